@@ -1,4 +1,6 @@
-from typing import Dict, Any, List, Optional
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import nullcontext
+from typing import Callable, ContextManager, Dict, Any, List, Optional, Tuple
 from .base_agent import AgentResponse
 from .epic_agent import EpicAgent
 from .story_agent import StoryAgent
@@ -7,7 +9,11 @@ from .testplan_agent import TestPlanAgent
 from .rag_agent import RAGAgent
 from models.file_model import Upload, Epic, Story, QA
 from config.db import get_db, get_db_context
+from config.config import WORKFLOW_CONCURRENCY
+from utils.ownership import FORBIDDEN, MISSING, owner_status
+from utils.projection import content_title, list_columns
 import logging
+import time
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
@@ -45,6 +51,15 @@ def create_coordinator_response(
 class AgentCoordinator:
     """Orchestrates multiple agents for requirement analysis workflow"""
 
+    # Workflow runs QA for this many stories
+    QA_STORY_LIMIT = 5
+
+    # Columns read by the epic and story listings; content only on request
+    EPIC_LIST_COLUMNS = ("name", "confluence_page_id", "jira_key", "jira_issue_id", "jira_url",
+                         "jira_creation_success", "created_at")
+    STORY_LIST_COLUMNS = ("name", "jira_key", "jira_issue_id", "jira_url", "epic_jira_key",
+                          "epic_jira_issue_id", "jira_creation_success", "created_at")
+
     def __init__(self):
         self.epic_agent = EpicAgent()
         self.story_agent = StoryAgent()
@@ -52,25 +67,25 @@ class AgentCoordinator:
         self.testplan_agent = TestPlanAgent()
         self.rag_agent = RAGAgent()
 
-    def generate_epics(self, upload_id: int) -> AgentResponse:
+    def generate_epics(self, upload_id: int, use_cache: bool = True) -> AgentResponse:
         """Trigger epic generation"""
         logger.info(f"Coordinator: Triggering epic generation for upload {upload_id}")
-        return self.epic_agent.execute({"upload_id": upload_id})
+        return self.epic_agent.execute({"upload_id": upload_id, "use_cache": use_cache})
 
-    def generate_stories(self, epic_id: int) -> AgentResponse:
+    def generate_stories(self, epic_id: int, use_cache: bool = True) -> AgentResponse:
         """Trigger story generation"""
         logger.info(f"Coordinator: Triggering story generation for epic {epic_id}")
-        return self.story_agent.execute({"epic_id": epic_id})
+        return self.story_agent.execute({"epic_id": epic_id, "use_cache": use_cache})
 
-    def generate_qa(self, story_id: int) -> AgentResponse:
+    def generate_qa(self, story_id: int, use_cache: bool = True) -> AgentResponse:
         """Trigger QA generation"""
         logger.info(f"Coordinator: Triggering QA generation for story {story_id}")
-        return self.qa_agent.execute({"story_id": story_id})
+        return self.qa_agent.execute({"story_id": story_id, "use_cache": use_cache})
 
-    def generate_testplan(self, epic_id: int) -> AgentResponse:
+    def generate_testplan(self, epic_id: int, use_cache: bool = True) -> AgentResponse:
         """Trigger test plan generation"""
         logger.info(f"Coordinator: Triggering test plan generation for epic {epic_id}")
-        return self.testplan_agent.execute({"epic_id": epic_id})
+        return self.testplan_agent.execute({"epic_id": epic_id, "use_cache": use_cache})
 
     def retrieve_documents(self, query: str, upload_id: int = None, top_k: int = 5) -> AgentResponse:
         """Retrieve relevant documents from RAG"""
@@ -80,58 +95,122 @@ class AgentCoordinator:
             context["upload_id"] = upload_id
         return self.rag_agent.execute(context)
 
-    def execute_workflow(self, upload_id: int) -> Dict[str, Any]:
+    def execute_workflow(self, upload_id: int, step: Optional[Callable[[str], ContextManager]] = None,
+                         use_cache: bool = True) -> Dict[str, Any]:
         """Execute full workflow: epics -> stories -> qa
         
-        Returns a comprehensive result dict with all generated artifacts
+        After the epics are generated the workflow runs as a dependency graph:
+        story generation for every epic is started at once, and QA for a
+        story starts as soon as its epic's stories land. At most
+        WORKFLOW_CONCURRENCY agent calls run at the same time.
+        
+        step, if given, is called with each phase name ("epics",
+        "stories_and_qa") and must return a context manager wrapping that
+        phase, e.g. a job timer. use_cache=False bypasses the LLM response
+        cache for every step.
+        
+        Returns a comprehensive result dict with all generated artifacts and
+        per-step timings
         """
+        step = step or (lambda name: nullcontext())
         logger.info(f"Coordinator: Starting full workflow for upload {upload_id}")
+        workflow_started = time.perf_counter()
         
         workflow_result = {
             "success": True,
             "epics": [],
             "stories": [],
             "qa": [],
-            "errors": []
+            "errors": [],
+            "timings": {"epics": None, "stories": [], "qa": [], "total_seconds": None}
         }
 
         # Step 1: Generate Epics
-        epic_response = self.generate_epics(upload_id)
+        with step("epics"):
+            started = time.perf_counter()
+            epic_response = self.generate_epics(upload_id, use_cache=use_cache)
+            workflow_result["timings"]["epics"] = round(time.perf_counter() - started, 4)
         if not epic_response.success:
             workflow_result["success"] = False
             workflow_result["errors"].append(f"Epic generation failed: {epic_response.error}")
+            workflow_result["timings"]["total_seconds"] = round(time.perf_counter() - workflow_started, 4)
             return workflow_result
 
         workflow_result["epics"] = epic_response.data.get("epics", [])
         epic_ids = [e.get("id") for e in workflow_result["epics"]]
 
-        # Step 2: Generate Stories for each epic
+        # Steps 2 and 3: stories per epic, then QA per story as soon as its stories land
+        with step("stories_and_qa"):
+            stories_by_epic, qa_by_story = self._fan_out(epic_ids, workflow_result, use_cache)
+
+        # Report artifacts in epic/story order regardless of completion order
         for epic_id in epic_ids:
-            story_response = self.generate_stories(epic_id)
-            if story_response.success:
-                workflow_result["stories"].extend(story_response.data.get("stories", []))
-            else:
-                workflow_result["errors"].append(f"Story generation failed for epic {epic_id}")
-
-        # Step 3: Generate QA for each story (sample first 5)
-        story_ids = [s.get("id") for s in workflow_result["stories"]][:5]
-        for story_id in story_ids:
-            qa_response = self.generate_qa(story_id)
-            if qa_response.success:
-                workflow_result["qa"].extend(qa_response.data.get("qa_tests", []))
-            else:
-                workflow_result["errors"].append(f"QA generation failed for story {story_id}")
-
-        logger.info(f"Coordinator: Workflow completed. Generated {len(workflow_result['epics'])} epics, "
+            workflow_result["stories"].extend(stories_by_epic.get(epic_id, []))
+        for story in workflow_result["stories"]:
+            workflow_result["qa"].extend(qa_by_story.get(story.get("id"), []))
+
+        workflow_result["timings"]["total_seconds"] = round(time.perf_counter() - workflow_started, 4)
+        logger.info(f"Coordinator: Workflow completed in {workflow_result['timings']['total_seconds']}s. "
+                   f"Generated {len(workflow_result['epics'])} epics, "
                    f"{len(workflow_result['stories'])} stories, {len(workflow_result['qa'])} QA tests")
         return workflow_result
 
-    def get_epics(self, upload_id: int, user_id: int = None) -> AgentResponse:
-        """Get all epics for a given upload"""
+    def _timed(self, func: Callable[..., AgentResponse], resource_id: int, use_cache: bool) -> Tuple[AgentResponse, float]:
+        started = time.perf_counter()
+        try:
+            response = func(resource_id, use_cache=use_cache)
+        except Exception as e:
+            response = create_coordinator_response(success=False, error=str(e))
+        return response, time.perf_counter() - started
+
+    def _fan_out(self, epic_ids: List[int], workflow_result: Dict[str, Any],
+                 use_cache: bool = True) -> Tuple[Dict[int, list], Dict[int, list]]:
+        """Run story generation per epic and QA per story on a bounded pool"""
+        stories_by_epic: Dict[int, list] = {}
+        qa_by_story: Dict[int, list] = {}
+        qa_remaining = self.QA_STORY_LIMIT
+        landed: Dict[int, list] = {}  # Stories of each finished epic, empty if generation failed
+        next_epic = 0  # Position in epic_ids of the first epic not yet considered for QA
+        timings = workflow_result["timings"]
+
+        with ThreadPoolExecutor(max_workers=WORKFLOW_CONCURRENCY, thread_name_prefix="workflow") as executor:
+            pending = {
+                executor.submit(self._timed, self.generate_stories, epic_id, use_cache): ("stories", epic_id)
+                for epic_id in epic_ids
+            }
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    kind, resource_id = pending.pop(future)
+                    response, seconds = future.result()
+                    id_key = "epic_id" if kind == "stories" else "story_id"
+                    timings[kind].append({id_key: resource_id, "seconds": round(seconds, 4), "success": response.success})
+
+                    if kind == "stories":
+                        if response.success:
+                            stories_by_epic[resource_id] = landed[resource_id] = response.data.get("stories", [])
+                        else:
+                            landed[resource_id] = []
+                            workflow_result["errors"].append(f"Story generation failed for epic {resource_id}")
+                        # QA only for the first stories in epic order, queued once every earlier epic has landed
+                        while qa_remaining and next_epic < len(epic_ids) and epic_ids[next_epic] in landed:
+                            for story in landed[epic_ids[next_epic]][:qa_remaining]:
+                                pending[executor.submit(self._timed, self.generate_qa, story.get("id"), use_cache)] = ("qa", story.get("id"))
+                                qa_remaining -= 1
+                            next_epic += 1
+                    elif response.success:
+                        qa_by_story[resource_id] = response.data.get("qa_tests", [])
+                    else:
+                        workflow_result["errors"].append(f"QA generation failed for story {resource_id}")
+
+        return stories_by_epic, qa_by_story
+
+    def get_epics(self, upload_id: int, user_id: int = None, content: bool = False) -> AgentResponse:
+        """Get all epics for a given upload, with their content if requested"""
         logger.info(f"Coordinator: Fetching epics for upload {upload_id}, user {user_id}")
         try:
             with get_db_context() as db:
-                upload_obj = db.query(Upload).filter(Upload.id == upload_id).first()
+                upload_obj = db.query(Upload.user_id).filter(Upload.id == upload_id).first()
                 if not upload_obj:
                     return create_coordinator_response(
                         success=False,
@@ -147,7 +226,12 @@ class AgentCoordinator:
                         message=""
                     )
                 
-                epics = db.query(Epic).filter(Epic.upload_id == upload_id).all()
+                epics = (
+                    db.query(Epic)
+                    .options(list_columns(Epic, *self.EPIC_LIST_COLUMNS, content=content))
+                    .filter(Epic.upload_id == upload_id)
+                    .all()
+                )
                 epic_list = []
                 for e in epics:
                     try:
@@ -155,7 +239,6 @@ class AgentCoordinator:
                         epic_data = {
                             "id": e.id,
                             "name": e.name or "Untitled",
-                            "content": e.content if isinstance(e.content, (dict, str)) else str(e.content),
                             "confluence_page_id": e.confluence_page_id,
                             "confluence_page_url": confluence_url,
                             "jira_key": e.jira_key,
@@ -164,6 +247,8 @@ class AgentCoordinator:
                             "jira_creation_success": e.jira_creation_success,
                             "created_at": str(e.created_at) if e.created_at else None
                         }
+                        if content:
+                            epic_data["content"] = safe_serialize_content(e.content)
                         epic_list.append(epic_data)
                     except Exception as item_error:
                         logger.error(f"Error serializing epic {e.id}: {str(item_error)}")
@@ -183,37 +268,30 @@ class AgentCoordinator:
                 message=""
             )
 
-    def get_stories(self, epic_id: int, user_id: int = None) -> AgentResponse:
-        """Get all stories for a given epic"""
+    def get_stories(self, epic_id: int, user_id: int = None, content: bool = False) -> AgentResponse:
+        """Get all stories for a given epic, with their content if requested"""
         logger.info(f"Coordinator: Fetching stories for epic {epic_id}, user {user_id}")
         try:
             with get_db_context() as db:
-                epic_obj = db.query(Epic).filter(Epic.id == epic_id).first()
-                if not epic_obj:
-                    return create_coordinator_response(
-                        success=False,
-                        error="Epic not found",
-                        message=""
-                    )
-                
+                query = (
+                    db.query(Story)
+                    .options(list_columns(Story, *self.STORY_LIST_COLUMNS, content=content))
+                    .filter(Story.epic_id == epic_id)
+                )
                 # Verify user access if user_id provided
                 if user_id:
-                    upload = db.query(Upload).filter(Upload.id == epic_obj.upload_id, Upload.user_id == user_id).first()
-                    if not upload:
-                        return create_coordinator_response(
-                            success=False,
-                            error="Unauthorized: You do not have access to this epic",
-                            message=""
-                        )
-                
-                stories = db.query(Story).filter(Story.epic_id == epic_id).all()
+                    query = query.filter(Story.user_id == user_id)
+                stories = query.all()
+                if not stories:
+                    error = self._access_error(db, Epic, epic_id, user_id, "epic")
+                    if error:
+                        return error
                 story_list = []
                 for s in stories:
                     try:
                         story_data = {
                             "id": s.id,
                             "name": s.name or "Untitled",
-                            "content": s.content if isinstance(s.content, (dict, str)) else str(s.content),
                             "jira_key": s.jira_key,
                             "jira_issue_id": s.jira_issue_id,
                             "jira_url": s.jira_url,
@@ -222,6 +300,8 @@ class AgentCoordinator:
                             "jira_creation_success": s.jira_creation_success,
                             "created_at": str(s.created_at) if s.created_at else None
                         }
+                        if content:
+                            story_data["content"] = safe_serialize_content(s.content)
                         story_list.append(story_data)
                     except Exception as item_error:
                         logger.error(f"Error serializing story {s.id}: {str(item_error)}")
@@ -240,37 +320,24 @@ class AgentCoordinator:
                 message=""
             )
 
-    def get_qa(self, story_id: int, user_id: int = None) -> AgentResponse:
-        """Get all QA test cases for a given story"""
+    def get_qa(self, story_id: int, user_id: int = None, content: bool = False) -> AgentResponse:
+        """Get all QA test cases for a given story, with their content if requested"""
         logger.info(f"Coordinator: Fetching QA tests for story {story_id}, user {user_id}")
         try:
             with get_db_context() as db:
-                story_obj = db.query(Story).filter(Story.id == story_id).first()
-                if not story_obj:
-                    return create_coordinator_response(
-                        success=False,
-                        error="Story not found",
-                        message=""
-                    )
-                
+                query = (
+                    db.query(QA)
+                    .options(list_columns(QA, "story_id", "test_type", "created_at", content=content))
+                    .filter(QA.story_id == story_id)
+                )
                 # Verify user access if user_id provided
                 if user_id:
-                    epic = db.query(Epic).filter(Epic.id == story_obj.epic_id).first()
-                    if not epic:
-                        return create_coordinator_response(
-                            success=False,
-                            error="Epic not found",
-                            message=""
-                        )
-                    upload = db.query(Upload).filter(Upload.id == epic.upload_id, Upload.user_id == user_id).first()
-                    if not upload:
-                        return create_coordinator_response(
-                            success=False,
-                            error="Unauthorized: You do not have access to this story",
-                            message=""
-                        )
-                
-                qa_tests = db.query(QA).filter(QA.story_id == story_id).all()
+                    query = query.filter(QA.user_id == user_id)
+                qa_tests = query.all()
+                if not qa_tests:
+                    error = self._access_error(db, Story, story_id, user_id, "story")
+                    if error:
+                        return error
                 qa_list = []
                 for q in qa_tests:
                     try:
@@ -278,9 +345,10 @@ class AgentCoordinator:
                             "id": q.id,
                             "story_id": q.story_id,
                             "test_type": q.test_type,
-                            "content": q.content if isinstance(q.content, (dict, str)) else str(q.content),
                             "created_at": str(q.created_at) if q.created_at else None
                         }
+                        if content:
+                            qa_data["content"] = safe_serialize_content(q.content)
                         qa_list.append(qa_data)
                     except Exception as item_error:
                         logger.error(f"Error serializing QA {q.id}: {str(item_error)}")
@@ -299,32 +367,26 @@ class AgentCoordinator:
                 message=""
             )
 
-    def get_testplan(self, epic_id: int, user_id: int = None) -> AgentResponse:
-        """Get all test plans for a given epic"""
+    def get_testplan(self, epic_id: int, user_id: int = None, content: bool = False) -> AgentResponse:
+        """Get all test plans for a given epic, with their content if requested"""
         logger.info(f"Coordinator: Fetching test plans for epic {epic_id}, user {user_id}")
         try:
             with get_db_context() as db:
-                epic_obj = db.query(Epic).filter(Epic.id == epic_id).first()
-                if not epic_obj:
-                    return create_coordinator_response(
-                        success=False,
-                        error="Epic not found",
-                        message=""
-                    )
-                
+                # Get test plans for this epic
+                query = (
+                    db.query(QA, content_title(QA))
+                    .options(list_columns(QA, "confluence_page_id", "created_at", content=content))
+                    .filter(QA.epic_id == epic_id, QA.type == "test_plan")
+                )
                 # Verify user access if user_id provided
                 if user_id:
-                    upload = db.query(Upload).filter(Upload.id == epic_obj.upload_id, Upload.user_id == user_id).first()
-                    if not upload:
-                        return create_coordinator_response(
-                            success=False,
-                            error="Unauthorized: You do not have access to this epic",
-                            message=""
-                        )
-                
-                # Get test plans for this epic
-                test_plans = db.query(QA).filter(QA.epic_id == epic_id, QA.type == "test_plan").all()
-                test_plan_list = self._build_test_plan_list(test_plans)
+                    query = query.filter(QA.user_id == user_id)
+                test_plans = query.all()
+                if not test_plans:
+                    error = self._access_error(db, Epic, epic_id, user_id, "epic")
+                    if error:
+                        return error
+                test_plan_list = self._build_test_plan_list(test_plans, content)
                 
                 return create_coordinator_response(
                     success=True,
@@ -339,24 +401,38 @@ class AgentCoordinator:
                 message=""
             )
 
-    def _build_test_plan_list(self, test_plans):
-        """Helper method to build test plan list with proper formatting"""
+    def _access_error(self, db, model, row_id: int, user_id: Optional[int], label: str) -> Optional[AgentResponse]:
+        """Error response when a parent row is missing or, with a user_id, not owned by that user"""
+        access = owner_status(db, model, row_id, user_id)
+        if access == MISSING:
+            return create_coordinator_response(success=False, error=f"{label.capitalize()} not found", message="")
+        if user_id and access == FORBIDDEN:
+            return create_coordinator_response(
+                success=False,
+                error=f"Unauthorized: You do not have access to this {label}",
+                message=""
+            )
+        return None
+
+    def _build_test_plan_list(self, test_plans, content: bool = False):
+        """Helper method to build test plan list from (test plan, title) rows with proper formatting"""
         DEFAULT_NAME = "Test Plan"
         test_plan_list = []
         
-        for tp in test_plans:
+        for tp, title in test_plans:
             try:
-                tp_name = self._extract_test_plan_name(tp.content, DEFAULT_NAME)
+                tp_name = title or (self._extract_test_plan_name(tp.content, DEFAULT_NAME) if content else DEFAULT_NAME)
                 confluence_url = self._get_confluence_url(tp.confluence_page_id)
                 
                 test_plan_data = {
                     "id": tp.id,
                     "name": tp_name,
-                    "content": tp.content if isinstance(tp.content, (dict, str)) else str(tp.content),
                     "confluence_page_id": tp.confluence_page_id,
                     "confluence_page_url": confluence_url,
                     "created_at": str(tp.created_at) if tp.created_at else None
                 }
+                if content:
+                    test_plan_data["content"] = safe_serialize_content(tp.content)
                 test_plan_list.append(test_plan_data)
             except Exception as item_error:
                 logger.error(f"Error serializing test plan {tp.id}: {str(item_error)}")
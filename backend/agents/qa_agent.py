@@ -2,6 +2,7 @@ from typing import Dict, Any
 import os
 import json
 import re
+from sqlalchemy.orm import undefer
 from config.gemini import generate_json
 from config.db import get_db, get_db_context
 from models.file_model import Story, QA
@@ -103,6 +104,7 @@ User Story:
         
         Context expects:
             - story_id (int): ID of the story
+            - use_cache (bool, optional): False bypasses the LLM response cache
         """
         try:
             story_id = context.get("story_id")
@@ -114,8 +116,9 @@ User Story:
                     error="Missing story_id in context"
                 )
 
+            # Short read; no connection is held during the model call
             with get_db_context() as db:
-                story_obj = db.query(Story).filter(Story.id == story_id).first()
+                story_obj = db.query(Story).options(undefer(Story.content)).filter(Story.id == story_id).first()
                 if not story_obj:
                     return self.create_response(
                         success=False,
@@ -124,41 +127,46 @@ User Story:
                         error="Story not found"
                     )
 
-                # Load prompt from file
-                prompt_template = self.load_qa_prompt()
-                
-                # Convert story content to string if it's a dict
                 story_content = story_obj.content
-                if isinstance(story_content, dict):
-                    story_content = str(story_content)
-                else:
-                    story_content = str(story_content) if story_content else ""
-                
-                # Replace placeholder with story content
-                prompt = prompt_template.replace("{{requirement}}", story_content)
-
-                self.log_execution("info", f"Generating QA test cases for story {story_id}")
-                raw_output = generate_json(prompt)
-                
-                try:
-                    qa_list = safe_parse_json(raw_output)
-                except ValueError as parse_error:
-                    self.log_execution("error", f"JSON parsing error: {str(parse_error)}")
-                    return self.create_response(
-                        success=False,
-                        data=None,
-                        message="Could not extract valid JSON from model output.",
-                        error=f"JSON parsing failed: {str(parse_error)}"
-                    )
+                upload_id = story_obj.upload_id
+                user_id = story_obj.user_id
+
+            # Load prompt from file
+            prompt_template = self.load_qa_prompt()
+            
+            # Convert story content to string if it's a dict
+            if isinstance(story_content, dict):
+                story_content = str(story_content)
+            else:
+                story_content = str(story_content) if story_content else ""
+            
+            # Replace placeholder with story content
+            prompt = prompt_template.replace("{{requirement}}", story_content)
+
+            self.log_execution("info", f"Generating QA test cases for story {story_id}")
+            raw_output = generate_json(prompt, use_cache=context.get("use_cache", True))
+            
+            try:
+                qa_list = safe_parse_json(raw_output)
+            except ValueError as parse_error:
+                self.log_execution("error", f"JSON parsing error: {str(parse_error)}")
+                return self.create_response(
+                    success=False,
+                    data=None,
+                    message="Could not extract valid JSON from model output.",
+                    error=f"JSON parsing failed: {str(parse_error)}"
+                )
 
-                if not isinstance(qa_list, list):
-                    return self.create_response(
-                        success=False,
-                        data=None,
-                        message="Expected an array of QA objects",
-                        error="Invalid response format"
-                    )
+            if not isinstance(qa_list, list):
+                return self.create_response(
+                    success=False,
+                    data=None,
+                    message="Expected an array of QA objects",
+                    error="Invalid response format"
+                )
 
+            # Save the test cases in one short transaction
+            with get_db_context() as db:
                 saved_tests = []
                 for qa_item in qa_list:
                     # Extract test_type from the test case
@@ -169,6 +177,8 @@ User Story:
                     
                     qa_obj = QA(
                         story_id=story_id,
+                        upload_id=upload_id,
+                        user_id=user_id,
                         type="qa",
                         test_type=test_type,
                         content=qa_item
@@ -186,12 +196,12 @@ User Story:
 
                 db.commit()
 
-                self.log_execution("info", f"Successfully generated {len(saved_tests)} QA test cases")
-                return self.create_response(
-                    success=True,
-                    data={"qa_tests": saved_tests, "story_id": story_id},
-                    message=f"Successfully generated {len(saved_tests)} QA test cases"
-                )
+            self.log_execution("info", f"Successfully generated {len(saved_tests)} QA test cases")
+            return self.create_response(
+                success=True,
+                data={"qa_tests": saved_tests, "story_id": story_id},
+                message=f"Successfully generated {len(saved_tests)} QA test cases"
+            )
 
         except Exception as e:
             self.log_execution("error", f"Exception: {str(e)}")
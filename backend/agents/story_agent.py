@@ -1,6 +1,7 @@
 from typing import Dict, Any
 import os
 from pathlib import Path
+from sqlalchemy.orm import undefer
 from config.gemini import generate_json
 from config.db import get_db, get_db_context
 from models.file_model import Epic, Story
@@ -59,6 +60,7 @@ Epic Details:
         
         Context expects:
             - epic_id (int): ID of the epic
+            - use_cache (bool, optional): False bypasses the LLM response cache
         """
         try:
             epic_id = context.get("epic_id")
@@ -70,8 +72,9 @@ Epic Details:
                     error="Missing epic_id in context"
                 )
 
+            # Short read; no connection is held during the model call
             with get_db_context() as db:
-                epic_obj = db.query(Epic).filter(Epic.id == epic_id).first()
+                epic_obj = db.query(Epic).options(undefer(Epic.content)).filter(Epic.id == epic_id).first()
                 if not epic_obj:
                     return self.create_response(
                         success=False,
@@ -80,42 +83,49 @@ Epic Details:
                         error="Epic not found"
                     )
 
-                # Load prompt from file
-                prompt_template = self.load_story_prompt()
-                
-                # Convert epic content to string if it's a dict
                 epic_content = epic_obj.content
-                if isinstance(epic_content, dict):
-                    epic_content = str(epic_content)
-                else:
-                    epic_content = str(epic_content) if epic_content else ""
-                
-                # Replace placeholder with epic content
-                prompt = prompt_template.replace("{{requirement}}", epic_content)
-
-                self.log_execution("info", f"Generating stories for epic {epic_id}")
-                stories_raw = generate_json(prompt)
-
-                # Normalize response to a list of story objects
-                if isinstance(stories_raw, dict):
-                    stories_list = [
-                        {"name": k, **v} if isinstance(v, dict) else {"name": k, "content": v}
-                        for k, v in stories_raw.items()
-                    ]
-                elif isinstance(stories_raw, list):
-                    stories_list = stories_raw
-                else:
-                    return self.create_response(
-                        success=False,
-                        data=None,
-                        message="Unexpected response format from Gemini",
-                        error="Invalid response format"
-                    )
+                upload_id = epic_obj.upload_id
+                user_id = epic_obj.user_id
+
+            # Load prompt from file
+            prompt_template = self.load_story_prompt()
+            
+            # Convert epic content to string if it's a dict
+            if isinstance(epic_content, dict):
+                epic_content = str(epic_content)
+            else:
+                epic_content = str(epic_content) if epic_content else ""
+            
+            # Replace placeholder with epic content
+            prompt = prompt_template.replace("{{requirement}}", epic_content)
+
+            self.log_execution("info", f"Generating stories for epic {epic_id}")
+            stories_raw = generate_json(prompt, use_cache=context.get("use_cache", True))
+
+            # Normalize response to a list of story objects
+            if isinstance(stories_raw, dict):
+                stories_list = [
+                    {"name": k, **v} if isinstance(v, dict) else {"name": k, "content": v}
+                    for k, v in stories_raw.items()
+                ]
+            elif isinstance(stories_raw, list):
+                stories_list = stories_raw
+            else:
+                return self.create_response(
+                    success=False,
+                    data=None,
+                    message="Unexpected response format from Gemini",
+                    error="Invalid response format"
+                )
 
+            # Save the stories in one short transaction
+            with get_db_context() as db:
                 response_array = []
                 for story_item in stories_list:
                     story = Story(
-                        epic_id=epic_obj.id,
+                        epic_id=epic_id,
+                        upload_id=upload_id,
+                        user_id=user_id,
                         name=story_item.get("name", "Unnamed Story"),
                         content=story_item
                     )
@@ -129,12 +139,12 @@ Epic Details:
 
                 db.commit()
 
-                self.log_execution("info", f"Successfully generated {len(response_array)} stories")
-                return self.create_response(
-                    success=True,
-                    data={"stories": response_array, "epic_id": epic_id},
-                    message=f"Successfully generated {len(response_array)} stories"
-                )
+            self.log_execution("info", f"Successfully generated {len(response_array)} stories")
+            return self.create_response(
+                success=True,
+                data={"stories": response_array, "epic_id": epic_id},
+                message=f"Successfully generated {len(response_array)} stories"
+            )
 
         except Exception as e:
             self.log_execution("error", f"Exception: {str(e)}")
@@ -1,6 +1,6 @@
 import sys
 import os
-from fastapi import FastAPI, status
+from fastapi import Depends, FastAPI, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 import logging
@@ -16,8 +16,18 @@ logger = logging.getLogger(__name__)
 # Add backend directory to path so imports work correctly
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
+from config.auth import TokenData, get_current_user
 from config.db import Base, engine, dispose_db_connections
-from routes import upload, generateStories, generateEpics, generateQA, listFiles, generateTestPlan, getEpics, getStories, getQA, getTestPlan, agents_router, rag_search, rag_vectorstore_search, auth, jira
+from config.config import EMBEDDING_MODEL_WARMUP, UPLOAD_MAX_BYTES, VECTORSTORE_WRITE_BEHIND
+from rag.embedder import get_embedding_model, get_embedding_model_stats
+from utils.llm_cache import get_llm_cache_stats
+from rag.vectorstore import start_write_behind_flusher, stop_write_behind_flusher
+from services.job_queue import start_job_workers, stop_job_workers
+from services.confluence_outbox import start_outbox_worker, stop_outbox_worker
+from services.jira_client import clear_jira_clients
+from services.text_extraction import shutdown_extraction_pool
+from utils.upload_limit import UploadSizeLimitMiddleware
+from routes import upload, generateStories, generateEpics, generateQA, listFiles, generateTestPlan, getEpics, getStories, getQA, getTestPlan, agents_router, rag_search, rag_vectorstore_search, indexing, auth, jira, jobs, confluence
 
 logger.info("Starting Requirement Analyzer Backend")
 logger.info(f"Database engine available: {bool(engine)}")
@@ -37,11 +47,35 @@ async def lifespan(app: FastAPI):
     else:
         logger.error("Database engine not configured!")
     
+    # Optionally load the shared embedding model before serving requests
+    if EMBEDDING_MODEL_WARMUP:
+        try:
+            get_embedding_model()
+        except Exception as e:
+            logger.error(f"Embedding model warmup failed: {str(e)}")
+    
+    # Periodically flush buffered vectorstore writes
+    if VECTORSTORE_WRITE_BEHIND:
+        start_write_behind_flusher()
+    
+    # Workers for queued generation jobs; resumes jobs queued before a restart
+    start_job_workers()
+    
+    # Publishes generated content to Confluence after it is committed
+    start_outbox_worker()
+    
     logger.info("Application startup completed")
     yield
     
     # Shutdown
     logger.info("Application shutting down")
+    stop_job_workers()
+    stop_outbox_worker()
+    clear_jira_clients()
+    shutdown_extraction_pool()
+    flushed = stop_write_behind_flusher()
+    if flushed:
+        logger.info(f"Flushed {flushed} buffered vectorstore documents")
     dispose_db_connections()
     logger.info("Database connections closed")
 
@@ -102,6 +136,9 @@ else:
         ]
     )
 
+# Reject oversized uploads from their Content-Length, before the body is read
+app.add_middleware(UploadSizeLimitMiddleware, max_bytes=UPLOAD_MAX_BYTES, paths=["/api/upload"])
+
 # Add CORS middleware - must be added BEFORE routes
 app.add_middleware(
     CORSMiddleware,
@@ -157,6 +194,18 @@ async def version():
     }
 
 
+@app.get("/metrics/embedding-model", tags=["System"])
+async def embedding_model_metrics():
+    """Get load time and memory metrics for the shared embedding model"""
+    return get_embedding_model_stats()
+
+
+@app.get("/metrics/llm-cache", tags=["System"])
+async def llm_cache_metrics(current_user: TokenData = Depends(get_current_user)):
+    """Get hit/miss counters and size of the LLM response cache (signed-in users only)"""
+    return get_llm_cache_stats()
+
+
 # Register routers
 app.include_router(auth.router, prefix="/api", tags=["Authentication"])
 app.include_router(upload.router, prefix="/api", tags=["Files"])
@@ -172,7 +221,10 @@ app.include_router(getTestPlan.router, prefix="/api", tags=["Content Retrieval"]
 app.include_router(agents_router.router, prefix="/api", tags=["Agents"])
 app.include_router(rag_search.router, prefix="/api", tags=["RAG Search"])
 app.include_router(rag_vectorstore_search.router, prefix="/api", tags=["RAG Search"])
+app.include_router(indexing.router, prefix="/api", tags=["RAG Search"])
 app.include_router(jira.router, tags=["Jira Integration"])
+app.include_router(jobs.router, prefix="/api", tags=["Jobs"])
+app.include_router(confluence.router, prefix="/api", tags=["Confluence"])
 
 logger.info("All routers registered successfully")
 
@@ -29,6 +29,9 @@ SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# Users allowed to run maintenance on shared resources (comma-separated emails); none by default
+ADMIN_EMAILS = {email.strip().lower() for email in os.getenv("ADMIN_EMAILS", "").split(",") if email.strip()}
+
 # Security scheme
 security = HTTPBearer(auto_error=False)
 
@@ -162,3 +165,18 @@ def get_current_user(credentials: Optional[HTTPAuthorizationCredentials] = Depen
     
     logger.info(f"Authentication successful: user_email={token_data.email}, user_id={token_data.user_id}")
     return token_data
+
+
+def get_admin_user(current_user: TokenData = Depends(get_current_user)) -> TokenData:
+    """Dependency for endpoints that act on data shared by every user; only ADMIN_EMAILS pass"""
+    if current_user.email.lower() not in ADMIN_EMAILS:
+        logger.warning(f"Admin access denied: user_email={current_user.email}")
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail={
+                "error": "This endpoint is restricted to administrators",
+                "status": "forbidden",
+                "code": "ADMIN_REQUIRED"
+            },
+        )
+    return current_user
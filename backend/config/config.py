@@ -11,5 +11,69 @@ CONFLUENCE_PASSWORD = os.getenv("confluence_password")
 CONFLUENCE_SPACE_KEY = os.getenv("confluence_space_key")
 CONFLUENCE_ROOT_FOLDER_ID = os.getenv("confluence_root_folder_id")
 
+# Confluence publisher configuration (parallel page creation, retries on 429/5xx)
+CONFLUENCE_MAX_WORKERS = int(os.getenv("CONFLUENCE_MAX_WORKERS", "8"))
+CONFLUENCE_MAX_RETRIES = int(os.getenv("CONFLUENCE_MAX_RETRIES", "4"))
+CONFLUENCE_RETRY_BACKOFF_SECONDS = float(os.getenv("CONFLUENCE_RETRY_BACKOFF_SECONDS", "0.5"))
+CONFLUENCE_TIMEOUT_SECONDS = float(os.getenv("CONFLUENCE_TIMEOUT_SECONDS", "30"))
+CONFLUENCE_OUTBOX_POLL_SECONDS = float(os.getenv("CONFLUENCE_OUTBOX_POLL_SECONDS", "5"))
+CONFLUENCE_OUTBOX_BATCH_SIZE = int(os.getenv("CONFLUENCE_OUTBOX_BATCH_SIZE", "10"))
+CONFLUENCE_OUTBOX_MAX_ATTEMPTS = int(os.getenv("CONFLUENCE_OUTBOX_MAX_ATTEMPTS", "5"))
+# An entry claimed longer ago than this is assumed abandoned by a stopped worker and requeued
+CONFLUENCE_OUTBOX_LEASE_SECONDS = float(os.getenv("CONFLUENCE_OUTBOX_LEASE_SECONDS", "900"))
+
 # Jira Configuration
-JIRA_API_TOKEN_ENCRYPTION_KEY = os.getenv("JIRA_ENCRYPTION_KEY", "default-encryption-key-change-in-production")
\ No newline at end of file
+JIRA_API_TOKEN_ENCRYPTION_KEY = os.getenv("JIRA_ENCRYPTION_KEY", "default-encryption-key-change-in-production")
+JIRA_BULK_CHUNK_SIZE = int(os.getenv("JIRA_BULK_CHUNK_SIZE", "50"))  # Jira Cloud accepts at most 50 issues per bulk request
+JIRA_CLIENT_TTL_SECONDS = float(os.getenv("JIRA_CLIENT_TTL_SECONDS", "900"))
+JIRA_CLIENT_CACHE_SIZE = int(os.getenv("JIRA_CLIENT_CACHE_SIZE", "64"))
+JIRA_POOL_MAXSIZE = int(os.getenv("JIRA_POOL_MAXSIZE", "10"))
+JIRA_TIMEOUT_SECONDS = float(os.getenv("JIRA_TIMEOUT_SECONDS", "30"))
+
+# Embedding model configuration
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "all-MiniLM-L6-v2")
+EMBEDDING_MODEL_WARMUP = os.getenv("EMBEDDING_MODEL_WARMUP", "false").lower() == "true"
+
+# Local storage (vector store, job store, LLM cache); absolute so every process
+# opens the same files whatever its working directory
+STORAGE_DIR = os.getenv("STORAGE_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "storage"))
+
+# Vector store configuration
+VECTORSTORE_DIR = os.getenv("VECTORSTORE_DIR", STORAGE_DIR)
+VECTORSTORE_ENCODE_BATCH_SIZE = int(os.getenv("VECTORSTORE_ENCODE_BATCH_SIZE", "64"))
+VECTORSTORE_WRITE_BEHIND = os.getenv("VECTORSTORE_WRITE_BEHIND", "false").lower() == "true"
+VECTORSTORE_FLUSH_INTERVAL_SECONDS = float(os.getenv("VECTORSTORE_FLUSH_INTERVAL_SECONDS", "5"))
+VECTORSTORE_INDEX_TYPE = os.getenv("VECTORSTORE_INDEX_TYPE", "exact").lower()
+VECTORSTORE_ANN_MIN_DOCUMENTS = int(os.getenv("VECTORSTORE_ANN_MIN_DOCUMENTS", "10000"))
+VECTORSTORE_ANN_REBUILD_RATIO = float(os.getenv("VECTORSTORE_ANN_REBUILD_RATIO", "0.5"))
+
+# Upload ingestion configuration
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(100 * 1024 * 1024)))
+UPLOAD_SPOOL_CHUNK_BYTES = int(os.getenv("UPLOAD_SPOOL_CHUNK_BYTES", str(1024 * 1024)))
+UPLOAD_EXTRACTION_WORKERS = int(os.getenv("UPLOAD_EXTRACTION_WORKERS", "4"))
+PDF_EXTRACTION_PROCESSES = int(os.getenv("PDF_EXTRACTION_PROCESSES", str(min(4, os.cpu_count() or 1))))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "25"))
+
+# Upload chunking for RAG search; MiniLM reads about 256 tokens (~1000 characters) per passage
+CHUNK_MAX_CHARS = int(os.getenv("CHUNK_MAX_CHARS", "900"))
+CHUNK_OVERLAP_CHARS = int(os.getenv("CHUNK_OVERLAP_CHARS", "150"))
+
+# Background job queue configuration
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_QUEUE_MAX_PENDING = int(os.getenv("JOB_QUEUE_MAX_PENDING", "100"))
+JOB_STORE_PATH = os.getenv("JOB_STORE_PATH", os.path.join(STORAGE_DIR, "jobs.db"))
+# Running jobs renew their lease while the worker lives; another process fails them once it expires
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+
+# Agent workflow configuration
+WORKFLOW_CONCURRENCY = int(os.getenv("WORKFLOW_CONCURRENCY", "4"))
+
+# Gemini client configuration
+GEMINI_TIMEOUT_SECONDS = float(os.getenv("GEMINI_TIMEOUT_SECONDS", "120"))
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "16"))
+
+# LLM response cache configuration
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(STORAGE_DIR, "llm_cache.db"))
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
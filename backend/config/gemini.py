@@ -1,5 +1,10 @@
+import asyncio
+import threading
+import weakref
+from typing import Any, AsyncIterator, Optional
 import google.generativeai as genai
-from config.config import GEMINI_API_KEY
+from config.config import GEMINI_API_KEY, GEMINI_TIMEOUT_SECONDS, GEMINI_MAX_CONCURRENCY
+from utils.llm_cache import cache_key, get_llm_cache
 import logging
 
 logger = logging.getLogger(__name__)
@@ -10,6 +15,43 @@ genai.configure(api_key=GEMINI_API_KEY)
 # Default model
 DEFAULT_MODEL = "models/gemini-2.5-flash"  # safer than gemini-1.5-pro if unavailable
 
+# Model objects are reused so their underlying client connections are too
+_models = {}
+_models_lock = threading.Lock()
+
+# One semaphore per event loop; asyncio primitives cannot be shared across loops
+_semaphores = weakref.WeakKeyDictionary()
+
+
+def get_model(model_name: str = DEFAULT_MODEL) -> genai.GenerativeModel:
+    """
+    Return the shared GenerativeModel for a model name, creating it on first use.
+    
+    Args:
+        model_name: Gemini model name
+        
+    Returns:
+        Reused GenerativeModel instance
+    """
+    model = _models.get(model_name)
+    if model is None:
+        with _models_lock:
+            model = _models.get(model_name)
+            if model is None:
+                model = genai.GenerativeModel(model_name)
+                _models[model_name] = model
+    return model
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    """Semaphore limiting in-flight async Gemini calls on the running loop"""
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(GEMINI_MAX_CONCURRENCY)
+        _semaphores[loop] = semaphore
+    return semaphore
+
 
 def generate_text(prompt: str) -> str:
     """
@@ -22,8 +64,7 @@ def generate_text(prompt: str) -> str:
         Generated text
     """
     try:
-        model = genai.GenerativeModel(DEFAULT_MODEL)
-        response = model.generate_content(prompt)
+        response = get_model().generate_content(prompt, request_options={"timeout": GEMINI_TIMEOUT_SECONDS})
         logger.debug("Text generation completed successfully")
         return response.text
     except Exception as e:
@@ -31,13 +72,28 @@ def generate_text(prompt: str) -> str:
         raise
 
 
-def generate_json(prompt: str):
+def _cached_response(model_name: str, prompt: str, params: Optional[dict], use_cache: bool):
+    """Look up a cached response; returns (cache, key, text or None)"""
+    cache = get_llm_cache()
+    if cache is None:
+        return None, None, None
+    key = cache_key(model_name, prompt, params)
+    return cache, key, cache.get(key) if use_cache else None
+
+
+def generate_json(prompt: str, use_cache: bool = True, generation_config: Optional[dict] = None):
     """
     Call Gemini to generate JSON content.
     Uses unified JSON parser from utils for consistency.
     
+    Responses are cached by (model, prompt, generation_config); identical
+    requests are answered from the cache until the entry expires.
+    
     Args:
         prompt: Input prompt for generation
+        use_cache: Read from the response cache; False forces a fresh call
+            whose response then replaces the cached one
+        generation_config: Optional Gemini generation parameters
         
     Returns:
         Parsed JSON object or list
@@ -47,13 +103,179 @@ def generate_json(prompt: str):
     """
     from utils.json_parser import extract_valid_json
     
+    cache, key, cached = _cached_response(DEFAULT_MODEL, prompt, generation_config, use_cache)
+    if cached is not None:
+        logger.debug("JSON generation served from cache")
+        return extract_valid_json(cached)
+    
     try:
-        model = genai.GenerativeModel(DEFAULT_MODEL)
-        response = model.generate_content(prompt)
+        response = get_model().generate_content(
+            prompt,
+            generation_config=generation_config,
+            request_options={"timeout": GEMINI_TIMEOUT_SECONDS}
+        )
         logger.debug("JSON generation completed, parsing response")
         
         text = response.text
-        return extract_valid_json(text)
+        result = extract_valid_json(text)
     except Exception as e:
         logger.error(f"Error generating JSON: {str(e)}")
-        raise
\ No newline at end of file
+        raise
+    
+    # Only responses that parsed are worth replaying
+    if cache is not None:
+        cache.put(key, DEFAULT_MODEL, text)
+    return result
+
+
+async def agenerate_text(prompt: str, timeout: float = GEMINI_TIMEOUT_SECONDS,
+                         generation_config: Optional[dict] = None) -> str:
+    """
+    Call Gemini asynchronously to generate text.
+    
+    At most GEMINI_MAX_CONCURRENCY calls are in flight per event loop; the
+    rest wait their turn without holding a thread.
+    
+    Args:
+        prompt: Input prompt for generation
+        timeout: Seconds to wait for the response, queueing time excluded
+        generation_config: Optional Gemini generation parameters
+        
+    Returns:
+        Generated text
+        
+    Raises:
+        TimeoutError: If Gemini does not answer within timeout
+    """
+    async with _get_semaphore():
+        try:
+            response = await asyncio.wait_for(
+                get_model().generate_content_async(
+                    prompt,
+                    generation_config=generation_config,
+                    request_options={"timeout": timeout}
+                ),
+                timeout
+            )
+            logger.debug("Async text generation completed successfully")
+            return response.text
+        except asyncio.TimeoutError:
+            logger.error(f"Gemini call timed out after {timeout}s")
+            raise TimeoutError(f"Gemini call timed out after {timeout}s")
+        except Exception as e:
+            logger.error(f"Error generating text: {str(e)}")
+            raise
+
+
+async def agenerate_json(prompt: str, timeout: float = GEMINI_TIMEOUT_SECONDS, use_cache: bool = True,
+                         generation_config: Optional[dict] = None):
+    """
+    Call Gemini asynchronously to generate JSON content.
+    
+    Shares the response cache with generate_json.
+    
+    Args:
+        prompt: Input prompt for generation
+        timeout: Seconds to wait for the response, queueing time excluded
+        use_cache: Read from the response cache; False forces a fresh call
+        generation_config: Optional Gemini generation parameters
+        
+    Returns:
+        Parsed JSON object or list
+        
+    Raises:
+        TimeoutError: If Gemini does not answer within timeout
+        ValueError: If JSON extraction fails
+    """
+    from utils.json_parser import extract_valid_json
+    
+    # SQLite lookups on the local cache file are sub-millisecond, so they run inline
+    cache, key, cached = _cached_response(DEFAULT_MODEL, prompt, generation_config, use_cache)
+    if cached is not None:
+        logger.debug("Async JSON generation served from cache")
+        return extract_valid_json(cached)
+    
+    text = await agenerate_text(prompt, timeout, generation_config)
+    logger.debug("Async JSON generation completed, parsing response")
+    result = extract_valid_json(text)
+    if cache is not None:
+        cache.put(key, DEFAULT_MODEL, text)
+    return result
+
+
+async def astream_json_items(prompt: str, timeout: float = GEMINI_TIMEOUT_SECONDS, use_cache: bool = True,
+                             generation_config: Optional[dict] = None) -> AsyncIterator[Any]:
+    """
+    Stream a Gemini JSON array response, yielding each element once it is complete.
+    
+    A cached response is replayed element by element. Otherwise the response
+    is streamed and, if the full text parses, stored in the same cache that
+    generate_json uses.
+    
+    Args:
+        prompt: Input prompt for generation
+        timeout: Maximum seconds to wait for the first chunk and between chunks
+        use_cache: Read from the response cache; False forces a fresh call
+        generation_config: Optional Gemini generation parameters
+        
+    Yields:
+        Parsed array elements, in order
+        
+    Raises:
+        TimeoutError: If Gemini stalls for longer than timeout
+    """
+    from utils.json_parser import JSONArrayStream, ensure_list, extract_valid_json
+    
+    cache, key, cached = _cached_response(DEFAULT_MODEL, prompt, generation_config, use_cache)
+    if cached is not None:
+        logger.debug("Streamed JSON generation served from cache")
+        for item in ensure_list(extract_valid_json(cached)):
+            yield item
+        return
+    
+    parser = JSONArrayStream()
+    text_parts = []
+    streamed = 0
+    # The slot is held while waiting on Gemini only, never while the consumer handles an item
+    semaphore = _get_semaphore()
+    try:
+        async with semaphore:
+            response = await asyncio.wait_for(
+                get_model().generate_content_async(
+                    prompt,
+                    stream=True,
+                    generation_config=generation_config,
+                    request_options={"timeout": timeout}
+                ),
+                timeout
+            )
+        chunks = response.__aiter__()
+        while True:
+            async with semaphore:
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), timeout)
+                except StopAsyncIteration:
+                    break
+            text_parts.append(chunk.text)
+            for item in parser.feed(chunk.text):
+                streamed += 1
+                yield item
+    except asyncio.TimeoutError:
+        logger.error(f"Gemini stream stalled for more than {timeout}s")
+        raise TimeoutError(f"Gemini stream stalled for more than {timeout}s")
+    
+    for item in parser.close():
+        streamed += 1
+        yield item
+    
+    text = "".join(text_parts)
+    if not streamed:
+        # Nothing usable was streamed; parse the whole text so malformed output raises ValueError
+        for item in ensure_list(extract_valid_json(text)):
+            yield item
+    if cache is not None:
+        try:
+            extract_valid_json(text)
+            cache.put(key, DEFAULT_MODEL, text)
+        except ValueError:
+            logger.warning("Streamed response was not valid JSON; not caching it")
@@ -1,6 +1,8 @@
-from sqlalchemy import Column, Integer, String, TIMESTAMP, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, Text, TIMESTAMP, ForeignKey, Boolean, LargeBinary, Index, event, select
 from sqlalchemy.dialects.postgresql import JSONB
-from sqlalchemy.sql import func
+from sqlalchemy.orm import deferred, relationship
+from sqlalchemy.sql import false, func
+from datetime import datetime
 import sys
 from pathlib import Path
 
@@ -24,33 +26,89 @@ class User(Base):
 
 class Upload(Base):
     __tablename__ = "uploads"
+    # Composite indexes serve the keyset-paginated listings; see migrations/add_listing_indexes.py
+    __table_args__ = (
+        Index("ix_uploads_user_created", "user_id", "created_at", "id"),
+        Index("ix_uploads_user_file_hash", "user_id", "file_hash"),
+        Index("ix_uploads_user_text_hash", "user_id", "text_hash"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     filename = Column(String(255))
-    content = Column(JSONB)  # store requirement content as JSON
+    # Large JSONB columns are deferred: loaded on first access or with undefer(); see utils/projection.py
+    content = deferred(Column(JSONB))  # store requirement content as JSON
+    page_offsets = deferred(Column(JSONB, nullable=True))  # where each PDF page starts in content["requirement"]
+    # Duplicate detection; see services/upload_dedup.py
+    file_hash = Column(String(64), nullable=True)  # sha256 of the uploaded bytes
+    text_hash = Column(String(64), nullable=True)  # sha256 of content["requirement"]
     confluence_page_id = Column(String(50), nullable=True)
     vectorstore_id = Column(String(255), nullable=True)  # unique ID for this upload's vector store
+    chunked = Column(Boolean, nullable=False, default=False, server_default=false())  # upload_chunks written; see rag/upload_chunks.py
     created_at = Column(TIMESTAMP, server_default=func.now())
 
+    # Children are removed by the ON DELETE CASCADE foreign keys, not loaded and deleted one by one
+    epics = relationship("Epic", back_populates="upload", order_by="Epic.id", passive_deletes=True)
+    aggregated = relationship("AggregatedUpload", back_populates="upload", order_by="AggregatedUpload.id",
+                              passive_deletes=True)
+    chunks = relationship("UploadChunk", back_populates="upload", order_by="UploadChunk.chunk_index",
+                          passive_deletes=True)
+
+class UploadChunk(Base):
+    """Overlapping passage of an upload's requirement text, embedded on its own for RAG search"""
+    __tablename__ = "upload_chunks"
+    __table_args__ = (Index("ix_upload_chunks_upload_index", "upload_id", "chunk_index"),)
+    id = Column(Integer, primary_key=True, index=True)
+    upload_id = Column(Integer, ForeignKey("uploads.id", ondelete="CASCADE"), nullable=False)
+    chunk_index = Column(Integer, nullable=False)
+    start_offset = Column(Integer, nullable=False)  # [start_offset, end_offset) of content["requirement"]
+    end_offset = Column(Integer, nullable=False)
+    heading = Column(String(255), nullable=True)  # section the passage belongs to
+    text = Column(Text, nullable=False)
+    embedding = Column(LargeBinary, nullable=True)  # float32 embedding bytes for RAG search
+    embedding_model = Column(String(255), nullable=True)  # model that produced the embedding
+    embedding_hash = Column(String(64), nullable=True)  # sha256 of the embedded text
+
+    upload = relationship("Upload", back_populates="chunks")
+
 class Epic(Base):
     __tablename__ = "epics"
+    __table_args__ = (
+        Index("ix_epics_upload_created", "upload_id", "created_at", "id"),
+        Index("ix_epics_user_created", "user_id", "created_at", "id"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     upload_id = Column(Integer, ForeignKey("uploads.id", ondelete="CASCADE"))
+    # Owner copied from the upload on insert so access checks need no joins; see migrations/add_owner_columns.py
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=True)
     name = Column(String(255))
-    content = Column(JSONB)  # epic details as JSON
+    content = deferred(Column(JSONB))  # epic details as JSON
     confluence_page_id = Column(String(255), nullable=True)  # Confluence page ID
     jira_key = Column(String(50), nullable=True)  # Jira issue key (e.g., PROJ-1)
     jira_issue_id = Column(String(50), nullable=True)  # Jira issue ID (numeric, e.g., 10028)
     jira_url = Column(String(512), nullable=True)  # Jira issue URL
     jira_creation_success = Column(Boolean, nullable=True)  # True if Jira creation succeeded, False if failed, None if not attempted
+    embedding = Column(LargeBinary, nullable=True)  # float32 embedding bytes for RAG search
+    embedding_model = Column(String(255), nullable=True)  # model that produced the embedding
+    embedding_hash = Column(String(64), nullable=True)  # sha256 of the embedded text
     created_at = Column(TIMESTAMP, server_default=func.now())
 
+    upload = relationship("Upload", back_populates="epics")
+    stories = relationship("Story", back_populates="epic", order_by="Story.id", passive_deletes=True)
+    qa = relationship("QA", back_populates="epic", order_by="QA.id", passive_deletes=True)  # test plans
+
 class Story(Base):
     __tablename__ = "stories"
+    __table_args__ = (
+        Index("ix_stories_epic_created", "epic_id", "created_at", "id"),
+        Index("ix_stories_user_created", "user_id", "created_at", "id"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     epic_id = Column(Integer, ForeignKey("epics.id", ondelete="CASCADE"))
+    # Denormalized from the parent epic on insert
+    upload_id = Column(Integer, ForeignKey("uploads.id", ondelete="CASCADE"), nullable=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=True)
     name = Column(String(255))
-    content = Column(JSONB)  # story details as JSON
+    content = deferred(Column(JSONB))  # story details as JSON
     jira_key = Column(String(50), nullable=True)  # Jira issue key (e.g., PROJ-2)
     jira_issue_id = Column(String(50), nullable=True)  # Jira issue ID (numeric, e.g., 10030)
     jira_url = Column(String(512), nullable=True)  # Jira issue URL
@@ -59,20 +117,92 @@ class Story(Base):
     jira_creation_success = Column(Boolean, nullable=True)  # True if Jira creation succeeded, False if failed, None if not attempted
     created_at = Column(TIMESTAMP, server_default=func.now())
 
+    epic = relationship("Epic", back_populates="stories")
+    qa = relationship("QA", back_populates="story", order_by="QA.id", passive_deletes=True)
+
 class QA(Base):
     __tablename__ = "qa"
+    __table_args__ = (
+        Index("ix_qa_story_type", "story_id", "type"),
+        Index("ix_qa_epic_type", "epic_id", "type"),
+        Index("ix_qa_user_type_created", "user_id", "type", "created_at", "id"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     story_id = Column(Integer, ForeignKey("stories.id", ondelete="CASCADE"), nullable=True)
     epic_id = Column(Integer, ForeignKey("epics.id", ondelete="CASCADE"), nullable=True)
+    # Denormalized from the parent story (QA) or epic (test plans) on insert
+    upload_id = Column(Integer, ForeignKey("uploads.id", ondelete="CASCADE"), nullable=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=True)
     type = Column(String(50))  # test_plan, api_test, automation_script
     test_type = Column(String(50), nullable=True)  # functional, non_functional, api
-    content = Column(JSONB)
+    content = deferred(Column(JSONB))
     confluence_page_id = Column(String(255), nullable=True)
+    embedding = Column(LargeBinary, nullable=True)  # float32 embedding bytes for RAG search
+    embedding_model = Column(String(255), nullable=True)  # model that produced the embedding
+    embedding_hash = Column(String(64), nullable=True)  # sha256 of the embedded text
     created_at = Column(TIMESTAMP, server_default=func.now())
 
+    story = relationship("Story", back_populates="qa")
+    epic = relationship("Epic", back_populates="qa")
+
 class AggregatedUpload(Base):
     __tablename__ = "aggregated_uploads"
     id = Column(Integer, primary_key=True, index=True)
     upload_id = Column(Integer, ForeignKey("uploads.id", ondelete="CASCADE"))
-    content = Column(JSONB)  # full hierarchy as JSON
+    content = deferred(Column(JSONB))  # full hierarchy as JSON
     created_at = Column(TIMESTAMP, server_default=func.now())
+
+    upload = relationship("Upload", back_populates="aggregated")
+
+class ConfluenceOutbox(Base):
+    """Confluence publication waiting to run, committed together with the generated rows"""
+    __tablename__ = "confluence_outbox"
+    __table_args__ = (Index("ix_confluence_outbox_status_available", "status", "available_at"),)
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=True)
+    upload_id = Column(Integer, ForeignKey("uploads.id", ondelete="CASCADE"), nullable=False)
+    epic_id = Column(Integer, ForeignKey("epics.id", ondelete="CASCADE"), nullable=True)  # None publishes every epic
+    status = Column(String(20), nullable=False, default="pending")  # pending, in_progress, done, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(String(1000), nullable=True)
+    available_at = Column(TIMESTAMP, nullable=False, default=datetime.utcnow)  # not retried before this time
+    claimed_at = Column(TIMESTAMP, nullable=True)  # when a worker took it in_progress; stale claims are requeued
+    created_at = Column(TIMESTAMP, server_default=func.now())
+    updated_at = Column(TIMESTAMP, nullable=True, onupdate=datetime.utcnow)
+
+
+def _copy_owner(connection, target, parent_table, parent_id, upload_column) -> None:
+    """Fill unset user_id/upload_id on a new row from its parent row"""
+    if parent_id is None:
+        return
+    row = connection.execute(
+        select(parent_table.c.user_id, upload_column).where(parent_table.c.id == parent_id)
+    ).first()
+    if row is None:
+        return
+    if target.user_id is None:
+        target.user_id = row[0]
+    if hasattr(target, "upload_id") and target.upload_id is None:
+        target.upload_id = row[1]
+
+
+@event.listens_for(Epic, "before_insert")
+def _epic_owner(mapper, connection, target):
+    if target.user_id is None:
+        uploads = Upload.__table__
+        _copy_owner(connection, target, uploads, target.upload_id, uploads.c.id)
+
+
+@event.listens_for(Story, "before_insert")
+def _story_owner(mapper, connection, target):
+    if target.user_id is None or target.upload_id is None:
+        epics = Epic.__table__
+        _copy_owner(connection, target, epics, target.epic_id, epics.c.upload_id)
+
+
+@event.listens_for(QA, "before_insert")
+def _qa_owner(mapper, connection, target):
+    if target.user_id is None or target.upload_id is None:
+        parent = Story.__table__ if target.story_id is not None else Epic.__table__
+        parent_id = target.story_id if target.story_id is not None else target.epic_id
+        _copy_owner(connection, target, parent, parent_id, parent.c.upload_id)
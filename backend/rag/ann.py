@@ -0,0 +1,236 @@
+"""Approximate nearest-neighbour indexes for VectorStore.
+
+Indexes cover rows of a store's unit-length float32 matrix and return
+candidate rows with their inner-product (cosine) scores; the store applies
+live-row, threshold and metadata masks and the final top-k on top.
+
+Backends:
+- ``ivf``: inverted file over spherical k-means centroids, pure NumPy
+- ``hnsw``: hnswlib graph index, used when the optional ``hnswlib``
+  package is installed and falling back to ``ivf`` otherwise
+"""
+import json
+import logging
+from abc import ABC, abstractmethod
+from typing import Dict, Optional, Tuple, Type
+
+import numpy as np
+
+try:
+    import hnswlib
+except ImportError:  # Optional dependency
+    hnswlib = None
+
+logger = logging.getLogger(__name__)
+
+ANN_DTYPE = np.float32
+
+
+class ANNIndex(ABC):
+    """Base class for approximate indexes over the rows of a vector matrix"""
+
+    kind = ""
+
+    @abstractmethod
+    def build(self, matrix: np.ndarray, rows: np.ndarray) -> None:
+        """Index the given rows of a unit-length matrix"""
+
+    @abstractmethod
+    def search(self, matrix: np.ndarray, query: np.ndarray, k: int,
+               nprobe: Optional[int] = None, ef_search: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (rows, scores) of at least the approximate top-k rows for a unit-length query"""
+
+    @abstractmethod
+    def save(self, path: str) -> None:
+        """Write the index to a file"""
+
+    @classmethod
+    @abstractmethod
+    def load(cls, path: str, dimension: int) -> "ANNIndex":
+        """Read an index written by save()"""
+
+
+class IVFIndex(ANNIndex):
+    """
+    Inverted file index in pure NumPy.
+
+    Rows are clustered around ``nlist`` centroids; a search scores the
+    centroids, then scores exactly only the rows of the ``nprobe`` closest
+    lists. Larger ``nprobe`` trades latency for recall.
+    """
+
+    kind = "ivf"
+    TRAIN_ITERATIONS = 10
+    TRAIN_SAMPLE_PER_LIST = 256
+
+    def __init__(self, nlist: Optional[int] = None, nprobe: int = 8, seed: int = 0):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.seed = seed
+        self.centroids = np.zeros((0, 0), dtype=ANN_DTYPE)
+        self.list_rows = np.zeros(0, dtype=np.int64)  # Rows grouped by list
+        self.list_offsets = np.zeros(1, dtype=np.int64)  # List i is list_rows[offsets[i]:offsets[i + 1]]
+
+    def _train(self, vectors: np.ndarray, nlist: int) -> np.ndarray:
+        """Spherical k-means on a sample of the vectors"""
+        rng = np.random.default_rng(self.seed)
+        sample_size = min(len(vectors), nlist * self.TRAIN_SAMPLE_PER_LIST)
+        sample = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+        centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+
+        for _ in range(self.TRAIN_ITERATIONS):
+            assignments = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, sample)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            # Keep the previous centroid for lists that received no vectors
+            centroids = np.where(norms > 0, sums / np.maximum(norms, 1e-12), centroids).astype(ANN_DTYPE)
+        return centroids
+
+    def build(self, matrix: np.ndarray, rows: np.ndarray) -> None:
+        rows = np.asarray(rows, dtype=np.int64)
+        if len(rows) == 0:
+            self.centroids = np.zeros((0, matrix.shape[1]), dtype=ANN_DTYPE)
+            self.list_rows = rows
+            self.list_offsets = np.zeros(1, dtype=np.int64)
+            return
+
+        vectors = np.asarray(matrix[rows], dtype=ANN_DTYPE)
+        nlist = self.nlist or int(np.sqrt(len(rows)))
+        nlist = max(1, min(nlist, len(rows)))
+        self.centroids = self._train(vectors, nlist)
+
+        # Assign in chunks so the score matrix stays small
+        assignments = np.empty(len(rows), dtype=np.int64)
+        for start in range(0, len(rows), 65536):
+            chunk = vectors[start:start + 65536]
+            assignments[start:start + len(chunk)] = np.argmax(chunk @ self.centroids.T, axis=1)
+
+        order = np.argsort(assignments, kind="stable")
+        self.list_rows = rows[order]
+        counts = np.bincount(assignments, minlength=nlist)
+        self.list_offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+    def search(self, matrix, query, k, nprobe=None, ef_search=None):
+        nlist = len(self.centroids)
+        if nlist == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=ANN_DTYPE)
+
+        nprobe = max(1, min(nprobe or self.nprobe, nlist))
+        centroid_scores = self.centroids @ query
+        if nprobe < nlist:
+            probed = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        else:
+            probed = np.arange(nlist)
+
+        rows = np.concatenate([
+            self.list_rows[self.list_offsets[i]:self.list_offsets[i + 1]] for i in probed
+        ])
+        rows.sort()  # Sequential reads from the memory-mapped matrix
+        return rows, matrix[rows] @ query
+
+    def save(self, path: str) -> None:
+        with open(path, "wb") as f:
+            np.savez(
+                f,
+                centroids=self.centroids,
+                list_rows=self.list_rows,
+                list_offsets=self.list_offsets,
+                nprobe=np.array(self.nprobe)
+            )
+
+    @classmethod
+    def load(cls, path: str, dimension: int) -> "IVFIndex":
+        with np.load(path) as data:
+            index = cls(nlist=len(data["centroids"]), nprobe=int(data["nprobe"]))
+            index.centroids = data["centroids"]
+            index.list_rows = data["list_rows"]
+            index.list_offsets = data["list_offsets"]
+        return index
+
+
+class HNSWIndex(ANNIndex):
+    """
+    Hierarchical navigable small world graph backed by hnswlib.
+
+    ``M`` and ``ef_construction`` control graph quality at build time;
+    ``ef_search`` is the recall-vs-latency knob at query time.
+    """
+
+    kind = "hnsw"
+
+    def __init__(self, M: int = 16, ef_construction: int = 200, ef_search: int = 64):
+        if hnswlib is None:
+            raise ImportError("hnswlib is not installed")
+        self.M = M
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.index = None
+
+    def build(self, matrix: np.ndarray, rows: np.ndarray) -> None:
+        rows = np.asarray(rows, dtype=np.int64)
+        self.index = hnswlib.Index(space="ip", dim=matrix.shape[1])
+        self.index.init_index(max_elements=max(len(rows), 1), ef_construction=self.ef_construction, M=self.M)
+        if len(rows):
+            self.index.add_items(np.asarray(matrix[rows], dtype=ANN_DTYPE), rows)
+
+    def search(self, matrix, query, k, nprobe=None, ef_search=None):
+        count = self.index.get_current_count() if self.index is not None else 0
+        if count == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=ANN_DTYPE)
+
+        k = min(k, count)
+        self.index.set_ef(max(ef_search or self.ef_search, k))
+        labels, distances = self.index.knn_query(query.reshape(1, -1), k=k)
+        # hnswlib's inner-product distance is 1 - dot
+        return labels[0].astype(np.int64), (1.0 - distances[0]).astype(ANN_DTYPE)
+
+    def save(self, path: str) -> None:
+        self.index.save_index(path)
+        with open(f"{path}.json", "w") as f:
+            json.dump({"M": self.M, "ef_construction": self.ef_construction, "ef_search": self.ef_search}, f)
+
+    @classmethod
+    def load(cls, path: str, dimension: int) -> "HNSWIndex":
+        with open(f"{path}.json", "r") as f:
+            index = cls(**json.load(f))
+        index.index = hnswlib.Index(space="ip", dim=dimension)
+        index.index.load_index(path)
+        return index
+
+
+ANN_BACKENDS: Dict[str, Type[ANNIndex]] = {
+    IVFIndex.kind: IVFIndex,
+    HNSWIndex.kind: HNSWIndex,
+}
+
+
+def resolve_index_type(index_type: str) -> str:
+    """
+    Map a requested index type to one usable in this process.
+
+    Args:
+        index_type: "exact", "ivf" or "hnsw"
+
+    Returns:
+        The index type to use, "ivf" when hnsw is requested without hnswlib
+
+    Raises:
+        ValueError: If the index type is unknown
+    """
+    if index_type != "exact" and index_type not in ANN_BACKENDS:
+        raise ValueError(f"Unknown vector index type: {index_type}")
+    if index_type == HNSWIndex.kind and hnswlib is None:
+        logger.warning("hnswlib is not installed, using the NumPy IVF index instead")
+        return IVFIndex.kind
+    return index_type
+
+
+def create_index(index_type: str, **params) -> ANNIndex:
+    """Create an empty ANN index of the given (resolved) type"""
+    return ANN_BACKENDS[index_type](**params)
+
+
+def load_index(index_type: str, path: str, dimension: int) -> ANNIndex:
+    """Load a saved ANN index of the given (resolved) type"""
+    return ANN_BACKENDS[index_type].load(path, dimension)
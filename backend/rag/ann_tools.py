@@ -0,0 +1,181 @@
+"""Build, rebuild and benchmark ANN indexes for vector stores.
+
+Usage (from the backend directory):
+
+    python -m rag.ann_tools build --index-type ivf      # build missing or stale indexes
+    python -m rag.ann_tools rebuild --index-type hnsw   # rebuild every index
+    python -m rag.ann_tools benchmark --documents 200000 --k 10
+    python -m rag.ann_tools benchmark --store storage/vectorstore.json
+"""
+import argparse
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from rag.ann import create_index, resolve_index_type
+from rag.vectorstore import VectorStore, get_vectorstore
+
+logger = logging.getLogger(__name__)
+
+# Search parameters swept by the benchmark, per index type
+BENCHMARK_SWEEPS = {
+    "ivf": [{"nprobe": n} for n in (1, 4, 8, 16, 32)],
+    "hnsw": [{"ef_search": ef} for ef in (16, 32, 64, 128, 256)],
+}
+
+
+def build_store_indexes(storage_dir: str = "storage", index_type: str = "ivf", force: bool = False,
+                        **params) -> Dict[str, Dict[str, Any]]:
+    """
+    Build ANN indexes for every vector store in a folder.
+
+    Args:
+        storage_dir: Folder holding the vector stores
+        index_type: "ivf" or "hnsw"
+        force: Rebuild indexes that are already current
+        **params: Backend build parameters
+
+    Returns:
+        Build statistics per store
+    """
+    results = {}
+    if not os.path.isdir(storage_dir):
+        return results
+    for filename in sorted(os.listdir(storage_dir)):
+        if not (filename.startswith("vectorstore") and filename.endswith(".meta.jsonl")):
+            continue
+        store_name = filename[:-len(".meta.jsonl")]
+        store = get_vectorstore(store_path=os.path.join(storage_dir, f"{store_name}.json"), index_type=index_type)
+        stats = store.get_stats()
+        current = stats["index_type"] == resolve_index_type(index_type)
+        if (not force and current and stats["ann_indexed_rows"]
+                and stats["ann_indexed_rows"] == stats["indexed_documents"]):
+            results[store_name] = {"index_type": store.index_type, "skipped": True}
+            continue
+        results[store_name] = store.build_ann_index(index_type=index_type, **params)
+    return results
+
+
+def exact_top_k(matrix: np.ndarray, query: np.ndarray, k: int) -> np.ndarray:
+    """Row indices of the exact top-k by inner product"""
+    scores = matrix @ query
+    k = min(k, len(scores))
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+def benchmark(matrix: np.ndarray, queries: np.ndarray, k: int = 10,
+              index_types: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """
+    Compare recall@k and latency of ANN indexes against exact search.
+
+    Args:
+        matrix: Unit-length float32 vectors to index
+        queries: Unit-length float32 query vectors
+        k: Number of neighbours to compare
+        index_types: Index types to benchmark (defaults to ivf and hnsw)
+
+    Returns:
+        One row per (index type, search parameters) with recall and latency
+    """
+    rows = np.arange(len(matrix))
+    results = []
+
+    started = time.perf_counter()
+    truth = [set(exact_top_k(matrix, query, k)) for query in queries]
+    exact_ms = (time.perf_counter() - started) * 1000 / len(queries)
+    results.append({"index_type": "exact", "params": {}, "recall_at_k": 1.0,
+                    "mean_latency_ms": round(exact_ms, 3), "build_seconds": 0.0})
+
+    for requested in index_types or ["ivf", "hnsw"]:
+        index_type = resolve_index_type(requested)
+        if index_type != requested:
+            logger.warning(f"Skipping {requested} benchmark: backend not available")
+            continue
+
+        started = time.perf_counter()
+        index = create_index(index_type)
+        index.build(matrix, rows)
+        build_seconds = time.perf_counter() - started
+
+        for params in BENCHMARK_SWEEPS[index_type]:
+            hits = 0
+            latencies = []
+            for query, expected in zip(queries, truth):
+                started = time.perf_counter()
+                candidates, scores = index.search(matrix, query, k * VectorStore.ANN_CANDIDATE_FACTOR, **params)
+                top = candidates[np.argsort(-scores)[:k]]
+                latencies.append(time.perf_counter() - started)
+                hits += len(expected.intersection(top.tolist()))
+            results.append({
+                "index_type": index_type,
+                "params": params,
+                "recall_at_k": round(hits / (len(queries) * k), 4),
+                "mean_latency_ms": round(float(np.mean(latencies)) * 1000, 3),
+                "p95_latency_ms": round(float(np.percentile(latencies, 95)) * 1000, 3),
+                "build_seconds": round(build_seconds, 3)
+            })
+    return results
+
+
+def synthetic_vectors(count: int, dimension: int, clusters: int = 100, seed: int = 0) -> np.ndarray:
+    """Clustered unit-length vectors, closer to real embeddings than uniform noise"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dimension)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, count)] + 0.5 * rng.standard_normal((count, dimension)).astype(np.float32)
+    return VectorStore._normalize(vectors)
+
+
+def _print_benchmark(results: List[Dict[str, Any]], k: int) -> None:
+    print(f"{'index':<8}{'params':<20}{'recall@' + str(k):>10}{'mean ms':>10}{'p95 ms':>10}{'build s':>10}")
+    for row in results:
+        params = ", ".join(f"{key}={value}" for key, value in row["params"].items())
+        print(f"{row['index_type']:<8}{params:<20}{row['recall_at_k']:>10.4f}{row['mean_latency_ms']:>10.3f}"
+              f"{row.get('p95_latency_ms', row['mean_latency_ms']):>10.3f}{row['build_seconds']:>10.3f}")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Vector store ANN index tools")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    for name in ("build", "rebuild"):
+        command = subcommands.add_parser(name, help=f"{name.capitalize()} ANN indexes for stored vector stores")
+        command.add_argument("--storage", default="storage", help="Folder holding the vector stores")
+        command.add_argument("--index-type", default="ivf", choices=["ivf", "hnsw"])
+
+    bench = subcommands.add_parser("benchmark", help="Compare recall@k and latency against exact search")
+    bench.add_argument("--store", help="Benchmark the vectors of this store instead of synthetic data")
+    bench.add_argument("--documents", type=int, default=100000, help="Synthetic vector count")
+    bench.add_argument("--dimension", type=int, default=384, help="Synthetic vector dimension")
+    bench.add_argument("--queries", type=int, default=100, help="Number of queries")
+    bench.add_argument("--k", type=int, default=10, help="Neighbours to compare")
+    bench.add_argument("--index-type", action="append", choices=["ivf", "hnsw"], help="Index types to run")
+
+    args = parser.parse_args(argv)
+
+    if args.command in ("build", "rebuild"):
+        results = build_store_indexes(args.storage, args.index_type, force=args.command == "rebuild")
+        for store_name, stats in results.items():
+            print(f"{store_name}: {stats}")
+        if not results:
+            print(f"No vector stores found in {args.storage}")
+        return
+
+    if args.store:
+        store = get_vectorstore(store_path=args.store)
+        store.refresh()
+        matrix = np.asarray(store._matrix[np.flatnonzero(store._live[:store._size])])
+    else:
+        matrix = synthetic_vectors(args.documents, args.dimension)
+    rng = np.random.default_rng(1)
+    query_rows = rng.choice(len(matrix), min(args.queries, len(matrix)), replace=False)
+    # Perturbed copies of stored vectors stand in for real queries
+    queries = VectorStore._normalize(matrix[query_rows] + 0.1 * rng.standard_normal(matrix[query_rows].shape).astype(np.float32))
+    _print_benchmark(benchmark(matrix, queries, args.k, args.index_type), args.k)
+
+
+if __name__ == "__main__":
+    main()
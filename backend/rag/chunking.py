@@ -0,0 +1,151 @@
+"""Structure-aware splitting of requirement documents into overlapping passages.
+
+The embedding model only reads the first ~256 tokens of a text, so a whole
+document embedded as one vector is invisible to search past its opening.
+Documents are instead cut into passages of at most ``CHUNK_MAX_CHARS``:
+
+- heading lines (``# Title``, ``1.2 Title``, ``SECTION TITLE``) always start
+  a new passage, and every passage remembers the heading it falls under;
+- paragraphs are packed together until the next one would not fit;
+- paragraphs longer than a passage are cut at a sentence end, or a space;
+- a passage that continues the previous one repeats its last
+  ``CHUNK_OVERLAP_CHARS`` so a sentence on the boundary is found from both.
+
+Every passage is an exact slice ``text[start:end]`` of the document.
+"""
+import re
+from dataclasses import dataclass
+from typing import Iterator, List, Optional, Tuple
+
+from config.config import CHUNK_MAX_CHARS, CHUNK_OVERLAP_CHARS
+
+HEADING_MAX_CHARS = 120
+HEADING_MAX_WORDS = 12
+
+_MARKDOWN_HEADING = re.compile(r"#{1,6}\s+\S")
+_NUMBERED_HEADING = re.compile(r"(?:\d+(?:\.\d+)*\.?|[A-Z]\.|[IVX]+\.)\s+[A-Z]")
+_SENTENCE_END = re.compile(r"[.!?;:]\s")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@dataclass
+class TextChunk:
+    """Passage text[start:end] of a document"""
+    index: int
+    start: int
+    end: int
+    text: str
+    heading: Optional[str] = None
+
+
+def is_heading(line: str) -> bool:
+    """Whether a stripped line looks like a section heading"""
+    if len(line) > HEADING_MAX_CHARS:
+        return False
+    if _MARKDOWN_HEADING.match(line):
+        return True
+    if line.endswith((".", ",", ";")):
+        return False
+    if _NUMBERED_HEADING.match(line):
+        return len(line.split()) <= HEADING_MAX_WORDS
+    return sum(char.isalpha() for char in line) >= 3 and line.isupper()
+
+
+def _blocks(text: str) -> Iterator[Tuple[int, int, bool]]:
+    """(start, end, is_heading) of every heading line and paragraph, without surrounding whitespace"""
+    offset = 0
+    paragraph: Optional[List[int]] = None
+    for line in text.splitlines(keepends=True):
+        stripped = line.strip()
+        start = offset + len(line) - len(line.lstrip())
+        offset += len(line)
+        if stripped and not is_heading(stripped):
+            if paragraph is None:
+                paragraph = [start, start + len(stripped)]
+            else:
+                paragraph[1] = start + len(stripped)
+            continue
+        if paragraph is not None:
+            yield paragraph[0], paragraph[1], False
+            paragraph = None
+        if stripped:
+            yield start, start + len(stripped), True
+    if paragraph is not None:
+        yield paragraph[0], paragraph[1], False
+
+
+def _split_long(text: str, start: int, end: int, max_chars: int) -> Iterator[Tuple[int, int]]:
+    """Cut text[start:end] into pieces of at most max_chars, preferring sentence ends"""
+    while end - start > max_chars:
+        window = text[start:start + max_chars + 1]
+        cut = None
+        for pattern in (_SENTENCE_END, _WHITESPACE):
+            matches = [match for match in pattern.finditer(window) if match.start() >= max_chars // 2]
+            if matches:
+                cut = matches[-1].start() + (1 if pattern is _SENTENCE_END else 0)
+                break
+        cut = cut or max_chars
+        yield start, start + len(text[start:start + cut].rstrip())
+        start += cut
+        start += len(text[start:end]) - len(text[start:end].lstrip())
+    if end > start:
+        yield start, end
+
+
+def _overlap_start(text: str, previous: TextChunk, piece_start: int, piece_end: int,
+                   overlap_chars: int, max_chars: int) -> int:
+    """Where a passage continuing the previous one starts: the first word of its last overlap_chars"""
+    if overlap_chars <= 0:
+        return piece_start
+    match = _WHITESPACE.search(text, max(previous.start, previous.end - overlap_chars), previous.end)
+    start = match.end() if match else piece_start
+    return start if piece_end - start <= max_chars else piece_start
+
+
+def chunk_text(text: str, max_chars: int = CHUNK_MAX_CHARS,
+               overlap_chars: int = CHUNK_OVERLAP_CHARS) -> List[TextChunk]:
+    """
+    Split a document into overlapping passages that follow its headings and paragraphs.
+
+    Args:
+        text: Document text
+        max_chars: Longest passage
+        overlap_chars: Characters a passage repeats from the one before it,
+            when it continues the same section
+
+    Returns:
+        Passages in document order
+    """
+    chunks: List[TextChunk] = []
+    heading = None
+    chunk_start = chunk_end = None
+    chunk_heading = None
+    has_body = False
+    # Long paragraphs leave room for the overlap the next passage repeats
+    piece_chars = max(max_chars - overlap_chars, max_chars // 2)
+
+    for block_start, block_end, block_is_heading in _blocks(text):
+        if block_is_heading:
+            heading = text[block_start:block_end]
+            pieces = [(block_start, block_end)]
+        else:
+            pieces = _split_long(text, block_start, block_end, piece_chars)
+        for piece_start, piece_end in pieces:
+            if chunk_start is not None and (
+                (block_is_heading and has_body) or piece_end - chunk_start > max_chars
+            ):
+                chunks.append(TextChunk(len(chunks), chunk_start, chunk_end,
+                                        text[chunk_start:chunk_end], chunk_heading))
+                if block_is_heading:
+                    chunk_start = None
+                else:
+                    chunk_start = _overlap_start(text, chunks[-1], piece_start, piece_end, overlap_chars, max_chars)
+                    chunk_heading, has_body = heading, True
+            if chunk_start is None:
+                chunk_start, chunk_heading, has_body = piece_start, heading, False
+            chunk_end = piece_end
+            has_body = has_body or not block_is_heading
+
+    if chunk_start is not None:
+        chunks.append(TextChunk(len(chunks), chunk_start, chunk_end, text[chunk_start:chunk_end], chunk_heading))
+    return chunks
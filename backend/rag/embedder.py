@@ -1,21 +1,128 @@
-from sentence_transformers import SentenceTransformer
+from typing import TYPE_CHECKING, Any, Dict, Optional
 import logging
+import os
+import threading
+import time
+
+from config.config import EMBEDDING_MODEL_NAME
+
+if TYPE_CHECKING:
+    # Imported when the first model loads: pulling in torch costs seconds and hundreds of MB
+    from sentence_transformers import SentenceTransformer
 
 logger = logging.getLogger(__name__)
 
+# Process-wide registry of loaded embedding models, keyed by model name
+_models: Dict[str, "SentenceTransformer"] = {}
+_model_stats: Dict[str, Dict[str, Any]] = {}
+_registry_lock = threading.Lock()
+
+
+def _current_rss_mb() -> Optional[float]:
+    """Resident set size of this process in MB, if it can be determined"""
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return round(resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024), 1)
+    except Exception:
+        pass
+    try:
+        import resource
+        # Peak RSS; reported in KB on Linux and bytes on macOS
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        divisor = 1024 * 1024 if os.uname().sysname == "Darwin" else 1024
+        return round(max_rss / divisor, 1)
+    except Exception:
+        return None
+
+
+def get_embedding_model(model_name: Optional[str] = None) -> "SentenceTransformer":
+    """
+    Get the shared embedding model, loading it on first use.
+
+    Every module goes through this registry so each process holds a single
+    copy of the model regardless of how many callers need it.
+
+    Args:
+        model_name: Model to load (defaults to EMBEDDING_MODEL_NAME)
+
+    Returns:
+        Loaded SentenceTransformer instance
+
+    Raises:
+        Exception: If the model cannot be loaded
+    """
+    model_name = model_name or EMBEDDING_MODEL_NAME
+    model = _models.get(model_name)
+    if model is not None:
+        return model
+
+    with _registry_lock:
+        model = _models.get(model_name)
+        if model is not None:
+            return model
+
+        rss_before = _current_rss_mb()
+        started = time.perf_counter()
+        try:
+            from sentence_transformers import SentenceTransformer
+            model = SentenceTransformer(model_name)
+        except Exception as e:
+            logger.error(f"Failed to load embedding model {model_name}: {e}")
+            raise
+        load_seconds = time.perf_counter() - started
+        rss_after = _current_rss_mb()
+
+        _models[model_name] = model
+        _model_stats[model_name] = {
+            "model_name": model_name,
+            "load_time_seconds": round(load_seconds, 3),
+            "rss_before_mb": rss_before,
+            "rss_after_mb": rss_after,
+            "rss_delta_mb": round(rss_after - rss_before, 1) if rss_before is not None and rss_after is not None else None,
+            "loaded_at": time.time(),
+        }
+        logger.info(f"Loaded embedding model {model_name} in {load_seconds:.2f}s (RSS {rss_after} MB)")
+        return model
+
+
+def get_embedding_model_or_none(model_name: Optional[str] = None) -> Optional["SentenceTransformer"]:
+    """Get the shared embedding model, or None if it cannot be loaded"""
+    try:
+        return get_embedding_model(model_name)
+    except Exception:
+        return None
+
+
+def get_embedding_model_stats() -> Dict[str, Any]:
+    """Load time and memory metrics for the models in the registry"""
+    return {
+        "default_model": EMBEDDING_MODEL_NAME,
+        "loaded_models": list(_models.keys()),
+        "current_rss_mb": _current_rss_mb(),
+        "models": {name: dict(stats) for name, stats in _model_stats.items()},
+    }
+
+
+def clear_embedding_models() -> None:
+    """Drop all loaded models from the registry"""
+    with _registry_lock:
+        _models.clear()
+        _model_stats.clear()
+
 
 class EmbeddingManager:
     """Manages embeddings for RAG system"""
-    
-    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL_NAME):
         try:
-            self.model = SentenceTransformer(model_name)
+            self.model = get_embedding_model(model_name)
             self.model_name = model_name
             logger.info(f"Initialized embedding model: {model_name}")
         except Exception as e:
             logger.error(f"Failed to initialize embedding model: {e}")
             raise
-    
+
     def embed_text(self, text: str):
         """Generate embedding for a single text"""
         try:
@@ -23,7 +130,7 @@ class EmbeddingManager:
         except Exception as e:
             logger.error(f"Error embedding text: {e}")
             raise
-    
+
     def embed_batch(self, texts: list):
         """Generate embeddings for multiple texts"""
         try:
@@ -33,8 +140,18 @@ class EmbeddingManager:
             raise
 
 
+class _LazyEmbedder:
+    """Proxy to the shared default model so importing this module stays cheap"""
+
+    def __getattr__(self, name):
+        # Don't load the model for introspection (mock, copy, pickle, asyncio, ...)
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(get_embedding_model(), name)
+
+
 # Legacy function for backward compatibility
-embedder = SentenceTransformer("all-MiniLM-L6-v2")
+embedder = _LazyEmbedder()
 
 def embed_text(text):
     """Legacy function - use EmbeddingManager instead"""
@@ -0,0 +1,269 @@
+"""Vectorstore documents for database resources and incremental reindexing.
+
+Every upload, epic, story and QA row maps to exactly one vectorstore
+document with a deterministic ID (``epic_12``) and a hash of its text and
+metadata. Reindexing compares that hash with the one stored alongside the
+document, so only new or changed rows are embedded again, and documents
+whose row no longer exists are deleted.
+"""
+import hashlib
+import json
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from sqlalchemy.orm import undefer
+
+from models.file_model import Upload, Epic, Story, QA
+
+logger = logging.getLogger(__name__)
+
+# Document types owned by the database resources; anything else in the store is left alone
+INDEXED_DOC_TYPES = {"upload", "epic", "story", "qa", "test_plan"}
+REINDEX_BATCH_SIZE = 256
+
+
+def resource_doc_id(resource_type: str, resource_id: int) -> str:
+    """Deterministic vectorstore document ID for a database row"""
+    return f"{resource_type}_{resource_id}"
+
+
+def _content(row) -> Dict[str, Any]:
+    return row.content if isinstance(row.content, dict) else {}
+
+
+def _join(values) -> str:
+    return ", ".join(str(value) for value in values or [])
+
+
+def document_hash(text: str, metadata: Dict[str, Any]) -> str:
+    """SHA-256 of a document's text and metadata"""
+    payload = json.dumps({"text": text, "metadata": metadata}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _document(resource_type: str, resource_id: int, text: str, metadata: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "doc_id": resource_doc_id(resource_type, resource_id),
+        "text": text,
+        "metadata": metadata,
+        "content_hash": document_hash(text, metadata)
+    }
+
+
+def epic_document(epic) -> Dict[str, Any]:
+    """Vectorstore document for an epic"""
+    content = _content(epic)
+    text = (
+        f"Epic: {epic.name}\n"
+        f"Description: {content.get('description', '')}\n"
+        f"Acceptance Criteria: {_join(content.get('acceptanceCriteria'))}"
+    )
+    return _document("epic", epic.id, text, {
+        "type": "epic",
+        "epic_id": epic.id,
+        "upload_id": epic.upload_id,
+        "epic_name": epic.name
+    })
+
+
+def story_document(story) -> Dict[str, Any]:
+    """Vectorstore document for a story"""
+    content = _content(story)
+    text = (
+        f"Story: {story.name}\n"
+        f"Type: {content.get('type', '')}\n"
+        f"Description: {content.get('description', '')}\n"
+        f"Acceptance Criteria: {_join(content.get('acceptanceCriteria'))}"
+    )
+    return _document("story", story.id, text, {
+        "type": "story",
+        "story_id": story.id,
+        "epic_id": story.epic_id,
+        "story_name": story.name
+    })
+
+
+def qa_document(qa) -> Dict[str, Any]:
+    """Vectorstore document for a QA test or test plan"""
+    content = _content(qa)
+    if qa.type == "test_plan":
+        text = (
+            f"Test Plan: {content.get('title', '')}\n"
+            f"Objective: {content.get('objective', '')}"
+        )
+    else:
+        text = (
+            f"QA Test: {content.get('title', '')}\n"
+            f"API Endpoint: {content.get('apiEndpoint', '')}\n"
+            f"Method: {content.get('method', '')}\n"
+            f"Validation Steps: {_join(content.get('validationSteps'))}"
+        )
+    return _document("qa", qa.id, text, {
+        "type": "test_plan" if qa.type == "test_plan" else "qa",
+        "qa_id": qa.id,
+        "story_id": qa.story_id,
+        "epic_id": qa.epic_id
+    })
+
+
+def upload_document(upload) -> Dict[str, Any]:
+    """Vectorstore document for an upload"""
+    content = json.dumps(upload.content) if isinstance(upload.content, dict) else str(upload.content)
+    text = f"Upload: {upload.filename}\nContent: {content}"
+    return _document("upload", upload.id, text, {
+        "type": "upload",
+        "upload_id": upload.id,
+        "filename": upload.filename
+    })
+
+
+# Reindexed in this order: (phase name, model, document builder)
+RESOURCE_PHASES = [
+    ("uploads", Upload, upload_document),
+    ("epics", Epic, epic_document),
+    ("stories", Story, story_document),
+    ("qa", QA, qa_document),
+]
+
+
+class ReindexProgress:
+    """Thread-safe progress of the current (or last) reindex run"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state: Dict[str, Any] = {"state": "idle"}
+
+    def start(self, full: bool) -> bool:
+        """Mark a run as started; returns False if one is already running"""
+        with self._lock:
+            if self._state.get("state") == "running":
+                return False
+            self._state = {
+                "state": "running",
+                "full": full,
+                "phase": None,
+                "total": 0,
+                "processed": 0,
+                "embedded": 0,
+                "unchanged": 0,
+                "failed": 0,
+                "deleted": 0,
+                "started_at": datetime.now().isoformat(),
+                "finished_at": None,
+                "error": None
+            }
+            return True
+
+    def update(self, **changes) -> None:
+        with self._lock:
+            self._state.update(changes)
+
+    def add(self, **increments) -> None:
+        with self._lock:
+            for key, value in increments.items():
+                self._state[key] = self._state.get(key, 0) + value
+
+    def finish(self, error: Optional[str] = None) -> None:
+        with self._lock:
+            self._state.update(
+                state="failed" if error else "completed",
+                phase=None,
+                error=error,
+                finished_at=datetime.now().isoformat()
+            )
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            snapshot = dict(self._state)
+        if snapshot.get("total"):
+            snapshot["percent"] = round(100 * snapshot["processed"] / snapshot["total"], 1)
+        return snapshot
+
+
+def _batches(rows: Iterable[Any], size: int) -> Iterable[List[Any]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _store_changed(store, documents: List[Dict[str, Any]], full: bool, progress: ReindexProgress) -> None:
+    """Embed and store the documents whose hash differs from the stored one"""
+    changed = [
+        document for document in documents
+        if full or store.data.get(document["doc_id"], {}).get("content_hash") != document["content_hash"]
+    ]
+    if changed:
+        store.store_documents(changed)
+    progress.add(processed=len(documents), embedded=len(changed), unchanged=len(documents) - len(changed))
+
+
+def reindex_resources(db, store, full: bool = False, progress: Optional[ReindexProgress] = None,
+                      batch_size: int = REINDEX_BATCH_SIZE) -> Dict[str, Any]:
+    """
+    Bring the vectorstore in line with the database.
+
+    Rows are streamed and stored batch by batch, so an interrupted run keeps
+    what it finished and the next run resumes from the stored hashes.
+
+    Args:
+        db: Database session
+        store: VectorStore to update
+        full: Re-embed every row regardless of its stored hash
+        progress: Progress tracker to report into (a new one if omitted)
+        batch_size: Rows embedded and written per batch
+
+    Returns:
+        Final progress snapshot
+    """
+    progress = progress or ReindexProgress()
+    if progress.snapshot().get("state") != "running":
+        progress.start(full)
+
+    try:
+        progress.update(total=sum(db.query(model).count() for _, model, _ in RESOURCE_PHASES))
+        expected_ids: Set[str] = set()
+
+        for phase, model, build_document in RESOURCE_PHASES:
+            progress.update(phase=phase)
+            rows = db.query(model).options(undefer(model.content)).order_by(model.id).yield_per(batch_size)
+            for batch in _batches(rows, batch_size):
+                documents = []
+                for row in batch:
+                    try:
+                        documents.append(build_document(row))
+                    except Exception as e:
+                        logger.warning(f"Could not build {phase} document for row {row.id}: {str(e)}")
+                        progress.add(processed=1, failed=1)
+                expected_ids.update(document["doc_id"] for document in documents)
+                _store_changed(store, documents, full, progress)
+
+        progress.update(phase="orphans")
+        orphans = [
+            doc_id for doc_id, record in list(store.data.items())
+            if record.get("metadata", {}).get("type") in INDEXED_DOC_TYPES and doc_id not in expected_ids
+        ]
+        progress.add(deleted=store.delete_documents(orphans))
+
+        if full:
+            progress.update(phase="compacting")
+            store.compact()
+
+        progress.finish()
+    except Exception as e:
+        logger.error(f"Reindex failed: {str(e)}")
+        progress.finish(error=str(e))
+        raise
+
+    snapshot = progress.snapshot()
+    logger.info(
+        f"Reindex finished: {snapshot['embedded']} embedded, {snapshot['unchanged']} unchanged, "
+        f"{snapshot['deleted']} deleted"
+    )
+    return snapshot
@@ -0,0 +1,180 @@
+"""Precomputed per-row embeddings for database-backed RAG search.
+
+Epics and test plans carry their embedding alongside the row
+(``embedding`` / ``embedding_model`` / ``embedding_hash`` columns) so search
+only has to encode the query. Rows are (re-)embedded when they are written or
+when the hash of their searchable text no longer matches the stored one.
+"""
+import hashlib
+import logging
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from config.config import EMBEDDING_MODEL_NAME
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_DTYPE = np.float32
+
+
+def _get_model():
+    """Shared embedding model from the process-wide registry"""
+    from rag.embedder import get_embedding_model
+    return get_embedding_model(EMBEDDING_MODEL_NAME)
+
+
+def epic_text(epic) -> str:
+    """Searchable text of an epic (name and description)"""
+    text = epic.name or ""
+    if isinstance(epic.content, dict):
+        description = epic.content.get("description", "")
+        if description:
+            text += " " + description
+    return text.strip()
+
+
+def testplan_text(test_plan) -> str:
+    """Searchable text of a test plan (title and objective)"""
+    if isinstance(test_plan.content, dict):
+        title = test_plan.content.get("title", "")
+        objective = test_plan.content.get("objective", "")
+        return f"{title} {objective}".strip()
+    return ""
+
+
+ROW_TEXT_BUILDERS: Dict[str, Callable[[Any], str]] = {
+    "epic": epic_text,
+    "test_plan": testplan_text,
+}
+
+
+def content_hash(text: str) -> str:
+    """SHA-256 hex digest of the text that gets embedded"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def pack_embedding(vector) -> bytes:
+    """Serialize an embedding vector to float32 bytes for storage"""
+    return np.asarray(vector, dtype=EMBEDDING_DTYPE).tobytes()
+
+
+def unpack_embedding(blob: bytes) -> np.ndarray:
+    """Deserialize float32 bytes back into an embedding vector"""
+    return np.frombuffer(blob, dtype=EMBEDDING_DTYPE)
+
+
+def encode_texts(texts: Sequence[str], model=None) -> np.ndarray:
+    """
+    Encode texts in a single batch.
+
+    Args:
+        texts: Texts to encode
+        model: Optional SentenceTransformer; defaults to the shared row model
+
+    Returns:
+        float32 matrix of shape (len(texts), dim)
+    """
+    model = model or _get_model()
+    vectors = model.encode(list(texts), show_progress_bar=False)
+    return np.asarray(vectors, dtype=EMBEDDING_DTYPE).reshape(len(texts), -1)
+
+
+def _is_current(row, digest: str) -> bool:
+    return (
+        row.embedding is not None
+        and row.embedding_hash == digest
+        and row.embedding_model == EMBEDDING_MODEL_NAME
+    )
+
+
+def refresh_row_embeddings(rows: Sequence[Any], kind: str, model=None) -> List[Tuple[Any, np.ndarray]]:
+    """
+    Return (row, embedding) for every row with searchable text.
+
+    Stored embeddings are reused when the content hash and model name match;
+    stale or missing ones are encoded together in one batch and written back
+    onto the rows, so the caller's session persists them on commit.
+
+    Args:
+        rows: ORM rows (Epic or QA)
+        kind: One of ROW_TEXT_BUILDERS keys
+        model: Optional SentenceTransformer to encode with
+
+    Returns:
+        List of (row, embedding) tuples, skipping rows without text
+    """
+    build_text = ROW_TEXT_BUILDERS[kind]
+    pairs: List[List[Any]] = []
+    stale = []
+
+    for row in rows:
+        text = build_text(row)
+        if not text:
+            continue
+        digest = content_hash(text)
+        if _is_current(row, digest):
+            pairs.append([row, unpack_embedding(row.embedding)])
+        else:
+            stale.append((len(pairs), row, text, digest))
+            pairs.append([row, None])
+
+    if stale:
+        vectors = encode_texts([text for _, _, text, _ in stale], model)
+        for (position, row, _, digest), vector in zip(stale, vectors):
+            row.embedding = pack_embedding(vector)
+            row.embedding_hash = digest
+            row.embedding_model = EMBEDDING_MODEL_NAME
+            pairs[position][1] = vector
+        logger.info(f"Embedded {len(stale)} stale {kind} rows ({len(pairs) - len(stale)} reused)")
+
+    return [(row, vector) for row, vector in pairs]
+
+
+def embed_new_rows(rows: Sequence[Any], kind: str, model=None) -> bool:
+    """
+    Compute embeddings for freshly written rows without failing the write.
+
+    Search backfills anything missed here, so errors are only logged.
+
+    Returns:
+        True if embeddings were stored
+    """
+    try:
+        refresh_row_embeddings(rows, kind, model)
+        return True
+    except Exception as e:
+        logger.warning(f"Could not embed {kind} rows at write time: {str(e)}")
+        return False
+
+
+def cosine_similarities(query_vector, matrix: np.ndarray) -> np.ndarray:
+    """Cosine similarity of one query vector against every row of a matrix"""
+    query = np.asarray(query_vector, dtype=EMBEDDING_DTYPE).ravel()
+    query_norm = np.linalg.norm(query)
+    row_norms = np.linalg.norm(matrix, axis=1)
+    denominator = row_norms * query_norm
+    scores = np.zeros(matrix.shape[0], dtype=EMBEDDING_DTYPE)
+    np.divide(matrix @ query, denominator, out=scores, where=denominator > 0)
+    return scores
+
+
+def score_rows(query_vector, rows: Sequence[Any], kind: str, model=None) -> List[Tuple[Any, float]]:
+    """
+    Score rows against a query embedding using their stored embeddings.
+
+    Args:
+        query_vector: Query embedding
+        rows: ORM rows to score
+        kind: One of ROW_TEXT_BUILDERS keys
+        model: Optional SentenceTransformer used for stale rows
+
+    Returns:
+        List of (row, cosine similarity) tuples
+    """
+    pairs = refresh_row_embeddings(rows, kind, model)
+    if not pairs:
+        return []
+    matrix = np.vstack([vector for _, vector in pairs])
+    scores = cosine_similarities(query_vector, matrix)
+    return [(row, float(score)) for (row, _), score in zip(pairs, scores)]
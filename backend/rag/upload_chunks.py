@@ -0,0 +1,212 @@
+"""Passage-level embeddings of uploads for RAG search.
+
+An upload's requirement text is split into overlapping passages
+(``rag.chunking``) when it is stored; all of them are encoded in one batch
+and kept in ``upload_chunks`` with their offsets. Search then only encodes
+the query, scores it against the stored chunk vectors of the uploads in
+scope and loads the text of the best passages alone. Search never writes:
+uploads stored before chunking, or whose chunking failed at write time, and
+chunks embedded by another model are (re-)embedded by
+migrations/backfill_upload_chunks.py.
+"""
+import logging
+from typing import Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import or_
+from sqlalchemy.orm import contains_eager, undefer
+
+from config.config import EMBEDDING_MODEL_NAME
+from models.file_model import Upload, UploadChunk
+from rag.chunking import chunk_text
+from rag.row_embeddings import content_hash, cosine_similarities, encode_texts, pack_embedding, unpack_embedding
+
+logger = logging.getLogger(__name__)
+
+
+def requirement_text(upload) -> str:
+    """The text chunk offsets refer to: content["requirement"] as stored"""
+    content = upload.content
+    if isinstance(content, dict):
+        return content.get("requirement") or ""
+    return str(content) if content else ""
+
+
+def chunk_embedding_text(chunk) -> str:
+    """Text a chunk is embedded from: its passage, under its section heading"""
+    if chunk.heading and not chunk.text.startswith(chunk.heading):
+        return f"{chunk.heading}\n{chunk.text}"
+    return chunk.text
+
+
+def _set_embedding(row: UploadChunk, text: str, vector) -> None:
+    row.embedding = pack_embedding(vector)
+    row.embedding_hash = content_hash(text)
+    row.embedding_model = EMBEDDING_MODEL_NAME
+
+
+def build_upload_chunks(upload, model=None) -> List[UploadChunk]:
+    """
+    Split an upload into chunks and embed them in one batch.
+
+    The chunks replace upload.chunks and the upload is marked as chunked, so
+    the caller's session persists both with the upload.
+
+    Args:
+        upload: Upload row with its requirement text
+        model: Optional SentenceTransformer to encode with
+
+    Returns:
+        The new chunk rows, in document order
+    """
+    rows = [
+        UploadChunk(
+            chunk_index=chunk.index,
+            start_offset=chunk.start,
+            end_offset=chunk.end,
+            heading=chunk.heading[:255] if chunk.heading else None,
+            text=chunk.text
+        )
+        for chunk in chunk_text(requirement_text(upload))
+    ]
+    if rows:
+        texts = [chunk_embedding_text(row) for row in rows]
+        for row, text, vector in zip(rows, texts, encode_texts(texts, model)):
+            _set_embedding(row, text, vector)
+    upload.chunks = rows
+    upload.chunked = True
+    return rows
+
+
+def embed_upload_chunks(upload, model=None) -> bool:
+    """
+    Chunk and embed a freshly stored upload without failing the write.
+
+    Uploads missed here stay unchunked until the backfill runs, so errors
+    are only logged.
+
+    Returns:
+        True if the chunks were stored
+    """
+    try:
+        rows = build_upload_chunks(upload, model)
+        logger.info(f"Embedded {len(rows)} chunks of upload {upload.filename}")
+        return True
+    except Exception as e:
+        logger.warning(f"Could not chunk upload {upload.filename} at write time: {str(e)}")
+        return False
+
+
+def _scope(query, user_id: Optional[int], upload_id: Optional[int]):
+    if user_id is not None:
+        query = query.filter(Upload.user_id == user_id)
+    if upload_id is not None:
+        query = query.filter(Upload.id == upload_id)
+    return query
+
+
+def backfill_upload_chunks(db, batch_size: int = 50, model=None) -> int:
+    """
+    Chunk uploads not yet chunked and re-embed chunks from another model.
+
+    Uploads are loaded with their content a batch at a time and each batch
+    is committed, so a long backfill keeps its progress if it stops.
+
+    Args:
+        db: Session
+        batch_size: Uploads chunked per commit
+        model: Optional SentenceTransformer to encode with
+
+    Returns:
+        Number of chunks embedded
+    """
+    embedded = 0
+    chunked = 0
+    while True:
+        uploads = (
+            db.query(Upload)
+            .options(undefer(Upload.content))
+            .filter(Upload.chunked.is_(False))
+            .order_by(Upload.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not uploads:
+            break
+        for upload in uploads:
+            embedded += len(build_upload_chunks(upload, model))
+        chunked += len(uploads)
+        db.commit()
+
+    stale = (
+        db.query(UploadChunk)
+        .filter(or_(UploadChunk.embedding.is_(None), UploadChunk.embedding_model != EMBEDDING_MODEL_NAME))
+        .all()
+    )
+    if stale:
+        texts = [chunk_embedding_text(row) for row in stale]
+        for row, text, vector in zip(stale, texts, encode_texts(texts, model)):
+            _set_embedding(row, text, vector)
+        embedded += len(stale)
+        db.commit()
+
+    logger.info(f"Embedded {embedded} upload chunks ({chunked} uploads chunked)")
+    return embedded
+
+
+def search_upload_chunks(db, query_vector, user_id: Optional[int] = None, upload_id: Optional[int] = None,
+                         top_k: Optional[int] = 5,
+                         min_similarity: float = 0.1) -> List[Tuple[UploadChunk, float]]:
+    """
+    Best-matching upload passages for a query embedding.
+
+    Only chunk IDs and vectors are read to score; the text of the top
+    chunks and their upload's id, filename and page are loaded afterwards.
+    Chunks embedded by another model are skipped until they are re-embedded.
+
+    Args:
+        db: Session
+        query_vector: Query embedding
+        user_id: Only search this user's uploads
+        upload_id: Only search this upload
+        top_k: Most chunks to return; None returns every chunk above min_similarity
+        min_similarity: Lowest cosine similarity returned
+
+    Returns:
+        (chunk, cosine similarity) pairs, best first, with chunk.upload loaded
+    """
+    if query_vector is None or not len(query_vector):
+        return []
+
+    vectors = (
+        _scope(db.query(UploadChunk.id, UploadChunk.embedding).join(UploadChunk.upload), user_id, upload_id)
+        .filter(UploadChunk.embedding.isnot(None), UploadChunk.embedding_model == EMBEDDING_MODEL_NAME)
+        .all()
+    )
+    if not vectors:
+        return []
+    scores = cosine_similarities(query_vector, np.vstack([unpack_embedding(blob) for _, blob in vectors]))
+    ranked = [position for position in np.argsort(-scores, kind="stable") if scores[position] > min_similarity]
+    ranked = ranked[:top_k] if top_k is not None else ranked
+    if not ranked:
+        return []
+
+    chunks = {
+        chunk.id: chunk
+        for chunk in db.query(UploadChunk)
+        .join(UploadChunk.upload)
+        .options(contains_eager(UploadChunk.upload).load_only(Upload.id, Upload.filename, Upload.confluence_page_id))
+        .filter(UploadChunk.id.in_([vectors[position][0] for position in ranked]))
+    }
+    return [(chunks[vectors[position][0]], float(scores[position])) for position in ranked]
+
+
+def best_chunk_per_upload(matches: Sequence[Tuple[UploadChunk, float]]) -> List[Tuple[UploadChunk, float]]:
+    """Keep the best passage of each upload, for results listed per upload"""
+    seen = set()
+    best: List[Tuple[Any, float]] = []
+    for chunk, score in matches:
+        if chunk.upload_id not in seen:
+            seen.add(chunk.upload_id)
+            best.append((chunk, score))
+    return best
@@ -1,93 +1,674 @@
-from sentence_transformers import SentenceTransformer
 import numpy as np
 import os
 import json
 import logging
+import threading
+import time
 import uuid
-from typing import List, Dict, Any, Optional
-from functools import lru_cache
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime, timedelta
 
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, one process per store
+    fcntl = None
+
+from config.config import (
+    VECTORSTORE_DIR,
+    VECTORSTORE_ANN_MIN_DOCUMENTS,
+    VECTORSTORE_ANN_REBUILD_RATIO,
+    VECTORSTORE_ENCODE_BATCH_SIZE,
+    VECTORSTORE_FLUSH_INTERVAL_SECONDS,
+    VECTORSTORE_INDEX_TYPE,
+    VECTORSTORE_WRITE_BEHIND,
+)
+from rag.ann import ANNIndex, create_index, load_index, resolve_index_type
+from rag.embedder import get_embedding_model
+
 logger = logging.getLogger(__name__)
 
+STORE_FORMAT = "vectorstore-binary"
+STORE_FORMAT_VERSION = 1
+VECTOR_DTYPE = np.float32
+
 
 class VectorStore:
-    """Vector store for RAG system with caching and optimized search"""
+    """
+    Vector store for RAG system with caching and optimized search.
+    
+    On disk a store is a pair of files next to ``store_path``:
+    
+    - ``<name>.meta.jsonl``: a header line (format, dimension, vectors file)
+      followed by an append-only log of ``put``/``delete`` records
+    - ``<name>.<generation>.f32``: raw float32 rows of unit-length embeddings,
+      memory-mapped on open and appended to as documents are stored
+    
+    Overwritten and deleted rows stay in the vectors file until the store is
+    compacted into a new generation. A legacy ``<name>.json`` store is
+    migrated the first time it is opened.
+    
+    In write-behind mode stored documents are buffered and written by
+    ``flush()``, which runs before any search or delete, on the background
+    flusher's timer and at shutdown.
+    
+    With an ``ivf`` or ``hnsw`` index type, searches over stores of at least
+    VECTORSTORE_ANN_MIN_DOCUMENTS go through an approximate index (see
+    ``rag.ann``), saved as ``<name>.<type>.ann``. Rows appended after the
+    index was built are scanned exactly until the next rebuild.
+    
+    Use ``get_vectorstore()`` to share one instance per path within a
+    process. Writes take an exclusive lock on ``<name>.lock`` and first
+    catch up with records other processes appended, so row numbers always
+    come from the files on disk rather than from this instance's view.
+    """
     
     # Class-level cache for embeddings to avoid redundant computations
     _embedding_cache: Dict[str, np.ndarray] = {}
     _cache_timestamp: Dict[str, datetime] = {}
     CACHE_TTL = timedelta(hours=24)  # Cache embeddings for 24 hours
+    INITIAL_INDEX_CAPACITY = 64  # Row slots preallocated for the live-row mask
+    COMPACT_MIN_DEAD_ROWS = 64  # Don't compact tiny stores
+    COMPACT_DEAD_RATIO = 0.5  # Compact once this share of rows is dead
+    ANN_CANDIDATE_FACTOR = 4  # Candidates fetched per requested result from graph indexes
     
-    def __init__(self, store_path: str = "storage/vectorstore.json", upload_id: str = None):
+    def __init__(self, store_path: str = "storage/vectorstore.json", upload_id: str = None,
+                 write_behind: Optional[bool] = None, index_type: Optional[str] = None):
         """
         Initialize vector store with caching support.
         
         Args:
             store_path: Base path for vector stores
             upload_id: Optional upload ID for per-upload vector stores
+            write_behind: Buffer writes until flush (defaults to VECTORSTORE_WRITE_BEHIND)
+            index_type: "exact", "ivf" or "hnsw" (defaults to VECTORSTORE_INDEX_TYPE)
         """
-        if upload_id:
-            # Create per-upload vector store path
-            self.upload_id = str(upload_id)
-            base_dir = os.path.dirname(store_path) or "storage"
-            self.store_path = os.path.join(base_dir, f"vectorstore_upload_{upload_id}.json")
-        else:
-            self.store_path = store_path
-            self.upload_id = None
+        self.store_path = self.resolve_store_path(store_path, upload_id)
+        self.upload_id = str(upload_id) if upload_id else None
         
-        # Lazy load model only when needed
-        self._model = None
-        self.data = self._load_store()
+        self.base_path = os.path.splitext(self.store_path)[0]
+        self.meta_path = f"{self.base_path}.meta.jsonl"
+        self.lock_path = f"{self.base_path}.lock"
+        self.write_behind = VECTORSTORE_WRITE_BEHIND if write_behind is None else write_behind
+        self.index_type = resolve_index_type(index_type or VECTORSTORE_INDEX_TYPE)
+        self.ann_state_path = f"{self.base_path}.ann.json"
+        self.data: Dict[str, Dict[str, Any]] = {}
+        self._pending: List[Tuple[str, np.ndarray, Dict[str, Any]]] = []
+        self._lock = threading.RLock()
+        self._file_lock_depth = 0
+        self._lock_file = None
+        self._meta_offset = 0  # Bytes of the metadata log already applied
+        self._ann_build_thread: Optional[threading.Thread] = None
+        self._reset_index(None, None)
+        if os.path.exists(self.meta_path) or os.path.exists(self.store_path):
+            with self._locked():
+                self._load_store()
+        self._load_ann_index()
         
         logger.info(f"Initialized VectorStore at {self.store_path} with {len(self.data)} documents")
     
     @property
     def model(self):
-        """Lazy load embedding model to avoid initialization overhead"""
-        if self._model is None:
-            logger.debug("Initializing embedding model")
-            self._model = SentenceTransformer("all-MiniLM-L6-v2")
-        return self._model
+        """Shared embedding model, loaded on first use"""
+        return get_embedding_model()
+    
+    @staticmethod
+    def resolve_store_path(store_path: str, upload_id: Optional[str] = None) -> str:
+        """Store path for a base path, or for an upload's own store next to it"""
+        if upload_id:
+            base_dir = os.path.dirname(store_path) or "storage"
+            return os.path.join(base_dir, f"vectorstore_upload_{upload_id}.json")
+        return store_path
+    
+    @contextmanager
+    def _locked(self):
+        """
+        Hold the thread lock and the cross-process file lock.
+        
+        Re-entrant: only the outermost call takes the file lock, since a
+        second flock from the same process on a new descriptor would block.
+        """
+        with self._lock:
+            if self._file_lock_depth == 0 and fcntl is not None:
+                os.makedirs(os.path.dirname(self.lock_path) or ".", exist_ok=True)
+                self._lock_file = open(self.lock_path, "a")
+                fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+            self._file_lock_depth += 1
+            try:
+                yield
+            finally:
+                self._file_lock_depth -= 1
+                if self._file_lock_depth == 0 and self._lock_file is not None:
+                    fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+                    self._lock_file.close()
+                    self._lock_file = None
     
     @staticmethod
     def create_vectorstore_id() -> str:
         """Generate a unique vector store ID"""
         return str(uuid.uuid4())
     
-    def _load_store(self) -> Dict[str, Any]:
+    @staticmethod
+    def _normalize(matrix: np.ndarray) -> np.ndarray:
+        """Scale each row to unit length, leaving zero rows as zeros"""
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        normalized = np.zeros_like(matrix, dtype=VECTOR_DTYPE)
+        np.divide(matrix, norms, out=normalized, where=norms > 0)
+        return normalized
+    
+    def _reset_index(self, dimension: Optional[int], vectors_file: Optional[str]) -> None:
+        """
+        Reset the search index to an empty state.
+        
+        The index is the (memory-mapped) float32 matrix of every row in the
+        vectors file, the document ID owning each row (None once overwritten
+        or deleted) and a boolean mask of the rows that are still live.
+        """
+        self._dimension = dimension
+        self._vectors_file = vectors_file
+        self._matrix = np.zeros((0, dimension or 0), dtype=VECTOR_DTYPE)
+        self._ids: List[Optional[str]] = []
+        self._live = np.zeros(self.INITIAL_INDEX_CAPACITY, dtype=bool)
+        self._positions: Dict[str, int] = {}
+        self._metadata_columns: Dict[str, np.ndarray] = {}
+        # Row numbers change with every generation, so any ANN index is dropped
+        self._ann: Optional[ANNIndex] = None
+        self._ann_rows = 0  # Rows below this were indexed by self._ann
+    
+    @property
+    def _size(self) -> int:
+        """Number of rows in the vectors file, live or not"""
+        return len(self._ids)
+    
+    def _vectors_path(self, vectors_file: Optional[str] = None) -> str:
+        return os.path.join(os.path.dirname(self.meta_path), vectors_file or self._vectors_file)
+    
+    def _map_vectors(self) -> np.ndarray:
+        """Memory-map the vectors file, dropping any partially written trailing row"""
+        if not self._vectors_file or not self._dimension:
+            return np.zeros((0, self._dimension or 0), dtype=VECTOR_DTYPE)
+        
+        path = self._vectors_path()
+        row_bytes = self._dimension * np.dtype(VECTOR_DTYPE).itemsize
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        rows = size // row_bytes
+        if size % row_bytes:
+            logger.warning(f"Truncating partial row at the end of {path}")
+            with open(path, "r+b") as f:
+                f.truncate(rows * row_bytes)
+        if rows == 0:
+            return np.zeros((0, self._dimension), dtype=VECTOR_DTYPE)
+        return np.memmap(path, dtype=VECTOR_DTYPE, mode="r", shape=(rows, self._dimension))
+    
+    def _grow_rows(self, rows: int) -> None:
+        """Extend the row bookkeeping to cover newly appended rows"""
+        if rows > len(self._live):
+            # Grow geometrically so appends stay amortized O(1)
+            grown = np.zeros(max(rows, len(self._live) * 2), dtype=bool)
+            grown[:self._size] = self._live[:self._size]
+            self._live = grown
+        self._ids.extend([None] * (rows - self._size))
+    
+    def _mark_dead(self, doc_id: str) -> None:
+        position = self._positions.pop(doc_id, None)
+        if position is not None:
+            self._ids[position] = None
+            self._live[position] = False
+    
+    def _mark_live(self, doc_id: str, position: int) -> None:
+        self._mark_dead(doc_id)
+        self._ids[position] = doc_id
+        self._live[position] = True
+        self._positions[doc_id] = position
+    
+    def _read_log(self, offset: int = 0) -> Tuple[Dict[str, Any], List[Dict[str, Any]], int]:
+        """
+        Header and the complete records of the metadata log from a byte offset.
+        
+        Returns:
+            (header, records, offset just past the last complete record)
+        """
+        records = []
+        with open(self.meta_path, "rb") as f:
+            header = json.loads(f.readline())
+            end = max(offset, f.tell())
+            f.seek(end)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # Being written by another process; read it next time
+                end += len(line)
+                if not line.strip():
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    logger.warning(f"Skipping unreadable record in {self.meta_path} at byte {end - len(line)}")
+        if header.get("format") != STORE_FORMAT:
+            raise ValueError(f"Unknown vectorstore format: {header.get('format')}")
+        return header, records, end
+    
+    def _apply_records(self, records: List[Dict[str, Any]]) -> None:
+        for record in records:
+            doc_id = record.get("doc_id")
+            if record.get("op") == "put":
+                if record["row"] >= self._size:
+                    logger.warning(f"Skipping {doc_id}: row {record['row']} missing from vectors file")
+                    continue
+                self._mark_live(doc_id, record["row"])
+                self.data[doc_id] = {
+                    "text": record.get("text", ""),
+                    "metadata": record.get("metadata", {}),
+                    "created_at": record.get("created_at")
+                }
+                if record.get("content_hash"):
+                    self.data[doc_id]["content_hash"] = record["content_hash"]
+            elif record.get("op") == "delete":
+                self._mark_dead(doc_id)
+                self.data.pop(doc_id, None)
+        self._metadata_columns.clear()
+    
+    def _load_store(self) -> None:
         """Load vectorstore from disk with error handling"""
-        if os.path.exists(self.store_path):
+        self.data = {}
+        self._meta_offset = 0
+        if not os.path.exists(self.meta_path):
+            self._reset_index(None, None)
+            if os.path.exists(self.store_path) and self.store_path.endswith(".json"):
+                try:
+                    self._import_legacy_json()
+                except Exception as e:
+                    logger.error(f"Error migrating vectorstore from {self.store_path}: {e}")
+                    self.data = {}
+                    self._reset_index(None, None)
+            return
+        
+        try:
+            header, records, self._meta_offset = self._read_log()
+            self._reset_index(header.get("dimension"), header.get("vectors_file"))
+            self._matrix = self._map_vectors()
+            self._grow_rows(self._matrix.shape[0])
+            self._apply_records(records)
+        except Exception as e:
+            logger.error(f"Error loading vectorstore from {self.meta_path}: {e}")
+            self.data = {}
+            self._meta_offset = 0
+            self._reset_index(None, None)
+    
+    def _sync_with_disk(self) -> None:
+        """
+        Catch up with records appended, or a generation written, by another instance or process.
+        
+        Call with the file lock held.
+        """
+        if not os.path.exists(self.meta_path):
+            if self._vectors_file is not None:
+                self._reload()
+            return
+        if os.path.getsize(self.meta_path) == self._meta_offset:
+            return
+        try:
+            header, records, end = self._read_log(self._meta_offset)
+        except Exception as e:
+            logger.warning(f"Reloading {self.meta_path} after failing to read new records: {e}")
+            self._reload()
+            return
+        if (header.get("vectors_file") != self._vectors_file or header.get("dimension") != self._dimension
+                or os.path.getsize(self.meta_path) < self._meta_offset):
+            # Compacted or cleared elsewhere: row numbers start over
+            self._reload()
+            return
+        self._matrix = self._map_vectors()
+        self._grow_rows(self._matrix.shape[0])
+        self._apply_records(records)
+        self._meta_offset = end
+        logger.debug(f"Applied {len(records)} records written elsewhere to {self.meta_path}")
+    
+    def _reload(self) -> None:
+        """Reload from disk, keeping documents still buffered in write-behind mode"""
+        self._load_store()
+        for doc_id, _, record in self._pending:
+            self.data[doc_id] = record
+        self._load_ann_index()
+    
+    def _import_legacy_json(self) -> None:
+        """Convert a legacy JSON store at store_path into the binary layout"""
+        with open(self.store_path, "r") as f:
+            legacy = json.load(f)
+        
+        entries = []
+        missing = []
+        for doc_id, doc_data in legacy.items():
+            if not isinstance(doc_data, dict):
+                continue
+            record = {
+                "text": doc_data.get("text", ""),
+                "metadata": doc_data.get("metadata", {}),
+                "created_at": doc_data.get("created_at")
+            }
+            if doc_data.get("embedding"):
+                entries.append((doc_id, np.asarray(doc_data["embedding"], dtype=VECTOR_DTYPE), record))
+            elif record["text"]:
+                missing.append((doc_id, record))
+        
+        if missing:
+            vectors = self.model.encode([record["text"] for _, record in missing], show_progress_bar=False)
+            for (doc_id, record), vector in zip(missing, vectors):
+                entries.append((doc_id, np.asarray(vector, dtype=VECTOR_DTYPE), record))
+        
+        if entries:
+            dimension = entries[0][1].shape[0]
+            skipped = [doc_id for doc_id, vector, _ in entries if vector.shape[0] != dimension]
+            for doc_id in skipped:
+                logger.warning(f"Skipping {doc_id} while migrating {self.store_path}: embedding size mismatch")
+            self._write_documents([entry for entry in entries if entry[1].shape[0] == dimension])
+        else:
+            self._write_generation(None, [])
+        
+        os.replace(self.store_path, f"{self.store_path}.migrated")
+        logger.info(f"Migrated {len(self.data)} documents from {self.store_path} to {self.meta_path}")
+    
+    def _write_generation(self, dimension: Optional[int], doc_ids: List[str]) -> None:
+        """
+        Rewrite the store as a new vectors file holding only the given documents.
+        
+        The new metadata log is swapped in atomically and names the new vectors
+        file, so a crash part-way through leaves the previous generation intact.
+        """
+        os.makedirs(os.path.dirname(self.meta_path) or ".", exist_ok=True)
+        old_vectors_file = self._vectors_file
+        vectors_file = None
+        
+        if dimension:
+            vectors_file = f"{os.path.basename(self.base_path)}.{uuid.uuid4().hex[:8]}.f32"
+            rows = [self._positions[doc_id] for doc_id in doc_ids]
+            block = np.ascontiguousarray(self._matrix[rows], dtype=VECTOR_DTYPE)
+            with open(self._vectors_path(vectors_file), "wb") as f:
+                f.write(block.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+        
+        header = {
+            "format": STORE_FORMAT,
+            "version": STORE_FORMAT_VERSION,
+            "dimension": dimension,
+            "vectors_file": vectors_file
+        }
+        temp_path = f"{self.meta_path}.tmp"
+        with open(temp_path, "w") as f:
+            f.write(json.dumps(header) + "\n")
+            for row, doc_id in enumerate(doc_ids):
+                f.write(json.dumps({"op": "put", "doc_id": doc_id, "row": row, **self.data[doc_id]}) + "\n")
+        os.replace(temp_path, self.meta_path)
+        self._meta_offset = os.path.getsize(self.meta_path)
+        
+        self._reset_index(dimension, vectors_file)
+        self._matrix = self._map_vectors()
+        self._grow_rows(len(doc_ids))
+        for row, doc_id in enumerate(doc_ids):
+            self._mark_live(doc_id, row)
+        
+        if old_vectors_file and old_vectors_file != vectors_file:
             try:
-                with open(self.store_path, "r") as f:
-                    return json.load(f)
-            except Exception as e:
-                logger.error(f"Error loading vectorstore from {self.store_path}: {e}")
-                return {}
-        return {}
+                os.remove(self._vectors_path(old_vectors_file))
+            except OSError as e:
+                logger.warning(f"Could not remove old vectors file {old_vectors_file}: {e}")
+        logger.debug(f"Wrote vectorstore generation {vectors_file} with {len(doc_ids)} documents")
+    
+    def _append_documents(self, entries: List[Tuple[str, np.ndarray, Dict[str, Any]]]) -> None:
+        """Write (doc_id, embedding, record) entries now, or buffer them in write-behind mode"""
+        if not entries:
+            return
+        with self._lock:
+            if not self.write_behind:
+                with self._locked():
+                    self._write_documents(entries)
+                return
+            self._pending.extend(entries)
+            for doc_id, _, record in entries:
+                self.data[doc_id] = record
+            _mark_dirty(self)
+    
+    def _write_documents(self, entries: List[Tuple[str, np.ndarray, Dict[str, Any]]]) -> None:
+        """
+        Append (doc_id, embedding, record) entries to the vectors file and log.
+        
+        Vectors are written before their log records, so a crash can only
+        leave unreferenced rows behind, never records without vectors. Call
+        with the file lock held.
+        """
+        if not entries:
+            return
+        
+        self._sync_with_disk()
+        vectors = self._normalize(np.vstack([vector.reshape(1, -1) for _, vector, _ in entries]))
+        if self._dimension is None or self._vectors_file is None:
+            self._write_generation(vectors.shape[1], [])
+        elif vectors.shape[1] != self._dimension:
+            raise ValueError(f"Embedding size {vectors.shape[1]} does not match store dimension {self._dimension}")
+        
+        # Rows are numbered from the file itself, whoever appended to it last
+        row_bytes = self._dimension * np.dtype(VECTOR_DTYPE).itemsize
+        vectors_path = self._vectors_path()
+        first_row = (os.path.getsize(vectors_path) if os.path.exists(vectors_path) else 0) // row_bytes
+        with open(vectors_path, "ab") as f:
+            f.truncate(first_row * row_bytes)
+            f.write(vectors.tobytes())
+        with open(self.meta_path, "a") as f:
+            for offset, (doc_id, _, record) in enumerate(entries):
+                f.write(json.dumps({"op": "put", "doc_id": doc_id, "row": first_row + offset, **record}) + "\n")
+        self._meta_offset = os.path.getsize(self.meta_path)
+        
+        self._matrix = self._map_vectors()
+        self._grow_rows(self._matrix.shape[0])
+        for offset, (doc_id, _, record) in enumerate(entries):
+            self._mark_live(doc_id, first_row + offset)
+            self.data[doc_id] = record
+        self._metadata_columns.clear()
+        self._maybe_compact()
+    
+    def _append_deletes(self, doc_ids: List[str]) -> None:
+        """Log deletions and drop the documents from the index"""
+        if not doc_ids:
+            return
+        with self._locked():
+            self.flush()
+            self._sync_with_disk()
+            with open(self.meta_path, "a") as f:
+                for doc_id in doc_ids:
+                    f.write(json.dumps({"op": "delete", "doc_id": doc_id}) + "\n")
+            self._meta_offset = os.path.getsize(self.meta_path)
+            for doc_id in doc_ids:
+                self._mark_dead(doc_id)
+                self.data.pop(doc_id, None)
+            self._metadata_columns.clear()
+            self._maybe_compact()
     
-    def _save_store(self) -> None:
-        """Save vectorstore to disk with atomic writes"""
+    def _maybe_compact(self) -> None:
+        dead_rows = self._size - len(self._positions)
+        if dead_rows >= self.COMPACT_MIN_DEAD_ROWS and dead_rows > self._size * self.COMPACT_DEAD_RATIO:
+            self.compact()
+    
+    def flush(self) -> int:
+        """
+        Write any buffered documents to disk.
+        
+        Returns:
+            Number of documents written
+        """
+        with self._lock:
+            entries, self._pending = self._pending, []
+            _dirty_stores.discard(self)
+            if not entries:
+                return 0
+            try:
+                with self._locked():
+                    self._write_documents(entries)
+            except Exception:
+                # Keep the documents buffered so the next flush retries them
+                self._pending = entries + self._pending
+                _mark_dirty(self)
+                raise
+            logger.debug(f"Flushed {len(entries)} buffered documents to {self.meta_path}")
+            return len(entries)
+    
+    def _ann_index_path(self, index_type: str) -> str:
+        return f"{self.base_path}.{index_type}.ann"
+    
+    def _load_ann_index(self) -> None:
+        """Load the saved ANN index if it was built for the current vectors file"""
+        if self.index_type == "exact" or not os.path.exists(self.ann_state_path):
+            return
         try:
-            os.makedirs(os.path.dirname(self.store_path) or ".", exist_ok=True)
-            # Write to temp file first for atomicity
-            temp_path = f"{self.store_path}.tmp"
-            with open(temp_path, "w") as f:
-                json.dump(self.data, f, indent=2)
-            # Atomic rename
-            os.replace(temp_path, self.store_path)
-            logger.debug(f"Saved vectorstore to {self.store_path}")
+            with open(self.ann_state_path, "r") as f:
+                state = json.load(f)
+            if (state.get("index_type") != self.index_type
+                    or state.get("vectors_file") != self._vectors_file
+                    or state.get("rows", 0) > self._size):
+                logger.info(f"Ignoring stale ANN index for {self.meta_path}")
+                return
+            self._ann = load_index(self.index_type, self._ann_index_path(self.index_type), self._dimension)
+            self._ann_rows = state["rows"]
         except Exception as e:
-            logger.error(f"Error saving vectorstore: {e}")
+            logger.warning(f"Could not load ANN index for {self.meta_path}: {e}")
+    
+    def build_ann_index(self, index_type: Optional[str] = None, **params) -> Dict[str, Any]:
+        """
+        Build (or rebuild) the approximate index over all live rows and save it.
+        
+        The rows are snapshotted under the lock but indexed outside it, so
+        searches and writes carry on during the build; rows appended
+        meanwhile are scanned exactly until the next rebuild.
+        
+        Args:
+            index_type: "ivf" or "hnsw" (defaults to the store's index type)
+            **params: Backend build parameters (nlist, nprobe / M, ef_construction, ef_search)
+            
+        Returns:
+            Build statistics
+        """
+        with self._lock:
+            self.flush()
+            self.refresh()
+            index_type = resolve_index_type(index_type or self.index_type)
+            self.index_type = index_type
+            if index_type == "exact":
+                self._ann = None
+                self._ann_rows = 0
+                return {"index_type": index_type, "indexed_rows": 0, "build_seconds": 0.0}
+            matrix, vectors_file, size = self._matrix, self._vectors_file, self._size
+            rows = np.flatnonzero(self._live[:size])
+        
+        started = time.perf_counter()
+        index = create_index(index_type, **params)
+        index.build(matrix, rows)
+        build_seconds = time.perf_counter() - started
+        stats = {"index_type": index_type, "indexed_rows": int(len(rows)), "build_seconds": round(build_seconds, 3)}
+        
+        with self._locked():
+            if self._vectors_file != vectors_file:
+                # Compacted or cleared during the build: the rows no longer line up
+                logger.info(f"Discarding {index_type} index of {self.meta_path} built for an older generation")
+                return {**stats, "indexed_rows": 0}
+            if vectors_file:
+                index.save(self._ann_index_path(index_type))
+                temp_path = f"{self.ann_state_path}.tmp"
+                with open(temp_path, "w") as f:
+                    json.dump({"index_type": index_type, "vectors_file": vectors_file, "rows": size}, f)
+                os.replace(temp_path, self.ann_state_path)
+            
+            self._ann = index
+            self._ann_rows = size
+        logger.info(f"Built {index_type} index over {len(rows)} rows of {self.meta_path} in {build_seconds:.2f}s")
+        return stats
+    
+    def _build_ann_in_background(self) -> None:
+        try:
+            self.build_ann_index()
+        except Exception as e:
+            logger.warning(f"Background ANN build for {self.meta_path} failed: {e}")
+    
+    def _current_ann_index(self) -> Optional[ANNIndex]:
+        """
+        ANN index to search with, or None for an exact scan.
+        
+        A missing or stale index is rebuilt on a background thread; searches
+        scan exactly (or use the stale index plus an exact tail) meanwhile.
+        """
+        if self.index_type == "exact" or len(self._positions) < VECTORSTORE_ANN_MIN_DOCUMENTS:
+            return None
+        if self._ann is None or self._size - self._ann_rows > self._ann_rows * VECTORSTORE_ANN_REBUILD_RATIO:
+            if self._ann_build_thread is None or not self._ann_build_thread.is_alive():
+                self._ann_build_thread = threading.Thread(
+                    target=self._build_ann_in_background, name="vectorstore-ann-build", daemon=True
+                )
+                self._ann_build_thread.start()
+        return self._ann
+    
+    def _score_rows(self, query_vector: np.ndarray, top_k: int, filters: Optional[Dict[str, Any]],
+                    exact: bool, nprobe: Optional[int], ef_search: Optional[int]) -> Tuple[np.ndarray, np.ndarray]:
+        """Candidate rows and their scores, from the ANN index when one applies"""
+        ann = None if exact else self._current_ann_index()
+        if ann is None:
+            # One matrix-vector product scores every row
+            return np.arange(self._size), self._matrix @ query_vector
+        
+        candidate_k = top_k * self.ANN_CANDIDATE_FACTOR * (self.ANN_CANDIDATE_FACTOR if filters else 1)
+        rows, scores = ann.search(self._matrix, query_vector, candidate_k, nprobe=nprobe, ef_search=ef_search)
+        tail = np.arange(self._ann_rows, self._size)
+        if len(tail):
+            rows = np.concatenate([rows, tail])
+            scores = np.concatenate([scores, self._matrix[tail] @ query_vector])
+        return rows, scores
+    
+    def refresh(self) -> None:
+        """Pick up documents written to the store's files by other instances or processes"""
+        with self._lock:
+            if os.path.exists(self.meta_path):
+                changed = os.path.getsize(self.meta_path) != self._meta_offset
+            else:
+                changed = self._vectors_file is not None  # Deleted since this instance wrote it
+            if changed:
+                with self._locked():
+                    self._sync_with_disk()
+    
+    def compact(self) -> None:
+        """Rewrite the store without overwritten or deleted rows"""
+        try:
+            with self._locked():
+                self.flush()
+                self._sync_with_disk()
+                live_ids = [self._ids[row] for row in np.flatnonzero(self._live[:self._size])]
+                self._write_generation(self._dimension, live_ids)
+            logger.info(f"Compacted vectorstore {self.meta_path} to {len(live_ids)} rows")
+        except Exception as e:
+            logger.error(f"Error compacting vectorstore: {e}")
             raise
     
+    def _metadata_column(self, key: str) -> np.ndarray:
+        """Metadata values for one key, aligned with the index rows"""
+        column = self._metadata_columns.get(key)
+        if column is None:
+            column = np.empty(self._size, dtype=object)
+            for position, doc_id in enumerate(self._ids):
+                if doc_id is not None:
+                    column[position] = self.data[doc_id].get("metadata", {}).get(key)
+            self._metadata_columns[key] = column
+        return column
+    
+    def _filter_mask(self, filters: Dict[str, Any]) -> np.ndarray:
+        """Boolean mask of live index rows whose metadata matches every filter"""
+        mask = self._live[:self._size].copy()
+        for key, value in filters.items():
+            mask &= self._metadata_column(key) == value
+        return mask
+    
     def _get_cached_embedding(self, text: str) -> np.ndarray:
         """
         Get embedding from cache or compute and cache it.
         
         Args:
             text: Text to get embedding for
-            
+        
         Returns:
             Embedding vector
         """
@@ -120,29 +701,69 @@ class VectorStore:
             text: Document text
             doc_id: Unique document ID
             metadata: Optional metadata for the document
-            
+        
         Returns:
             True if successful
-            
+        
         Raises:
             Exception: If storage fails
         """
         try:
-            embedding = self._get_cached_embedding(text).tolist()
-            self.data[doc_id] = {
+            embedding = np.asarray(self._get_cached_embedding(text), dtype=VECTOR_DTYPE)
+            self._append_documents([(doc_id, embedding, {
                 "text": text,
-                "embedding": embedding,
                 "metadata": metadata or {},
                 "created_at": datetime.now().isoformat()
-            }
-            self._save_store()
+            })])
             logger.info(f"Stored document: {doc_id}")
             return True
         except Exception as e:
             logger.error(f"Error storing document {doc_id}: {e}")
             raise
     
-    def search(self, query: str, top_k: int = 5, similarity_threshold: float = 0.0) -> List[Dict]:
+    def store_documents(self, items: List[Dict[str, Any]], batch_size: Optional[int] = None) -> int:
+        """
+        Store many documents with one encode call and one write.
+        
+        Args:
+            items: Dicts with "text", "doc_id" and optional "metadata" and "content_hash"
+            batch_size: Encoder batch size (defaults to VECTORSTORE_ENCODE_BATCH_SIZE)
+            
+        Returns:
+            Number of documents stored
+            
+        Raises:
+            Exception: If storage fails
+        """
+        if not items:
+            return 0
+        try:
+            vectors = self.model.encode(
+                [item["text"] for item in items],
+                batch_size=batch_size or VECTORSTORE_ENCODE_BATCH_SIZE,
+                show_progress_bar=False
+            )
+            created_at = datetime.now().isoformat()
+            entries = []
+            for item, vector in zip(items, vectors):
+                record = {
+                    "text": item["text"],
+                    "metadata": item.get("metadata") or {},
+                    "created_at": created_at
+                }
+                if item.get("content_hash"):
+                    record["content_hash"] = item["content_hash"]
+                entries.append((item["doc_id"], np.asarray(vector, dtype=VECTOR_DTYPE), record))
+            self._append_documents(entries)
+            logger.info(f"Stored {len(entries)} documents")
+            return len(entries)
+        except Exception as e:
+            logger.error(f"Error storing {len(items)} documents: {e}")
+            raise
+    
+    def search(self, query: str, top_k: int = 5, similarity_threshold: float = 0.0,
+               filters: Optional[Dict[str, Any]] = None, exact: bool = False,
+               nprobe: Optional[int] = None, ef_search: Optional[int] = None) -> List[Dict]:
         """
         Search vectorstore for similar documents with optimizations.
         
@@ -150,46 +771,58 @@ class VectorStore:
             query: Search query text
             top_k: Number of top results to return
             similarity_threshold: Minimum similarity score (0.0 to 1.0)
-            
+            filters: Optional metadata key/value pairs that results must match
+            exact: Score every document even when an ANN index is available
+            nprobe: IVF lists to scan (higher = better recall, slower)
+            ef_search: HNSW candidate list size (higher = better recall, slower)
+        
         Returns:
             List of similar documents with scores
         """
-        try:
-            if not self.data:
-                logger.warning("Vectorstore is empty")
-                return []
-            
-            query_embedding = self._get_cached_embedding(query)
-            results = []
-            
-            # Vectorized computation for better performance
-            for doc_id, doc_data in self.data.items():
-                try:
-                    doc_embedding = np.array(doc_data["embedding"])
-                    
-                    # Compute cosine similarity
-                    similarity = self._cosine_similarity(query_embedding, doc_embedding)
-                    
-                    if similarity >= similarity_threshold:
-                        results.append({
-                            "doc_id": doc_id,
-                            "text": doc_data["text"],
-                            "similarity": float(similarity),
-                            "metadata": doc_data.get("metadata", {}),
-                            "created_at": doc_data.get("created_at")
-                        })
-                except Exception as e:
-                    logger.warning(f"Error processing document {doc_id}: {e}")
-                    continue
-            
-            # Sort by similarity descending and return top-k
-            results = sorted(results, key=lambda x: x["similarity"], reverse=True)[:top_k]
-            logger.debug(f"Found {len(results)} results for query (threshold: {similarity_threshold})")
-            return results
+        with self._lock:
+            self.flush()
+            self.refresh()
+            try:
+                if not self._positions:
+                    logger.warning("Vectorstore is empty")
+                    return []
+                if top_k <= 0:
+                    return []
+                
+                query_embedding = np.asarray(self._get_cached_embedding(query), dtype=VECTOR_DTYPE)
+                query_vector = self._normalize(query_embedding.reshape(1, -1))[0]
+                
+                rows, scores = self._score_rows(query_vector, top_k, filters, exact, nprobe, ef_search)
+                
+                # Dead rows and metadata mismatches are masked out
+                mask = scores >= similarity_threshold
+                mask &= (self._filter_mask(filters) if filters else self._live[:self._size])[rows]
+                candidates = np.flatnonzero(mask)
+                
+                # Partial selection of the top-k, then order only those
+                if len(candidates) > top_k:
+                    top = np.argpartition(-scores[candidates], top_k - 1)[:top_k]
+                    candidates = candidates[top]
+                candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+                
+                results = []
+                for candidate in candidates:
+                    doc_id = self._ids[rows[candidate]]
+                    doc_data = self.data[doc_id]
+                    results.append({
+                        "doc_id": doc_id,
+                        "text": doc_data["text"],
+                        "similarity": float(scores[candidate]),
+                        "metadata": doc_data.get("metadata", {}),
+                        "created_at": doc_data.get("created_at")
+                    })
+                
+                logger.debug(f"Found {len(results)} results for query (threshold: {similarity_threshold})")
+                return results
             
-        except Exception as e:
-            logger.error(f"Error searching vectorstore: {e}")
-            raise
+            except Exception as e:
+                logger.error(f"Error searching vectorstore: {e}")
+                raise
     
     @staticmethod
     def _cosine_similarity(vec_a: np.ndarray, vec_b: np.ndarray) -> float:
@@ -199,7 +832,7 @@ class VectorStore:
         Args:
             vec_a: First vector
             vec_b: Second vector
-            
+        
         Returns:
             Cosine similarity value
         """
@@ -217,14 +850,13 @@ class VectorStore:
         
         Args:
             doc_id: Document ID to delete
-            
+        
         Returns:
             True if deleted, False if not found
         """
         try:
             if doc_id in self.data:
-                del self.data[doc_id]
-                self._save_store()
+                self._append_deletes([doc_id])
                 logger.info(f"Deleted document: {doc_id}")
                 return True
             return False
@@ -232,6 +864,29 @@ class VectorStore:
             logger.error(f"Error deleting document {doc_id}: {e}")
             raise
     
+    def delete_documents(self, doc_ids: List[str]) -> int:
+        """
+        Delete several documents with one log write.
+        
+        Args:
+            doc_ids: Document IDs to delete
+            
+        Returns:
+            Number of documents deleted
+        """
+        try:
+            with self._lock:
+                self.flush()
+                self.refresh()
+                existing = [doc_id for doc_id in doc_ids if doc_id in self.data]
+                self._append_deletes(existing)
+            if existing:
+                logger.info(f"Deleted {len(existing)} documents")
+            return len(existing)
+        except Exception as e:
+            logger.error(f"Error deleting {len(doc_ids)} documents: {e}")
+            raise
+    
     def delete_by_metadata(self, metadata_key: str, metadata_value: Any) -> int:
         """
         Delete documents matching metadata criteria.
@@ -239,26 +894,21 @@ class VectorStore:
         Args:
             metadata_key: Metadata field key
             metadata_value: Metadata field value
-            
+        
         Returns:
             Number of documents deleted
         """
-        deleted_count = 0
         try:
-            doc_ids_to_delete = [
-                doc_id for doc_id, doc_data in self.data.items()
-                if doc_data.get("metadata", {}).get(metadata_key) == metadata_value
-            ]
+            self.flush()
+            self.refresh()
+            rows = np.flatnonzero(self._filter_mask({metadata_key: metadata_value}))
+            doc_ids_to_delete = [self._ids[row] for row in rows]
             
-            for doc_id in doc_ids_to_delete:
-                del self.data[doc_id]
-                deleted_count += 1
+            if doc_ids_to_delete:
+                self._append_deletes(doc_ids_to_delete)
+                logger.info(f"Deleted {len(doc_ids_to_delete)} documents by metadata")
             
-            if deleted_count > 0:
-                self._save_store()
-                logger.info(f"Deleted {deleted_count} documents by metadata")
-            
-            return deleted_count
+            return len(doc_ids_to_delete)
         except Exception as e:
             logger.error(f"Error deleting documents by metadata: {e}")
             raise
@@ -266,8 +916,11 @@ class VectorStore:
     def clear(self) -> bool:
         """Clear all documents from vectorstore"""
         try:
-            self.data = {}
-            self._save_store()
+            with self._locked():
+                self._pending = []
+                _dirty_stores.discard(self)
+                self.data = {}
+                self._write_generation(None, [])
             logger.info("Cleared vectorstore")
             return True
         except Exception as e:
@@ -276,14 +929,132 @@ class VectorStore:
     
     def get_stats(self) -> Dict[str, Any]:
         """Get vectorstore statistics"""
+        self.refresh()
         return {
             "total_documents": len(self.data),
             "store_path": self.store_path,
+            "meta_path": self.meta_path,
+            "vectors_file": self._vectors_file,
+            "indexed_documents": len(self._positions),
+            "dead_rows": self._size - len(self._positions),
+            "pending_documents": len(self._pending),
+            "index_type": self.index_type,
+            "ann_indexed_rows": self._ann_rows if self._ann is not None else 0,
+            "embedding_dimension": self._dimension,
             "embedding_cache_size": len(self._embedding_cache),
             "upload_id": self.upload_id
         }
 
 
+# One store per path in this process, so writers share row numbers and write-behind buffers
+_stores: Dict[str, VectorStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_vectorstore(store_path: str = "storage/vectorstore.json", upload_id: Optional[str] = None,
+                    **options) -> VectorStore:
+    """
+    The process-wide VectorStore for a path, opened on first use.
+    
+    Args:
+        store_path: Base path for vector stores
+        upload_id: Optional upload ID for per-upload vector stores
+        **options: VectorStore options (write_behind, index_type), applied
+            when the store is first opened
+    
+    Returns:
+        The shared store
+    """
+    path = VectorStore.resolve_store_path(store_path, upload_id)
+    key = os.path.abspath(os.path.splitext(path)[0])
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = VectorStore(store_path=store_path, upload_id=upload_id, **options)
+    return store
+
+
+# Stores with buffered writes, flushed by the background flusher and at shutdown
+_dirty_stores = set()
+_dirty_lock = threading.Lock()
+_flusher_thread: Optional[threading.Thread] = None
+_flusher_stop = threading.Event()
+
+
+def _mark_dirty(store: VectorStore) -> None:
+    with _dirty_lock:
+        _dirty_stores.add(store)
+
+
+def flush_all_stores() -> int:
+    """
+    Flush every store with buffered writes.
+    
+    Returns:
+        Number of documents written
+    """
+    with _dirty_lock:
+        stores = list(_dirty_stores)
+    written = 0
+    for store in stores:
+        try:
+            written += store.flush()
+        except Exception as e:
+            logger.error(f"Error flushing vectorstore {store.meta_path}: {e}")
+    return written
+
+
+def _flush_loop(interval: float) -> None:
+    while not _flusher_stop.wait(interval):
+        flush_all_stores()
+
+
+def start_write_behind_flusher(interval: float = VECTORSTORE_FLUSH_INTERVAL_SECONDS) -> None:
+    """Start the background thread that flushes buffered writes every interval seconds"""
+    global _flusher_thread
+    if _flusher_thread is not None and _flusher_thread.is_alive():
+        return
+    _flusher_stop.clear()
+    _flusher_thread = threading.Thread(target=_flush_loop, args=(interval,), name="vectorstore-flusher", daemon=True)
+    _flusher_thread.start()
+    logger.info(f"Started vectorstore write-behind flusher (every {interval}s)")
+
+
+def stop_write_behind_flusher() -> int:
+    """
+    Stop the background flusher and write everything still buffered.
+    
+    Returns:
+        Number of documents written by the final flush
+    """
+    global _flusher_thread
+    _flusher_stop.set()
+    if _flusher_thread is not None:
+        _flusher_thread.join()
+        _flusher_thread = None
+    return flush_all_stores()
+
+
+def migrate_json_stores(storage_dir: str = "storage") -> Dict[str, int]:
+    """
+    Convert every legacy ``vectorstore*.json`` file in a folder to the binary layout.
+    
+    Args:
+        storage_dir: Folder holding the vector stores
+    
+    Returns:
+        Number of documents migrated per store file
+    """
+    migrated = {}
+    if not os.path.isdir(storage_dir):
+        return migrated
+    for filename in sorted(os.listdir(storage_dir)):
+        if filename.startswith("vectorstore") and filename.endswith(".json"):
+            store = get_vectorstore(store_path=os.path.join(storage_dir, filename))
+            migrated[filename] = len(store.data)
+    return migrated
+
+
 # Maintain backward compatibility with legacy functions
 _default_store = None
 
@@ -291,25 +1062,5 @@ def get_default_store() -> VectorStore:
     """Get or create default vectorstore instance"""
     global _default_store
     if _default_store is None:
-        _default_store = VectorStore()
+        _default_store = get_vectorstore(store_path=os.path.join(VECTORSTORE_DIR, "vectorstore.json"))
     return _default_store
-
-    embedding = model.encode(text).tolist()
-    
-    if not os.path.exists("storage"):
-        os.makedirs("storage")
-    
-    data = {}
-    if os.path.exists(STORE_PATH):
-        with open(STORE_PATH, "r") as f:
-            data = json.load(f)
-    
-    data[doc_id] = {
-        "text": text,
-        "embedding": embedding
-    }
-    
-    with open(STORE_PATH, "w") as f:
-        json.dump(data, f)
-    
-    return True
\ No newline at end of file
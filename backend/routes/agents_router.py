@@ -4,11 +4,15 @@ from pathlib import Path
 # Add backend directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query
 from agents.agent_coordinator import AgentCoordinator
 from config.auth import get_current_user, TokenData
 from config.db import get_db, get_db_context
 from models.file_model import Upload, Epic, Story
+from utils.ownership import FORBIDDEN, MISSING, owner_status
+from utils.projection import INCLUDE_DESCRIPTION, include_content
+from services.job_queue import JobContext, register_job_handler
+from routes.jobs import submit_job
 from pydantic import BaseModel
 from typing import Optional
 
@@ -18,18 +22,22 @@ coordinator = AgentCoordinator()
 
 class EpicGenerationRequest(BaseModel):
     upload_id: int
+    no_cache: bool = False  # Bypass the LLM response cache
 
 
 class StoryGenerationRequest(BaseModel):
     epic_id: int
+    no_cache: bool = False  # Bypass the LLM response cache
 
 
 class QAGenerationRequest(BaseModel):
     story_id: int
+    no_cache: bool = False  # Bypass the LLM response cache
 
 
 class TestPlanGenerationRequest(BaseModel):
     epic_id: int
+    no_cache: bool = False  # Bypass the LLM response cache
 
 
 class RAGSearchRequest(BaseModel):
@@ -40,6 +48,7 @@ class RAGSearchRequest(BaseModel):
 
 class WorkflowExecutionRequest(BaseModel):
     upload_id: int
+    no_cache: bool = False  # Bypass the LLM response cache
 
 
 @router.post("/epic/generate")
@@ -56,7 +65,7 @@ def generate_epics_endpoint(request: EpicGenerationRequest, current_user: TokenD
     except Exception as e:
         raise HTTPException(status_code=400, detail={"error": str(e)})
     
-    response = coordinator.generate_epics(request.upload_id)
+    response = coordinator.generate_epics(request.upload_id, use_cache=not request.no_cache)
     if not response.success:
         raise HTTPException(status_code=400, detail=response.error)
     return {
@@ -68,7 +77,7 @@ def generate_epics_endpoint(request: EpicGenerationRequest, current_user: TokenD
 @router.post("/story/generate")
 def generate_stories_endpoint(request: StoryGenerationRequest, current_user: TokenData = Depends(get_current_user)):
     """Generate stories from an epic using StoryAgent"""
-    response = coordinator.generate_stories(request.epic_id)
+    response = coordinator.generate_stories(request.epic_id, use_cache=not request.no_cache)
     if not response.success:
         raise HTTPException(status_code=400, detail=response.error)
     return {
@@ -80,7 +89,7 @@ def generate_stories_endpoint(request: StoryGenerationRequest, current_user: Tok
 @router.post("/qa/generate")
 def generate_qa_endpoint(request: QAGenerationRequest, current_user: TokenData = Depends(get_current_user)):
     """Generate QA test cases from a story using QAAgent"""
-    response = coordinator.generate_qa(request.story_id)
+    response = coordinator.generate_qa(request.story_id, use_cache=not request.no_cache)
     if not response.success:
         raise HTTPException(status_code=400, detail=response.error)
     return {
@@ -92,7 +101,7 @@ def generate_qa_endpoint(request: QAGenerationRequest, current_user: TokenData =
 @router.post("/testplan/generate")
 def generate_testplan_endpoint(request: TestPlanGenerationRequest, current_user: TokenData = Depends(get_current_user)):
     """Generate test plan from an epic using TestPlanAgent"""
-    response = coordinator.generate_testplan(request.epic_id)
+    response = coordinator.generate_testplan(request.epic_id, use_cache=not request.no_cache)
     if not response.success:
         raise HTTPException(status_code=400, detail=response.error)
     return {
@@ -117,27 +126,38 @@ def rag_search_endpoint(request: RAGSearchRequest):
     }
 
 
-@router.post("/workflow/execute")
-def execute_workflow_endpoint(request: WorkflowExecutionRequest):
-    """Execute full agentic workflow: epics -> stories -> qa"""
-    try:
-        result = coordinator.execute_workflow(request.upload_id)
-        return {
-            "message": "Workflow executed successfully" if result["success"] else "Workflow completed with errors",
-            "data": result
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+def run_workflow(ctx: JobContext, upload_id: int, use_cache: bool = True) -> dict:
+    """Run the full agentic workflow on a job worker, timing each phase"""
+    ctx.progress("Running workflow")
+    result = coordinator.execute_workflow(upload_id, step=ctx.step, use_cache=use_cache)
+    return {
+        "message": "Workflow executed successfully" if result["success"] else "Workflow completed with errors",
+        "data": result
+    }
+
+
+register_job_handler("workflow", run_workflow)
+
+
+@router.post("/workflow/execute", status_code=202)
+def execute_workflow_endpoint(request: WorkflowExecutionRequest, current_user: TokenData = Depends(get_current_user)):
+    """Queue the full agentic workflow (epics -> stories -> qa); poll /jobs/{job_id} for the result"""
+    return submit_job("workflow", {"upload_id": request.upload_id, "use_cache": not request.no_cache}, current_user)
 
 
 # GET endpoints for retrieving generated artifacts
 @router.get("/epic/list")
-def get_epics_endpoint(upload_id: int, current_user: TokenData = Depends(get_current_user)):
-    """Get all epics for a given upload"""
+def get_epics_endpoint(
+    upload_id: int,
+    include: Optional[str] = Query(None, description=INCLUDE_DESCRIPTION),
+    current_user: TokenData = Depends(get_current_user),
+):
+    """Get all epics for a given upload; `include=content` adds their content"""
+    content = include_content(include)
     # Verify ownership of upload
     try:
         with get_db_context() as db:
-            upload = db.query(Upload).filter(Upload.id == upload_id, Upload.user_id == current_user.user_id).first()
+            upload = db.query(Upload.id).filter(Upload.id == upload_id, Upload.user_id == current_user.user_id).first()
             if not upload:
                 raise HTTPException(status_code=403, detail={"error": "Unauthorized: You do not have access to this upload"})
     except HTTPException:
@@ -145,7 +165,7 @@ def get_epics_endpoint(upload_id: int, current_user: TokenData = Depends(get_cur
     except Exception as e:
         raise HTTPException(status_code=400, detail={"error": str(e)})
     
-    response = coordinator.get_epics(upload_id, current_user.user_id)
+    response = coordinator.get_epics(upload_id, current_user.user_id, content)
     if not response.success:
         raise HTTPException(status_code=400, detail=response.error)
     return {
@@ -154,24 +174,33 @@ def get_epics_endpoint(upload_id: int, current_user: TokenData = Depends(get_cur
     }
 
 
+def _verify_owner(db, model, row_id: int, user_id: int, label: str) -> None:
+    """Raise 404/403 unless the user owns the row; one lookup on its denormalized user_id"""
+    access = owner_status(db, model, row_id, user_id)
+    if access == MISSING:
+        raise HTTPException(status_code=404, detail={"error": f"{label.capitalize()} not found"})
+    if access == FORBIDDEN:
+        raise HTTPException(status_code=403, detail={"error": f"Unauthorized: You do not have access to this {label}"})
+
+
 @router.get("/story/list")
-def get_stories_endpoint(epic_id: int, current_user: TokenData = Depends(get_current_user)):
-    """Get all stories for a given epic"""
-    # Verify ownership of epic (through upload)
+def get_stories_endpoint(
+    epic_id: int,
+    include: Optional[str] = Query(None, description=INCLUDE_DESCRIPTION),
+    current_user: TokenData = Depends(get_current_user),
+):
+    """Get all stories for a given epic; `include=content` adds their content"""
+    content = include_content(include)
+    # Verify ownership of epic
     try:
         with get_db_context() as db:
-            epic = db.query(Epic).filter(Epic.id == epic_id).first()
-            if not epic:
-                raise HTTPException(status_code=404, detail={"error": "Epic not found"})
-            upload = db.query(Upload).filter(Upload.id == epic.upload_id, Upload.user_id == current_user.user_id).first()
-            if not upload:
-                raise HTTPException(status_code=403, detail={"error": "Unauthorized: You do not have access to this epic"})
+            _verify_owner(db, Epic, epic_id, current_user.user_id, "epic")
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=400, detail={"error": str(e)})
     
-    response = coordinator.get_stories(epic_id, current_user.user_id)
+    response = coordinator.get_stories(epic_id, current_user.user_id, content)
     if not response.success:
         raise HTTPException(status_code=400, detail=response.error)
     return {
@@ -181,26 +210,23 @@ def get_stories_endpoint(epic_id: int, current_user: TokenData = Depends(get_cur
 
 
 @router.get("/qa/list")
-def get_qa_endpoint(story_id: int, current_user: TokenData = Depends(get_current_user)):
-    """Get all QA test cases for a given story"""
-    # Verify ownership of story (through epic -> upload)
+def get_qa_endpoint(
+    story_id: int,
+    include: Optional[str] = Query(None, description=INCLUDE_DESCRIPTION),
+    current_user: TokenData = Depends(get_current_user),
+):
+    """Get all QA test cases for a given story; `include=content` adds their content"""
+    content = include_content(include)
+    # Verify ownership of story
     try:
         with get_db_context() as db:
-            story = db.query(Story).filter(Story.id == story_id).first()
-            if not story:
-                raise HTTPException(status_code=404, detail={"error": "Story not found"})
-            epic = db.query(Epic).filter(Epic.id == story.epic_id).first()
-            if not epic:
-                raise HTTPException(status_code=404, detail={"error": "Epic not found"})
-            upload = db.query(Upload).filter(Upload.id == epic.upload_id, Upload.user_id == current_user.user_id).first()
-            if not upload:
-                raise HTTPException(status_code=403, detail={"error": "Unauthorized: You do not have access to this story"})
+            _verify_owner(db, Story, story_id, current_user.user_id, "story")
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=400, detail={"error": str(e)})
     
-    response = coordinator.get_qa(story_id, current_user.user_id)
+    response = coordinator.get_qa(story_id, current_user.user_id, content)
     if not response.success:
         raise HTTPException(status_code=400, detail=response.error)
     return {
@@ -210,23 +236,23 @@ def get_qa_endpoint(story_id: int, current_user: TokenData = Depends(get_current
 
 
 @router.get("/testplan/list")
-def get_testplan_endpoint(epic_id: int, current_user: TokenData = Depends(get_current_user)):
-    """Get all test plans for a given epic"""
-    # Verify ownership of epic (through upload)
+def get_testplan_endpoint(
+    epic_id: int,
+    include: Optional[str] = Query(None, description=INCLUDE_DESCRIPTION),
+    current_user: TokenData = Depends(get_current_user),
+):
+    """Get all test plans for a given epic; `include=content` adds their content"""
+    content = include_content(include)
+    # Verify ownership of epic
     try:
         with get_db_context() as db:
-            epic = db.query(Epic).filter(Epic.id == epic_id).first()
-            if not epic:
-                raise HTTPException(status_code=404, detail={"error": "Epic not found"})
-            upload = db.query(Upload).filter(Upload.id == epic.upload_id, Upload.user_id == current_user.user_id).first()
-            if not upload:
-                raise HTTPException(status_code=403, detail={"error": "Unauthorized: You do not have access to this epic"})
+            _verify_owner(db, Epic, epic_id, current_user.user_id, "epic")
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=400, detail={"error": str(e)})
     
-    response = coordinator.get_testplan(epic_id, current_user.user_id)
+    response = coordinator.get_testplan(epic_id, current_user.user_id, content)
     if not response.success:
         raise HTTPException(status_code=400, detail=response.error)
     return {
@@ -0,0 +1,44 @@
+import sys
+from pathlib import Path
+
+# Add backend directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from typing import Optional
+from fastapi import APIRouter, Depends, Query
+from config.db import get_db_context
+from config.auth import get_current_user, TokenData
+from models.file_model import ConfluenceOutbox
+from services.confluence_outbox import outbox_entry_response, replay_failed
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+@router.get("/confluence/outbox")
+def list_outbox(status: Optional[str] = Query(None, description="pending, in_progress, done or failed"),
+                limit: int = Query(20, ge=1, le=100),
+                current_user: TokenData = Depends(get_current_user)):
+    """List the current user's most recent Confluence publications"""
+    with get_db_context() as db:
+        query = db.query(ConfluenceOutbox).filter(ConfluenceOutbox.user_id == current_user.user_id)
+        if status:
+            query = query.filter(ConfluenceOutbox.status == status)
+        entries = query.order_by(ConfluenceOutbox.id.desc()).limit(limit).all()
+        return {"entries": [outbox_entry_response(entry) for entry in entries]}
+
+
+@router.post("/confluence/outbox/replay")
+def replay_outbox(entry_id: Optional[int] = Query(None, description="Replay one entry; all failed entries if omitted"),
+                  current_user: TokenData = Depends(get_current_user)):
+    """
+    Queue the current user's failed Confluence publications again.
+
+    Pages that were already created are kept; only the missing ones are published.
+    """
+    with get_db_context() as db:
+        requeued = replay_failed(db, user_id=current_user.user_id, entry_id=entry_id)
+    logger.info(f"replay_outbox: user={current_user.email}, requeued={requeued}")
+    return {"requeued": requeued}
@@ -1,5 +1,6 @@
 from fastapi import APIRouter, HTTPException, Query
 from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import undefer
 from models.file_model import AggregatedUpload
 from config.db import get_db, get_db_context
 import json
@@ -14,7 +15,12 @@ def download_aggregated(
     format: str = Query("json", enum=["json", "pdf"])
 ):
     with get_db_context() as db:
-        agg = db.query(AggregatedUpload).filter(AggregatedUpload.upload_id == upload_id).first()
+        agg = (
+            db.query(AggregatedUpload)
+            .options(undefer(AggregatedUpload.content))
+            .filter(AggregatedUpload.upload_id == upload_id)
+            .first()
+        )
         if not agg:
             raise HTTPException(status_code=404, detail="Aggregated data not found")
 
@@ -4,31 +4,23 @@ from pathlib import Path
 # Add backend directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from fastapi import APIRouter, HTTPException, Depends, status
+import time
+from fastapi import APIRouter, Depends, Query, status
+from fastapi.responses import StreamingResponse
 from models.file_model import Upload
 from config.db import get_db_context
 from config.auth import get_current_user, TokenData
-from atlassian import Confluence
-from config.config import CONFLUENCE_URL, CONFLUENCE_USERNAME, CONFLUENCE_PASSWORD, CONFLUENCE_SPACE_KEY, CONFLUENCE_ROOT_FOLDER_ID
+from services.confluence_outbox import enqueue_publication, notify_outbox_worker
 from services.content_generator import ContentGenerationService
-from utils.confluence_helper import add_timestamp, create_confluence_html_content, build_confluence_page
-from utils.error_handler import handle_errors, ProcessingError
+from services.job_queue import JobContext, register_job_handler
+from routes.jobs import sse_event, submit_job
+from utils.ownership import check_owner
 import logging
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-# Initialize Confluence client once
-confluence = Confluence(
-    url=CONFLUENCE_URL,
-    username=CONFLUENCE_USERNAME,
-    password=CONFLUENCE_PASSWORD
-)
-
-SPACE_KEY = CONFLUENCE_SPACE_KEY
-ROOT_FOLDER_ID = CONFLUENCE_ROOT_FOLDER_ID
-
 
 
 EPIC_GENERATION_PROMPT = """
@@ -73,116 +65,157 @@ Epic:
 """
 
 
-@router.post("/generate-epics/{upload_id}")
-def generate_epics(upload_id: int, current_user: TokenData = Depends(get_current_user)):
+def run_epic_generation(ctx: JobContext, upload_id: int, use_cache: bool = True) -> dict:
     """
-    Generate epics from an uploaded requirement document.
+    Generate epics and test plans for an upload and queue their Confluence pages.
+    
+    Runs on a job worker; see POST /generate-epics/{upload_id}. The generated
+    rows are committed together with a Confluence outbox entry, and the
+    outbox worker publishes the pages afterwards, so no database connection
+    is held while Confluence is called.
     
     Args:
+        ctx: Job context for timing and progress
         upload_id: ID of the upload document
-        current_user: Authenticated user
+        use_cache: False bypasses the LLM response cache
         
     Returns:
-        Generated epics with Confluence pages
+        Generated epics and test plans, and the outbox entry publishing them
     """
-    logger.info(f"generate_epics: user={current_user.email}, upload_id={upload_id}")
-    
     with get_db_context() as db:
-        service = ContentGenerationService(db)
+        service = ContentGenerationService(db, use_cache=use_cache)
         
-        try:
-            # Generate epics
+        # Generate epics
+        ctx.progress("Generating epics")
+        with ctx.step("llm"):
             epics_data = service.generate_epics(upload_id, EPIC_GENERATION_PROMPT)
-            
-            # Create upload folder page in Confluence
-            upload_obj = db.query(Upload).filter(Upload.id == upload_id).first()
-            upload_title_ts = add_timestamp(upload_obj.filename)
-            
-            upload_page = build_confluence_page(
-                confluence,
-                SPACE_KEY,
-                upload_title_ts,
-                f"<h2>Requirements Upload: {upload_obj.filename}</h2>",
-                ROOT_FOLDER_ID
-            )
-            upload_obj.confluence_page_id = upload_page['id']
-            db.commit()
-            
-            # Save epics and create Confluence pages
+        with ctx.step("database"):
             saved_epics = service.save_epics(upload_id, epics_data)
-            
-            result = []
-            for epic_id, epic_data in saved_epics:
-                epic_obj = db.query(db.query(db.model_map['Epic']).get_or_404)
-                
-                # Create epic Confluence page
-                section_configs = {"acceptanceCriteria": {"is_list": True, "heading_level": 3}}
-                epic_content = create_confluence_html_content(
-                    epic_data.get("name", "Epic"),
-                    epic_data,
-                    section_configs
-                )
-                epic_page = build_confluence_page(
-                    confluence,
-                    SPACE_KEY,
-                    add_timestamp(epic_data.get("name", "Epic")),
-                    epic_content,
-                    upload_page['id']
-                )
-                
-                # Update epic with confluence page ID
-                from models.file_model import Epic
-                epic_obj = db.query(Epic).filter(Epic.id == epic_id).first()
-                epic_obj.confluence_page_id = epic_page['id']
-                db.commit()
-                
-                # Generate and save test plans
+        
+        # Generate and save test plans
+        result = []
+        for index, (epic_id, epic_data) in enumerate(saved_epics, start=1):
+            ctx.progress(f"Generating test plans for epic {index} of {len(saved_epics)}")
+            with ctx.step("llm"):
                 testplan_data = service.generate_test_plan(epic_id, TESTPLAN_GENERATION_PROMPT)
+            with ctx.step("database"):
                 saved_testplans = service.save_qa(epic_id, testplan_data, qa_type="test_plan")
-                
-                testplan_results = []
-                for testplan_id, testplan_item in saved_testplans:
-                    testplan_content = create_confluence_html_content(
-                        f"Test Plan: {testplan_item.get('title', 'Test Plan')}",
-                        testplan_item,
-                        {"testScenarios": {"is_list": True, "heading_level": 3}}
-                    )
-                    testplan_page = build_confluence_page(
-                        confluence,
-                        SPACE_KEY,
-                        add_timestamp(testplan_item.get("title", "Test Plan")),
-                        testplan_content,
-                        epic_page['id']
-                    )
-                    
-                    from models.file_model import QA
-                    testplan_obj = db.query(QA).filter(QA.id == testplan_id).first()
-                    testplan_obj.confluence_page_id = testplan_page['id']
-                    db.commit()
-                    
-                    testplan_results.append({
-                        "id": testplan_id,
-                        "title": testplan_item.get("title", "Test Plan"),
-                        "confluence_page_id": testplan_page['id']
-                    })
-                
-                result.append({
-                    "id": epic_id,
-                    "name": epic_data.get("name", "Epic"),
-                    "confluence_page_id": epic_page['id'],
-                    "test_plans": testplan_results
-                })
-            
-            return {
-                "message": "Epics and test plans generated with Confluence pages",
-                "upload_id": upload_id,
-                "upload_folder_page_id": upload_page['id'],
-                "epics": result
-            }
-            
+            result.append({
+                "id": epic_id,
+                "name": epic_data.get("name", "Epic"),
+                "test_plans": [
+                    {"id": testplan_id, "title": testplan_item.get("title", "Test Plan")}
+                    for testplan_id, testplan_item in saved_testplans
+                ]
+            })
+        
+        # Queue the Confluence pages; the outbox worker publishes them
+        with ctx.step("database"):
+            outbox_id = _queue_publication(db, upload_id)
+    notify_outbox_worker()
+    
+    return {
+        "message": "Epics and test plans generated; Confluence pages are being published",
+        "upload_id": upload_id,
+        "confluence_outbox_id": outbox_id,
+        "epics": result
+    }
+
+
+register_job_handler("generate_epics", run_epic_generation)
+
+
+@router.post("/generate-epics/{upload_id}", status_code=status.HTTP_202_ACCEPTED)
+def generate_epics(upload_id: int, no_cache: bool = Query(False, description="Bypass the LLM response cache"),
+                   current_user: TokenData = Depends(get_current_user)):
+    """
+    Queue epic generation for an uploaded requirement document.
+    
+    Generation runs on a job worker; poll /jobs/{job_id} or stream
+    /jobs/{job_id}/events for the result. The Confluence pages are published
+    afterwards by the outbox worker; see GET /confluence/outbox.
+    
+    Args:
+        upload_id: ID of the upload document
+        no_cache: Bypass the LLM response cache
+        current_user: Authenticated user
+        
+    Returns:
+        The queued job
+    """
+    return submit_job("generate_epics", {"upload_id": upload_id, "use_cache": not no_cache}, current_user)
+
+
+@router.post("/generate-epics/{upload_id}/stream")
+async def stream_epics(upload_id: int, no_cache: bool = Query(False, description="Bypass the LLM response cache"),
+                       current_user: TokenData = Depends(get_current_user)):
+    """
+    Generate epics as server-sent events, one per epic as soon as Gemini completes it.
+    
+    Each epic is saved in its own short transaction while the rest of the
+    response is still being generated, so no database connection is held
+    while Gemini streams; once the stream ends the Confluence pages are
+    queued for the outbox worker. Events:
+    - epic: {"id", "epic"} once the epic is saved
+    - done: {"count", "confluence_outbox_id", "first_item_seconds", "total_seconds"}
+    - error: {"error"} if generation failed
+    
+    Test plans are not generated here; use POST /generate-testplan/{epic_id}.
+    
+    Args:
+        upload_id: ID of the upload document
+        no_cache: Bypass the LLM response cache
+        current_user: Authenticated user
+        
+    Returns:
+        text/event-stream response
+    """
+    logger.info(f"stream_epics: user={current_user.email}, upload_id={upload_id}")
+    
+    with get_db_context() as db:
+        check_owner(db, Upload, upload_id, current_user.user_id, "upload")
+    
+    async def events():
+        started = time.perf_counter()
+        first_item_seconds = None
+        count = 0
+        
+        # No session of its own: the read and each save use short sessions
+        service = ContentGenerationService(use_cache=not no_cache)
+        try:
+            async for epic_id, epic_data in service.astream_epics(upload_id, EPIC_GENERATION_PROMPT):
+                count += 1
+                if first_item_seconds is None:
+                    first_item_seconds = round(time.perf_counter() - started, 4)
+                yield sse_event("epic", {"id": epic_id, "epic": epic_data})
+            outbox_id = None
+            if count:
+                with get_db_context() as db:
+                    outbox_id = _queue_publication(db, upload_id)
         except Exception as e:
-            logger.error(f"Failed to generate epics: {str(e)}", exc_info=True)
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Epic generation failed: {str(e)}"
-            )
+            logger.error(f"Epic stream failed for upload {upload_id}: {str(e)}", exc_info=True)
+            yield sse_event("error", {"error": getattr(e, "message", None) or str(e)})
+            return
+        notify_outbox_worker()
+        
+        yield sse_event("done", {
+            "upload_id": upload_id,
+            "count": count,
+            "confluence_outbox_id": outbox_id,
+            "first_item_seconds": first_item_seconds,
+            "total_seconds": round(time.perf_counter() - started, 4)
+        })
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def _queue_publication(db, upload_id: int) -> int:
+    """Commit an outbox entry for the upload's Confluence pages and return its ID"""
+    user_id = db.query(Upload.user_id).filter(Upload.id == upload_id).scalar()
+    entry = enqueue_publication(db, upload_id, user_id=user_id)
+    db.commit()
+    return entry.id
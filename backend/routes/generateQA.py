@@ -4,10 +4,12 @@ from pathlib import Path
 # Add backend directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, Depends, Query, status
 from config.db import get_db_context
 from config.auth import get_current_user, TokenData
 from services.content_generator import ContentGenerationService
+from services.job_queue import JobContext, register_job_handler
+from routes.jobs import submit_job
 import logging
 
 logger = logging.getLogger(__name__)
@@ -32,47 +34,64 @@ User Story:
 """
 
 
-@router.post("/generate-qa/{story_id}")
-def generate_qa(story_id: int, current_user: TokenData = Depends(get_current_user)):
+def run_qa_generation(ctx: JobContext, story_id: int, use_cache: bool = True) -> dict:
     """
-    Generate QA test cases from a user story.
+    Generate and save QA test cases for a user story.
+    
+    Runs on a job worker; see POST /generate-qa/{story_id}.
     
     Args:
+        ctx: Job context for timing and progress
         story_id: ID of the story
-        current_user: Authenticated user
+        use_cache: False bypasses the LLM response cache
         
     Returns:
         Generated QA test cases
     """
-    logger.info(f"generate_qa: user={current_user.email}, story_id={story_id}")
-    
     with get_db_context() as db:
-        service = ContentGenerationService(db)
+        service = ContentGenerationService(db, use_cache=use_cache)
         
-        try:
-            # Generate QA tests
+        # Generate QA tests
+        ctx.progress("Generating QA tests")
+        with ctx.step("llm"):
             qa_data = service.generate_qa(story_id, QA_GENERATION_PROMPT)
-            
-            # Save QA tests
+        
+        # Save QA tests
+        with ctx.step("database"):
             saved_qa = service.save_qa(story_id, qa_data, qa_type="qa")
-            
-            saved_tests = [
-                {
-                    "id": qa_id,
-                    "content": qa_item
-                }
-                for qa_id, qa_item in saved_qa
-            ]
-            
-            return {
-                "message": "QA tests generated successfully",
-                "story_id": story_id,
-                "qa": saved_tests
+        
+        saved_tests = [
+            {
+                "id": qa_id,
+                "content": qa_item
             }
-            
-        except Exception as e:
-            logger.error(f"Failed to generate QA: {str(e)}", exc_info=True)
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"QA generation failed: {str(e)}"
-            )
+            for qa_id, qa_item in saved_qa
+        ]
+        
+        return {
+            "message": "QA tests generated successfully",
+            "story_id": story_id,
+            "qa": saved_tests
+        }
+
+
+register_job_handler("generate_qa", run_qa_generation)
+
+
+@router.post("/generate-qa/{story_id}", status_code=status.HTTP_202_ACCEPTED)
+def generate_qa(story_id: int, no_cache: bool = Query(False, description="Bypass the LLM response cache"),
+                current_user: TokenData = Depends(get_current_user)):
+    """
+    Queue QA test case generation for a user story.
+    
+    Poll /jobs/{job_id} or stream /jobs/{job_id}/events for the result.
+    
+    Args:
+        story_id: ID of the story
+        no_cache: Bypass the LLM response cache
+        current_user: Authenticated user
+        
+    Returns:
+        The queued job
+    """
+    return submit_job("generate_qa", {"story_id": story_id, "use_cache": not no_cache}, current_user)
@@ -4,10 +4,16 @@ from pathlib import Path
 # Add backend directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from fastapi import APIRouter, HTTPException, Depends, status
+import asyncio
+import time
+from fastapi import APIRouter, HTTPException, Depends, Query, status
+from fastapi.responses import StreamingResponse
 from config.db import get_db_context
+from models.file_model import Epic
 from config.auth import get_current_user, TokenData
 from services.content_generator import ContentGenerationService
+from routes.jobs import sse_event
+from utils.ownership import check_owner
 import logging
 
 logger = logging.getLogger(__name__)
@@ -30,12 +36,18 @@ Epic content:
 
 
 @router.post("/generate-stories/{epic_id}")
-def generate_stories(epic_id: int, current_user: TokenData = Depends(get_current_user)):
+async def generate_stories(epic_id: int, no_cache: bool = Query(False, description="Bypass the LLM response cache"),
+                           current_user: TokenData = Depends(get_current_user)):
     """
     Generate user stories from an epic.
     
+    The Gemini call is awaited on the event loop instead of holding a
+    threadpool thread; saving (embeddings and vectorstore writes) runs in a
+    worker thread.
+    
     Args:
         epic_id: ID of the epic
+        no_cache: Bypass the LLM response cache
         current_user: Authenticated user
         
     Returns:
@@ -44,14 +56,14 @@ def generate_stories(epic_id: int, current_user: TokenData = Depends(get_current
     logger.info(f"generate_stories: user={current_user.email}, epic_id={epic_id}")
     
     with get_db_context() as db:
-        service = ContentGenerationService(db)
+        service = ContentGenerationService(db, use_cache=not no_cache)
         
         try:
             # Generate stories
-            stories_data = service.generate_stories(epic_id, STORY_GENERATION_PROMPT)
+            stories_data = await service.agenerate_stories(epic_id, STORY_GENERATION_PROMPT)
             
             # Save stories
-            saved_stories = service.save_stories(epic_id, stories_data)
+            saved_stories = await asyncio.to_thread(service.save_stories, epic_id, stories_data)
             
             response_array = [
                 {
@@ -73,3 +85,62 @@ def generate_stories(epic_id: int, current_user: TokenData = Depends(get_current
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Story generation failed: {str(e)}"
             )
+
+
+@router.post("/generate-stories/{epic_id}/stream")
+async def stream_stories(epic_id: int, no_cache: bool = Query(False, description="Bypass the LLM response cache"),
+                         current_user: TokenData = Depends(get_current_user)):
+    """
+    Generate user stories as server-sent events, one per story as soon as Gemini completes it.
+    
+    Each story is saved in its own short transaction, so no database
+    connection is held while Gemini streams.
+    
+    Events:
+    - story: {"id", "story"} once the story is saved
+    - done: {"count", "first_item_seconds", "total_seconds"}
+    - error: {"error"} if generation failed
+    
+    Args:
+        epic_id: ID of the epic
+        no_cache: Bypass the LLM response cache
+        current_user: Authenticated user
+        
+    Returns:
+        text/event-stream response
+    """
+    logger.info(f"stream_stories: user={current_user.email}, epic_id={epic_id}")
+    
+    with get_db_context() as db:
+        check_owner(db, Epic, epic_id, current_user.user_id, "epic")
+    
+    async def events():
+        started = time.perf_counter()
+        first_item_seconds = None
+        count = 0
+        
+        # No session of its own: the read and each save use short sessions
+        service = ContentGenerationService(use_cache=not no_cache)
+        try:
+            async for story_id, story_data in service.astream_stories(epic_id, STORY_GENERATION_PROMPT):
+                count += 1
+                if first_item_seconds is None:
+                    first_item_seconds = round(time.perf_counter() - started, 4)
+                yield sse_event("story", {"id": story_id, "story": story_data})
+        except Exception as e:
+            logger.error(f"Story stream failed for epic {epic_id}: {str(e)}", exc_info=True)
+            yield sse_event("error", {"error": getattr(e, "message", None) or str(e)})
+            return
+        
+        yield sse_event("done", {
+            "epic_id": epic_id,
+            "count": count,
+            "first_item_seconds": first_item_seconds,
+            "total_seconds": round(time.perf_counter() - started, 4)
+        })
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,4 +1,5 @@
 from fastapi import APIRouter, HTTPException, Query, Depends
+from sqlalchemy.orm import undefer
 import sys
 from pathlib import Path
 
@@ -9,7 +10,9 @@ from models.file_model import Upload, Epic
 from config.db import get_db, get_db_context
 from config.config import CONFLUENCE_URL
 from config.auth import get_current_user, TokenData
-from typing import Optional
+from typing import Literal, Optional
+from utils.pagination import count_rows, page_info, paginate, sort_columns
+from utils.projection import INCLUDE_DESCRIPTION, include_content, list_columns
 
 router = APIRouter()
 
@@ -30,34 +33,52 @@ def get_confluence_page_url(page_id: str) -> Optional[str]:
 
     return f"{base}/pages/viewpage.action?pageId={pid}"
 
+# Columns of an epic returned by the listings
+EPIC_LIST_COLUMNS = ("name", "confluence_page_id", "jira_key", "jira_issue_id", "jira_url",
+                     "jira_creation_success", "created_at")
+
+
+def _epic_entry(epic: Epic, with_content: bool) -> dict:
+    epic_data = {
+        "id": epic.id,
+        "name": epic.name,
+        "confluence_page_id": epic.confluence_page_id,
+        "confluence_page_url": get_confluence_page_url(epic.confluence_page_id),
+        "jira_key": epic.jira_key,
+        "jira_issue_id": epic.jira_issue_id,
+        "jira_url": epic.jira_url,
+        "jira_creation_success": epic.jira_creation_success,
+        "created_at": epic.created_at
+    }
+    if with_content:
+        epic_data["content"] = epic.content
+    return epic_data
+
+
 @router.get("/epics/{upload_id}")
-def get_epics(upload_id: int, current_user: TokenData = Depends(get_current_user)):
-    """Get all epics for a given upload"""
+def get_epics(
+    upload_id: int,
+    include: Optional[str] = Query(None, description=INCLUDE_DESCRIPTION),
+    current_user: TokenData = Depends(get_current_user),
+):
+    """Get all epics for a given upload; `include=content` adds each epic's content"""
+    with_content = include_content(include)
     with get_db_context() as db:
-        upload_obj = db.query(Upload).filter(Upload.id == upload_id, Upload.user_id == current_user.user_id).first()
+        upload_obj = db.query(Upload.id).filter(Upload.id == upload_id, Upload.user_id == current_user.user_id).first()
         if not upload_obj:
             raise HTTPException(status_code=404, detail="Upload not found or you don't have access")
 
-        epics = db.query(Epic).filter(Epic.upload_id == upload_id).all()
+        epics = (
+            db.query(Epic)
+            .options(list_columns(Epic, *EPIC_LIST_COLUMNS, content=with_content))
+            .filter(Epic.upload_id == upload_id)
+            .all()
+        )
         
         if not epics:
             raise HTTPException(status_code=404, detail="No epics found for this upload")
 
-        epic_list = []
-        for epic in epics:
-            epic_data = {
-                "id": epic.id,
-                "name": epic.name,
-                "content": epic.content,
-                "confluence_page_id": epic.confluence_page_id,
-                "confluence_page_url": get_confluence_page_url(epic.confluence_page_id),
-                "jira_key": epic.jira_key,
-                "jira_issue_id": epic.jira_issue_id,
-                "jira_url": epic.jira_url,
-                "jira_creation_success": epic.jira_creation_success,
-                "created_at": epic.created_at
-            }
-            epic_list.append(epic_data)
+        epic_list = [_epic_entry(epic, with_content) for epic in epics]
 
         return {
             "message": "Epics retrieved successfully",
@@ -73,65 +94,37 @@ def get_all_epics(
     page_size: int = Query(10, ge=1, le=100),
     sort_by: str = Query("created_at"),
     sort_order: str = Query("desc"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page; replaces page"),
+    total: Literal["exact", "approximate", "none"] = Query("exact", description="How to count the total"),
+    include: Optional[str] = Query(None, description=INCLUDE_DESCRIPTION),
     current_user: TokenData = Depends(get_current_user),
 ):
-    """Get all epics from user's uploads (paginated). Supports sorting by `id` or `created_at`."""
+    """
+    Get all epics from user's uploads (paginated). Supports sorting by `id` or `created_at`.
+    
+    Pass the returned `next_cursor` as `cursor` to fetch the next page by
+    keyset instead of offset. `total=approximate` uses the query planner's
+    estimate and `total=none` skips counting. Epics are listed without their
+    content unless `include=content` is passed.
+    """
+    with_content = include_content(include)
     with get_db_context() as db:
-        # Get user's upload IDs
-        user_uploads = db.query(Upload.id).filter(Upload.user_id == current_user.user_id).all()
-        upload_ids = [u[0] for u in user_uploads]
-        
-        if not upload_ids:
-            return {
-                "message": "No uploads found for this user",
-                "total_epics": 0,
-                "current_page": page,
-                "page_size": page_size,
-                "total_pages": 0,
-                "epics": []
-            }
+        query = (
+            db.query(Epic)
+            .options(list_columns(Epic, *EPIC_LIST_COLUMNS, content=with_content))
+            .filter(Epic.user_id == current_user.user_id)
+        )
+        total_count, is_estimate = count_rows(query, total)
         
-        total_count = db.query(Epic).filter(Epic.upload_id.in_(upload_ids)).count()
-        offset = (page - 1) * page_size
-        # choose column to sort by
-        sort_by = (sort_by or "created_at").lower()
-        sort_order = (sort_order or "desc").lower()
-        if sort_by == "id":
-            col = Epic.id
-        else:
-            col = Epic.created_at
-
-        if sort_order == "asc":
-            order_clause = col.asc()
-        else:
-            order_clause = col.desc()
-
-        epics = db.query(Epic).filter(Epic.upload_id.in_(upload_ids)).order_by(order_clause).offset(offset).limit(page_size).all()
-
-        epic_list = []
-        for epic in epics:
-            epic_data = {
-                "id": epic.id,
-                "name": epic.name,
-                "content": epic.content,
-                "confluence_page_id": epic.confluence_page_id,
-                "confluence_page_url": get_confluence_page_url(epic.confluence_page_id),
-                "jira_key": epic.jira_key,
-                "jira_issue_id": epic.jira_issue_id,
-                "jira_url": epic.jira_url,
-                "jira_creation_success": epic.jira_creation_success,
-                "created_at": epic.created_at
-            }
-            epic_list.append(epic_data)
+        columns = sort_columns(Epic, sort_by)
+        epics, next_cursor = paginate(query, columns, page_size, (sort_order or "desc").lower() != "asc", cursor, page)
 
-        total_pages = (total_count + page_size - 1) // page_size
+        epic_list = [_epic_entry(epic, with_content) for epic in epics]
 
         return {
             "message": "All epics retrieved successfully",
             "total_epics": total_count,
-            "current_page": page,
-            "page_size": page_size,
-            "total_pages": total_pages,
+            **page_info(total_count, page, page_size, next_cursor, is_estimate),
             "epics": epic_list
         }
 
@@ -139,11 +132,11 @@ def get_all_epics(
 def get_epic_details(upload_id: int, epic_id: int, current_user: TokenData = Depends(get_current_user)):
     """Get details of a specific epic"""
     with get_db_context() as db:
-        upload_obj = db.query(Upload).filter(Upload.id == upload_id, Upload.user_id == current_user.user_id).first()
+        upload_obj = db.query(Upload.id).filter(Upload.id == upload_id, Upload.user_id == current_user.user_id).first()
         if not upload_obj:
             raise HTTPException(status_code=404, detail="Upload not found or you don't have access")
 
-        epic = db.query(Epic).filter(
+        epic = db.query(Epic).options(undefer(Epic.content)).filter(
             Epic.id == epic_id,
             Epic.upload_id == upload_id
         ).first()
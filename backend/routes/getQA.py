@@ -1,36 +1,41 @@
 from fastapi import APIRouter, HTTPException, Query, Depends
+from sqlalchemy.orm import undefer
 import sys
 from pathlib import Path
 
 # Add backend directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from models.file_model import Upload, Epic, Story, QA
+from models.file_model import Story, QA
 from config.db import get_db, get_db_context
 from config.auth import get_current_user, TokenData
+from utils.ownership import check_owner
+from utils.pagination import count_rows, page_info, paginate, sort_columns
+from utils.projection import INCLUDE_DESCRIPTION, include_content, list_columns
+from typing import Literal, Optional
 
 router = APIRouter()
 
+# Columns of a QA test case returned by the listings
+QA_LIST_COLUMNS = ("story_id", "test_type", "created_at")
+
 @router.get("/qa/{story_id}")
-def get_qa(story_id: int, current_user: TokenData = Depends(get_current_user)):
-    """Get all QA test cases for a given story"""
+def get_qa(
+    story_id: int,
+    include: Optional[str] = Query(None, description=INCLUDE_DESCRIPTION),
+    current_user: TokenData = Depends(get_current_user),
+):
+    """Get all QA test cases for a given story; `include=content` adds each test case's content"""
+    with_content = include_content(include)
     with get_db_context() as db:
-        story_obj = db.query(Story).filter(Story.id == story_id).first()
-        if not story_obj:
-            raise HTTPException(status_code=404, detail="Story not found")
-        epic_obj = db.query(Epic).filter(Epic.id == story_obj.epic_id).first()
-        if not epic_obj:
-            raise HTTPException(status_code=404, detail="Epic not found")
-        upload_obj = db.query(Upload).filter(Upload.id == epic_obj.upload_id, Upload.user_id == current_user.user_id).first()
-        if not upload_obj:
-            raise HTTPException(status_code=403, detail="You don't have access to this story")
-
-        qa_tests = db.query(QA).filter(
+        qa_tests = db.query(QA).options(list_columns(QA, *QA_LIST_COLUMNS, content=with_content)).filter(
             QA.story_id == story_id,
+            QA.user_id == current_user.user_id,
             QA.type == "qa"
         ).all()
         
         if not qa_tests:
+            check_owner(db, Story, story_id, current_user.user_id, "story")
             raise HTTPException(status_code=404, detail="No QA test cases found for this story")
 
         qa_list = []
@@ -39,9 +44,10 @@ def get_qa(story_id: int, current_user: TokenData = Depends(get_current_user)):
                 "id": qa.id,
                 "story_id": qa.story_id,
                 "test_type": qa.test_type,
-                "content": qa.content,
                 "created_at": qa.created_at
             }
+            if with_content:
+                qa_data["content"] = qa.content
             qa_list.append(qa_data)
 
         return {
@@ -55,23 +61,15 @@ def get_qa(story_id: int, current_user: TokenData = Depends(get_current_user)):
 def get_qa_details(story_id: int, qa_id: int, current_user: TokenData = Depends(get_current_user)):
     """Get details of a specific QA test case"""
     with get_db_context() as db:
-        story_obj = db.query(Story).filter(Story.id == story_id).first()
-        if not story_obj:
-            raise HTTPException(status_code=404, detail="Story not found")
-        epic_obj = db.query(Epic).filter(Epic.id == story_obj.epic_id).first()
-        if not epic_obj:
-            raise HTTPException(status_code=404, detail="Epic not found")
-        upload_obj = db.query(Upload).filter(Upload.id == epic_obj.upload_id, Upload.user_id == current_user.user_id).first()
-        if not upload_obj:
-            raise HTTPException(status_code=403, detail="You don't have access to this story")
-
-        qa = db.query(QA).filter(
+        qa = db.query(QA).options(undefer(QA.content)).filter(
             QA.id == qa_id,
             QA.story_id == story_id,
+            QA.user_id == current_user.user_id,
             QA.type == "qa"
         ).first()
         
         if not qa:
+            check_owner(db, Story, story_id, current_user.user_id, "story")
             raise HTTPException(status_code=404, detail="QA test case not found")
 
         return {
@@ -90,89 +88,48 @@ def get_all_qa(
     page_size: int = Query(10, ge=1, le=100),
     sort_by: str = Query("created_at"),
     sort_order: str = Query("desc"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page; replaces page"),
+    total: Literal["exact", "approximate", "none"] = Query("exact", description="How to count the total"),
+    include: Optional[str] = Query(None, description=INCLUDE_DESCRIPTION),
     current_user: TokenData = Depends(get_current_user),
 ):
-    """Get all QA test cases from user's stories (paginated). Supports sorting by `id` or `created_at`."""
+    """
+    Get all QA test cases from user's stories (paginated). Supports sorting by `id` or `created_at`.
+    
+    Pass the returned `next_cursor` as `cursor` for keyset paging; `total`
+    selects an exact, approximate or no total. `include=content` adds each
+    test case's content.
+    """
+    with_content = include_content(include)
     with get_db_context() as db:
-        # Get user's uploads, epics, and stories
-        user_uploads = db.query(Upload.id).filter(Upload.user_id == current_user.user_id).all()
-        upload_ids = [u[0] for u in user_uploads]
-        
-        if not upload_ids:
-            return {
-                "message": "No QA tests found for this user",
-                "total_qa_tests": 0,
-                "current_page": page,
-                "page_size": page_size,
-                "total_pages": 0,
-                "qa_tests": []
-            }
+        query = (
+            db.query(QA, Story.name, Story.jira_key)
+            .options(list_columns(QA, *QA_LIST_COLUMNS, content=with_content))
+            .join(Story, QA.story_id == Story.id)
+            .filter(QA.user_id == current_user.user_id, QA.type == "qa")
+        )
+        total_count, is_estimate = count_rows(query, total)
         
-        user_epics = db.query(Epic.id).filter(Epic.upload_id.in_(upload_ids)).all()
-        epic_ids = [e[0] for e in user_epics]
-        
-        if not epic_ids:
-            return {
-                "message": "No QA tests found for this user",
-                "total_qa_tests": 0,
-                "current_page": page,
-                "page_size": page_size,
-                "total_pages": 0,
-                "qa_tests": []
-            }
-        
-        user_stories = db.query(Story.id).filter(Story.epic_id.in_(epic_ids)).all()
-        story_ids = [s[0] for s in user_stories]
-        
-        if not story_ids:
-            return {
-                "message": "No QA tests found for this user",
-                "total_qa_tests": 0,
-                "current_page": page,
-                "page_size": page_size,
-                "total_pages": 0,
-                "qa_tests": []
-            }
-        
-        query = db.query(QA).filter(QA.type == "qa", QA.story_id.in_(story_ids))
-        total_count = query.count()
-        offset = (page - 1) * page_size
-        sort_by = (sort_by or "created_at").lower()
-        sort_order = (sort_order or "desc").lower()
-        if sort_by == "id":
-            col = QA.id
-        else:
-            col = QA.created_at
-
-        if sort_order == "asc":
-            order_clause = col.asc()
-        else:
-            order_clause = col.desc()
-
-        qa_tests = query.order_by(order_clause).offset(offset).limit(page_size).all()
+        columns = sort_columns(QA, sort_by)
+        rows, next_cursor = paginate(query, columns, page_size, (sort_order or "desc").lower() != "asc", cursor, page)
 
         qa_list = []
-        for qa in qa_tests:
-            # Get story details to include jira_key
-            story = db.query(Story).filter(Story.id == qa.story_id).first()
+        for qa, story_name, story_jira_key in rows:
             qa_data = {
                 "id": qa.id,
-                "content": qa.content,
                 "story_id": qa.story_id,
-                "story_name": story.name if story else "Unknown",
-                "story_jira_key": story.jira_key if story else None,
+                "story_name": story_name or "Unknown",
+                "story_jira_key": story_jira_key,
                 "test_type": qa.test_type,
                 "created_at": qa.created_at
             }
+            if with_content:
+                qa_data["content"] = qa.content
             qa_list.append(qa_data)
 
-        total_pages = (total_count + page_size - 1) // page_size
-
         return {
             "message": "All QA test cases retrieved successfully",
             "total_qa_tests": total_count,
-            "current_page": page,
-            "page_size": page_size,
-            "total_pages": total_pages,
+            **page_info(total_count, page, page_size, next_cursor, is_estimate),
             "qa_tests": qa_list
         }
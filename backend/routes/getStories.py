@@ -1,13 +1,18 @@
 from fastapi import APIRouter, HTTPException, Query, Depends
+from sqlalchemy.orm import undefer
 import sys
 from pathlib import Path
 
 # Add backend directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from models.file_model import Upload, Epic, Story
+from models.file_model import Epic, Story
 from config.db import get_db, get_db_context
 from config.auth import get_current_user, TokenData
+from utils.ownership import check_owner
+from utils.pagination import count_rows, page_info, paginate, sort_columns
+from utils.projection import INCLUDE_DESCRIPTION, include_content, list_columns
+from typing import Literal, Optional
 
 router = APIRouter()
 
@@ -22,20 +27,28 @@ def safe_serialize_content(content):
     except Exception:
         return None
 
+# Columns of a story returned by the listings
+STORY_LIST_COLUMNS = ("name", "epic_id", "jira_key", "jira_issue_id", "jira_url", "epic_jira_key",
+                      "epic_jira_issue_id", "jira_creation_success", "created_at")
+
 @router.get("/stories/{epic_id}")
-def get_stories(epic_id: int, current_user: TokenData = Depends(get_current_user)):
-    """Get all stories for a given epic"""
+def get_stories(
+    epic_id: int,
+    include: Optional[str] = Query(None, description=INCLUDE_DESCRIPTION),
+    current_user: TokenData = Depends(get_current_user),
+):
+    """Get all stories for a given epic; `include=content` adds each story's content"""
+    with_content = include_content(include)
     with get_db_context() as db:
-        epic_obj = db.query(Epic).filter(Epic.id == epic_id).first()
-        if not epic_obj:
-            raise HTTPException(status_code=404, detail="Epic not found")
-        upload_obj = db.query(Upload).filter(Upload.id == epic_obj.upload_id, Upload.user_id == current_user.user_id).first()
-        if not upload_obj:
-            raise HTTPException(status_code=403, detail="You don't have access to this epic")
-
-        stories = db.query(Story).filter(Story.epic_id == epic_id).all()
+        stories = (
+            db.query(Story)
+            .options(list_columns(Story, *STORY_LIST_COLUMNS, content=with_content))
+            .filter(Story.epic_id == epic_id, Story.user_id == current_user.user_id)
+            .all()
+        )
         
         if not stories:
+            check_owner(db, Epic, epic_id, current_user.user_id, "epic")
             raise HTTPException(status_code=404, detail="No stories found for this epic")
 
         story_list = []
@@ -44,7 +57,6 @@ def get_stories(epic_id: int, current_user: TokenData = Depends(get_current_user
                 story_data = {
                     "id": story.id,
                     "name": story.name or "Untitled",
-                    "content": safe_serialize_content(story.content),
                     "jira_key": story.jira_key,
                     "jira_issue_id": story.jira_issue_id,
                     "jira_url": story.jira_url,
@@ -53,6 +65,8 @@ def get_stories(epic_id: int, current_user: TokenData = Depends(get_current_user
                     "jira_creation_success": story.jira_creation_success,
                     "created_at": str(story.created_at) if story.created_at else None
                 }
+                if with_content:
+                    story_data["content"] = safe_serialize_content(story.content)
                 story_list.append(story_data)
             except Exception:
                 # Skip stories that fail to serialize
@@ -69,19 +83,14 @@ def get_stories(epic_id: int, current_user: TokenData = Depends(get_current_user
 def get_story_details(epic_id: int, story_id: int, current_user: TokenData = Depends(get_current_user)):
     """Get details of a specific story"""
     with get_db_context() as db:
-        epic_obj = db.query(Epic).filter(Epic.id == epic_id).first()
-        if not epic_obj:
-            raise HTTPException(status_code=404, detail="Epic not found")
-        upload_obj = db.query(Upload).filter(Upload.id == epic_obj.upload_id, Upload.user_id == current_user.user_id).first()
-        if not upload_obj:
-            raise HTTPException(status_code=403, detail="You don't have access to this epic")
-
-        story = db.query(Story).filter(
+        story = db.query(Story).options(undefer(Story.content)).filter(
             Story.id == story_id,
-            Story.epic_id == epic_id
+            Story.epic_id == epic_id,
+            Story.user_id == current_user.user_id
         ).first()
         
         if not story:
+            check_owner(db, Epic, epic_id, current_user.user_id, "epic")
             raise HTTPException(status_code=404, detail="Story not found")
 
         return {
@@ -107,52 +116,29 @@ def get_all_stories(
     page_size: int = Query(10, ge=1, le=100),
     sort_by: str = Query("created_at"),
     sort_order: str = Query("desc"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page; replaces page"),
+    total: Literal["exact", "approximate", "none"] = Query("exact", description="How to count the total"),
+    include: Optional[str] = Query(None, description=INCLUDE_DESCRIPTION),
     current_user: TokenData = Depends(get_current_user),
 ):
-    """Get all stories from user's epics (paginated). Supports sorting by `id` or `created_at`."""
+    """
+    Get all stories from user's epics (paginated). Supports sorting by `id` or `created_at`.
+    
+    Pass the returned `next_cursor` as `cursor` for keyset paging; `total`
+    selects an exact, approximate or no total. `include=content` adds each
+    story's content.
+    """
+    with_content = include_content(include)
     with get_db_context() as db:
-        # Get user's uploads and epics
-        user_uploads = db.query(Upload.id).filter(Upload.user_id == current_user.user_id).all()
-        upload_ids = [u[0] for u in user_uploads]
-        
-        if not upload_ids:
-            return {
-                "message": "No stories found for this user",
-                "total_stories": 0,
-                "current_page": page,
-                "page_size": page_size,
-                "total_pages": 0,
-                "stories": []
-            }
+        query = (
+            db.query(Story)
+            .options(list_columns(Story, *STORY_LIST_COLUMNS, content=with_content))
+            .filter(Story.user_id == current_user.user_id)
+        )
+        total_count, is_estimate = count_rows(query, total)
         
-        user_epics = db.query(Epic.id).filter(Epic.upload_id.in_(upload_ids)).all()
-        epic_ids = [e[0] for e in user_epics]
-        
-        if not epic_ids:
-            return {
-                "message": "No stories found for this user",
-                "total_stories": 0,
-                "current_page": page,
-                "page_size": page_size,
-                "total_pages": 0,
-                "stories": []
-            }
-        
-        total_count = db.query(Story).filter(Story.epic_id.in_(epic_ids)).count()
-        offset = (page - 1) * page_size
-        sort_by = (sort_by or "created_at").lower()
-        sort_order = (sort_order or "desc").lower()
-        if sort_by == "id":
-            col = Story.id
-        else:
-            col = Story.created_at
-
-        if sort_order == "asc":
-            order_clause = col.asc()
-        else:
-            order_clause = col.desc()
-
-        stories = db.query(Story).filter(Story.epic_id.in_(epic_ids)).order_by(order_clause).offset(offset).limit(page_size).all()
+        columns = sort_columns(Story, sort_by)
+        stories, next_cursor = paginate(query, columns, page_size, (sort_order or "desc").lower() != "asc", cursor, page)
 
         story_list = []
         for story in stories:
@@ -160,7 +146,6 @@ def get_all_stories(
                 story_data = {
                     "id": story.id,
                     "name": story.name or "Untitled",
-                    "content": safe_serialize_content(story.content),
                     "epic_id": story.epic_id,
                     "jira_key": story.jira_key,
                     "jira_issue_id": story.jira_issue_id,
@@ -170,18 +155,16 @@ def get_all_stories(
                     "jira_creation_success": story.jira_creation_success,
                     "created_at": str(story.created_at) if story.created_at else None
                 }
+                if with_content:
+                    story_data["content"] = safe_serialize_content(story.content)
                 story_list.append(story_data)
             except Exception:
                 # Skip stories that fail to serialize
                 continue
 
-        total_pages = (total_count + page_size - 1) // page_size
-
         return {
             "message": "All stories retrieved successfully",
             "total_stories": total_count,
-            "current_page": page,
-            "page_size": page_size,
-            "total_pages": total_pages,
+            **page_info(total_count, page, page_size, next_cursor, is_estimate),
             "stories": story_list
         }
@@ -1,15 +1,19 @@
 from fastapi import APIRouter, HTTPException, Query, Depends
+from sqlalchemy.orm import undefer
 import sys
 from pathlib import Path
 
 # Add backend directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from models.file_model import Upload, Epic, QA
+from models.file_model import Epic, QA
 from config.db import get_db, get_db_context
 from config.config import CONFLUENCE_URL
 from config.auth import get_current_user, TokenData
-from typing import Optional
+from typing import Literal, Optional
+from utils.ownership import check_owner
+from utils.pagination import count_rows, page_info, paginate, sort_columns
+from utils.projection import INCLUDE_DESCRIPTION, content_title, include_content, list_columns
 
 router = APIRouter()
 
@@ -31,35 +35,50 @@ def get_confluence_page_url(page_id: str) -> Optional[str]:
 
     return f"{base}/pages/viewpage.action?pageId={pid}"
 
+# Columns of a test plan returned by the listings
+TESTPLAN_LIST_COLUMNS = ("epic_id", "confluence_page_id", "created_at")
+# Title read from the content by the database, so listings need not load the content
+TESTPLAN_TITLE = content_title(QA)
+
+
+def _testplan_query(db, with_content: bool):
+    return db.query(QA, TESTPLAN_TITLE).options(list_columns(QA, *TESTPLAN_LIST_COLUMNS, content=with_content))
+
+
+def _testplan_entry(testplan: QA, title: Optional[str], with_content: bool) -> dict:
+    testplan_data = {
+        "id": testplan.id,
+        "title": title or ("Test Plan " + str(testplan.id)),
+        "epic_id": testplan.epic_id,
+        "confluence_page_id": testplan.confluence_page_id,
+        "confluence_page_url": get_confluence_page_url(testplan.confluence_page_id),
+        "created_at": testplan.created_at
+    }
+    if with_content:
+        testplan_data["content"] = testplan.content
+    return testplan_data
+
+
 @router.get("/testplans/{epic_id}")
-def get_testplans(epic_id: int, current_user: TokenData = Depends(get_current_user)):
-    """Get all test plans for a given epic"""
+def get_testplans(
+    epic_id: int,
+    include: Optional[str] = Query(None, description=INCLUDE_DESCRIPTION),
+    current_user: TokenData = Depends(get_current_user),
+):
+    """Get all test plans for a given epic; `include=content` adds each plan's content"""
+    with_content = include_content(include)
     with get_db_context() as db:
-        epic_obj = db.query(Epic).filter(Epic.id == epic_id).first()
-        if not epic_obj:
-            raise HTTPException(status_code=404, detail="Epic not found")
-        upload_obj = db.query(Upload).filter(Upload.id == epic_obj.upload_id, Upload.user_id == current_user.user_id).first()
-        if not upload_obj:
-            raise HTTPException(status_code=403, detail="You don't have access to this epic")
-
-        testplans = db.query(QA).filter(
+        testplans = _testplan_query(db, with_content).filter(
             QA.epic_id == epic_id,
+            QA.user_id == current_user.user_id,
             QA.type == "test_plan"
         ).all()
         
         if not testplans:
+            check_owner(db, Epic, epic_id, current_user.user_id, "epic")
             raise HTTPException(status_code=404, detail="No test plans found for this epic")
 
-        testplan_list = []
-        for testplan in testplans:
-            testplan_data = {
-                "id": testplan.id,
-                "content": testplan.content,
-                "confluence_page_id": testplan.confluence_page_id,
-                "confluence_page_url": get_confluence_page_url(testplan.confluence_page_id),
-                "created_at": testplan.created_at
-            }
-            testplan_list.append(testplan_data)
+        testplan_list = [_testplan_entry(testplan, title, with_content) for testplan, title in testplans]
 
         return {
             "message": "Test plans retrieved successfully",
@@ -72,17 +91,15 @@ def get_testplans(epic_id: int, current_user: TokenData = Depends(get_current_us
 def get_testplan_details(epic_id: int, testplan_id: int, current_user: TokenData = Depends(get_current_user)):
     """Get details of a specific test plan"""
     with get_db_context() as db:
-        epic_obj = db.query(Epic).filter(Epic.id == epic_id).first()
-        if not epic_obj:
-            raise HTTPException(status_code=404, detail="Epic not found")
-
-        testplan = db.query(QA).filter(
+        testplan = db.query(QA).options(undefer(QA.content)).filter(
             QA.id == testplan_id,
             QA.epic_id == epic_id,
+            QA.user_id == current_user.user_id,
             QA.type == "test_plan"
         ).first()
         
         if not testplan:
+            check_owner(db, Epic, epic_id, current_user.user_id, "epic")
             raise HTTPException(status_code=404, detail="Test plan not found")
 
         return {
@@ -103,81 +120,34 @@ def get_all_testplans(
     page_size: int = Query(10, ge=1, le=100),
     sort_by: str = Query("created_at"),
     sort_order: str = Query("desc"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page; replaces page"),
+    total: Literal["exact", "approximate", "none"] = Query("exact", description="How to count the total"),
+    include: Optional[str] = Query(None, description=INCLUDE_DESCRIPTION),
     current_user: TokenData = Depends(get_current_user),
 ):
-    """Get all test plans from user's epics (paginated). Supports sorting by `id` or `created_at`."""
+    """
+    Get all test plans from user's epics (paginated). Supports sorting by `id` or `created_at`.
+    
+    Pass the returned `next_cursor` as `cursor` for keyset paging; `total`
+    selects an exact, approximate or no total. `include=content` adds each
+    plan's content.
+    """
+    with_content = include_content(include)
     with get_db_context() as db:
-        # Get user's uploads and epics
-        user_uploads = db.query(Upload.id).filter(Upload.user_id == current_user.user_id).all()
-        upload_ids = [u[0] for u in user_uploads]
-        
-        if not upload_ids:
-            return {
-                "message": "No test plans found for this user",
-                "total_test_plans": 0,
-                "current_page": page,
-                "page_size": page_size,
-                "total_pages": 0,
-                "test_plans": []
-            }
+        query = (
+            _testplan_query(db, with_content)
+            .filter(QA.user_id == current_user.user_id, QA.type == "test_plan")
+        )
+        total_count, is_estimate = count_rows(query, total)
         
-        user_epics = db.query(Epic.id).filter(Epic.upload_id.in_(upload_ids)).all()
-        epic_ids = [e[0] for e in user_epics]
-        
-        base_query = db.query(QA).filter(QA.type == "test_plan", QA.epic_id.in_(epic_ids))
-        total_count = base_query.count()
-        offset = (page - 1) * page_size
-        sort_by = (sort_by or "created_at").lower()
-        sort_order = (sort_order or "desc").lower()
-        if sort_by == "id":
-            col = QA.id
-        else:
-            col = QA.created_at
-
-        if sort_order == "asc":
-            order_clause = col.asc()
-        else:
-            order_clause = col.desc()
-
-        testplans = base_query.order_by(order_clause).offset(offset).limit(page_size).all()
-
-        testplan_list = []
-        for testplan in testplans:
-            # extract title from stored JSON content if present
-            title = None
-            try:
-                if isinstance(testplan.content, dict):
-                    title = testplan.content.get("title") or testplan.content.get("name")
-                else:
-                    # content might be stored as stringified JSON
-                    import json
-                    try:
-                        parsed = json.loads(testplan.content)
-                        if isinstance(parsed, dict):
-                            title = parsed.get("title") or parsed.get("name")
-                    except Exception:
-                        title = None
-            except Exception:
-                title = None
-
-            testplan_data = {
-                "id": testplan.id,
-                "title": title or ("Test Plan " + str(testplan.id)),
-                "epic_id": testplan.epic_id,
-                "confluence_page_id": testplan.confluence_page_id,
-                "confluence_page_url": get_confluence_page_url(testplan.confluence_page_id),
-                "created_at": testplan.created_at,
-                "content": testplan.content
-            }
-            testplan_list.append(testplan_data)
+        columns = sort_columns(QA, sort_by)
+        testplans, next_cursor = paginate(query, columns, page_size, (sort_order or "desc").lower() != "asc", cursor, page)
 
-        total_pages = (total_count + page_size - 1) // page_size
+        testplan_list = [_testplan_entry(testplan, title, with_content) for testplan, title in testplans]
 
         return {
             "message": "All test plans retrieved successfully",
             "total_test_plans": total_count,
-            "current_page": page,
-            "page_size": page_size,
-            "total_pages": total_pages,
+            **page_info(total_count, page, page_size, next_cursor, is_estimate),
             "test_plans": testplan_list
         }
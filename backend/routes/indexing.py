@@ -1,85 +1,56 @@
-from fastapi import APIRouter, HTTPException
-from models.file_model import Upload, Epic, Story, QA
+from fastapi import APIRouter, Depends, HTTPException, Query
+from config.auth import get_admin_user
 from config.db import get_db, get_db_context
-from rag.vectorstore import VectorStore
-import uuid
-import json
+from rag.vectorstore import get_default_store
+from rag.resource_index import ReindexProgress, reindex_resources
+import logging
+import threading
 
-router = APIRouter()
-vectorstore = VectorStore()
+logger = logging.getLogger(__name__)
+
+# Mounted under /api; the store holds every user's documents, so only administrators may
+# see its contents, reindex, rebuild or clear it
+router = APIRouter(dependencies=[Depends(get_admin_user)])
+# The store in VECTORSTORE_DIR that content generation writes and the search routes read
+vectorstore = get_default_store()
+
+
+_reindex_progress = ReindexProgress()
+
+
+def _run_reindex(full: bool):
+    """Reindex in the background, reporting into _reindex_progress"""
+    try:
+        with get_db_context() as db:
+            reindex_resources(db, vectorstore, full=full, progress=_reindex_progress)
+    except Exception as e:
+        logger.error(f"Background reindex failed: {str(e)}")
 
 
 @router.post("/reindex")
-def reindex_all():
-    """Reindex all content from database into vectorstore"""
-    indexed_count = 0
+def reindex_all(full: bool = Query(False, description="Re-embed every row instead of only new or changed ones")):
+    """
+    Reindex database content into the vectorstore in the background.
     
-    with get_db_context() as db:
-        # Index all epics
-        epics = db.query(Epic).all()
-        for epic in epics:
-            try:
-                epic_text = f"Epic: {epic.name}\nDescription: {epic.content.get('description', '')}\nAcceptance Criteria: {', '.join(epic.content.get('acceptanceCriteria', []))}"
-                doc_id = f"epic_{epic.id}_{str(uuid.uuid4())[:8]}"
-                vectorstore.store_document(epic_text, doc_id, metadata={
-                    "type": "epic",
-                    "epic_id": epic.id,
-                    "upload_id": epic.upload_id,
-                    "epic_name": epic.name
-                })
-                indexed_count += 1
-            except Exception as e:
-                print(f"Error indexing epic {epic.id}: {e}")
-        
-        # Index all stories
-        stories = db.query(Story).all()
-        for story in stories:
-            try:
-                story_text = f"Story: {story.name}\nType: {story.content.get('type', '')}\nDescription: {story.content.get('description', '')}\nAcceptance Criteria: {', '.join(story.content.get('acceptanceCriteria', []))}"
-                doc_id = f"story_{story.id}_{str(uuid.uuid4())[:8]}"
-                vectorstore.store_document(story_text, doc_id, metadata={
-                    "type": "story",
-                    "story_id": story.id,
-                    "epic_id": story.epic_id,
-                    "story_name": story.name
-                })
-                indexed_count += 1
-            except Exception as e:
-                print(f"Error indexing story {story.id}: {e}")
-        
-        # Index all QA tests
-        qa_tests = db.query(QA).all()
-        for qa in qa_tests:
-            try:
-                qa_text = f"QA Test: {qa.content.get('title', '')}\nAPI Endpoint: {qa.content.get('apiEndpoint', '')}\nMethod: {qa.content.get('method', '')}\nValidation Steps: {', '.join(qa.content.get('validationSteps', []))}"
-                doc_id = f"qa_{qa.id}_{str(uuid.uuid4())[:8]}"
-                vectorstore.store_document(qa_text, doc_id, metadata={
-                    "type": "qa",
-                    "qa_id": qa.id,
-                    "story_id": qa.story_id
-                })
-                indexed_count += 1
-            except Exception as e:
-                print(f"Error indexing QA {qa.id}: {e}")
-        
-        # Index all uploads
-        uploads = db.query(Upload).all()
-        for upload in uploads:
-            try:
-                upload_text = f"Upload: {upload.filename}\nContent: {json.dumps(upload.content) if isinstance(upload.content, dict) else str(upload.content)}"
-                doc_id = f"upload_{upload.id}_{str(uuid.uuid4())[:8]}"
-                vectorstore.store_document(upload_text, doc_id, metadata={
-                    "type": "upload",
-                    "upload_id": upload.id,
-                    "filename": upload.filename
-                })
-                indexed_count += 1
-            except Exception as e:
-                print(f"Error indexing upload {upload.id}: {e}")
+    Only rows that are new or whose content changed since the last run are
+    embedded, and documents for deleted rows are removed. Poll
+    /reindex/status for progress.
+    """
+    if not _reindex_progress.start(full):
+        raise HTTPException(status_code=409, detail="A reindex is already running")
     
+    threading.Thread(target=_run_reindex, args=(full,), name="vectorstore-reindex", daemon=True).start()
     return {
-        "message": "Reindexing complete",
-        "documents_indexed": indexed_count,
+        "message": "Reindexing started",
+        **_reindex_progress.snapshot()
+    }
+
+
+@router.get("/reindex/status")
+def reindex_status():
+    """Get progress of the current or last reindex"""
+    return {
+        **_reindex_progress.snapshot(),
         "total_documents_in_store": len(vectorstore.data)
     }
 
@@ -101,6 +72,19 @@ def vectorstore_stats():
     return stats
 
 
+@router.post("/vectorstore/index/rebuild")
+def rebuild_vectorstore_index(index_type: str = None):
+    """Rebuild the approximate nearest-neighbour index of the vectorstore"""
+    try:
+        stats = vectorstore.build_ann_index(index_type=index_type)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "message": "Vectorstore index rebuilt",
+        **stats
+    }
+
+
 @router.post("/vectorstore/clear")
 def clear_vectorstore():
     """Clear all documents from vectorstore (for testing)"""
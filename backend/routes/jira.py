@@ -1,17 +1,18 @@
 import sys
 from pathlib import Path
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, undefer
 from pydantic import BaseModel
 from typing import Optional, List
 import logging
-from jira import JIRA
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from config.db import get_db
 from config.auth import get_current_user
 from models.file_model import Epic, Story, User
+from services.jira_client import JiraAuthError, create_issues_in_chunks, get_jira_client, invalidate_jira_clients
+from utils.ownership import check_owner
 
 router = APIRouter(prefix="/api/jira", tags=["jira"])
 logger = logging.getLogger(__name__)
@@ -76,6 +77,17 @@ class CreateStoryWithConfluenceRequest(BaseModel):
         return self.story_name or self.story_title or "Untitled Story"
 
 
+class BulkCreateStoriesRequest(BaseModel):
+    jira_url: str
+    jira_username: str
+    jira_api_token: str
+    jira_project_key: str
+    jira_project_id: Optional[str] = None  # Jira project ID (numeric, e.g., 10001)
+    story_issuetype_id: Optional[str] = None  # Story issue type ID (numeric, e.g., 10010)
+    epic_id: int
+    story_ids: List[int]
+
+
 class JiraIssueResponse(BaseModel):
     key: str
     url: str
@@ -89,10 +101,7 @@ async def test_jira_connection(
 ):
     """Test connection to Jira with provided credentials"""
     try:
-        jira = JIRA(
-            server=credentials.jira_url,
-            basic_auth=(credentials.jira_username, credentials.jira_api_token),
-        )
+        jira = get_jira_client(credentials.jira_url, credentials.jira_username, credentials.jira_api_token)
         user = jira.current_user()
         logger.info(f"Successfully connected to Jira: {credentials.jira_url}")
         
@@ -141,11 +150,7 @@ async def create_epic_in_jira(
     """Create an epic directly in Jira using the provided credentials"""
     try:
         try:
-            jira = JIRA(
-                server=request.jira_url,
-                basic_auth=(request.jira_username, request.jira_api_token),
-            )
-            jira.current_user()
+            jira = get_jira_client(request.jira_url, request.jira_username, request.jira_api_token)
         except Exception as e:
             logger.error(f"Failed to connect to Jira: {str(e)}")
             raise HTTPException(
@@ -224,11 +229,7 @@ async def create_story_in_jira(
     """Create a story as a subtask/child work item linked to an epic in Jira using issue IDs"""
     try:
         try:
-            jira = JIRA(
-                server=request.jira_url,
-                basic_auth=(request.jira_username, request.jira_api_token),
-            )
-            jira.current_user()
+            jira = get_jira_client(request.jira_url, request.jira_username, request.jira_api_token)
         except Exception as e:
             logger.error(f"Failed to connect to Jira: {str(e)}")
             raise HTTPException(
@@ -317,11 +318,7 @@ async def create_stories_under_epic(
     """Create stories under an epic in Jira using the provided credentials"""
     try:
         try:
-            jira = JIRA(
-                server=request.jira_url,
-                basic_auth=(request.jira_username, request.jira_api_token),
-            )
-            jira.current_user()
+            jira = get_jira_client(request.jira_url, request.jira_username, request.jira_api_token)
         except Exception as e:
             logger.error(f"Failed to connect to Jira: {str(e)}")
             raise HTTPException(
@@ -386,6 +383,138 @@ async def create_stories_under_epic(
         )
 
 
+@router.post("/create-stories-bulk")
+def create_stories_bulk(
+    request: BulkCreateStoriesRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Create stories as child work items of their epic with Jira's bulk-create API.
+    
+    Stories are sent JIRA_BULK_CHUNK_SIZE per request and every Story row is
+    updated in one transaction. A story that Jira rejects is marked failed
+    without failing the others, and stories that already have a Jira key are
+    not sent again. If the credentials are rejected after some chunks went
+    through, the stories created so far are still recorded and the rest are
+    reported with the credentials error.
+    
+    Returns:
+        Counts and one {"story_id", "success", "key", "url", "error"} per requested story
+    """
+    check_owner(db, Epic, request.epic_id, current_user.user_id, "epic")
+    epic = db.query(Epic).filter(Epic.id == request.epic_id).first()
+    if not epic.jira_issue_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Epic has not been created in Jira yet. Create the epic first.",
+        )
+
+    story_ids = list(dict.fromkeys(request.story_ids))
+    stories = {
+        story.id: story
+        for story in db.query(Story)
+        .options(undefer(Story.content))
+        .filter(Story.id.in_(story_ids), Story.epic_id == epic.id)
+    }
+    # Stories already in Jira are reported as they are, not created a second time
+    to_create = [
+        stories[story_id] for story_id in story_ids
+        if story_id in stories and not stories[story_id].jira_key
+    ]
+
+    auth_error = None
+    try:
+        jira = get_jira_client(request.jira_url, request.jira_username, request.jira_api_token)
+        created = create_issues_in_chunks(jira, [build_story_fields(request, epic, story) for story in to_create])
+    except JiraAuthError as e:
+        logger.error(f"Failed to connect to Jira: {str(e)}")
+        if not e.results:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid Jira credentials: {str(e)}",
+            )
+        # Earlier chunks were created in Jira; record them before reporting the failure
+        created, auth_error = e.results, f"Invalid Jira credentials: {str(e)}"
+    except Exception as e:
+        logger.error(f"Error creating stories in Jira: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail=f"Error creating stories in Jira: {str(e)}",
+        )
+
+    outcomes = {
+        story.id: {"story_id": story.id, "success": True, "key": story.jira_key, "url": story.jira_url, "error": None}
+        for story in stories.values()
+        if story.jira_key
+    }
+    for story in to_create[len(created):]:
+        outcomes[story.id] = {"story_id": story.id, "success": False, "key": None, "url": None, "error": auth_error}
+    for story, result in zip(to_create, created):
+        if result["key"]:
+            jira_url = f"{request.jira_url}/browse/{result['key']}"
+            story.jira_key = result["key"]
+            story.jira_issue_id = result["id"]
+            story.jira_url = jira_url
+            story.epic_jira_key = epic.jira_key
+            story.epic_jira_issue_id = epic.jira_issue_id
+            story.jira_creation_success = True
+            story.content = {**(story.content or {}), "jira_key": result["key"], "jira_issue_id": result["id"]}
+        else:
+            jira_url = None
+            story.jira_creation_success = False
+        outcomes[story.id] = {
+            "story_id": story.id,
+            "success": result["key"] is not None,
+            "key": result["key"],
+            "url": jira_url,
+            "error": result["error"],
+        }
+    db.commit()
+
+    results = [
+        outcomes.get(story_id) or {
+            "story_id": story_id,
+            "success": False,
+            "key": None,
+            "url": None,
+            "error": "Story not found in this epic",
+        }
+        for story_id in story_ids
+    ]
+    created_count = sum(1 for result in created if result["key"])
+    succeeded = sum(1 for result in results if result["success"])
+    logger.info(f"Bulk created {created_count} of {len(results)} stories under epic {epic.jira_key}")
+    return {
+        "epic_id": epic.id,
+        "epic_jira_key": epic.jira_key,
+        "created": created_count,
+        "already_created": succeeded - created_count,
+        "failed": len(results) - succeeded,
+        "error": auth_error,
+        "results": results,
+    }
+
+
+def build_story_fields(request: BulkCreateStoriesRequest, epic: Epic, story: Story) -> dict:
+    """Issue fields for a story as a child work item of its epic"""
+    content = story.content if isinstance(story.content, dict) else {}
+    fields = {
+        "summary": story.name or content.get("name") or content.get("title") or "Untitled Story",
+        "description": content.get("description", ""),
+        "parent": {"id": epic.jira_issue_id},
+    }
+    # Objects rather than bare key/name strings, so the client does not look them up per issue
+    if request.jira_project_id:
+        fields["project"] = {"id": request.jira_project_id}
+    else:
+        fields["project"] = {"key": request.jira_project_key}
+    if request.story_issuetype_id:
+        fields["issuetype"] = {"id": request.story_issuetype_id}
+    else:
+        fields["issuetype"] = {"name": "Story"}
+    return fields
+
 
 @router.post("/save-credentials")
 async def save_jira_credentials(
@@ -395,28 +524,29 @@ async def save_jira_credentials(
 ):
     """Save Jira credentials to user profile"""
     try:
-        # Test connection first
-        try:
-            jira = JIRA(
-                server=credentials.jira_url,
-                basic_auth=(credentials.jira_username, credentials.jira_api_token),
+        # Get actual User object from database
+        user = db.query(User).filter(User.id == current_user.user_id).first()
+        if not user:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found",
             )
+
+        # Clients for the credentials being replaced are no longer needed
+        invalidate_jira_clients(user.jira_url, user.jira_username)
+
+        # Test connection first; the validated client stays cached for later requests
+        try:
+            jira = get_jira_client(credentials.jira_url, credentials.jira_username, credentials.jira_api_token)
             jira.current_user()
         except Exception as e:
             logger.error(f"Failed to connect to Jira: {str(e)}")
+            invalidate_jira_clients(credentials.jira_url, credentials.jira_username)
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Invalid Jira credentials: {str(e)}",
             )
 
-        # Get actual User object from database
-        user = db.query(User).filter(User.id == current_user.user_id).first()
-        if not user:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="User not found",
-            )
-
         # Save credentials to user profile
         user.jira_url = credentials.jira_url
         user.jira_username = credentials.jira_username
@@ -496,6 +626,7 @@ async def delete_jira_credentials(
                 detail="User not found",
             )
 
+        invalidate_jira_clients(user.jira_url, user.jira_username)
         user.jira_url = None
         user.jira_username = None
         user.jira_api_token = None
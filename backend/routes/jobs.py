@@ -0,0 +1,101 @@
+import sys
+from pathlib import Path
+
+# Add backend directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import asyncio
+import json
+from fastapi import APIRouter, HTTPException, Depends, Query, status
+from fastapi.responses import StreamingResponse
+from config.auth import get_current_user, TokenData
+from services.job_queue import FINISHED_STATES, QueueFullError, get_job_queue, job_response
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Seconds between status checks while streaming job events
+JOB_EVENT_POLL_SECONDS = 0.5
+
+
+def sse_event(event: str, data) -> str:
+    """Format one server-sent event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def submit_job(kind: str, params: dict, current_user: TokenData) -> dict:
+    """
+    Queue a job for the current user and build the 202 response body.
+
+    Raises:
+        HTTPException: 503 if the queue is full
+    """
+    try:
+        job = get_job_queue().submit(kind, params, user_id=current_user.user_id)
+    except QueueFullError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+    logger.info(f"{kind}: user={current_user.email}, job_id={job['id']}")
+    return {
+        "message": "Job queued",
+        **job_response(job)
+    }
+
+
+def _get_owned_job(job_id: str, current_user: TokenData) -> dict:
+    job = get_job_queue().get(job_id)
+    if not job or job["user_id"] != current_user.user_id:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return job
+
+
+@router.get("/jobs")
+def list_jobs(limit: int = Query(20, ge=1, le=100), current_user: TokenData = Depends(get_current_user)):
+    """List the current user's most recent jobs"""
+    return {
+        "jobs": [job_response(job) for job in get_job_queue().list(current_user.user_id, limit)]
+    }
+
+
+@router.get("/jobs/{job_id}")
+def get_job(job_id: str, current_user: TokenData = Depends(get_current_user)):
+    """
+    Get status, result and timing breakdown of a job.
+
+    Args:
+        job_id: ID returned when the job was submitted
+        current_user: Authenticated user
+
+    Returns:
+        Job status with its result once finished
+    """
+    return job_response(_get_owned_job(job_id, current_user))
+
+
+@router.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str, current_user: TokenData = Depends(get_current_user)):
+    """
+    Stream job status changes as server-sent events until the job finishes.
+
+    Each event carries the same body as GET /jobs/{job_id}.
+    """
+    _get_owned_job(job_id, current_user)
+
+    async def events():
+        last = None
+        while True:
+            job = await asyncio.to_thread(get_job_queue().get, job_id)
+            snapshot = (job["status"], job["progress"])
+            if snapshot != last:
+                last = snapshot
+                yield sse_event(job["status"], job_response(job))
+            if job["status"] in FINISHED_STATES:
+                return
+            await asyncio.sleep(JOB_EVENT_POLL_SECONDS)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
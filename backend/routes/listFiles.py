@@ -4,60 +4,131 @@ from pathlib import Path
 # Add backend directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
+from typing import Optional
+from sqlalchemy.orm import Session, load_only, selectinload
 from config.db import get_db, get_db_context
 from config.auth import get_current_user, TokenData
 from models.file_model import Upload, Epic, Story, QA, AggregatedUpload
+from utils.projection import INCLUDE_DESCRIPTION, include_content
 
 router = APIRouter()
 
+# depth values: uploads only, with epics, with stories, with QA
+MAX_TREE_DEPTH = 3
+
+
+def load_upload_tree(db: Session, user_id: int, page: int = 1, page_size: int = 10,
+                     depth: int = MAX_TREE_DEPTH, content: bool = False) -> dict:
+    """
+    Load a page of a user's uploads with their epics, stories and QA.
+
+    Each level is fetched with one selectinload query for the whole page, so
+    the number of queries does not grow with the number of rows. Only the
+    columns returned are read; the JSON content of stories, QA and the
+    aggregated upload is loaded, and returned, only with content=True.
+
+    Args:
+        db: Database session
+        user_id: Owner of the uploads
+        page: Page number (1-based)
+        page_size: Uploads per page
+        depth: 0 uploads only, 1 with epics, 2 with stories, 3 with QA
+        content: Include story, QA and aggregated content
+
+    Returns:
+        Uploads for the page with pagination info
+    """
+    base_query = db.query(Upload).filter(Upload.user_id == user_id)
+    total_count = base_query.count()
+
+    options = []
+    if content:
+        options.append(selectinload(Upload.aggregated).load_only(AggregatedUpload.content))
+    if depth >= 1:
+        loader = selectinload(Upload.epics).load_only(Epic.name)
+        if depth >= 2:
+            story_columns = [Story.name, Story.content] if content else [Story.name]
+            loader = loader.selectinload(Epic.stories).load_only(*story_columns)
+            if depth >= 3:
+                qa_columns = [QA.type, QA.content] if content else [QA.type]
+                loader = loader.selectinload(Story.qa).load_only(*qa_columns)
+        options.append(loader)
+
+    uploads = (
+        base_query.options(load_only(Upload.filename), *options)
+        .order_by(Upload.created_at.desc(), Upload.id.desc())
+        .offset((page - 1) * page_size)
+        .limit(page_size)
+        .all()
+    )
+
+    result = []
+    for up in uploads:
+        upload_entry = {
+            "upload_id": up.id,
+            "name": up.filename
+        }
+        if depth >= 1:
+            upload_entry["epics"] = [_epic_entry(e, depth, content) for e in up.epics]
+
+        # Optionally include aggregated JSON if exists
+        if content and up.aggregated:
+            upload_entry["aggregated"] = up.aggregated[0].content
+
+        result.append(upload_entry)
+
+    return {
+        "total_uploads": total_count,
+        "current_page": page,
+        "page_size": page_size,
+        "total_pages": (total_count + page_size - 1) // page_size,
+        "uploads": result
+    }
+
+
+def _epic_entry(e: Epic, depth: int, content: bool) -> dict:
+    epic_entry = {
+        "epic_id": e.id,
+        "name": e.name
+    }
+    if depth >= 2:
+        epic_entry["stories"] = [_story_entry(s, depth, content) for s in e.stories]
+    return epic_entry
+
+
+def _story_entry(s: Story, depth: int, content: bool) -> dict:
+    story_entry = {
+        "story_id": s.id,
+        "name": s.name
+    }
+    if content:
+        story_entry["content"] = s.content
+    if depth >= 3:
+        story_entry["qa"] = [_qa_entry(q, content) for q in s.qa]
+    return story_entry
+
+
+def _qa_entry(q: QA, content: bool) -> dict:
+    qa_entry = {
+        "qa_id": q.id,
+        "type": q.type
+    }
+    if content:
+        qa_entry["content"] = q.content
+    return qa_entry
+
+
 @router.get("/list-files")
-def list_files(current_user: TokenData = Depends(get_current_user)):
+def list_files(
+    page: int = Query(1, ge=1),
+    page_size: int = Query(10, ge=1, le=100),
+    depth: int = Query(MAX_TREE_DEPTH, ge=0, le=MAX_TREE_DEPTH,
+                       description="0 uploads only, 1 with epics, 2 with stories, 3 with QA"),
+    include: Optional[str] = Query(None, description=INCLUDE_DESCRIPTION),
+    current_user: TokenData = Depends(get_current_user)
+):
+    """Get a page of the current user's uploads with their epic, story and QA hierarchy"""
+    content = include_content(include)
     with get_db_context() as db:
-        uploads = db.query(Upload).filter(Upload.user_id == current_user.user_id).all()
-        result = []
-
-        for up in uploads:
-            upload_entry = {
-                "upload_id": up.id,
-                "name": up.name,
-                "epics": []
-            }
-
-            epics = db.query(Epic).filter(Epic.upload_id == up.id).all()
-            for e in epics:
-                epic_entry = {
-                    "epic_id": e.id,
-                    "name": e.name,
-                    "stories": []
-                }
-
-                stories = db.query(Story).filter(Story.epic_id == e.id).all()
-                for s in stories:
-                    story_entry = {
-                        "story_id": s.id,
-                        "name": s.name,
-                        "content": s.content,
-                        "qa": []
-                    }
-
-                    qa_entries = db.query(QA).filter(QA.story_id == s.id).all()
-                    for q in qa_entries:
-                        story_entry["qa"].append({
-                            "qa_id": q.id,
-                            "type": q.type,
-                            "content": q.content
-                        })
-
-                    epic_entry["stories"].append(story_entry)
-
-                upload_entry["epics"].append(epic_entry)
-
-            # Optionally include aggregated JSON if exists
-            agg = db.query(AggregatedUpload).filter(AggregatedUpload.upload_id == up.id).first()
-            if agg:
-                upload_entry["aggregated"] = agg.content
-
-            result.append(upload_entry)
-
-    return {"uploads": result}
+        return load_upload_tree(db, current_user.user_id, page, page_size, depth, content)
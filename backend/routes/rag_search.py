@@ -1,4 +1,5 @@
 from fastapi import APIRouter, HTTPException, Query, Depends
+from sqlalchemy.orm import undefer
 import sys
 from pathlib import Path
 
@@ -8,9 +9,10 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 from models.file_model import Upload, Epic, QA
 from config.db import get_db, get_db_context
 from config.auth import get_current_user, TokenData
-import numpy as np
+from rag.embedder import get_embedding_model_or_none
+from rag.row_embeddings import score_rows
+from rag.upload_chunks import best_chunk_per_upload, search_upload_chunks
 import logging
-from sentence_transformers import SentenceTransformer
 
 logger = logging.getLogger(__name__)
 
@@ -20,14 +22,8 @@ router = APIRouter()
 SEARCH_QUERY_DESC = "Search query across all uploads and epics"
 TOP_K_DESC = "Number of top results to return"
 
-# Initialize model once at module level for reuse
-try:
-    embedding_model = SentenceTransformer("all-MiniLM-L6-v2")
-except Exception as e:
-    logger.error(f"Failed to initialize embedding model: {str(e)}")
-    embedding_model = None
 
-# Cache for embeddings to avoid recalculating
+# Cache for query embeddings to avoid recalculating
 _embedding_cache = {}
 
 
@@ -38,6 +34,7 @@ def _get_embedding(text, use_cache=True):
         if use_cache and text in _embedding_cache:
             return _embedding_cache[text]
         
+        embedding_model = get_embedding_model_or_none()
         if not embedding_model:
             return None
         
@@ -53,42 +50,6 @@ def _get_embedding(text, use_cache=True):
         return None
 
 
-def _calculate_similarity(query_embedding, doc_embedding):
-    """Calculate cosine similarity between two embeddings."""
-    try:
-        query_vec = np.array(query_embedding)
-        doc_vec = np.array(doc_embedding)
-        
-        norm_q = np.linalg.norm(query_vec)
-        norm_d = np.linalg.norm(doc_vec)
-        
-        if norm_q == 0 or norm_d == 0:
-            return 0.0
-        
-        similarity = np.dot(query_vec, doc_vec) / (norm_q * norm_d)
-        return float(similarity)
-    except Exception as e:
-        logger.error(f"Error calculating similarity: {str(e)}")
-        return 0.0
-
-
-def _extract_text(obj):
-    """Safely extract text from various object types."""
-    if isinstance(obj, str):
-        return obj.strip()
-    elif isinstance(obj, dict):
-        text_parts = []
-        for value in obj.values():
-            if isinstance(value, str):
-                text_parts.append(value)
-            elif isinstance(value, list):
-                text_parts.extend([str(v) for v in value if v])
-        return " ".join(text_parts).strip()
-    elif isinstance(obj, (list, tuple)):
-        return " ".join([str(v) for v in obj if v]).strip()
-    return str(obj).strip() if obj else ""
-
-
 def _search_database_only(db, query, top_k):
     """
     Search through uploads, epics, and test plans (no stories or other details).
@@ -105,86 +66,64 @@ def _search_database_only(db, query, top_k):
         
         logger.info(f"Searching database for query: '{query}'")
         
-        # Search in uploads table
-        uploads = db.query(Upload).all()
-        logger.info(f"Found {len(uploads)} uploads in database")
+        # Search in uploads by their best-matching passage
+        chunk_matches = search_upload_chunks(db, query_embedding, top_k=None, min_similarity=0.05)
+        logger.info(f"Found {len(chunk_matches)} matching upload passages")
         
-        for upload in uploads:
-            upload_text = _extract_text(upload.content) if upload.content else ""
-            
-            if upload_text:
-                upload_embedding = _get_embedding(upload_text)
-                if upload_embedding:
-                    similarity = _calculate_similarity(query_embedding, upload_embedding)
-                    if similarity > 0.05:  # Filter very low scores
-                        results.append({
-                            "type": "upload",
-                            "upload_id": upload.id,
-                            "upload_name": upload.filename,
-                            "similarity_score": round(similarity, 4),
-                            "similarity_percentage": round(similarity * 100, 2),
-                            "confluence_page_id": upload.confluence_page_id
-                        })
+        for chunk, similarity in best_chunk_per_upload(chunk_matches):
+            results.append({
+                "type": "upload",
+                "upload_id": chunk.upload.id,
+                "upload_name": chunk.upload.filename,
+                "similarity_score": round(similarity, 4),
+                "similarity_percentage": round(similarity * 100, 2),
+                "confluence_page_id": chunk.upload.confluence_page_id
+            })
         
         # Search in epics table
-        epics = db.query(Epic).all()
+        epics = db.query(Epic).options(undefer(Epic.content)).all()
         logger.info(f"Found {len(epics)} epics in database")
         
-        for epic in epics:
-            epic_text = epic.name if epic.name else ""
-            if epic.content:
-                content_text = _extract_text(epic.content)
-                epic_text = f"{epic_text} {content_text}".strip()
-            
-            if epic_text:
-                epic_embedding = _get_embedding(epic_text)
-                if epic_embedding:
-                    similarity = _calculate_similarity(query_embedding, epic_embedding)
-                    if similarity > 0.05:  # Filter very low scores
-                        # Get parent upload
-                        upload = db.query(Upload).filter(Upload.id == epic.upload_id).first()
-                        
-                        results.append({
-                            "type": "epic",
-                            "epic_id": epic.id,
-                            "epic_name": epic.name,
-                            "upload_id": epic.upload_id,
-                            "upload_name": upload.filename if upload else "Unknown",
-                            "similarity_score": round(similarity, 4),
-                            "similarity_percentage": round(similarity * 100, 2),
-                            "confluence_page_id": epic.confluence_page_id
-                        })
+        for epic, similarity in score_rows(query_embedding, epics, "epic"):
+            if similarity > 0.05:  # Filter very low scores
+                # Get parent upload
+                upload = db.query(Upload).filter(Upload.id == epic.upload_id).first()
+                
+                results.append({
+                    "type": "epic",
+                    "epic_id": epic.id,
+                    "epic_name": epic.name,
+                    "upload_id": epic.upload_id,
+                    "upload_name": upload.filename if upload else "Unknown",
+                    "similarity_score": round(similarity, 4),
+                    "similarity_percentage": round(similarity * 100, 2),
+                    "confluence_page_id": epic.confluence_page_id
+                })
         
         # Search in test plans (QA table with type='test_plan')
-        test_plans = db.query(QA).filter(QA.type == "test_plan").all()
+        test_plans = db.query(QA).options(undefer(QA.content)).filter(QA.type == "test_plan").all()
         logger.info(f"Found {len(test_plans)} test plans in database")
         
-        for test_plan in test_plans:
-            test_plan_text = _extract_text(test_plan.content) if test_plan.content else ""
-            
-            if test_plan_text:
-                test_plan_embedding = _get_embedding(test_plan_text)
-                if test_plan_embedding:
-                    similarity = _calculate_similarity(query_embedding, test_plan_embedding)
-                    if similarity > 0.05:  # Filter very low scores
-                        # Get parent epic and upload
-                        epic = db.query(Epic).filter(Epic.id == test_plan.epic_id).first()
-                        upload = None
-                        if epic:
-                            upload = db.query(Upload).filter(Upload.id == epic.upload_id).first()
-                        
-                        results.append({
-                            "type": "test_plan",
-                            "test_plan_id": test_plan.id,
-                            "test_plan_title": test_plan.content.get("title", "Test Plan") if isinstance(test_plan.content, dict) else "Test Plan",
-                            "epic_id": test_plan.epic_id,
-                            "epic_name": epic.name if epic else "Unknown",
-                            "upload_id": epic.upload_id if epic else None,
-                            "upload_name": upload.filename if upload else "Unknown",
-                            "similarity_score": round(similarity, 4),
-                            "similarity_percentage": round(similarity * 100, 2),
-                            "confluence_page_id": test_plan.confluence_page_id
-                        })
+        for test_plan, similarity in score_rows(query_embedding, test_plans, "test_plan"):
+            if similarity > 0.05:  # Filter very low scores
+                # Get parent epic and upload
+                epic = db.query(Epic).filter(Epic.id == test_plan.epic_id).first()
+                upload = None
+                if epic:
+                    upload = db.query(Upload).filter(Upload.id == epic.upload_id).first()
+                
+                results.append({
+                    "type": "test_plan",
+                    "test_plan_id": test_plan.id,
+                    "test_plan_title": test_plan.content.get("title", "Test Plan") if isinstance(test_plan.content, dict) else "Test Plan",
+                    "epic_id": test_plan.epic_id,
+                    "epic_name": epic.name if epic else "Unknown",
+                    "upload_id": epic.upload_id if epic else None,
+                    "upload_name": upload.filename if upload else "Unknown",
+                    "similarity_score": round(similarity, 4),
+                    "similarity_percentage": round(similarity * 100, 2),
+                    "confluence_page_id": test_plan.confluence_page_id
+                })
         
         logger.info(f"Total results before sorting: {len(results)}")
     
@@ -1,9 +1,11 @@
 from fastapi import APIRouter, HTTPException, Query
+from sqlalchemy.orm import undefer
 from models.file_model import Upload, Epic, QA
 from config.db import get_db, get_db_context
-import numpy as np
+from rag.embedder import get_embedding_model_or_none
+from rag.row_embeddings import score_rows
+from rag.upload_chunks import best_chunk_per_upload, search_upload_chunks
 import logging
-from sentence_transformers import SentenceTransformer
 
 logger = logging.getLogger(__name__)
 
@@ -13,32 +15,6 @@ router = APIRouter()
 SEARCH_QUERY_DESC = "Search query across all uploads and epics"
 TOP_K_RESULTS_DESC = "Number of top results to return (max 5)"
 
-# Initialize model once at module level for reuse
-try:
-    embedding_model = SentenceTransformer("all-MiniLM-L6-v2")
-    logger.info("Embedding model loaded successfully")
-except Exception as e:
-    logger.error(f"Failed to initialize embedding model: {str(e)}")
-    embedding_model = None
-
-
-def _calculate_similarity_np(query_embedding, doc_embedding):
-    """Calculate cosine similarity between two embeddings using numpy."""
-    try:
-        query_vec = np.array(query_embedding)
-        doc_vec = np.array(doc_embedding)
-        
-        norm_q = np.linalg.norm(query_vec)
-        norm_d = np.linalg.norm(doc_vec)
-        
-        if norm_q == 0 or norm_d == 0:
-            return 0.0
-        
-        similarity = np.dot(query_vec, doc_vec) / (norm_q * norm_d)
-        return float(similarity)
-    except Exception as e:
-        logger.error(f"Error calculating similarity: {str(e)}")
-        return 0.0
 
 
 def _search_database_only(db, query, top_k):
@@ -47,6 +23,7 @@ def _search_database_only(db, query, top_k):
     Returns sorted results with similarity scores and Confluence links.
     """
     results = []
+    embedding_model = get_embedding_model_or_none()
     
     if not embedding_model:
         logger.error("Embedding model not initialized")
@@ -58,99 +35,65 @@ def _search_database_only(db, query, top_k):
         query_embedding = embedding_model.encode(query, show_progress_bar=False)
         logger.info(f"Query embedding shape: {query_embedding.shape}")
         
-        # Search uploads
-        uploads = db.query(Upload).all()
-        logger.info(f"Found {len(uploads)} uploads in database")
+        # Search uploads by their best-matching stored passage
+        chunk_matches = search_upload_chunks(db, query_embedding, top_k=None, min_similarity=-1.0)
+        logger.info(f"Found {len(chunk_matches)} upload passages in database")
         
-        for upload in uploads:
-            try:
-                upload_text = ""
-                if upload.content and isinstance(upload.content, dict):
-                    upload_text = upload.content.get("requirement", "")
-                
-                if upload_text and len(upload_text.strip()) > 0:
-                    upload_embedding = embedding_model.encode(upload_text, show_progress_bar=False)
-                    similarity = _calculate_similarity_np(query_embedding, upload_embedding)
-                    
-                    results.append({
-                        "type": "upload",
-                        "upload_id": upload.id,
-                        "upload_name": upload.filename,
-                        "similarity_score": round(similarity, 4),
-                        "similarity_percentage": round(similarity * 100, 2),
-                        "confluence_page_id": upload.confluence_page_id
-                    })
-            except Exception as e:
-                logger.error(f"Error processing upload {upload.id}: {str(e)}")
-                continue
+        for chunk, similarity in best_chunk_per_upload(chunk_matches):
+            results.append({
+                "type": "upload",
+                "upload_id": chunk.upload.id,
+                "upload_name": chunk.upload.filename,
+                "similarity_score": round(similarity, 4),
+                "similarity_percentage": round(similarity * 100, 2),
+                "confluence_page_id": chunk.upload.confluence_page_id
+            })
         
         # Search epics
-        epics = db.query(Epic).all()
+        epics = db.query(Epic).options(undefer(Epic.content)).all()
         logger.info(f"Found {len(epics)} epics in database")
         
-        for epic in epics:
+        for epic, similarity in score_rows(query_embedding, epics, "epic", embedding_model):
             try:
-                epic_text = ""
-                if epic.name:
-                    epic_text = epic.name
-                if epic.content and isinstance(epic.content, dict):
-                    description = epic.content.get("description", "")
-                    if description:
-                        epic_text += " " + description
+                upload = db.query(Upload).filter(Upload.id == epic.upload_id).first()
                 
-                if epic_text and len(epic_text.strip()) > 0:
-                    epic_embedding = embedding_model.encode(epic_text, show_progress_bar=False)
-                    similarity = _calculate_similarity_np(query_embedding, epic_embedding)
-                    
-                    upload = db.query(Upload).filter(Upload.id == epic.upload_id).first()
-                    
-                    results.append({
-                        "type": "epic",
-                        "epic_id": epic.id,
-                        "epic_name": epic.name,
-                        "upload_id": epic.upload_id,
-                        "upload_name": upload.filename if upload else "Unknown",
-                        "similarity_score": round(similarity, 4),
-                        "similarity_percentage": round(similarity * 100, 2),
-                        "confluence_page_id": epic.confluence_page_id
-                    })
+                results.append({
+                    "type": "epic",
+                    "epic_id": epic.id,
+                    "epic_name": epic.name,
+                    "upload_id": epic.upload_id,
+                    "upload_name": upload.filename if upload else "Unknown",
+                    "similarity_score": round(similarity, 4),
+                    "similarity_percentage": round(similarity * 100, 2),
+                    "confluence_page_id": epic.confluence_page_id
+                })
             except Exception as e:
                 logger.error(f"Error processing epic {epic.id}: {str(e)}")
                 continue
         
         # Search test plans
-        test_plans = db.query(QA).filter(QA.type == "test_plan").all()
+        test_plans = db.query(QA).options(undefer(QA.content)).filter(QA.type == "test_plan").all()
         logger.info(f"Found {len(test_plans)} test plans in database")
         
-        for test_plan in test_plans:
+        for test_plan, similarity in score_rows(query_embedding, test_plans, "test_plan", embedding_model):
             try:
-                test_plan_text = ""
-                if test_plan.content and isinstance(test_plan.content, dict):
-                    title = test_plan.content.get("title", "")
-                    objective = test_plan.content.get("objective", "")
-                    test_plan_text = f"{title} {objective}"
+                epic = db.query(Epic).filter(Epic.id == test_plan.epic_id).first()
+                upload = None
+                if epic:
+                    upload = db.query(Upload).filter(Upload.id == epic.upload_id).first()
                 
-                if test_plan_text and len(test_plan_text.strip()) > 0:
-                    test_plan_embedding = embedding_model.encode(test_plan_text, show_progress_bar=False)
-                    similarity = _calculate_similarity_np(query_embedding, test_plan_embedding)
-                    
-                    epic = db.query(Epic).filter(Epic.id == test_plan.epic_id).first()
-                    upload = None
-                    if epic:
-                        upload = db.query(Upload).filter(Upload.id == epic.upload_id).first()
-                    
-                    results.append({
-                        "type": "test_plan",
-                        "test_plan_id": test_plan.id,
-                        "test_plan_title": test_plan.content.get("title", "Test Plan") if test_plan.content else "Test Plan",
-                        "epic_id": test_plan.epic_id,
-                        "epic_name": epic.name if epic else "Unknown",
-                        "upload_id": epic.upload_id if epic else None,
-                        "upload_name": upload.filename if upload else "Unknown",
-                        "similarity_score": round(similarity, 4),
-                        "similarity_percentage": round(similarity * 100, 2),
-                        "confluence_page_id": test_plan.confluence_page_id
-                    })
+                results.append({
+                    "type": "test_plan",
+                    "test_plan_id": test_plan.id,
+                    "test_plan_title": test_plan.content.get("title", "Test Plan") if test_plan.content else "Test Plan",
+                    "epic_id": test_plan.epic_id,
+                    "epic_name": epic.name if epic else "Unknown",
+                    "upload_id": epic.upload_id if epic else None,
+                    "upload_name": upload.filename if upload else "Unknown",
+                    "similarity_score": round(similarity, 4),
+                    "similarity_percentage": round(similarity * 100, 2),
+                    "confluence_page_id": test_plan.confluence_page_id
+                })
             except Exception as e:
                 logger.error(f"Error processing test_plan {test_plan.id}: {str(e)}")
                 continue
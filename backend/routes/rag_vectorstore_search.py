@@ -1,110 +1,84 @@
 from fastapi import APIRouter, HTTPException, Query, Depends
-import json
+from sqlalchemy.orm import undefer
 import os
 import logging
 from pathlib import Path
-import numpy as np
-from sentence_transformers import SentenceTransformer
 import sys
 
 # Add backend directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from models.file_model import Epic, QA, Upload
+from models.file_model import Epic, QA
 from config.db import get_db, get_db_context
 from config.auth import get_current_user, TokenData
+from config.config import VECTORSTORE_DIR
+from rag.embedder import get_embedding_model_or_none
+from rag.vectorstore import get_vectorstore
+from rag.row_embeddings import score_rows, testplan_text, epic_text as epic_row_text
+from rag.upload_chunks import search_upload_chunks
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-# Initialize embedding model
-try:
-    embedding_model = SentenceTransformer("all-MiniLM-L6-v2")
-    logger.info("Embedding model loaded successfully for vectorstore search")
-except Exception as e:
-    logger.error(f"Failed to initialize embedding model: {str(e)}")
-    embedding_model = None
 
 # Storage folder path
-STORAGE_FOLDER = Path(__file__).parent.parent / "storage"
+STORAGE_FOLDER = Path(VECTORSTORE_DIR)
 
 
 def _load_vectorstore_files():
-    """Load all vectorstore JSON files from storage folder."""
-    vectorstore_data = {}
+    """Open all vector stores in the storage folder, migrating legacy JSON files."""
+    stores = {}
     try:
         if not STORAGE_FOLDER.exists():
             logger.warning(f"Storage folder does not exist: {STORAGE_FOLDER}")
-            return vectorstore_data
+            return stores
         
-        # Find all JSON files in storage folder
-        json_files = list(STORAGE_FOLDER.glob("vectorstore*.json"))
-        logger.info(f"Found {len(json_files)} vectorstore JSON files")
+        # Legacy JSON stores are converted to the binary layout on first open
+        for json_file in STORAGE_FOLDER.glob("vectorstore*.json"):
+            get_vectorstore(store_path=str(json_file))
         
-        for json_file in json_files:
+        meta_files = list(STORAGE_FOLDER.glob("vectorstore*.meta.jsonl"))
+        logger.info(f"Found {len(meta_files)} vectorstore files")
+        
+        for meta_file in meta_files:
             try:
-                with open(json_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    vectorstore_data[json_file.stem] = data
-                    logger.info(f"Loaded vectorstore: {json_file.name}")
+                store_name = meta_file.name[:-len(".meta.jsonl")]
+                # Shared stores catch up with other writers when searched
+                stores[store_name] = get_vectorstore(store_path=str(STORAGE_FOLDER / f"{store_name}.json"))
             except Exception as e:
-                logger.error(f"Error loading {json_file.name}: {str(e)}")
+                logger.error(f"Error loading {meta_file.name}: {str(e)}")
                 continue
         
-        logger.info(f"Successfully loaded {len(vectorstore_data)} vectorstore files")
+        logger.info(f"Successfully loaded {len(stores)} vectorstores")
     except Exception as e:
         logger.error(f"Error accessing storage folder: {str(e)}")
     
-    return vectorstore_data
-
-
-def _calculate_similarity(query_embedding, doc_embedding):
-    """Calculate cosine similarity between two embeddings."""
-    try:
-        query_vec = np.array(query_embedding)
-        doc_vec = np.array(doc_embedding)
-        
-        norm_q = np.linalg.norm(query_vec)
-        norm_d = np.linalg.norm(doc_vec)
-        
-        if norm_q == 0 or norm_d == 0:
-            return 0.0
-        
-        similarity = np.dot(query_vec, doc_vec) / (norm_q * norm_d)
-        return float(similarity)
-    except Exception as e:
-        logger.error(f"Error calculating similarity: {str(e)}")
-        return 0.0
+    return stores
 
 
 def _search_vectorstore(query, top_k=5):
     """
-    Search through vectorstore JSON files.
+    Search through the vector stores in the storage folder.
     Returns top_k results sorted by similarity score.
     """
     results = []
+    embedding_model = get_embedding_model_or_none()
     
     if not embedding_model:
         logger.error("Embedding model not initialized")
         raise HTTPException(status_code=500, detail="Embedding model not available")
     
     try:
-        # Load all vectorstore files
-        vectorstore_data = _load_vectorstore_files()
+        stores = _load_vectorstore_files()
         
-        if not vectorstore_data:
+        if not stores:
             logger.warning("No vectorstore files found or loaded")
             return results
         
-        # Get query embedding
-        logger.info(f"Encoding query: '{query}'")
-        query_embedding = embedding_model.encode(query, show_progress_bar=False).tolist()
-        logger.info(f"Query embedding created with dimension: {len(query_embedding)}")
-        
-        # Search through all vectorstore files
-        for store_name, store_data in vectorstore_data.items():
-            _search_vectorstore_file(store_name, store_data, query_embedding, results)
+        logger.info(f"Searching vectorstores for: '{query}'")
+        for store_name, store in stores.items():
+            _search_vectorstore_file(store_name, store, query, top_k, results)
         
         logger.info(f"Total vectorstore results before sorting: {len(results)}")
     
@@ -122,44 +96,26 @@ def _search_vectorstore(query, top_k=5):
     return results
 
 
-def _search_vectorstore_file(store_name, store_data, query_embedding, results):
-    """Search a single vectorstore file and add results to list."""
-    logger.info(f"Searching in {store_name} with {len(store_data)} items")
+def _search_vectorstore_file(store_name, store, query, top_k, results):
+    """Search a single vector store and add results to list."""
+    logger.info(f"Searching in {store_name} with {len(store.data)} items")
     
-    for doc_key, doc_data in store_data.items():
-        try:
-            # Extract text and embedding from document
-            if isinstance(doc_data, dict):
-                text = doc_data.get("text", "")
-                doc_embedding = doc_data.get("embedding", None)
-                metadata = doc_data.get("metadata", {})
-                
-                # If no embedding in file, skip or compute
-                if not doc_embedding:
-                    logger.debug(f"No embedding found for {doc_key} in {store_name}, computing...")
-                    if text:
-                        doc_embedding = embedding_model.encode(text, show_progress_bar=False).tolist()
-                    else:
-                        continue
-                
-                # Calculate similarity
-                similarity = _calculate_similarity(query_embedding, doc_embedding)
-                
-                # Add to results if similarity is above threshold
-                if similarity > 0.1:  # Filter very low scores
-                    results.append({
-                        "source": "vectorstore",
-                        "vectorstore": store_name,
-                        "document_id": doc_key,
-                        "text": text[:500],  # Truncate text for response
-                        "full_text": text,  # Keep full text for reference
-                        "similarity_score": round(similarity, 4),
-                        "similarity_percentage": round(similarity * 100, 2),
-                        "metadata": metadata
-                    })
-        except Exception as e:
-            logger.error(f"Error processing document {doc_key} in {store_name}: {str(e)}")
-            continue
+    try:
+        for match in store.search(query, top_k=top_k, similarity_threshold=0.1):
+            similarity = match["similarity"]
+            text = match["text"]
+            results.append({
+                "source": "vectorstore",
+                "vectorstore": store_name,
+                "document_id": match["doc_id"],
+                "text": text[:500],  # Truncate text for response
+                "full_text": text,  # Keep full text for reference
+                "similarity_score": round(similarity, 4),
+                "similarity_percentage": round(similarity * 100, 2),
+                "metadata": match["metadata"]
+            })
+    except Exception as e:
+        logger.error(f"Error searching {store_name}: {str(e)}")
 
 
 def _search_database(query, top_k=5):
@@ -168,6 +124,7 @@ def _search_database(query, top_k=5):
     Returns results sorted by similarity score.
     """
     results = []
+    embedding_model = get_embedding_model_or_none()
     
     if not embedding_model:
         logger.error("Embedding model not initialized")
@@ -201,38 +158,29 @@ def _search_database(query, top_k=5):
 def _search_epics_in_db(db, query_embedding, results):
     """Search epics in database and add to results."""
     try:
-        epics = db.query(Epic).all()
+        epics = db.query(Epic).options(undefer(Epic.content)).all()
         logger.info(f"Found {len(epics)} epics in database")
         
-        for epic in epics:
+        for epic, similarity in score_rows(query_embedding, epics, "epic"):
             try:
-                epic_text = epic.name if epic.name else ""
-                if epic.content and isinstance(epic.content, dict):
-                    description = epic.content.get("description", "")
-                    if description:
-                        epic_text += " " + description
-                
-                if epic_text and len(epic_text.strip()) > 0:
-                    epic_embedding = embedding_model.encode(epic_text, show_progress_bar=False).tolist()
-                    similarity = _calculate_similarity(query_embedding, epic_embedding)
-                    
-                    if similarity > 0.1:  # Filter very low scores
-                        results.append({
-                            "source": "database",
+                if similarity > 0.1:  # Filter very low scores
+                    epic_text = epic_row_text(epic)
+                    results.append({
+                        "source": "database",
+                        "type": "epic",
+                        "document_id": f"epic_{epic.id}",
+                        "epic_id": epic.id,
+                        "epic_name": epic.name,
+                        "text": epic_text[:500],
+                        "full_text": epic_text,
+                        "similarity_score": round(similarity, 4),
+                        "similarity_percentage": round(similarity * 100, 2),
+                        "metadata": {
                             "type": "epic",
-                            "document_id": f"epic_{epic.id}",
-                            "epic_id": epic.id,
-                            "epic_name": epic.name,
-                            "text": epic_text[:500],
-                            "full_text": epic_text,
-                            "similarity_score": round(similarity, 4),
-                            "similarity_percentage": round(similarity * 100, 2),
-                            "metadata": {
-                                "type": "epic",
-                                "upload_id": epic.upload_id,
-                                "confluence_page_id": epic.confluence_page_id
-                            }
-                        })
+                            "upload_id": epic.upload_id,
+                            "confluence_page_id": epic.confluence_page_id
+                        }
+                    })
             except Exception as e:
                 logger.error(f"Error processing epic {epic.id}: {str(e)}")
                 continue
@@ -244,39 +192,30 @@ def _search_epics_in_db(db, query_embedding, results):
 def _search_test_plans_in_db(db, query_embedding, results):
     """Search test plans in database and add to results."""
     try:
-        test_plans = db.query(QA).filter(QA.type == "test_plan").all()
+        test_plans = db.query(QA).options(undefer(QA.content)).filter(QA.type == "test_plan").all()
         logger.info(f"Found {len(test_plans)} test plans in database")
         
-        for test_plan in test_plans:
+        for test_plan, similarity in score_rows(query_embedding, test_plans, "test_plan"):
             try:
-                test_plan_text = ""
-                if test_plan.content and isinstance(test_plan.content, dict):
-                    title = test_plan.content.get("title", "")
-                    objective = test_plan.content.get("objective", "")
-                    test_plan_text = f"{title} {objective}".strip()
-                
-                if test_plan_text and len(test_plan_text) > 0:
-                    test_plan_embedding = embedding_model.encode(test_plan_text, show_progress_bar=False).tolist()
-                    similarity = _calculate_similarity(query_embedding, test_plan_embedding)
-                    
-                    if similarity > 0.1:  # Filter very low scores
-                        results.append({
-                            "source": "database",
+                if similarity > 0.1:  # Filter very low scores
+                    test_plan_text = testplan_text(test_plan)
+                    results.append({
+                        "source": "database",
+                        "type": "test_plan",
+                        "document_id": f"test_plan_{test_plan.id}",
+                        "test_plan_id": test_plan.id,
+                        "test_plan_title": test_plan.content.get("title", "Test Plan") if test_plan.content else "Test Plan",
+                        "epic_id": test_plan.epic_id,
+                        "text": test_plan_text[:500],
+                        "full_text": test_plan_text,
+                        "similarity_score": round(similarity, 4),
+                        "similarity_percentage": round(similarity * 100, 2),
+                        "metadata": {
                             "type": "test_plan",
-                            "document_id": f"test_plan_{test_plan.id}",
-                            "test_plan_id": test_plan.id,
-                            "test_plan_title": test_plan.content.get("title", "Test Plan") if test_plan.content else "Test Plan",
                             "epic_id": test_plan.epic_id,
-                            "text": test_plan_text[:500],
-                            "full_text": test_plan_text,
-                            "similarity_score": round(similarity, 4),
-                            "similarity_percentage": round(similarity * 100, 2),
-                            "metadata": {
-                                "type": "test_plan",
-                                "epic_id": test_plan.epic_id,
-                                "confluence_page_id": test_plan.confluence_page_id
-                            }
-                        })
+                            "confluence_page_id": test_plan.confluence_page_id
+                        }
+                    })
             except Exception as e:
                 logger.error(f"Error processing test_plan {test_plan.id}: {str(e)}")
                 continue
@@ -285,56 +224,41 @@ def _search_test_plans_in_db(db, query_embedding, results):
         logger.error(f"Error searching test plans: {str(e)}")
 
 
-def _search_uploads_in_db(db, query_embedding, results, current_user: TokenData = None):
+def _search_uploads_in_db(db, query_embedding, results, current_user: TokenData = None, top_k: int = 10):
     """
-    Search through uploaded documents (from uploads table).
-    Returns results sorted by similarity score.
+    Search through the passages of uploaded documents (upload_chunks table).
+    Adds the top_k best passages, each with its source upload and offsets.
     """
     try:
-        # Get user's uploads
-        if current_user:
-            uploads = db.query(Upload).filter(Upload.user_id == current_user.user_id).all()
-        else:
-            uploads = db.query(Upload).all()
+        user_id = current_user.user_id if current_user else None
+        matches = search_upload_chunks(db, query_embedding, user_id=user_id, top_k=top_k)
+        logger.info(f"Found {len(matches)} matching upload passages")
         
-        logger.info(f"Searching {len(uploads)} uploads")
-        
-        for upload in uploads:
+        for chunk, similarity in matches:
             try:
-                # Get the requirement text from content
-                if upload.content and isinstance(upload.content, dict):
-                    text = upload.content.get("requirement", "")
-                else:
-                    text = str(upload.content) if upload.content else ""
-                
-                if not text or len(text) < 5:
-                    continue
-                
-                # Encode text
-                doc_embedding = embedding_model.encode(text, show_progress_bar=False).tolist()
-                
-                # Calculate similarity
-                similarity = _calculate_similarity(query_embedding, doc_embedding)
-                
-                # Add to results if similarity is above threshold
-                if similarity > 0.1:
-                    results.append({
-                        "source": "upload",
-                        "document_id": f"upload_{upload.id}",
+                upload = chunk.upload
+                results.append({
+                    "source": "upload",
+                    "document_id": f"upload_{upload.id}_chunk_{chunk.chunk_index}",
+                    "filename": upload.filename,
+                    "upload_id": upload.id,
+                    "chunk_index": chunk.chunk_index,
+                    "text": chunk.text[:500],  # Truncate text for response
+                    "full_text": chunk.text,  # Whole passage for reference
+                    "similarity_score": round(similarity, 4),
+                    "similarity_percentage": round(similarity * 100, 2),
+                    "metadata": {
+                        "type": "requirement",
                         "filename": upload.filename,
                         "upload_id": upload.id,
-                        "text": text[:500],  # Truncate text for response
-                        "full_text": text,  # Keep full text for reference
-                        "similarity_score": round(similarity, 4),
-                        "similarity_percentage": round(similarity * 100, 2),
-                        "metadata": {
-                            "type": "requirement",
-                            "filename": upload.filename,
-                            "upload_id": upload.id
-                        }
-                    })
+                        "chunk_index": chunk.chunk_index,
+                        "heading": chunk.heading,
+                        "start_offset": chunk.start_offset,
+                        "end_offset": chunk.end_offset
+                    }
+                })
             except Exception as e:
-                logger.error(f"Error processing upload {upload.id}: {str(e)}")
+                logger.error(f"Error processing upload chunk {chunk.id}: {str(e)}")
                 continue
     
     except Exception as e:
@@ -360,12 +284,13 @@ def rag_vectorstore_search(
         # Search both sources
         with get_db_context() as db:
             # Get query embedding
+            embedding_model = get_embedding_model_or_none()
             query_embedding = embedding_model.encode(query, show_progress_bar=False).tolist() if embedding_model else []
             
             all_results = []
             
             # Search uploads (user-specific)
-            _search_uploads_in_db(db, query_embedding, all_results, current_user)
+            _search_uploads_in_db(db, query_embedding, all_results, current_user, top_k)
             
             # Search database (epics and test plans)
             _search_epics_in_db(db, query_embedding, all_results)
@@ -1,4 +1,7 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException, Query, Depends
+from fastapi.concurrency import run_in_threadpool
+import hashlib
+import os
 import sys
 from pathlib import Path
 
@@ -9,9 +12,16 @@ from models.file_model import Upload, Epic
 from config.db import get_db, get_db_context
 from config.config import CONFLUENCE_URL
 from config.auth import get_current_user, TokenData
-from PyPDF2 import PdfReader
-from docx import Document
-from typing import Optional
+from rag.resource_index import epic_document
+from rag.row_embeddings import content_hash
+from rag.upload_chunks import embed_upload_chunks
+from rag.vectorstore import get_default_store
+from services.text_extraction import ExtractedText, UploadTooLargeError, extract_document_async, spool_upload
+from services.upload_dedup import DuplicatePolicy, find_duplicate_upload, resolve_duplicate
+from sqlalchemy.orm import undefer
+from typing import Literal, Optional, Tuple
+from utils.pagination import count_rows, page_info, paginate, sort_columns
+from utils.projection import INCLUDE_DESCRIPTION, include_content, list_columns
 import logging
 
 logger = logging.getLogger(__name__)
@@ -37,93 +47,168 @@ def get_confluence_page_url(page_id: str) -> Optional[str]:
 @router.post("/upload")
 async def upload_file(
     file: UploadFile = File(...),
+    on_duplicate: DuplicatePolicy = Query(
+        "new",
+        description="When the user already uploaded this file (same bytes or same text): "
+                    "process the file as new (duplicate_of names the earlier upload), "
+                    "reuse the earlier upload, or copy it into a new one"
+    ),
     current_user: TokenData = Depends(get_current_user),
 ):
+    """
+    Upload a requirement document (PDF, DOCX or text) and store its text.
+    
+    The file is spooled to disk in chunks and rejected with 413 once it
+    exceeds UPLOAD_MAX_BYTES. Text extraction and the database write run
+    off the event loop; large PDFs are extracted across worker processes.
+    
+    By default every file is processed and stored as a new upload. With
+    on_duplicate=reuse or copy, a file whose bytes match an earlier upload of
+    the user is not extracted again, and one whose extracted text matches is
+    not embedded again; see services/upload_dedup.py. In every case
+    duplicate_of names the earlier upload.
+    """
+    path = None
     try:
-        # Extract text from file
-        if file.filename.endswith(".pdf"):
-            reader = PdfReader(file.file)
-            text = "".join([p.extract_text() + "\n" for p in reader.pages])
-        elif file.filename.endswith(".docx"):
-            doc = Document(file.file)
-            text = "\n".join([p.text for p in doc.paragraphs])
-        else:
-            contents = await file.read()
-            try:
-                text = contents.decode("utf-8")
-            except UnicodeDecodeError:
-                text = contents.decode("latin1")
-
-        # Store as JSON
-        content_json = {"requirement": text}
-
-        # Store in DB
-        with get_db_context() as db:
-            upload_obj = Upload(
-                filename=file.filename, 
-                content=content_json,
-                user_id=current_user.user_id
-            )
-            db.add(upload_obj)
-            db.commit()      # <-- commit transaction
-            db.refresh(upload_obj)  # <-- refresh to get the ID
-            
-            logger.info(f"Stored upload {upload_obj.id} in database")
-
+        digest = hashlib.sha256()
+        path = await run_in_threadpool(spool_upload, file.file, digest=digest)
+        file_hash = digest.hexdigest()
+        duplicate = await run_in_threadpool(
+            _resolve_duplicate, on_duplicate, file.filename, current_user.user_id, file_hash=file_hash
+        )
+        if duplicate:
+            return duplicate
+        
+        extracted = await extract_document_async(path, file.filename)
+        duplicate = await run_in_threadpool(
+            _resolve_duplicate, on_duplicate, file.filename, current_user.user_id,
+            file_hash=file_hash, text_hash=content_hash(extracted.text)
+        )
+        if duplicate:
+            return duplicate
+        
+        upload_id, duplicate_of = await run_in_threadpool(
+            _store_upload, file.filename, extracted, current_user.user_id, file_hash
+        )
+        
         return {
             "message": "File uploaded successfully",
-            "upload_id": upload_obj.id
+            "upload_id": upload_id,
+            "duplicate_of": duplicate_of
         }
 
+    except UploadTooLargeError as e:
+        logger.warning(f"Rejected upload {file.filename}: {str(e)}")
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except Exception as e:
         import traceback
         traceback.print_exc()
         logger.error(f"Error uploading file: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if path:
+            os.unlink(path)
+
+
+def _resolve_duplicate(policy: DuplicatePolicy, filename: str, user_id: int, **hashes) -> Optional[dict]:
+    """resolve_duplicate in its own session; the epics of a copy are indexed once it is committed"""
+    documents = []
+    with get_db_context() as db:
+        response = resolve_duplicate(db, policy, filename, user_id, **hashes)
+        if response and response["upload_id"] != response["duplicate_of"]:
+            documents = [
+                epic_document(epic)
+                for epic in db.query(Epic).options(undefer(Epic.content)).filter(Epic.upload_id == response["upload_id"])
+            ]
+    if documents:
+        try:
+            get_default_store().store_documents(documents)
+        except Exception as e:
+            logger.warning(f"Could not index copied epics of upload {response['upload_id']}: {str(e)}")
+    return response
+
+
+def _store_upload(filename: str, extracted: ExtractedText, user_id: int,
+                  file_hash: Optional[str] = None) -> Tuple[int, Optional[int]]:
+    """Store the extracted text with its embedded chunks; return the upload ID and the earlier duplicate's ID"""
+    # Store as JSON
+    content_json = {"requirement": extracted.text}
+    
+    upload_obj = Upload(
+        filename=filename,
+        content=content_json,
+        page_offsets=extracted.page_offsets,
+        file_hash=file_hash,
+        text_hash=content_hash(extracted.text),
+        user_id=user_id
+    )
+    # Store the chunk embeddings so RAG search doesn't re-encode the document per query
+    embed_upload_chunks(upload_obj)
+    with get_db_context() as db:
+        duplicate = find_duplicate_upload(db, user_id, file_hash, upload_obj.text_hash)
+        db.add(upload_obj)
+        db.commit()
+        
+        logger.info(f"Stored upload {upload_obj.id} in database")
+        return upload_obj.id, duplicate.id if duplicate else None
 
 
 @router.get("/uploads")
 def get_all_uploads(
     page: int = Query(1, ge=1),
     page_size: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page; replaces page"),
+    total: Literal["exact", "approximate", "none"] = Query("exact", description="How to count the total"),
+    include: Optional[str] = Query(None, description=INCLUDE_DESCRIPTION),
     current_user: TokenData = Depends(get_current_user),
 ):
     """Get all uploaded files for current user with pagination. Returns file info with first epic's Confluence link if available."""
+    with_content = include_content(include)
     try:
         with get_db_context() as db:
-            # Get total count for current user only
-            total_count = db.query(Upload).filter(Upload.user_id == current_user.user_id).count()
+            query = (
+                db.query(Upload)
+                .options(list_columns(Upload, "filename", "created_at", content=with_content))
+                .filter(Upload.user_id == current_user.user_id)
+            )
+            total_count, is_estimate = count_rows(query, total)
             
-            # Calculate offset
-            offset = (page - 1) * page_size
+            # Newest first, by keyset when a cursor is given
+            uploads, next_cursor = paginate(query, sort_columns(Upload, "created_at"), page_size, True, cursor, page)
             
-            # Get paginated results for current user only
-            uploads = db.query(Upload).filter(Upload.user_id == current_user.user_id).order_by(Upload.created_at.desc()).offset(offset).limit(page_size).all()
+            # First epic of every upload on the page, in one query, for the Confluence link
+            first_epic_pages = {}
+            if uploads:
+                epic_rows = (
+                    db.query(Epic.upload_id, Epic.confluence_page_id)
+                    .filter(Epic.upload_id.in_([upload.id for upload in uploads]))
+                    .order_by(Epic.upload_id, Epic.id)
+                    .all()
+                )
+                for upload_id, page_id in epic_rows:
+                    first_epic_pages.setdefault(upload_id, page_id)
             
             upload_list = []
             for upload in uploads:
-                # Get the first epic for this upload to get Confluence link
-                first_epic = db.query(Epic).filter(Epic.upload_id == upload.id).first()
-                
+                page_id = first_epic_pages.get(upload.id)
                 upload_data = {
                     "id": upload.id,
                     "filename": upload.filename,
                     "created_at": upload.created_at,
-                    "confluence_page_url": get_confluence_page_url(first_epic.confluence_page_id) if first_epic else None
+                    "confluence_page_url": get_confluence_page_url(page_id) if page_id else None
                 }
+                if with_content:
+                    upload_data["content"] = upload.content
                 upload_list.append(upload_data)
             
-            # Calculate pagination info
-            total_pages = (total_count + page_size - 1) // page_size
-            
             return {
                 "message": "Uploads retrieved successfully",
                 "total_uploads": total_count,
-                "current_page": page,
-                "page_size": page_size,
-                "total_pages": total_pages,
+                **page_info(total_count, page, page_size, next_cursor, is_estimate),
                 "uploads": upload_list
             }
+    except HTTPException:
+        raise
     except Exception as e:
         import traceback
         traceback.print_exc()
@@ -0,0 +1,329 @@
+"""Outbox for Confluence publication.
+
+Generation code commits its epics and test plans together with a
+``ConfluenceOutbox`` row and returns; it never talks to Confluence while
+holding a database connection. A background worker claims pending rows,
+reads what to publish in a short session, publishes with no session open,
+then records the page IDs and the outcome in a second short session.
+
+Publishing only creates pages for rows that have no ``confluence_page_id``
+yet, so an entry can be retried or replayed after a failure without
+duplicating pages. Failed attempts are retried with exponential backoff
+until ``CONFLUENCE_OUTBOX_MAX_ATTEMPTS``, then left as ``failed`` for
+``replay_failed``.
+
+A claim is stamped with ``claimed_at``. Entries still in progress after
+``CONFLUENCE_OUTBOX_LEASE_SECONDS`` were abandoned by a worker that
+stopped, and go back to pending; younger claims belong to a live worker,
+possibly in another process, and are left alone.
+"""
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import exists, or_
+from sqlalchemy.orm import Session, aliased, selectinload
+
+from config.config import (
+    CONFLUENCE_OUTBOX_BATCH_SIZE,
+    CONFLUENCE_OUTBOX_LEASE_SECONDS,
+    CONFLUENCE_OUTBOX_MAX_ATTEMPTS,
+    CONFLUENCE_OUTBOX_POLL_SECONDS,
+    CONFLUENCE_ROOT_FOLDER_ID,
+)
+from config.db import get_db_context
+from models.file_model import ConfluenceOutbox, Epic, QA, Upload
+from services.confluence_publisher import (
+    PageSpec,
+    epic_page_spec,
+    get_confluence_publisher,
+    iter_pages,
+    save_page_ids,
+    testplan_page_spec,
+    upload_page_spec,
+)
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_PENDING = "pending"
+OUTBOX_IN_PROGRESS = "in_progress"
+OUTBOX_DONE = "done"
+OUTBOX_FAILED = "failed"
+
+# Seconds before the first retry of a failed entry; doubles per attempt
+OUTBOX_RETRY_BASE_SECONDS = 30
+
+
+def enqueue_publication(db: Session, upload_id: int, epic_id: Optional[int] = None,
+                        user_id: Optional[int] = None) -> ConfluenceOutbox:
+    """
+    Add an outbox entry in the caller's transaction; it is published once committed.
+
+    Args:
+        db: Session holding the generated rows
+        upload_id: Upload whose page tree to publish
+        epic_id: Only this epic and its test plans; None publishes every epic
+        user_id: Owner, for listing and replaying entries
+
+    Returns:
+        The pending entry (flushed, so it has an ID)
+    """
+    entry = ConfluenceOutbox(upload_id=upload_id, epic_id=epic_id, user_id=user_id, status=OUTBOX_PENDING)
+    db.add(entry)
+    db.flush()
+    return entry
+
+
+def build_page_tree(db: Session, upload_id: int, epic_id: Optional[int] = None) -> Optional[PageSpec]:
+    """
+    Upload > epics > test plans tree with already published pages marked by their page IDs.
+
+    Returns:
+        Root page, or None if the upload no longer exists
+    """
+    upload = (
+        db.query(Upload)
+        .options(selectinload(Upload.epics).undefer(Epic.content).selectinload(Epic.qa).undefer(QA.content))
+        .filter(Upload.id == upload_id)
+        .first()
+    )
+    if upload is None:
+        return None
+
+    root = upload_page_spec(upload)
+    root.page_id = upload.confluence_page_id
+    for epic in upload.epics:
+        if epic_id is not None and epic.id != epic_id:
+            continue
+        epic_data = epic.content if isinstance(epic.content, dict) else {"description": epic.content}
+        epic_page = epic_page_spec(epic.id, {**epic_data, "name": epic_data.get("name") or epic.name})
+        epic_page.page_id = epic.confluence_page_id
+        for qa in epic.qa:
+            if qa.type != "test_plan":
+                continue
+            testplan_page = testplan_page_spec(qa.id, qa.content if isinstance(qa.content, dict) else {})
+            testplan_page.page_id = qa.confluence_page_id
+            epic_page.children.append(testplan_page)
+        root.children.append(epic_page)
+    return root
+
+
+def claim_pending(limit: int = CONFLUENCE_OUTBOX_BATCH_SIZE) -> List[int]:
+    """
+    Mark up to limit due entries in_progress and return their IDs.
+
+    Claims are serialized per upload: the uploads' rows are locked (skipping
+    any another worker holds) and the in-progress check is repeated under the
+    lock, so two workers never create the same upload's missing pages at once.
+    Entries of the same upload claimed together are published one after the
+    other by process_outbox.
+    """
+    busy = aliased(ConfluenceOutbox)
+    with get_db_context() as db:
+        candidates = (
+            db.query(ConfluenceOutbox)
+            .filter(
+                ConfluenceOutbox.status == OUTBOX_PENDING,
+                ConfluenceOutbox.available_at <= datetime.utcnow(),
+                ~exists().where(busy.upload_id == ConfluenceOutbox.upload_id, busy.status == OUTBOX_IN_PROGRESS)
+            )
+            .order_by(ConfluenceOutbox.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        upload_ids = {entry.upload_id for entry in candidates}
+        locked = {
+            upload_id for (upload_id,) in
+            db.query(Upload.id).filter(Upload.id.in_(upload_ids)).with_for_update(skip_locked=True)
+        } if upload_ids else set()
+        # Another worker may have claimed one of these uploads and committed since the first query
+        in_progress = {
+            upload_id for (upload_id,) in
+            db.query(ConfluenceOutbox.upload_id).filter(
+                ConfluenceOutbox.upload_id.in_(locked), ConfluenceOutbox.status == OUTBOX_IN_PROGRESS
+            )
+        } if locked else set()
+        entries = [entry for entry in candidates if entry.upload_id in locked - in_progress]
+        now = datetime.utcnow()
+        for entry in entries:
+            entry.status = OUTBOX_IN_PROGRESS
+            entry.claimed_at = now
+            entry.attempts += 1
+        db.commit()
+        return [entry.id for entry in entries]
+
+
+def process_entry(entry_id: int) -> str:
+    """
+    Publish one claimed entry and record the outcome.
+
+    Returns:
+        The entry's new status
+    """
+    with get_db_context() as db:
+        entry = db.get(ConfluenceOutbox, entry_id)
+        root = build_page_tree(db, entry.upload_id, entry.epic_id) if entry else None
+
+    # No database connection is held while Confluence is called
+    errors = []
+    if root is not None:
+        get_confluence_publisher().publish(root, CONFLUENCE_ROOT_FOLDER_ID)
+        errors = [node.error for node in iter_pages(root) if node.error]
+
+    with get_db_context() as db:
+        if root is not None:
+            save_page_ids(db, root)
+        entry = db.get(ConfluenceOutbox, entry_id)
+        if entry is None:
+            return OUTBOX_DONE
+        entry.claimed_at = None
+        if not errors:
+            entry.status = OUTBOX_DONE
+            entry.last_error = None
+        elif entry.attempts >= CONFLUENCE_OUTBOX_MAX_ATTEMPTS:
+            entry.status = OUTBOX_FAILED
+            entry.last_error = errors[0][:1000]
+        else:
+            entry.status = OUTBOX_PENDING
+            entry.last_error = errors[0][:1000]
+            delay = OUTBOX_RETRY_BASE_SECONDS * (2 ** (entry.attempts - 1))
+            entry.available_at = datetime.utcnow() + timedelta(seconds=delay)
+        db.commit()
+        if errors:
+            logger.warning(f"Confluence outbox entry {entry_id} attempt {entry.attempts} failed: {errors[0]}")
+        return entry.status
+
+
+def process_outbox(limit: int = CONFLUENCE_OUTBOX_BATCH_SIZE) -> Dict[str, int]:
+    """
+    Claim and publish due entries.
+
+    Returns:
+        Count of processed entries per resulting status
+    """
+    counts: Dict[str, int] = {}
+    _requeue_expired()
+    for entry_id in claim_pending(limit):
+        try:
+            result = process_entry(entry_id)
+        except Exception as e:
+            logger.error(f"Confluence outbox entry {entry_id} crashed: {str(e)}", exc_info=True)
+            result = _release(entry_id, str(e))
+        counts[result] = counts.get(result, 0) + 1
+    return counts
+
+
+def replay_failed(db: Session, user_id: Optional[int] = None, entry_id: Optional[int] = None) -> int:
+    """
+    Put failed entries back in the queue with a fresh attempt budget.
+
+    Returns:
+        Number of entries requeued
+    """
+    query = db.query(ConfluenceOutbox).filter(ConfluenceOutbox.status == OUTBOX_FAILED)
+    if user_id is not None:
+        query = query.filter(ConfluenceOutbox.user_id == user_id)
+    if entry_id is not None:
+        query = query.filter(ConfluenceOutbox.id == entry_id)
+    requeued = query.update(
+        {"status": OUTBOX_PENDING, "attempts": 0, "available_at": datetime.utcnow()},
+        synchronize_session=False
+    )
+    db.commit()
+    if requeued:
+        notify_outbox_worker()
+    return requeued
+
+
+def outbox_entry_response(entry: ConfluenceOutbox) -> Dict[str, Any]:
+    return {
+        "id": entry.id,
+        "upload_id": entry.upload_id,
+        "epic_id": entry.epic_id,
+        "status": entry.status,
+        "attempts": entry.attempts,
+        "last_error": entry.last_error,
+        "created_at": entry.created_at,
+        "available_at": entry.available_at
+    }
+
+
+def _release(entry_id: int, error: str) -> str:
+    """Return a crashed entry to the queue so it is not stuck in_progress"""
+    try:
+        with get_db_context() as db:
+            entry = db.get(ConfluenceOutbox, entry_id)
+            if entry is None:
+                return OUTBOX_DONE
+            entry.status = OUTBOX_FAILED if entry.attempts >= CONFLUENCE_OUTBOX_MAX_ATTEMPTS else OUTBOX_PENDING
+            entry.claimed_at = None
+            entry.last_error = error[:1000]
+            return entry.status
+    except Exception as e:
+        logger.error(f"Could not release Confluence outbox entry {entry_id}: {str(e)}")
+        return OUTBOX_IN_PROGRESS
+
+
+def _requeue_expired() -> int:
+    """Entries whose claim is older than the lease (or predates claimed_at) go back to pending"""
+    cutoff = datetime.utcnow() - timedelta(seconds=CONFLUENCE_OUTBOX_LEASE_SECONDS)
+    try:
+        with get_db_context() as db:
+            requeued = (
+                db.query(ConfluenceOutbox)
+                .filter(
+                    ConfluenceOutbox.status == OUTBOX_IN_PROGRESS,
+                    or_(ConfluenceOutbox.claimed_at.is_(None), ConfluenceOutbox.claimed_at < cutoff)
+                )
+                .update({"status": OUTBOX_PENDING, "claimed_at": None}, synchronize_session=False)
+            )
+    except Exception as e:
+        logger.error(f"Could not requeue interrupted Confluence outbox entries: {str(e)}")
+        return 0
+    if requeued:
+        logger.info(f"Requeued {requeued} interrupted Confluence outbox entries")
+    return requeued
+
+
+_worker_thread: Optional[threading.Thread] = None
+_worker_stop = threading.Event()
+_worker_wake = threading.Event()
+
+
+def notify_outbox_worker() -> None:
+    """Wake the worker now instead of at its next poll, e.g. right after enqueueing"""
+    _worker_wake.set()
+
+
+def _worker_loop(interval: float) -> None:
+    while not _worker_stop.is_set():
+        try:
+            process_outbox()
+        except Exception as e:
+            logger.error(f"Confluence outbox pass failed: {str(e)}")
+        _worker_wake.wait(interval)
+        _worker_wake.clear()
+
+
+def start_outbox_worker(interval: float = CONFLUENCE_OUTBOX_POLL_SECONDS) -> None:
+    """Start the background thread that publishes outbox entries every interval seconds"""
+    global _worker_thread
+    if _worker_thread is not None and _worker_thread.is_alive():
+        return
+    # Expired claims are requeued by every pass, so a live worker's entries are never taken over
+    _worker_stop.clear()
+    _worker_thread = threading.Thread(target=_worker_loop, args=(interval,), name="confluence-outbox", daemon=True)
+    _worker_thread.start()
+    logger.info(f"Started Confluence outbox worker (every {interval}s)")
+
+
+def stop_outbox_worker() -> None:
+    """Stop the worker after its current pass"""
+    global _worker_thread
+    _worker_stop.set()
+    _worker_wake.set()
+    if _worker_thread is not None:
+        _worker_thread.join()
+        _worker_thread = None
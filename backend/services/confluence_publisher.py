@@ -0,0 +1,264 @@
+"""Concurrent Confluence publishing for generated content.
+
+A publish run is a tree of ``PageSpec`` nodes, e.g. upload folder > epics >
+test plans. Each page is created as soon as its parent page exists, and
+siblings are created in parallel on a bounded thread pool that shares one
+pooled HTTP session. 429 and 5xx responses are retried with exponential
+backoff, honouring ``Retry-After``. Once the tree is published the page IDs
+are written back with one batched UPDATE per table (``save_page_ids``).
+"""
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from config.config import (
+    CONFLUENCE_MAX_RETRIES,
+    CONFLUENCE_MAX_WORKERS,
+    CONFLUENCE_PASSWORD,
+    CONFLUENCE_RETRY_BACKOFF_SECONDS,
+    CONFLUENCE_SPACE_KEY,
+    CONFLUENCE_TIMEOUT_SECONDS,
+    CONFLUENCE_URL,
+    CONFLUENCE_USERNAME,
+)
+from models.file_model import Epic, QA, Upload
+from utils.confluence_helper import add_timestamp, create_confluence_html_content
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_BACKOFF_SECONDS = 30.0
+
+
+class ConfluencePublishError(Exception):
+    """Raised when Confluence rejects a page or retries are exhausted"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+@dataclass
+class PageSpec:
+    """
+    A page to publish, the row that records its ID, and its child pages.
+
+    A node whose page_id is already set is an existing page: it is not
+    created again, only its children are, which makes re-publishing a
+    partly published tree safe.
+    """
+    title: str
+    body: str
+    model: Any = None  # ORM model with a confluence_page_id column
+    row_id: Optional[int] = None
+    children: List["PageSpec"] = field(default_factory=list)
+    page_id: Optional[str] = None
+    error: Optional[str] = None
+
+
+def iter_pages(root: PageSpec) -> Iterator[PageSpec]:
+    """Every page in the tree, parents before children"""
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        yield node
+        stack.extend(reversed(node.children))
+
+
+class ConfluencePublisher:
+    """Creates Confluence pages over a shared HTTP session with bounded concurrency and retries"""
+
+    def __init__(self, url: Optional[str] = CONFLUENCE_URL, username: Optional[str] = CONFLUENCE_USERNAME,
+                 password: Optional[str] = CONFLUENCE_PASSWORD, space_key: Optional[str] = CONFLUENCE_SPACE_KEY,
+                 max_workers: int = CONFLUENCE_MAX_WORKERS, max_retries: int = CONFLUENCE_MAX_RETRIES,
+                 backoff_seconds: float = CONFLUENCE_RETRY_BACKOFF_SECONDS,
+                 timeout: float = CONFLUENCE_TIMEOUT_SECONDS):
+        self.url = (url or "").rstrip("/")
+        self.space_key = space_key
+        self.max_workers = max(1, max_workers)
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.timeout = timeout
+        self.session = requests.Session()
+        if username:
+            self.session.auth = (username, password or "")
+        self.session.headers.update({"Content-Type": "application/json", "Accept": "application/json"})
+        # One keep-alive connection per worker
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def create_page(self, title: str, body: str, parent_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Create one page in storage representation, retrying 429/5xx and connection errors.
+
+        Raises:
+            ConfluencePublishError: If Confluence rejects the page or every attempt failed
+        """
+        payload = {
+            "type": "page",
+            "title": title,
+            "space": {"key": self.space_key},
+            "body": {"storage": {"value": body, "representation": "storage"}}
+        }
+        if parent_id:
+            payload["ancestors"] = [{"id": str(parent_id)}]
+
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+            try:
+                response = self.session.post(f"{self.url}/rest/api/content", json=payload, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if last_attempt:
+                    raise ConfluencePublishError(f"Confluence unreachable creating '{title}': {str(e)}")
+                self._backoff(attempt, None)
+                continue
+
+            if response.status_code < 300:
+                page = response.json()
+                logger.info(f"Created Confluence page: {title} (ID: {page.get('id')})")
+                return page
+            if response.status_code not in RETRY_STATUSES or last_attempt:
+                raise ConfluencePublishError(
+                    f"Confluence returned {response.status_code} creating '{title}': {response.text[:200]}",
+                    response.status_code
+                )
+            logger.warning(f"Confluence returned {response.status_code} creating '{title}', retrying")
+            self._backoff(attempt, response.headers.get("Retry-After"))
+        raise ConfluencePublishError(f"Could not create '{title}'")  # not reached
+
+    def publish(self, root: PageSpec, parent_id: Optional[str] = None) -> PageSpec:
+        """
+        Publish a page tree; each page is created once its parent exists.
+
+        Failures are recorded on the node (``error``) and its descendants are
+        skipped; other branches carry on.
+
+        Args:
+            root: Top page of the tree
+            parent_id: Existing page to publish the root under
+
+        Returns:
+            The same tree with page_id or error set on every node
+        """
+        return self.publish_many([root], parent_id)[0]
+
+    def publish_many(self, roots: List[PageSpec], parent_id: Optional[str] = None) -> List[PageSpec]:
+        """Publish sibling page trees under the same existing parent page"""
+        if not roots:
+            return roots
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="confluence") as pool:
+            pending = {pool.submit(self._publish_node, root, parent_id) for root in roots}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    node = future.result()
+                    if node.page_id:
+                        pending.update(pool.submit(self._publish_node, child, node.page_id) for child in node.children)
+                        continue
+                    for child in node.children:
+                        for skipped in iter_pages(child):
+                            skipped.error = f"Parent page '{node.title}' was not created"
+        return roots
+
+    def close(self) -> None:
+        self.session.close()
+
+    def _publish_node(self, node: PageSpec, parent_id: Optional[str]) -> PageSpec:
+        if node.page_id:
+            return node
+        try:
+            node.page_id = str(self.create_page(node.title, node.body, parent_id)["id"])
+        except Exception as e:
+            logger.error(f"Failed to create Confluence page '{node.title}': {str(e)}")
+            node.error = str(e)
+        return node
+
+    def _backoff(self, attempt: int, retry_after: Optional[str]) -> None:
+        delay = self.backoff_seconds * (2 ** attempt)
+        if retry_after:
+            try:
+                delay = float(retry_after)
+            except ValueError:
+                pass
+        time.sleep(min(delay, MAX_BACKOFF_SECONDS))
+
+
+def save_page_ids(db: Session, *roots: PageSpec) -> int:
+    """
+    Record the published page IDs of one or more trees with one batched UPDATE per table.
+
+    Returns:
+        Number of rows updated
+    """
+    by_model: Dict[Any, List[Dict[str, Any]]] = {}
+    for node in (page for root in roots for page in iter_pages(root)):
+        if node.page_id and node.model is not None and node.row_id is not None:
+            by_model.setdefault(node.model, []).append({"id": node.row_id, "confluence_page_id": node.page_id})
+
+    for model, rows in by_model.items():
+        db.execute(update(model), rows)
+    db.commit()
+    return sum(len(rows) for rows in by_model.values())
+
+
+def upload_page_spec(upload) -> PageSpec:
+    """Folder page for an upload"""
+    return PageSpec(
+        title=add_timestamp(upload.filename),
+        body=f"<h2>Requirements Upload: {upload.filename}</h2>",
+        model=Upload,
+        row_id=upload.id
+    )
+
+
+def epic_page_spec(epic_id: int, epic_data: Dict[str, Any]) -> PageSpec:
+    """Page for a generated epic"""
+    epic_name = epic_data.get("name", "Epic")
+    return PageSpec(
+        title=add_timestamp(epic_name),
+        body=create_confluence_html_content(
+            epic_name,
+            epic_data,
+            {"acceptanceCriteria": {"is_list": True, "heading_level": 3}}
+        ),
+        model=Epic,
+        row_id=epic_id
+    )
+
+
+def testplan_page_spec(testplan_id: int, testplan_data: Dict[str, Any]) -> PageSpec:
+    """Page for a generated test plan"""
+    title = testplan_data.get("title", "Test Plan")
+    return PageSpec(
+        title=add_timestamp(title),
+        body=create_confluence_html_content(
+            f"Test Plan: {title}",
+            testplan_data,
+            {"testScenarios": {"is_list": True, "heading_level": 3}}
+        ),
+        model=QA,
+        row_id=testplan_id
+    )
+
+
+_publisher: Optional[ConfluencePublisher] = None
+_publisher_lock = threading.Lock()
+
+
+def get_confluence_publisher() -> ConfluencePublisher:
+    """Process-wide publisher, so every request reuses the same connection pool"""
+    global _publisher
+    if _publisher is None:
+        with _publisher_lock:
+            if _publisher is None:
+                _publisher = ConfluencePublisher()
+    return _publisher
@@ -1,14 +1,18 @@
 """Unified generation service for all content types (epics, stories, QA, test plans)"""
+import asyncio
 import logging
-import uuid
-from typing import Dict, List, Any, Optional, Tuple
+from contextlib import contextmanager
+from typing import AsyncIterator, Dict, List, Any, Optional, Tuple
 from datetime import datetime
 
 from sqlalchemy.orm import Session
 
-from config.gemini import generate_json
+from config.db import get_db_context
+from config.gemini import generate_json, agenerate_json, astream_json_items
 from models.file_model import Epic, Story, QA, Upload
-from rag.vectorstore import VectorStore
+from rag.vectorstore import get_default_store
+from rag.resource_index import epic_document, story_document, qa_document
+from rag.row_embeddings import embed_new_rows
 from utils.json_parser import parse_model_json, ensure_dict_list
 from utils.error_handler import ProcessingError, ResourceNotFoundError, ValidationError
 
@@ -25,9 +29,13 @@ class ContentGenerationService:
         "test_plan": "test_plan"
     }
     
-    def __init__(self, db: Session):
+    def __init__(self, db: Optional[Session] = None, use_cache: bool = True):
+        # None makes every read and save use its own short session (for streaming responses)
         self.db = db
-        self.vectorstore = VectorStore()
+        # Shared with the indexing routes, so both append to the same rows
+        self.vectorstore = get_default_store()
+        # False bypasses the LLM response cache for this service's generations
+        self.use_cache = use_cache
     
     def generate_epics(self, upload_id: int, prompt_template: str) -> List[Dict[str, Any]]:
         """
@@ -52,7 +60,8 @@ class ContentGenerationService:
         try:
             # Generate from Gemini
             prompt = prompt_template.format(requirement_text=upload_obj.content)
-            epics_raw = generate_json(prompt)
+            self._end_read()
+            epics_raw = generate_json(prompt, use_cache=self.use_cache)
             epics_list = ensure_dict_list(epics_raw)
             
             logger.info(f"Generated {len(epics_list)} epics from upload {upload_id}")
@@ -88,7 +97,8 @@ class ContentGenerationService:
         try:
             # Generate from Gemini
             prompt = prompt_template.format(epic_content=epic_obj.content)
-            stories_raw = generate_json(prompt)
+            self._end_read()
+            stories_raw = generate_json(prompt, use_cache=self.use_cache)
             stories_list = ensure_dict_list(stories_raw)
             
             logger.info(f"Generated {len(stories_list)} stories from epic {epic_id}")
@@ -101,6 +111,112 @@ class ContentGenerationService:
                 operation="generate_stories"
             )
     
+    async def agenerate_stories(self, epic_id: int, prompt_template: str) -> List[Dict[str, Any]]:
+        """
+        Generate stories from epic content without blocking the event loop on Gemini.
+        
+        Args:
+            epic_id: ID of the epic
+            prompt_template: Prompt template with {epic_content} placeholder
+            
+        Returns:
+            List of generated story dictionaries
+            
+        Raises:
+            ResourceNotFoundError: If epic not found
+            ProcessingError: If generation fails
+        """
+        # Fetch epic
+        epic_obj = self.db.query(Epic).filter(Epic.id == epic_id).first()
+        if not epic_obj:
+            raise ResourceNotFoundError("Epic", epic_id)
+        
+        try:
+            # Generate from Gemini
+            prompt = prompt_template.format(epic_content=epic_obj.content)
+            self._end_read()
+            stories_raw = await agenerate_json(prompt, use_cache=self.use_cache)
+            stories_list = ensure_dict_list(stories_raw)
+            
+            logger.info(f"Generated {len(stories_list)} stories from epic {epic_id}")
+            return stories_list
+            
+        except Exception as e:
+            logger.error(f"Failed to generate stories: {str(e)}")
+            raise ProcessingError(
+                f"Failed to generate stories: {str(e)}",
+                operation="generate_stories"
+            )
+    
+    async def astream_epics(self, upload_id: int, prompt_template: str) -> AsyncIterator[Tuple[int, Dict]]:
+        """
+        Generate epics from upload content, saving and yielding each one as soon as Gemini completes it.
+        
+        Args:
+            upload_id: ID of the upload
+            prompt_template: Prompt template with {requirement_text} placeholder
+            
+        Yields:
+            (epic_id, epic_data) for each saved epic
+            
+        Raises:
+            ResourceNotFoundError: If upload not found
+            ProcessingError: If generation fails
+        """
+        with self._session() as db:
+            upload_obj = db.query(Upload).filter(Upload.id == upload_id).first()
+            if not upload_obj:
+                raise ResourceNotFoundError("Upload", upload_id)
+            
+            prompt = prompt_template.format(requirement_text=upload_obj.content)
+            db.commit()
+        async for saved in self._astream_and_save(prompt, "epics", lambda items: self.save_epics(upload_id, items)):
+            yield saved
+    
+    async def astream_stories(self, epic_id: int, prompt_template: str) -> AsyncIterator[Tuple[int, Dict]]:
+        """
+        Generate stories from epic content, saving and yielding each one as soon as Gemini completes it.
+        
+        Args:
+            epic_id: ID of the epic
+            prompt_template: Prompt template with {epic_content} placeholder
+            
+        Yields:
+            (story_id, story_data) for each saved story
+            
+        Raises:
+            ResourceNotFoundError: If epic not found
+            ProcessingError: If generation fails
+        """
+        with self._session() as db:
+            epic_obj = db.query(Epic).filter(Epic.id == epic_id).first()
+            if not epic_obj:
+                raise ResourceNotFoundError("Epic", epic_id)
+            
+            prompt = prompt_template.format(epic_content=epic_obj.content)
+            db.commit()
+        async for saved in self._astream_and_save(prompt, "stories", lambda items: self.save_stories(epic_id, items)):
+            yield saved
+    
+    async def _astream_and_save(self, prompt: str, content_type: str, save) -> AsyncIterator[Tuple[int, Dict]]:
+        """Stream array items from Gemini and save each dict item in a worker thread"""
+        count = 0
+        try:
+            async for item in astream_json_items(prompt, use_cache=self.use_cache):
+                if not isinstance(item, dict):
+                    logger.warning(f"Skipping non-object {content_type} item: {str(item)[:100]}")
+                    continue
+                for saved in await asyncio.to_thread(save, [item]):
+                    count += 1
+                    yield saved
+        except Exception as e:
+            logger.error(f"Failed to stream {content_type}: {str(e)}")
+            raise ProcessingError(
+                f"Failed to generate {content_type}: {str(e)}",
+                operation=f"stream_{content_type}"
+            )
+        logger.info(f"Streamed {count} {content_type}")
+    
     def generate_qa(self, story_id: int, prompt_template: str) -> List[Dict[str, Any]]:
         """
         Generate QA test cases from story content.
@@ -124,7 +240,8 @@ class ContentGenerationService:
         try:
             # Generate from Gemini
             prompt = prompt_template.format(story_content=story_obj.content)
-            qa_raw = generate_json(prompt)
+            self._end_read()
+            qa_raw = generate_json(prompt, use_cache=self.use_cache)
             qa_list = ensure_dict_list(qa_raw)
             
             logger.info(f"Generated {len(qa_list)} QA test cases from story {story_id}")
@@ -160,7 +277,8 @@ class ContentGenerationService:
         try:
             # Generate from Gemini
             prompt = prompt_template.format(epic_content=epic_obj.content)
-            testplan_raw = generate_json(prompt)
+            self._end_read()
+            testplan_raw = generate_json(prompt, use_cache=self.use_cache)
             testplan_list = ensure_dict_list(testplan_raw)
             
             logger.info(f"Generated {len(testplan_list)} test plans from epic {epic_id}")
@@ -184,35 +302,42 @@ class ContentGenerationService:
         Returns:
             List of (epic_id, epic_data) tuples
         """
-        saved_epics = []
-        
-        for epic_data in epics_data:
-            try:
-                epic = Epic(
-                    upload_id=upload_id,
-                    name=epic_data.get("name", "Unnamed Epic"),
-                    content=epic_data
-                )
-                self.db.add(epic)
-                self.db.flush()  # Get generated ID
+        with self._session() as db:
+            saved_epics = []
+            epic_rows = []
+            vector_items = []
+            user_id = db.query(Upload.user_id).filter(Upload.id == upload_id).scalar()
+            
+            for epic_data in epics_data:
+                try:
+                    epic = Epic(
+                        upload_id=upload_id,
+                        user_id=user_id,
+                        name=epic_data.get("name", "Unnamed Epic"),
+                        content=epic_data
+                    )
+                    db.add(epic)
+                    db.flush()  # Get generated ID
                 
-                # Index in vectorstore
-                self._index_in_vectorstore(
-                    text=f"Epic: {epic.name}\nDescription: {epic_data.get('description', '')}",
-                    doc_type="epic",
-                    resource_id=epic.id,
-                    resource_name=epic.name
-                )
+                    # Queue for vectorstore indexing
+                    vector_items.append(epic_document(epic))
                 
-                saved_epics.append((epic.id, epic_data))
-                logger.debug(f"Saved epic {epic.id}: {epic.name}")
+                    epic_rows.append(epic)
+                    saved_epics.append((epic.id, epic_data))
+                    logger.debug(f"Saved epic {epic.id}: {epic.name}")
                 
-            except Exception as e:
-                logger.error(f"Failed to save epic: {str(e)}")
-                continue
-        
-        self.db.commit()
-        return saved_epics
+                except Exception as e:
+                    logger.error(f"Failed to save epic: {str(e)}")
+                    continue
+            
+            # Commit before encoding, so no transaction is open during it and
+            # nothing outside the database refers to rows that were rolled back
+            db.commit()
+            self._index_in_vectorstore(vector_items, "epic")
+            # Store row embeddings for database search in one batch
+            embed_new_rows(epic_rows, "epic")
+            db.commit()
+            return saved_epics
     
     def save_stories(self, epic_id: int, stories_data: List[Dict[str, Any]]) -> List[Tuple[int, Dict]]:
         """
@@ -225,105 +350,114 @@ class ContentGenerationService:
         Returns:
             List of (story_id, story_data) tuples
         """
-        saved_stories = []
-        
-        for story_data in stories_data:
-            try:
-                story = Story(
-                    epic_id=epic_id,
-                    name=story_data.get("name", "Unnamed Story"),
-                    content=story_data
-                )
-                self.db.add(story)
-                self.db.flush()  # Get generated ID
+        with self._session() as db:
+            saved_stories = []
+            vector_items = []
+            owner = db.query(Epic.upload_id, Epic.user_id).filter(Epic.id == epic_id).first()
+            
+            for story_data in stories_data:
+                try:
+                    story = Story(
+                        epic_id=epic_id,
+                        upload_id=owner.upload_id if owner else None,
+                        user_id=owner.user_id if owner else None,
+                        name=story_data.get("name", "Unnamed Story"),
+                        content=story_data
+                    )
+                    db.add(story)
+                    db.flush()  # Get generated ID
                 
-                # Index in vectorstore
-                criteria = ", ".join(story_data.get("acceptanceCriteria", []))
-                self._index_in_vectorstore(
-                    text=f"Story: {story.name}\nDescription: {story_data.get('description', '')}\nCriteria: {criteria}",
-                    doc_type="story",
-                    resource_id=story.id,
-                    resource_name=story.name,
-                    parent_id=epic_id
-                )
+                    # Queue for vectorstore indexing
+                    vector_items.append(story_document(story))
                 
-                saved_stories.append((story.id, story_data))
-                logger.debug(f"Saved story {story.id}: {story.name}")
+                    saved_stories.append((story.id, story_data))
+                    logger.debug(f"Saved story {story.id}: {story.name}")
                 
-            except Exception as e:
-                logger.error(f"Failed to save story: {str(e)}")
-                continue
-        
-        self.db.commit()
-        return saved_stories
+                except Exception as e:
+                    logger.error(f"Failed to save story: {str(e)}")
+                    continue
+            
+            db.commit()
+            self._index_in_vectorstore(vector_items, "story")
+            return saved_stories
     
-    def save_qa(self, story_id: int, qa_data_list: List[Dict[str, Any]], qa_type: str = "qa") -> List[Tuple[int, Dict]]:
+    def save_qa(self, parent_id: int, qa_data_list: List[Dict[str, Any]], qa_type: str = "qa") -> List[Tuple[int, Dict]]:
         """
         Save QA test cases to database and vectorstore.
         
         Args:
-            story_id: ID of the parent story (can be None for test plans)
+            parent_id: ID of the parent story, or of the parent epic for test plans
             qa_data_list: List of QA data dictionaries
             qa_type: Type of QA (qa, test_plan, etc.)
             
         Returns:
             List of (qa_id, qa_data) tuples
         """
-        saved_qa = []
-        
-        for qa_item in qa_data_list:
-            try:
-                qa_obj = QA(
-                    story_id=story_id,
-                    type=qa_type,
-                    content=qa_item
-                )
-                self.db.add(qa_obj)
-                self.db.flush()  # Get generated ID
+        with self._session() as db:
+            saved_qa = []
+            qa_rows = []
+            vector_items = []
+            parent_model = Epic if qa_type == "test_plan" else Story
+            parent_key = "epic_id" if qa_type == "test_plan" else "story_id"
+            owner = db.query(parent_model.upload_id, parent_model.user_id).filter(parent_model.id == parent_id).first()
+            
+            for qa_item in qa_data_list:
+                try:
+                    qa_obj = QA(
+                        **{parent_key: parent_id},
+                        upload_id=owner.upload_id if owner else None,
+                        user_id=owner.user_id if owner else None,
+                        type=qa_type,
+                        content=qa_item
+                    )
+                    db.add(qa_obj)
+                    db.flush()  # Get generated ID
                 
-                # Index in vectorstore
-                title = qa_item.get("title", "Unnamed QA")
-                self._index_in_vectorstore(
-                    text=f"QA Test: {title}\n{str(qa_item)}",
-                    doc_type=qa_type,
-                    resource_id=qa_obj.id,
-                    resource_name=title,
-                    parent_id=story_id
-                )
+                    # Queue for vectorstore indexing
+                    title = qa_item.get("title", "Unnamed QA")
+                    vector_items.append(qa_document(qa_obj))
                 
-                saved_qa.append((qa_obj.id, qa_item))
-                logger.debug(f"Saved {qa_type} {qa_obj.id}: {title}")
+                    qa_rows.append(qa_obj)
+                    saved_qa.append((qa_obj.id, qa_item))
+                    logger.debug(f"Saved {qa_type} {qa_obj.id}: {title}")
                 
-            except Exception as e:
-                logger.error(f"Failed to save QA: {str(e)}")
-                continue
-        
+                except Exception as e:
+                    logger.error(f"Failed to save QA: {str(e)}")
+                    continue
+            
+            db.commit()
+            self._index_in_vectorstore(vector_items, qa_type)
+            # Only test plans are searchable from the database
+            if qa_type == "test_plan":
+                embed_new_rows(qa_rows, "test_plan")
+                db.commit()
+            return saved_qa
+    
+    @contextmanager
+    def _session(self):
+        """The caller's session, or a short session of its own, committed on exit, when the service has none"""
+        if self.db is not None:
+            yield self.db
+            return
+        with get_db_context() as db:
+            yield db
+    
+    def _end_read(self) -> None:
+        """End the read transaction so no pooled connection is held during the model call"""
         self.db.commit()
-        return saved_qa
     
-    def _index_in_vectorstore(self, text: str, doc_type: str, resource_id: int, 
-                             resource_name: str, parent_id: Optional[int] = None) -> None:
+    def _index_in_vectorstore(self, items: List[Dict[str, Any]], doc_type: str) -> None:
         """
-        Index document in vectorstore for RAG.
+        Index documents in vectorstore for RAG in a single batch.
         
         Args:
-            text: Text content to index
-            doc_type: Type of document (epic, story, qa, etc.)
-            resource_id: ID of the resource
-            resource_name: Name of the resource
-            parent_id: Optional parent resource ID
+            items: Documents built by rag.resource_index
+            doc_type: Type of document (epic, story, qa, etc.), for logging
         """
+        if not items:
+            return
         try:
-            doc_id = f"{doc_type}_{resource_id}_{str(uuid.uuid4())[:8]}"
-            metadata = {
-                "type": doc_type,
-                "resource_id": resource_id,
-                "resource_name": resource_name
-            }
-            if parent_id:
-                metadata["parent_id"] = parent_id
-            
-            self.vectorstore.store_document(text, doc_id, metadata=metadata)
-            logger.debug(f"Indexed document {doc_id} in vectorstore")
+            self.vectorstore.store_documents(items)
+            logger.debug(f"Indexed {len(items)} {doc_type} documents in vectorstore")
         except Exception as e:
             logger.warning(f"Could not index {doc_type} in vectorstore: {str(e)}")
@@ -0,0 +1,181 @@
+"""Shared Jira clients and bulk issue creation.
+
+Constructing ``JIRA(...)`` costs a server-info round trip and a fresh TLS
+connection, so clients are cached per (Jira URL, username, token hash) and
+reused across requests. Each client keeps a pool of keep-alive connections.
+Cached clients expire after ``JIRA_CLIENT_TTL_SECONDS``, the least recently
+used ones are evicted beyond ``JIRA_CLIENT_CACHE_SIZE``, and saving or
+deleting credentials drops a user's clients (``invalidate_jira_clients``).
+
+``create_issues_in_chunks`` sends issues through Jira's bulk-create API,
+``JIRA_BULK_CHUNK_SIZE`` issues per request, and reports the outcome of
+every issue.
+"""
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from jira import JIRA, JIRAError
+from requests.adapters import HTTPAdapter
+
+from config.config import (
+    JIRA_BULK_CHUNK_SIZE,
+    JIRA_CLIENT_CACHE_SIZE,
+    JIRA_CLIENT_TTL_SECONDS,
+    JIRA_POOL_MAXSIZE,
+    JIRA_TIMEOUT_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+# Statuses that mean the credentials, not the issue, are the problem
+AUTH_ERROR_STATUSES = {401, 403}
+
+
+class JiraAuthError(Exception):
+    """Raised when Jira rejects the credentials"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None,
+                 results: Optional[List[Dict[str, Any]]] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        # Outcomes of the issues sent before the credentials were rejected
+        self.results = results or []
+
+
+ClientKey = Tuple[str, str, str]
+
+# key -> (client, monotonic expiry), least recently used first
+_clients: "OrderedDict[ClientKey, Tuple[JIRA, float]]" = OrderedDict()
+_clients_lock = threading.Lock()
+
+
+def _client_key(jira_url: str, username: str, api_token: str) -> ClientKey:
+    """Cache key; the token is only kept as a hash"""
+    return (jira_url.rstrip("/"), username, hashlib.sha256(api_token.encode("utf-8")).hexdigest())
+
+
+def get_jira_client(jira_url: str, username: str, api_token: str) -> JIRA:
+    """
+    Authenticated client for the credentials, reused across requests until it expires.
+
+    Raises:
+        JIRAError: If a new client cannot reach the server
+    """
+    key = _client_key(jira_url, username, api_token)
+    now = time.monotonic()
+    with _clients_lock:
+        cached = _clients.get(key)
+        if cached is not None and cached[1] > now:
+            _clients.move_to_end(key)
+            return cached[0]
+
+    # Built outside the lock so one slow server does not block other users
+    client = _create_client(key[0], username, api_token)
+    with _clients_lock:
+        _clients.pop(key, None)
+        _clients[key] = (client, now + JIRA_CLIENT_TTL_SECONDS)
+        _evict(now)
+    return client
+
+
+def invalidate_jira_clients(jira_url: Optional[str], username: Optional[str]) -> int:
+    """
+    Drop every cached client for a (URL, username), whatever its token.
+
+    Dropped clients are not closed, since a request may still be using one;
+    their connections go when the last reference does.
+
+    Returns:
+        Number of clients dropped
+    """
+    if not jira_url or not username:
+        return 0
+    url = jira_url.rstrip("/")
+    with _clients_lock:
+        keys = [key for key in _clients if key[0] == url and key[1] == username]
+        for key in keys:
+            del _clients[key]
+    if keys:
+        logger.info(f"Dropped {len(keys)} cached Jira clients for {username} at {url}")
+    return len(keys)
+
+
+def clear_jira_clients() -> None:
+    """Close and drop every cached client, e.g. at shutdown"""
+    with _clients_lock:
+        dropped = [client for client, _ in _clients.values()]
+        _clients.clear()
+    for client in dropped:
+        try:
+            client.close()
+        except Exception as e:
+            logger.debug(f"Error closing Jira client: {str(e)}")
+
+
+def _create_client(jira_url: str, username: str, api_token: str) -> JIRA:
+    client = JIRA(
+        server=jira_url,
+        basic_auth=(username, api_token),
+        options={"check_update": False},
+        timeout=JIRA_TIMEOUT_SECONDS,
+    )
+    # Keep-alive connections shared by concurrent requests for these credentials
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=JIRA_POOL_MAXSIZE)
+    client._session.mount("https://", adapter)
+    client._session.mount("http://", adapter)
+    return client
+
+
+def _evict(now: float) -> None:
+    """Drop expired clients and the least recently used beyond the cache size; call with the lock held"""
+    for key in [key for key, (_, expires_at) in _clients.items() if expires_at <= now]:
+        del _clients[key]
+    while len(_clients) > JIRA_CLIENT_CACHE_SIZE:
+        _clients.popitem(last=False)
+
+
+def create_issues_in_chunks(jira: JIRA, field_list: List[Dict[str, Any]],
+                            chunk_size: int = JIRA_BULK_CHUNK_SIZE) -> List[Dict[str, Any]]:
+    """
+    Create issues through the bulk-create API, chunk_size per request.
+
+    A chunk that fails as a whole marks each of its issues failed and the
+    remaining chunks still run. Rejected credentials stop the run; the
+    outcomes of the chunks already sent travel with the JiraAuthError, since
+    those issues exist in Jira.
+
+    Returns:
+        One {"key", "id", "error"} per input, in input order; key and id are None on failure
+
+    Raises:
+        JiraAuthError: If Jira rejects the credentials, with the results so far
+    """
+    results = []
+    for start in range(0, len(field_list), chunk_size):
+        chunk = field_list[start:start + chunk_size]
+        try:
+            created = jira.create_issues(chunk, prefetch=False)
+        except JIRAError as e:
+            if e.status_code in AUTH_ERROR_STATUSES:
+                raise JiraAuthError(f"Jira rejected the credentials: {e.text or str(e)}", e.status_code, results)
+            logger.error(f"Jira bulk create failed for {len(chunk)} issues: {str(e)}")
+            results.extend({"key": None, "id": None, "error": e.text or str(e)} for _ in chunk)
+            continue
+        for item in created:
+            if item["status"] == "Success":
+                issue = item["issue"]
+                results.append({"key": issue.key, "id": str(issue.id), "error": None})
+            else:
+                results.append({"key": None, "id": None, "error": _format_error(item["error"])})
+    return results
+
+
+def _format_error(error: Any) -> str:
+    """Bulk-create element errors ({"field": "message"}) as one line"""
+    if isinstance(error, dict):
+        return "; ".join(f"{field}: {message}" for field, message in error.items()) or "Unknown error"
+    return str(error)
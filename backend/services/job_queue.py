@@ -0,0 +1,390 @@
+"""Background job queue for long-running generation requests.
+
+Routes submit a job and return its ID straight away; a bounded pool of
+worker threads runs the registered handler. Job state, results and timing
+breakdowns are kept in a local SQLite file, so status survives restarts
+and no external broker is needed.
+
+Handlers are plain functions ``handler(ctx, **params)`` registered per job
+kind with ``register_job_handler``. ``ctx.step(name)`` times a phase of the
+job (e.g. ``llm`` or ``confluence``) and ``ctx.progress(message)`` reports
+what the job is doing.
+
+Several processes may share the job file. A worker claims a queued job with
+a conditional UPDATE, so each job runs once, and holds a lease on it that a
+heartbeat renews. Running jobs are only failed as interrupted once their
+lease has expired, i.e. their worker process is gone.
+"""
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+from fastapi import status
+
+from config.config import JOB_LEASE_SECONDS, JOB_QUEUE_MAX_PENDING, JOB_STORE_PATH, JOB_WORKERS
+from utils.error_handler import APIError
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+FINISHED_STATES = {JOB_SUCCEEDED, JOB_FAILED}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    user_id INTEGER,
+    params TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    progress TEXT,
+    timings TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    owner TEXT,
+    lease_expires_at REAL
+);
+CREATE INDEX IF NOT EXISTS ix_jobs_user_created ON jobs (user_id, created_at);
+CREATE INDEX IF NOT EXISTS ix_jobs_status ON jobs (status);
+"""
+
+_JSON_COLUMNS = ("params", "result", "timings")
+# Columns added after the first release, created on files that predate them
+_ADDED_COLUMNS = {"owner": "TEXT", "lease_expires_at": "REAL"}
+
+
+class QueueFullError(APIError):
+    """Raised when too many jobs are waiting or running"""
+    def __init__(self, limit: int):
+        super().__init__(
+            f"Job queue is full ({limit} jobs pending), try again later",
+            status.HTTP_503_SERVICE_UNAVAILABLE,
+            {"limit": limit}
+        )
+
+
+class JobStore:
+    """SQLite-backed job records, safe to share between threads"""
+
+    def __init__(self, path: str = JOB_STORE_PATH):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        for column, column_type in _ADDED_COLUMNS.items():
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {column_type}")
+
+    def create(self, kind: str, params: Dict[str, Any], user_id: Optional[int] = None) -> Dict[str, Any]:
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, kind, status, user_id, params, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, kind, JOB_QUEUED, user_id, json.dumps(params, default=str), time.time())
+            )
+        return self.get(job_id)
+
+    def update(self, job_id: str, **fields) -> None:
+        for column in _JSON_COLUMNS:
+            if column in fields and fields[column] is not None:
+                fields[column] = json.dumps(fields[column], default=str)
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        with self._lock:
+            self._conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def list(self, user_id: Optional[int] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        query = "SELECT * FROM jobs"
+        args: tuple = ()
+        if user_id is not None:
+            query += " WHERE user_id = ?"
+            args = (user_id,)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        with self._lock:
+            rows = self._conn.execute(query, (*args, limit)).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def claim(self, job_id: str, owner: str, lease_seconds: float) -> bool:
+        """Move a queued job to running for owner; False if another worker got it first"""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, owner = ?, started_at = ?, lease_expires_at = ? "
+                "WHERE id = ? AND status = ?",
+                (JOB_RUNNING, owner, now, now + lease_seconds, job_id, JOB_QUEUED)
+            )
+        return cursor.rowcount == 1
+
+    def renew_leases(self, owner: str, lease_seconds: float) -> None:
+        """Extend the lease of every job owner is running"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET lease_expires_at = ? WHERE owner = ? AND status = ?",
+                (time.time() + lease_seconds, owner, JOB_RUNNING)
+            )
+
+    def fail_expired(self, error: str) -> int:
+        """Fail running jobs whose lease has expired (or that predate leases); returns how many"""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ? "
+                "WHERE status = ? AND (lease_expires_at IS NULL OR lease_expires_at < ?)",
+                (JOB_FAILED, error, now, JOB_RUNNING, now)
+            )
+        return cursor.rowcount
+
+    def ids_with_status(self, job_status: str) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id FROM jobs WHERE status = ? ORDER BY created_at", (job_status,)
+            ).fetchall()
+        return [row["id"] for row in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        for column in _JSON_COLUMNS:
+            job[column] = json.loads(job[column]) if job[column] else None
+        return job
+
+
+class JobContext:
+    """Handed to job handlers to time phases and report progress"""
+
+    def __init__(self, store: JobStore, job_id: str):
+        self.store = store
+        self.job_id = job_id
+        self.steps: Dict[str, float] = {}
+
+    @contextmanager
+    def step(self, name: str):
+        """Time a phase of the job; repeated phases accumulate"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.steps[name] = self.steps.get(name, 0.0) + time.perf_counter() - started
+
+    def progress(self, message: str) -> None:
+        """Record what the job is currently doing"""
+        self.store.update(self.job_id, progress=message)
+
+
+class JobQueue:
+    """
+    Bounded worker pool running registered job handlers.
+
+    At most ``max_pending`` jobs may be queued or running in this process;
+    further submissions raise QueueFullError instead of piling up.
+    """
+
+    def __init__(self, store: Optional[JobStore] = None, workers: int = JOB_WORKERS,
+                 max_pending: int = JOB_QUEUE_MAX_PENDING, lease_seconds: float = JOB_LEASE_SECONDS):
+        self.store = store or JobStore()
+        self.workers = workers
+        self.max_pending = max_pending
+        self.lease_seconds = lease_seconds
+        # Identifies this process's claims in a job file shared with other processes
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._handlers: Dict[str, Callable[..., Any]] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._heartbeat: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def register(self, kind: str, handler: Callable[..., Any]) -> None:
+        self._handlers[kind] = handler
+
+    def start(self) -> None:
+        """Start the workers and resume jobs left over from a previous run"""
+        with self._lock:
+            if self._executor is not None:
+                return
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="job-worker")
+            self._stopping.clear()
+            self._heartbeat = threading.Thread(target=self._renew_leases, name="job-lease-heartbeat", daemon=True)
+            self._heartbeat.start()
+
+        self._fail_interrupted()
+        # Claims are atomic, so jobs another live process also dispatches still run once
+        for job_id in self.store.ids_with_status(JOB_QUEUED):
+            self._dispatch(job_id)
+        logger.info(f"Job queue started with {self.workers} workers as {self.owner}")
+
+    def stop(self, wait: bool = True) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+            heartbeat, self._heartbeat = self._heartbeat, None
+        self._stopping.set()
+        if heartbeat is not None:
+            heartbeat.join()
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=not wait)
+            logger.info("Job queue stopped")
+
+    def submit(self, kind: str, params: Dict[str, Any], user_id: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Queue a job.
+
+        Args:
+            kind: Registered job kind
+            params: Keyword arguments for the handler (JSON-serializable)
+            user_id: Owner of the job
+
+        Returns:
+            The queued job record
+
+        Raises:
+            ValueError: If no handler is registered for kind
+            QueueFullError: If max_pending jobs are already queued or running
+        """
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        if self._executor is None:
+            self.start()
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise QueueFullError(self.max_pending)
+            self._pending += 1
+
+        job = self.store.create(kind, params, user_id)
+        self._executor.submit(self._run, job["id"])
+        logger.info(f"Queued {kind} job {job['id']}")
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self.store.get(job_id)
+
+    def list(self, user_id: Optional[int] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        return self.store.list(user_id, limit)
+
+    def _fail_interrupted(self) -> None:
+        # A job whose worker stopped renewing its lease cannot be resumed safely
+        failed = self.store.fail_expired("Interrupted by server restart")
+        if failed:
+            logger.warning(f"Failed {failed} jobs whose worker lease expired")
+
+    def _renew_leases(self) -> None:
+        """Heartbeat: renew this process's leases and fail jobs of workers that are gone"""
+        while not self._stopping.wait(self.lease_seconds / 3):
+            try:
+                self.store.renew_leases(self.owner, self.lease_seconds)
+                self._fail_interrupted()
+            except Exception as e:
+                logger.warning(f"Could not renew job leases: {str(e)}")
+
+    def _dispatch(self, job_id: str) -> None:
+        with self._lock:
+            self._pending += 1
+        self._executor.submit(self._run, job_id)
+
+    def _run(self, job_id: str) -> None:
+        try:
+            if not self.store.claim(job_id, self.owner, self.lease_seconds):
+                return  # Gone, or already claimed by another worker
+            job = self.store.get(job_id)
+            handler = self._handlers.get(job["kind"])
+            started = job["started_at"]
+            ctx = JobContext(self.store, job_id)
+
+            try:
+                if handler is None:
+                    raise ValueError(f"No handler registered for job kind {job['kind']}")
+                result = handler(ctx, **job["params"])
+                fields = {"status": JOB_SUCCEEDED, "result": result}
+            except Exception as e:
+                logger.error(f"Job {job_id} ({job['kind']}) failed: {str(e)}", exc_info=True)
+                fields = {"status": JOB_FAILED, "error": getattr(e, "message", None) or str(e)}
+
+            finished = time.time()
+            self.store.update(job_id, finished_at=finished, timings={
+                "queue_wait_seconds": round(started - job["created_at"], 4),
+                "run_seconds": round(finished - started, 4),
+                "steps": {name: round(seconds, 4) for name, seconds in ctx.steps.items()}
+            }, **fields)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+
+# Process-wide queue, created on first use
+_job_queue: Optional[JobQueue] = None
+_job_handlers: Dict[str, Callable[..., Any]] = {}
+_job_queue_lock = threading.Lock()
+
+
+def register_job_handler(kind: str, handler: Callable[..., Any]) -> None:
+    """Register the function that runs jobs of the given kind"""
+    _job_handlers[kind] = handler
+    if _job_queue is not None:
+        _job_queue.register(kind, handler)
+
+
+def get_job_queue() -> JobQueue:
+    """Return the process-wide job queue, creating it on first use"""
+    global _job_queue
+    with _job_queue_lock:
+        if _job_queue is None:
+            _job_queue = JobQueue()
+            for kind, handler in _job_handlers.items():
+                _job_queue.register(kind, handler)
+        return _job_queue
+
+
+def start_job_workers() -> JobQueue:
+    """Start the process-wide job workers"""
+    queue = get_job_queue()
+    queue.start()
+    return queue
+
+
+def stop_job_workers(wait: bool = True) -> None:
+    """Stop the process-wide job workers, letting running jobs finish"""
+    if _job_queue is not None:
+        _job_queue.stop(wait=wait)
+
+
+def job_response(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Public view of a job record"""
+    return {
+        "job_id": job["id"],
+        "kind": job["kind"],
+        "status": job["status"],
+        "progress": job["progress"],
+        "result": job["result"],
+        "error": job["error"],
+        "timings": job["timings"],
+        "created_at": job["created_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"],
+        "status_url": f"/api/jobs/{job['id']}"
+    }
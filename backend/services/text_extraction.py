@@ -0,0 +1,242 @@
+"""Bounded-memory ingestion of uploaded requirement documents.
+
+An upload is copied to a temporary file on disk in ``UPLOAD_SPOOL_CHUNK_BYTES``
+chunks and rejected as soon as it passes ``UPLOAD_MAX_BYTES``. Text is then
+extracted page by page (PDF), paragraph by paragraph (DOCX) or chunk by
+chunk (plain text) on a bounded worker pool, so the event loop never runs
+the CPU-bound parsers and only the extracted text is held in memory.
+
+PDF text extraction is CPU-bound, so large PDFs are split into ranges of
+``PDF_PAGES_PER_TASK`` pages that run on a pool of
+``PDF_EXTRACTION_PROCESSES`` processes; the pages are reassembled in order
+with the offset where each page starts.
+"""
+import asyncio
+import codecs
+import io
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import BinaryIO, Iterator, List, Optional
+
+from config.config import (
+    PDF_EXTRACTION_PROCESSES,
+    PDF_PAGES_PER_TASK,
+    UPLOAD_EXTRACTION_WORKERS,
+    UPLOAD_MAX_BYTES,
+    UPLOAD_SPOOL_CHUNK_BYTES,
+)
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ExtractedText:
+    """Text of a document; page_offsets[i] is where page i starts in text (PDFs only)"""
+    text: str
+    page_offsets: Optional[List[int]] = None
+
+
+class UploadTooLargeError(Exception):
+    """Raised when an upload exceeds UPLOAD_MAX_BYTES"""
+
+    def __init__(self, max_bytes: int):
+        super().__init__(f"File exceeds the {max_bytes // (1024 * 1024)} MB upload limit")
+        self.max_bytes = max_bytes
+        self.status_code = 413
+
+
+def spool_upload(source: BinaryIO, max_bytes: int = UPLOAD_MAX_BYTES,
+                 chunk_size: int = UPLOAD_SPOOL_CHUNK_BYTES, digest=None) -> str:
+    """
+    Copy an upload stream to a temporary file, chunk by chunk.
+
+    Args:
+        digest: Optional hashlib object updated with every chunk
+
+    Returns:
+        Path of the temporary file; the caller deletes it
+
+    Raises:
+        UploadTooLargeError: As soon as more than max_bytes have been read
+    """
+    written = 0
+    handle, path = tempfile.mkstemp(prefix="upload_")
+    try:
+        with os.fdopen(handle, "wb") as spool:
+            while True:
+                chunk = source.read(chunk_size)
+                if not chunk:
+                    break
+                written += len(chunk)
+                if written > max_bytes:
+                    raise UploadTooLargeError(max_bytes)
+                spool.write(chunk)
+                if digest is not None:
+                    digest.update(chunk)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path
+
+
+def iter_document_text(path: str, filename: str) -> Iterator[str]:
+    """Text of a spooled document in reading order, one page, paragraph or chunk at a time"""
+    name = filename.lower()
+    if name.endswith(".pdf"):
+        yield from _iter_pdf_text(path)
+    elif name.endswith(".docx"):
+        yield from _iter_docx_text(path)
+    else:
+        yield from _iter_plain_text(path)
+
+
+def extract_document(path: str, filename: str) -> ExtractedText:
+    """Text of a spooled document, with page offsets for PDFs"""
+    if filename.lower().endswith(".pdf"):
+        return extract_pdf(path)
+    text = io.StringIO()
+    for piece in iter_document_text(path, filename):
+        text.write(piece)
+    return ExtractedText(text.getvalue())
+
+
+def extract_text(path: str, filename: str) -> str:
+    """Full text of a spooled document"""
+    return extract_document(path, filename).text
+
+
+async def extract_document_async(path: str, filename: str) -> ExtractedText:
+    """extract_document on the extraction pool, off the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), extract_document, path, filename)
+
+
+async def extract_text_async(path: str, filename: str) -> str:
+    """extract_text on the extraction pool, off the event loop"""
+    return (await extract_document_async(path, filename)).text
+
+
+def extract_pdf(path: str, processes: int = PDF_EXTRACTION_PROCESSES,
+                pages_per_task: int = PDF_PAGES_PER_TASK) -> ExtractedText:
+    """
+    Extract a PDF's pages, in parallel across processes once it spans several page ranges.
+
+    Args:
+        path: PDF on disk
+        processes: Worker processes; 1 extracts in this thread
+        pages_per_task: Pages each worker extracts per task
+
+    Returns:
+        The text in page order with the offset of every page
+    """
+    from PyPDF2 import PdfReader
+
+    started = time.perf_counter()
+    with open(path, "rb") as pdf:
+        page_count = len(PdfReader(pdf).pages)
+
+    starts = list(range(0, page_count, max(1, pages_per_task)))
+    if processes > 1 and len(starts) > 1:
+        stops = starts[1:] + [page_count]
+        ranges = _get_process_pool(processes).map(_extract_page_range, [path] * len(starts), starts, stops)
+        pages = [page for page_range in ranges for page in page_range]
+    else:
+        pages = list(_iter_pdf_text(path))
+
+    text = io.StringIO()
+    offsets = []
+    for page in pages:
+        offsets.append(text.tell())
+        text.write(page)
+
+    seconds = time.perf_counter() - started
+    logger.info(
+        f"Extracted {page_count} PDF pages in {seconds:.2f}s "
+        f"({page_count / seconds if seconds else 0:.1f} pages/s, {processes if len(starts) > 1 else 1} processes)"
+    )
+    return ExtractedText(text.getvalue(), offsets)
+
+
+def _iter_pdf_text(path: str, start: int = 0, stop: Optional[int] = None) -> Iterator[str]:
+    from PyPDF2 import PdfReader
+
+    with open(path, "rb") as pdf:
+        for page in PdfReader(pdf).pages[start:stop]:
+            yield (page.extract_text() or "") + "\n"
+
+
+def _extract_page_range(path: str, start: int, stop: int) -> List[str]:
+    """Texts of pages [start, stop); runs in a worker process"""
+    return list(_iter_pdf_text(path, start, stop))
+
+
+def _iter_docx_text(path: str) -> Iterator[str]:
+    from docx import Document
+
+    for index, paragraph in enumerate(Document(path).paragraphs):
+        yield ("\n" if index else "") + paragraph.text
+
+
+def _iter_plain_text(path: str) -> Iterator[str]:
+    """UTF-8, or Latin-1 if the file is not valid UTF-8, decoded incrementally"""
+    try:
+        yield "".join(_decode_chunks(path, "utf-8"))
+    except UnicodeDecodeError:
+        yield from _decode_chunks(path, "latin1")
+
+
+def _decode_chunks(path: str, encoding: str) -> Iterator[str]:
+    decoder = codecs.getincrementaldecoder(encoding)()
+    with open(path, "rb") as source:
+        while True:
+            chunk = source.read(UPLOAD_SPOOL_CHUNK_BYTES)
+            if not chunk:
+                break
+            yield decoder.decode(chunk)
+    yield decoder.decode(b"", final=True)
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_process_pool: Optional[ProcessPoolExecutor] = None
+_process_pool_size = 0
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=UPLOAD_EXTRACTION_WORKERS, thread_name_prefix="extract")
+    return _executor
+
+
+def _get_process_pool(processes: int) -> ProcessPoolExecutor:
+    """Shared PDF worker processes, recreated if a different size is asked for"""
+    global _process_pool, _process_pool_size
+    with _executor_lock:
+        if _process_pool is None or _process_pool_size != processes:
+            if _process_pool is not None:
+                _process_pool.shutdown(wait=False)
+            # spawn, not fork: the server process has threads and open connections
+            _process_pool = ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn"))
+            _process_pool_size = processes
+        return _process_pool
+
+
+def shutdown_extraction_pool() -> None:
+    """Wait for running extractions and release the thread and process pools"""
+    global _executor, _process_pool
+    with _executor_lock:
+        executor, _executor = _executor, None
+        process_pool, _process_pool = _process_pool, None
+    if executor is not None:
+        executor.shutdown(wait=True)
+    if process_pool is not None:
+        process_pool.shutdown(wait=True)
@@ -0,0 +1,96 @@
+"""Benchmark serial against process-pool PDF text extraction.
+
+Usage (from the backend directory):
+
+    python -m services.text_extraction_bench --pages 400 --processes 1 2 4 --repeat 3
+"""
+import argparse
+import os
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+from fpdf import FPDF
+
+from services.text_extraction import extract_pdf, shutdown_extraction_pool
+
+
+def synthetic_pdf(path: str, pages: int, lines_per_page: int = 40) -> str:
+    """
+    Specification-like PDF: numbered pages of requirement sentences.
+
+    Returns:
+        path
+    """
+    pdf = FPDF()
+    pdf.set_font("Helvetica", size=9)
+    for number in range(1, pages + 1):
+        pdf.add_page()
+        for line in range(lines_per_page):
+            pdf.cell(0, 6, f"REQ-{number}.{line}: The system shall validate the account settings form.",
+                     new_x="LMARGIN", new_y="NEXT")
+    pdf.output(path)
+    return path
+
+
+def benchmark(pages: int = 400, processes: Sequence[int] = (1, 2, 4), repeat: int = 3,
+              pages_per_task: int = 25) -> List[Dict[str, Any]]:
+    """
+    Time extract_pdf on one synthetic PDF at each process count.
+
+    The process pool is started once before timing, as it is in the server.
+
+    Args:
+        pages: Pages in the synthetic PDF
+        processes: Process counts to compare; 1 is the serial baseline
+        repeat: Runs per measurement; the best run is reported
+        pages_per_task: Pages per worker task
+
+    Returns:
+        One row per process count with the best time, throughput and whether the text matched the serial run
+    """
+    results = []
+    handle, path = tempfile.mkstemp(suffix=".pdf")
+    os.close(handle)
+    try:
+        synthetic_pdf(path, pages)
+        expected = extract_pdf(path, processes=1).text
+        for count in processes:
+            extracted = extract_pdf(path, processes=count, pages_per_task=pages_per_task)
+            best = float("inf")
+            for _ in range(repeat):
+                started = time.perf_counter()
+                extract_pdf(path, processes=count, pages_per_task=pages_per_task)
+                best = min(best, time.perf_counter() - started)
+            results.append({
+                "processes": count,
+                "pages": pages,
+                "best_s": round(best, 3),
+                "pages_per_s": round(pages / best, 1),
+                "identical": extracted.text == expected and len(extracted.page_offsets) == pages
+            })
+    finally:
+        os.unlink(path)
+        shutdown_extraction_pool()
+    return results
+
+
+def _print_benchmark(results: List[Dict[str, Any]]) -> None:
+    print(f"{'processes':>10}{'pages':>8}{'best s':>10}{'pages/s':>10}{'identical':>11}")
+    for row in results:
+        print(f"{row['processes']:>10}{row['pages']:>8}{row['best_s']:>10.3f}{row['pages_per_s']:>10.1f}"
+              f"{str(row['identical']):>11}")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark PDF text extraction")
+    parser.add_argument("--pages", type=int, default=400, help="Pages in the synthetic PDF")
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 2, 4], help="Process counts to compare")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement")
+    parser.add_argument("--pages-per-task", type=int, default=25, help="Pages per worker task")
+    args = parser.parse_args(argv)
+    _print_benchmark(benchmark(args.pages, args.processes, args.repeat, args.pages_per_task))
+
+
+if __name__ == "__main__":
+    main()
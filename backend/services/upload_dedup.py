@@ -0,0 +1,118 @@
+"""Detection and reuse of documents a user has already uploaded.
+
+Every upload records the SHA-256 of its raw bytes (``file_hash``) and of
+its extracted text (``text_hash``). A new upload matching an earlier one of
+the same user, on either hash, does not need its text extracted, its
+chunks embedded or its epics generated again:
+
+- ``reuse`` answers with the earlier upload, which already has them;
+- ``copy`` stores a new upload seeded with the earlier one's text, page
+  offsets, embedded chunks and epics;
+- ``new`` (the default) processes the file from scratch and only reports
+  the match.
+"""
+import logging
+from typing import Any, Dict, Literal, Optional
+
+from sqlalchemy.orm import undefer
+
+from models.file_model import Epic, Upload, UploadChunk
+
+logger = logging.getLogger(__name__)
+
+DuplicatePolicy = Literal["reuse", "copy", "new"]
+
+# Epic fields that belong to the original's Jira and Confluence pages, not to a copy
+_EXTERNAL_CONTENT_KEYS = {"jira_key", "jira_issue_id", "jira_url", "confluence_page_id"}
+_CHUNK_COLUMNS = ("chunk_index", "start_offset", "end_offset", "heading", "text",
+                  "embedding", "embedding_model", "embedding_hash")
+
+
+def find_duplicate_upload(db, user_id: int, file_hash: Optional[str] = None,
+                          text_hash: Optional[str] = None) -> Optional[Upload]:
+    """The user's latest upload with the same bytes, or else the same text"""
+    for column, digest in ((Upload.file_hash, file_hash), (Upload.text_hash, text_hash)):
+        if digest:
+            upload = (
+                db.query(Upload)
+                .filter(Upload.user_id == user_id, column == digest)
+                .order_by(Upload.id.desc())
+                .first()
+            )
+            if upload is not None:
+                return upload
+    return None
+
+
+def copy_upload(db, source: Upload, filename: str, user_id: int, file_hash: Optional[str]) -> Upload:
+    """
+    New upload with the text, page offsets, chunks and epics of an earlier one.
+
+    Chunks keep their embeddings and epics their content and embeddings; Jira
+    and Confluence links stay with the original. The caller indexes the new
+    epics in the vector store once the copy is committed.
+
+    Returns:
+        The new upload, added to the session
+    """
+    upload = Upload(
+        filename=filename,
+        user_id=user_id,
+        content=source.content,
+        page_offsets=source.page_offsets,
+        file_hash=file_hash or source.file_hash,
+        text_hash=source.text_hash,
+        chunked=source.chunked,
+    )
+    upload.chunks = [
+        UploadChunk(**{column: getattr(chunk, column) for column in _CHUNK_COLUMNS})
+        for chunk in source.chunks
+    ]
+    upload.epics = [
+        Epic(
+            user_id=user_id,
+            name=epic.name,
+            content={key: value for key, value in epic.content.items() if key not in _EXTERNAL_CONTENT_KEYS}
+            if isinstance(epic.content, dict) else epic.content,
+            embedding=epic.embedding,
+            embedding_model=epic.embedding_model,
+            embedding_hash=epic.embedding_hash,
+        )
+        for epic in db.query(Epic).options(undefer(Epic.content)).filter(Epic.upload_id == source.id).order_by(Epic.id)
+    ]
+    db.add(upload)
+    db.flush()
+    logger.info(f"Copied upload {source.id} to {upload.id} with {len(upload.chunks)} chunks "
+                f"and {len(upload.epics)} epics")
+    return upload
+
+
+def resolve_duplicate(db, policy: DuplicatePolicy, filename: str, user_id: int,
+                      file_hash: Optional[str] = None, text_hash: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Apply the duplicate policy to an incoming upload.
+
+    Returns:
+        The upload response when an earlier upload was reused or copied,
+        None when the file has to be processed
+    """
+    if policy == "new":
+        return None
+    duplicate = find_duplicate_upload(db, user_id, file_hash, text_hash)
+    if duplicate is None:
+        return None
+
+    epic_count = db.query(Epic.id).filter(Epic.upload_id == duplicate.id).count()
+    if policy == "copy":
+        upload = copy_upload(db, duplicate, filename, user_id, file_hash)
+        message = "File uploaded successfully; text, embeddings and epics copied from an earlier upload"
+    else:
+        upload = duplicate
+        message = "File already uploaded; reusing its text, embeddings and epics"
+    logger.info(f"Upload {filename} duplicates upload {duplicate.id} ({policy})")
+    return {
+        "message": message,
+        "upload_id": upload.id,
+        "duplicate_of": duplicate.id,
+        "epic_count": epic_count,
+    }
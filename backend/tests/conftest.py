@@ -36,6 +36,30 @@ def mock_request():
     return request
 
 
+@pytest.fixture
+def sqlite_session():
+    """Real SQLAlchemy session on in-memory SQLite with the application tables"""
+    from sqlalchemy import create_engine
+    from sqlalchemy.dialects.postgresql import JSONB
+    from sqlalchemy.ext.compiler import compiles
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import StaticPool
+    from config.db import Base
+    from models.file_model import User, Upload, UploadChunk, Epic, Story, QA, AggregatedUpload, ConfluenceOutbox
+
+    # SQLite has no JSONB; its JSON type stores the same values
+    compiles(JSONB, "sqlite")(lambda element, compiler, **kw: "JSON")
+
+    # One shared connection, so code run in a threadpool sees the same in-memory database
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    tables = [model.__table__ for model in (User, Upload, UploadChunk, Epic, Story, QA, AggregatedUpload, ConfluenceOutbox)]
+    Base.metadata.create_all(engine, tables=tables)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
 @pytest.fixture(autouse=True)
 def clear_imports():
     """Clear module cache between tests to avoid import issues"""
@@ -0,0 +1,103 @@
+"""In-process fake of the Confluence REST API for publisher tests"""
+
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeConfluence:
+    """
+    Serves POST /rest/api/content on localhost and records the created pages.
+
+    ``fail(title, 503, 429)`` makes the next requests for a title answer
+    with those statuses before succeeding. ``delay`` slows every request so
+    concurrency can be observed through ``peak_in_flight``.
+    """
+
+    def __init__(self, delay: float = 0.0, retry_after: str = "0"):
+        self.delay = delay
+        self.retry_after = retry_after
+        self.pages = {}  # page id -> {"title", "parent_id", "space", "body"}
+        self.attempts = {}  # title -> requests received
+        self.peak_in_flight = 0
+        self._failures = {}
+        self._in_flight = 0
+        self._ids = itertools.count(1000)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def fail(self, title: str, *statuses: int) -> None:
+        self._failures[title] = list(statuses)
+
+    def parent_of(self, title: str):
+        return next(page["parent_id"] for page in self.pages.values() if page["title"] == title)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handle(self, payload: dict):
+        title = payload["title"]
+        with self._lock:
+            self._in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self._in_flight)
+            self.attempts[title] = self.attempts.get(title, 0) + 1
+            pending = self._failures.get(title)
+            status = pending.pop(0) if pending else None
+        try:
+            time.sleep(self.delay)
+            if status:
+                return status, {"message": f"Injected {status}"}
+            page_id = str(next(self._ids))
+            ancestors = payload.get("ancestors") or [{}]
+            with self._lock:
+                self.pages[page_id] = {
+                    "title": title,
+                    "parent_id": ancestors[-1].get("id"),
+                    "space": payload["space"]["key"],
+                    "body": payload["body"]["storage"]["value"]
+                }
+            return 200, {"id": page_id, "title": title}
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length))
+                if self.path != "/rest/api/content":
+                    status, body = 404, {"message": "Not found"}
+                else:
+                    status, body = fake._handle(payload)
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                if status == 429:
+                    self.send_header("Retry-After", fake.retry_after)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
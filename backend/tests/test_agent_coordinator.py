@@ -0,0 +1,171 @@
+"""Unit tests for the agent workflow coordinator"""
+
+import threading
+import time
+import pytest
+from unittest.mock import patch
+from agents.agent_coordinator import AgentCoordinator, create_coordinator_response
+
+
+def ok(**data):
+    return create_coordinator_response(success=True, data=data)
+
+
+def failed(error):
+    return create_coordinator_response(success=False, error=error)
+
+
+@pytest.fixture
+def coordinator():
+    """Coordinator whose agents return canned responses"""
+    coordinator = AgentCoordinator()
+    coordinator.generate_epics = lambda upload_id, **kwargs: ok(epics=[{"id": 1}, {"id": 2}, {"id": 3}])
+    coordinator.generate_stories = lambda epic_id, **kwargs: ok(stories=[{"id": epic_id * 10}, {"id": epic_id * 10 + 1}])
+    coordinator.generate_qa = lambda story_id, **kwargs: ok(qa_tests=[{"story_id": story_id}])
+    return coordinator
+
+
+class TestExecuteWorkflow:
+    """Test the dependency-graph workflow"""
+
+    def test_results_in_epic_and_story_order(self, coordinator):
+        """Test artifacts are ordered by epic, then story, whatever finished first"""
+        def generate_stories(epic_id, **kwargs):
+            time.sleep(0.01 * (4 - epic_id))  # Later epics finish first
+            return ok(stories=[{"id": epic_id * 10}, {"id": epic_id * 10 + 1}])
+
+        coordinator.generate_stories = generate_stories
+
+        result = coordinator.execute_workflow(1)
+
+        assert result["success"] is True
+        assert [s["id"] for s in result["stories"]] == [10, 11, 20, 21, 30, 31]
+        assert [q["story_id"] for q in result["qa"]] == [10, 11, 20, 21, 30]
+        assert len(result["qa"]) == AgentCoordinator.QA_STORY_LIMIT
+
+    def test_qa_sample_in_epic_order(self, coordinator):
+        """Test QA goes to the first stories in epic order, not to the epics that finish first"""
+        def generate_stories(epic_id, **kwargs):
+            time.sleep(0.01 * (4 - epic_id))  # Later epics finish first
+            return ok(stories=[{"id": epic_id * 10 + n} for n in range(3)])
+
+        coordinator.generate_stories = generate_stories
+
+        result = coordinator.execute_workflow(1)
+
+        assert [q["story_id"] for q in result["qa"]] == [10, 11, 12, 20, 21]
+
+    def test_story_generation_runs_concurrently(self, coordinator):
+        """Test stories for different epics are generated at the same time"""
+        running = []
+        peak = []
+        lock = threading.Lock()
+
+        def generate_stories(epic_id, **kwargs):
+            with lock:
+                running.append(epic_id)
+                peak.append(len(running))
+            time.sleep(0.05)
+            with lock:
+                running.remove(epic_id)
+            return ok(stories=[])
+
+        coordinator.generate_stories = generate_stories
+
+        with patch("agents.agent_coordinator.WORKFLOW_CONCURRENCY", 3):
+            coordinator.execute_workflow(1)
+
+        assert max(peak) == 3
+
+    def test_concurrency_cap(self, coordinator):
+        """Test no more than WORKFLOW_CONCURRENCY calls run at once"""
+        running = []
+        peak = []
+        lock = threading.Lock()
+
+        def generate_stories(epic_id, **kwargs):
+            with lock:
+                running.append(epic_id)
+                peak.append(len(running))
+            time.sleep(0.02)
+            with lock:
+                running.remove(epic_id)
+            return ok(stories=[])
+
+        coordinator.generate_stories = generate_stories
+
+        with patch("agents.agent_coordinator.WORKFLOW_CONCURRENCY", 1):
+            coordinator.execute_workflow(1)
+
+        assert max(peak) == 1
+
+    def test_qa_starts_before_all_stories_land(self, coordinator):
+        """Test QA for an epic's stories does not wait for slower epics"""
+        events = []
+
+        def generate_stories(epic_id, **kwargs):
+            if epic_id == 3:
+                time.sleep(0.1)
+            events.append(("stories", epic_id))
+            return ok(stories=[{"id": epic_id * 10}])
+
+        def generate_qa(story_id, **kwargs):
+            events.append(("qa", story_id))
+            return ok(qa_tests=[])
+
+        coordinator.generate_stories = generate_stories
+        coordinator.generate_qa = generate_qa
+
+        coordinator.execute_workflow(1)
+
+        assert events.index(("qa", 10)) < events.index(("stories", 3))
+
+    def test_failures_reported(self, coordinator):
+        """Test failed and raising steps are reported without stopping the rest"""
+        def generate_stories(epic_id, **kwargs):
+            if epic_id == 2:
+                return failed("model error")
+            return ok(stories=[{"id": epic_id * 10}])
+
+        def generate_qa(story_id, **kwargs):
+            raise RuntimeError("boom")
+
+        coordinator.generate_stories = generate_stories
+        coordinator.generate_qa = generate_qa
+
+        result = coordinator.execute_workflow(1)
+
+        assert [s["id"] for s in result["stories"]] == [10, 30]
+        assert "Story generation failed for epic 2" in result["errors"]
+        assert "QA generation failed for story 10" in result["errors"]
+
+    def test_timings_returned(self, coordinator):
+        """Test per-step timings are part of the result"""
+        result = coordinator.execute_workflow(1)
+        timings = result["timings"]
+
+        assert timings["epics"] >= 0
+        assert sorted(t["epic_id"] for t in timings["stories"]) == [1, 2, 3]
+        assert len(timings["qa"]) == AgentCoordinator.QA_STORY_LIMIT
+        assert timings["total_seconds"] >= timings["epics"]
+
+    def test_epic_failure_stops_workflow(self, coordinator):
+        """Test nothing else runs when epic generation fails"""
+        coordinator.generate_epics = lambda upload_id, **kwargs: failed("no upload")
+        coordinator.generate_stories = lambda epic_id, **kwargs: pytest.fail("stories should not run")
+
+        result = coordinator.execute_workflow(1)
+
+        assert result["success"] is False
+        assert result["timings"]["total_seconds"] is not None
+
+    def test_cache_bypass_passed_to_every_step(self, coordinator):
+        """Test use_cache=False reaches epic, story and QA generation"""
+        calls = []
+        coordinator.generate_epics = lambda upload_id, **kwargs: calls.append(kwargs) or ok(epics=[{"id": 1}])
+        coordinator.generate_stories = lambda epic_id, **kwargs: calls.append(kwargs) or ok(stories=[{"id": 10}])
+        coordinator.generate_qa = lambda story_id, **kwargs: calls.append(kwargs) or ok(qa_tests=[])
+
+        coordinator.execute_workflow(1, use_cache=False)
+
+        assert calls == [{"use_cache": False}] * 3
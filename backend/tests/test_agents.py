@@ -0,0 +1,84 @@
+"""Unit tests for the story and QA generation agents"""
+
+import pytest
+from contextlib import contextmanager
+from unittest.mock import patch
+from sqlalchemy.orm import sessionmaker
+from agents import qa_agent, story_agent
+from models.file_model import User, Upload, Epic, Story, QA
+
+
+@pytest.fixture
+def db(sqlite_session):
+    """Upload 1 owned by user 1, with epic 1 and its story 1"""
+    sqlite_session.add(User(id=1, email="a@example.com"))
+    sqlite_session.add(Upload(id=1, user_id=1, filename="req.pdf", content={}))
+    sqlite_session.add(Epic(id=1, upload_id=1, name="Login", content={"description": "Users sign in"}))
+    sqlite_session.add(Story(id=1, epic_id=1, name="Sign in", content={"description": "As a user"}))
+    sqlite_session.commit()
+    return sqlite_session
+
+
+@pytest.fixture
+def sessions(db):
+    """Route the agents' sessions to the test database, counting how many are open"""
+    factory = sessionmaker(bind=db.get_bind(), expire_on_commit=False)
+    state = {"open": 0, "open_during_llm": []}
+
+    @contextmanager
+    def db_context():
+        session = factory()
+        state["open"] += 1
+        try:
+            yield session
+            session.commit()
+        finally:
+            session.close()
+            state["open"] -= 1
+
+    with patch.object(story_agent, "get_db_context", db_context), \
+            patch.object(qa_agent, "get_db_context", db_context):
+        yield state
+
+
+def fake_llm(state, output):
+    def generate_json(prompt, **kwargs):
+        state["open_during_llm"].append(state["open"])
+        return output
+    return generate_json
+
+
+class TestAgentSessions:
+    """Test the agents hold no database session while the model runs"""
+
+    def test_story_agent(self, db, sessions):
+        """Test stories are read, generated with no session open, then saved with the epic's owner"""
+        stories = [{"name": "Sign in", "description": "d", "acceptanceCriteria": []}]
+        with patch.object(story_agent, "generate_json", fake_llm(sessions, stories)):
+            response = story_agent.StoryAgent().execute({"epic_id": 1})
+
+        assert response.success is True, response
+        assert sessions["open_during_llm"] == [0]
+        db.expire_all()
+        saved = db.query(Story).filter(Story.id == response.data["stories"][0]["id"]).one()
+        assert (saved.epic_id, saved.upload_id, saved.user_id) == (1, 1, 1)
+
+    def test_qa_agent(self, db, sessions):
+        """Test QA tests are read, generated with no session open, then saved with the story's owner"""
+        tests = [{"title": "Valid login", "type": "Functional"}]
+        with patch.object(qa_agent, "generate_json", fake_llm(sessions, tests)):
+            response = qa_agent.QAAgent().execute({"story_id": 1})
+
+        assert response.success is True, response
+        assert sessions["open_during_llm"] == [0]
+        db.expire_all()
+        saved = db.query(QA).filter(QA.id == response.data["qa_tests"][0]["id"]).one()
+        assert (saved.story_id, saved.user_id, saved.test_type) == (1, 1, "functional")
+
+    def test_missing_epic(self, db, sessions):
+        """Test an unknown epic fails without calling the model"""
+        with patch.object(story_agent, "generate_json") as generate_json:
+            response = story_agent.StoryAgent().execute({"epic_id": 99})
+
+        assert response.success is False
+        generate_json.assert_not_called()
@@ -0,0 +1,228 @@
+"""Unit tests for approximate nearest-neighbour indexes"""
+
+import pytest
+from unittest.mock import Mock, patch
+import numpy as np
+import rag.ann as ann
+import rag.vectorstore as vectorstore_module
+from rag.ann import IVFIndex, create_index, resolve_index_type
+from rag.ann_tools import benchmark, build_store_indexes, exact_top_k, synthetic_vectors
+from rag.vectorstore import VectorStore
+
+
+@pytest.fixture
+def vectors():
+    """Clustered unit-length vectors"""
+    return synthetic_vectors(2000, 16, clusters=20)
+
+
+@pytest.fixture
+def ann_store(tmp_path, vectors):
+    """Vector store with 2000 documents and the ANN threshold lowered"""
+    model = Mock()
+    model.encode.side_effect = lambda texts, **kwargs: (
+        vectors[int(texts)] if isinstance(texts, str) else vectors[[int(text) for text in texts]]
+    )
+    VectorStore._embedding_cache.clear()
+    VectorStore._cache_timestamp.clear()
+    with patch("rag.vectorstore.get_embedding_model", return_value=model), \
+            patch.object(vectorstore_module, "VECTORSTORE_ANN_MIN_DOCUMENTS", 100):
+        store = VectorStore(store_path=str(tmp_path / "vectorstore.json"), index_type="ivf")
+        store.store_documents([
+            {"text": str(i), "doc_id": f"doc_{i}", "metadata": {"parity": i % 2}}
+            for i in range(len(vectors))
+        ])
+        yield store
+    VectorStore._embedding_cache.clear()
+    VectorStore._cache_timestamp.clear()
+
+
+class TestIVFIndex:
+    """Test the NumPy IVF backend"""
+
+    def test_full_probe_matches_exact(self, vectors):
+        """Test probing every list returns the exact neighbours"""
+        index = IVFIndex(nlist=10)
+        index.build(vectors, np.arange(len(vectors)))
+
+        rows, scores = index.search(vectors, vectors[7], 5, nprobe=10)
+
+        top = rows[np.argsort(-scores)[:5]]
+        assert list(top) == list(exact_top_k(vectors, vectors[7], 5))
+
+    def test_probe_limits_candidates(self, vectors):
+        """Test fewer probes scan fewer rows"""
+        index = IVFIndex(nlist=20)
+        index.build(vectors, np.arange(len(vectors)))
+
+        few, _ = index.search(vectors, vectors[0], 5, nprobe=1)
+        many, _ = index.search(vectors, vectors[0], 5, nprobe=20)
+
+        assert len(few) < len(many) == len(vectors)
+
+    def test_indexes_only_given_rows(self, vectors):
+        """Test rows outside the build set are never returned"""
+        index = IVFIndex(nlist=4)
+        index.build(vectors, np.arange(0, len(vectors), 2))
+
+        rows, _ = index.search(vectors, vectors[1], 5, nprobe=4)
+
+        assert np.all(rows % 2 == 0)
+
+    def test_save_and_load(self, tmp_path, vectors):
+        """Test a saved index answers the same way after loading"""
+        index = IVFIndex(nlist=8, nprobe=3)
+        index.build(vectors, np.arange(len(vectors)))
+        path = str(tmp_path / "index.ann")
+        index.save(path)
+
+        loaded = IVFIndex.load(path, vectors.shape[1])
+
+        assert loaded.nprobe == 3
+        assert np.array_equal(loaded.search(vectors, vectors[3], 5)[0], index.search(vectors, vectors[3], 5)[0])
+
+
+class TestBackendSelection:
+    """Test index type resolution"""
+
+    def test_unknown_type_rejected(self):
+        """Test unknown index types raise"""
+        with pytest.raises(ValueError):
+            resolve_index_type("annoy")
+
+    def test_hnsw_falls_back_without_hnswlib(self):
+        """Test hnsw resolves to ivf when hnswlib is missing"""
+        with patch.object(ann, "hnswlib", None):
+            assert resolve_index_type("hnsw") == "ivf"
+
+    def test_hnsw_backend(self, vectors):
+        """Test the hnswlib backend finds the query's own row"""
+        pytest.importorskip("hnswlib")
+        index = create_index("hnsw")
+        index.build(vectors, np.arange(len(vectors)))
+
+        rows, scores = index.search(vectors, vectors[42], 5, ef_search=64)
+
+        assert rows[np.argmax(scores)] == 42
+
+
+class TestVectorStoreANN:
+    """Test VectorStore searches through the ANN index"""
+
+    def test_search_builds_index_in_background(self, ann_store):
+        """Test the first search scans exactly and leaves the build to a background thread"""
+        assert ann_store.get_stats()["ann_indexed_rows"] == 0
+
+        with patch.object(ann_store, "build_ann_index") as build:
+            ann_store._build_ann_in_background = lambda: build()
+            results = ann_store.search("5", top_k=3, nprobe=64)
+            ann_store._ann_build_thread.join(timeout=30)
+
+        assert results[0]["doc_id"] == "doc_5"
+        assert results[0]["similarity"] == pytest.approx(1.0, abs=1e-5)
+        build.assert_called_once_with()
+
+    def test_background_build_used_once_ready(self, ann_store):
+        """Test searches use the index once the background build has finished"""
+        ann_store.search("5", top_k=3)
+        ann_store._ann_build_thread.join(timeout=30)
+
+        assert ann_store.get_stats()["ann_indexed_rows"] == 2000
+        assert ann_store.search("5", top_k=3, nprobe=64)[0]["doc_id"] == "doc_5"
+
+    def test_ann_matches_exact_with_full_probe(self, ann_store):
+        """Test probing all lists gives the exact results"""
+        ann_store.build_ann_index(nlist=10)
+        approximate = ann_store.search("11", top_k=10, nprobe=10000)
+        exact = ann_store.search("11", top_k=10, exact=True)
+
+        assert [r["doc_id"] for r in approximate] == [r["doc_id"] for r in exact]
+
+    def test_filters_and_deletes_apply(self, ann_store):
+        """Test metadata filters and deletions still hold with the ANN index"""
+        ann_store.build_ann_index(nlist=10)
+        ann_store.delete_document("doc_4")
+
+        results = ann_store.search("4", top_k=5, filters={"parity": 0}, nprobe=10)
+
+        assert results
+        assert all(r["metadata"]["parity"] == 0 for r in results)
+        assert "doc_4" not in [r["doc_id"] for r in results]
+
+    def test_new_documents_found_before_rebuild(self, ann_store, vectors):
+        """Test rows appended after the build are scanned exactly"""
+        ann_store.build_ann_index(nlist=10)
+        ann_store.store_documents([{"text": "3", "doc_id": "late"}])
+
+        results = ann_store.search("3", top_k=2, nprobe=1)
+
+        assert "late" in [r["doc_id"] for r in results]
+
+    def test_index_reloaded_from_disk(self, ann_store):
+        """Test a saved index is reused when the store is reopened"""
+        ann_store.build_ann_index(nlist=10)
+
+        reopened = VectorStore(store_path=ann_store.store_path, index_type="ivf")
+
+        assert reopened.get_stats()["ann_indexed_rows"] == 2000
+
+    def test_compaction_drops_index(self, ann_store):
+        """Test compaction invalidates the row-numbered index"""
+        ann_store.build_ann_index(nlist=10)
+
+        ann_store.compact()
+
+        assert ann_store.get_stats()["ann_indexed_rows"] == 0
+        reopened = VectorStore(store_path=ann_store.store_path, index_type="ivf")
+        assert reopened.get_stats()["ann_indexed_rows"] == 0
+
+    def test_build_store_indexes_skips_current(self, ann_store, tmp_path):
+        """Test the build command only builds missing indexes unless forced"""
+        first = build_store_indexes(str(tmp_path), "ivf", nlist=10)
+        second = build_store_indexes(str(tmp_path), "ivf")
+        forced = build_store_indexes(str(tmp_path), "ivf", force=True, nlist=10)
+
+        assert first["vectorstore"]["indexed_rows"] == 2000
+        assert second["vectorstore"]["skipped"] is True
+        assert forced["vectorstore"]["indexed_rows"] == 2000
+
+    def test_build_discarded_after_compaction(self, ann_store):
+        """Test an index built for a generation compacted away mid-build is not installed"""
+        original = ann_store._matrix
+
+        def compact_during_build(index, matrix, rows):
+            ann_store.delete_document("doc_0")
+            ann_store.compact()
+
+        with patch.object(IVFIndex, "build", compact_during_build):
+            stats = ann_store.build_ann_index(nlist=10)
+
+        assert stats["indexed_rows"] == 0
+        assert ann_store.get_stats()["ann_indexed_rows"] == 0
+        assert original is not ann_store._matrix
+
+
+class TestANNIndexBase:
+    """Test the backend interface"""
+
+    def test_incomplete_backend_rejected(self):
+        """Test a backend missing part of the interface cannot be instantiated"""
+        class SearchOnly(ann.ANNIndex):
+            def search(self, matrix, query, k, nprobe=None, ef_search=None):
+                return np.array([]), np.array([])
+
+        with pytest.raises(TypeError):
+            SearchOnly()
+
+
+class TestBenchmark:
+    """Test the recall benchmark"""
+
+    def test_reports_recall_per_setting(self, vectors):
+        """Test recall improves with more probes and exact is the baseline"""
+        results = benchmark(vectors, vectors[:20], k=5, index_types=["ivf"])
+
+        assert results[0]["index_type"] == "exact"
+        ivf = [row for row in results if row["index_type"] == "ivf"]
+        assert [row["params"]["nprobe"] for row in ivf] == [1, 4, 8, 16, 32]
+        assert ivf[-1]["recall_at_k"] >= ivf[0]["recall_at_k"]
@@ -0,0 +1,193 @@
+"""Unit tests for upload chunking and passage-level RAG search"""
+
+import numpy as np
+import pytest
+from unittest.mock import Mock
+from models.file_model import User, Upload, UploadChunk
+from rag.chunking import chunk_text, is_heading
+from rag.row_embeddings import pack_embedding
+from rag.upload_chunks import (
+    backfill_upload_chunks,
+    best_chunk_per_upload,
+    build_upload_chunks,
+    chunk_embedding_text,
+    search_upload_chunks,
+)
+
+LOCKOUT = "The system shall lock the account after five failed attempts. "
+DOCUMENT = (
+    "# Login\n\n"
+    "Users sign in with email and password. " + LOCKOUT * 20 + "\n\n"
+    "2.1 Password Reset\n"
+    "Users can reset their password by email.\n"
+    "A reset link expires after one hour.\n\n"
+    "NON-FUNCTIONAL REQUIREMENTS\n"
+    "Pages load within two seconds."
+)
+KEYWORDS = ["lock", "reset", "seconds"]
+
+
+def keyword_model():
+    """Fake SentenceTransformer: one dimension per keyword the text contains"""
+    model = Mock()
+    model.encode.side_effect = lambda texts, show_progress_bar=False: np.array(
+        [[float(word in text.lower()) for word in KEYWORDS] + [0.01] for text in texts]
+    )
+    return model
+
+
+def query(word):
+    return [float(word == keyword) for keyword in KEYWORDS] + [0.0]
+
+
+class TestChunkText:
+    """Test documents are split along their structure with overlap"""
+
+    def test_chunks_are_exact_slices_within_limit(self):
+        """Test every chunk is text[start:end] and no longer than max_chars"""
+        chunks = chunk_text(DOCUMENT, max_chars=300, overlap_chars=60)
+
+        assert [chunk.index for chunk in chunks] == list(range(len(chunks)))
+        for chunk in chunks:
+            assert DOCUMENT[chunk.start:chunk.end] == chunk.text
+            assert len(chunk.text) <= 300
+
+    def test_headings_start_chunks(self):
+        """Test a heading begins a new chunk and later chunks keep their section heading"""
+        chunks = chunk_text(DOCUMENT, max_chars=300, overlap_chars=60)
+
+        reset = next(chunk for chunk in chunks if "Password Reset" in chunk.text)
+        assert reset.text.startswith("2.1 Password Reset")
+        assert reset.text.endswith("one hour.")
+        assert chunks[-1].heading == "NON-FUNCTIONAL REQUIREMENTS"
+        assert all(chunk.heading == "# Login" for chunk in chunks if LOCKOUT.strip() in chunk.text)
+
+    def test_long_paragraph_overlaps(self):
+        """Test consecutive chunks of one paragraph overlap, cut on sentence ends"""
+        chunks = [chunk for chunk in chunk_text(DOCUMENT, max_chars=300, overlap_chars=60)
+                  if chunk.heading == "# Login"]
+
+        assert len(chunks) > 2
+        for previous, current in zip(chunks, chunks[1:]):
+            assert previous.end - 60 <= current.start < previous.end
+        assert all(chunk.text.endswith(".") for chunk in chunks)
+
+    def test_no_overlap_across_sections(self):
+        """Test a chunk that starts at a heading repeats nothing from the previous section"""
+        chunks = chunk_text(DOCUMENT, max_chars=300, overlap_chars=60)
+        reset = next(index for index, chunk in enumerate(chunks) if chunk.text.startswith("2.1"))
+
+        assert chunks[reset].start > chunks[reset - 1].end
+
+    def test_short_and_empty(self):
+        """Test short text is one chunk and blank text has none"""
+        assert [chunk.text for chunk in chunk_text("  One line.  ")] == ["One line."]
+        assert chunk_text(" \n\n ") == []
+
+    def test_is_heading(self):
+        """Test heading detection for markdown, numbered and upper-case lines"""
+        assert is_heading("## Scope")
+        assert is_heading("3.2 Data Retention")
+        assert is_heading("FUNCTIONAL REQUIREMENTS")
+        assert not is_heading("1. Users can reset their password by email.")
+        assert not is_heading("Users can reset their password")
+
+
+class TestUploadChunks:
+    """Test chunks are embedded at ingest and searched by passage"""
+
+    @pytest.fixture
+    def db(self, sqlite_session):
+        sqlite_session.add_all([User(id=1, email="a@example.com"), User(id=2, email="b@example.com")])
+        sqlite_session.commit()
+        return sqlite_session
+
+    def store(self, db, upload_id, user_id, text, model):
+        upload = Upload(id=upload_id, user_id=user_id, filename=f"{upload_id}.pdf", content={"requirement": text})
+        build_upload_chunks(upload, model)
+        db.add(upload)
+        db.commit()
+        return upload
+
+    def test_build_embeds_in_one_batch(self, db):
+        """Test all chunks of an upload are encoded in one call, under their heading"""
+        model = keyword_model()
+
+        upload = self.store(db, 1, 1, DOCUMENT, model)
+
+        assert model.encode.call_count == 1
+        assert len(model.encode.call_args.args[0]) == len(upload.chunks) > 1
+        rows = db.query(UploadChunk).order_by(UploadChunk.chunk_index).all()
+        assert all(row.embedding and row.upload_id == 1 for row in rows)
+        assert DOCUMENT[rows[1].start_offset:rows[1].end_offset] == rows[1].text
+        assert upload.chunked
+
+    def test_embedding_text_includes_heading(self):
+        """Test a continued passage is embedded with its section heading"""
+        chunk = Mock(heading="# Login", text="The system shall lock the account.")
+
+        assert chunk_embedding_text(chunk) == "# Login\nThe system shall lock the account."
+
+    def test_search_returns_passages_with_upload(self, db):
+        """Test the best passage comes back with its upload, scoped to the user"""
+        model = keyword_model()
+        self.store(db, 1, 1, DOCUMENT, model)
+        self.store(db, 2, 2, "Reset tokens are single use.", model)
+
+        matches = search_upload_chunks(db, query("reset"), user_id=1, top_k=2)
+
+        chunk, score = matches[0]
+        assert "reset link" in chunk.text
+        assert (chunk.upload.id, chunk.upload.filename) == (1, "1.pdf")
+        assert score > 0.9
+        assert all(match.upload_id == 1 for match, _ in matches)
+
+    def test_search_is_read_only(self, db):
+        """Test search neither chunks old uploads nor uses chunks from another model"""
+        model = keyword_model()
+        self.store(db, 1, 1, "Pages load within two seconds.", model)
+        row = db.query(UploadChunk).one()
+        row.embedding, row.embedding_model = pack_embedding([0, 0, 0, 1]), "old-model"
+        db.add(Upload(id=2, user_id=1, filename="old.pdf", content={"requirement": DOCUMENT}))
+        db.commit()
+        model.encode.reset_mock()
+
+        assert search_upload_chunks(db, query("seconds")) == []
+        assert db.query(UploadChunk).count() == 1
+        assert not db.new and not db.dirty
+        model.encode.assert_not_called()
+
+    def test_backfill_chunks_unchunked_uploads(self, db):
+        """Test uploads stored without chunks are chunked once and marked as chunked"""
+        model = keyword_model()
+        db.add(Upload(id=1, user_id=1, filename="old.pdf", content={"requirement": DOCUMENT}))
+        db.add(Upload(id=2, user_id=1, filename="empty.pdf", content={"requirement": ""}))
+        db.commit()
+
+        assert backfill_upload_chunks(db, batch_size=1, model=model) > 1
+        assert all(upload.chunked for upload in db.query(Upload))
+        matches = search_upload_chunks(db, query("seconds"), upload_id=1, top_k=1)
+        assert "two seconds" in matches[0][0].text
+
+        model.encode.reset_mock()
+        assert backfill_upload_chunks(db, model=model) == 0
+        model.encode.assert_not_called()
+
+    def test_backfill_reembeds_other_models(self, db):
+        """Test chunks embedded by another model are re-encoded by the backfill"""
+        model = keyword_model()
+        self.store(db, 1, 1, "Pages load within two seconds.", model)
+        row = db.query(UploadChunk).one()
+        row.embedding, row.embedding_model = pack_embedding([0, 0, 0, 1]), "old-model"
+        db.commit()
+
+        assert backfill_upload_chunks(db, model=model) == 1
+
+        assert row.embedding_model != "old-model"
+        assert search_upload_chunks(db, query("seconds"))
+
+    def test_best_chunk_per_upload(self):
+        """Test only the first (best) passage of each upload is kept"""
+        first, second, third = Mock(upload_id=1), Mock(upload_id=1), Mock(upload_id=2)
+
+        assert best_chunk_per_upload([(first, 0.9), (second, 0.8), (third, 0.5)]) == [(first, 0.9), (third, 0.5)]
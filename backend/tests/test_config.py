@@ -138,6 +138,25 @@ class TestJiraConfiguration:
         assert len(JIRA_API_TOKEN_ENCRYPTION_KEY) >= 8
 
 
+class TestStorageConfiguration:
+    """Test local storage paths"""
+    
+    def test_storage_paths_share_absolute_base(self):
+        """Test the job store and LLM cache default to the same storage directory as the vector store"""
+        import importlib
+        import config.config as config_module
+        
+        with patch.dict(os.environ, {}, clear=False):
+            for name in ("STORAGE_DIR", "VECTORSTORE_DIR", "JOB_STORE_PATH", "LLM_CACHE_PATH"):
+                os.environ.pop(name, None)
+            importlib.reload(config_module)
+            storage_dir = config_module.STORAGE_DIR
+            paths = (config_module.VECTORSTORE_DIR, config_module.JOB_STORE_PATH, config_module.LLM_CACHE_PATH)
+        importlib.reload(config_module)
+        
+        assert os.path.isabs(storage_dir)
+        assert paths == (storage_dir, os.path.join(storage_dir, "jobs.db"), os.path.join(storage_dir, "llm_cache.db"))
+
 class TestGeminiConfiguration:
     """Test Gemini API configuration"""
     
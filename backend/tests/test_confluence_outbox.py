@@ -0,0 +1,257 @@
+"""Unit tests for the Confluence publication outbox, against a local fake server"""
+
+import pytest
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from unittest.mock import patch
+from sqlalchemy import event, update
+from sqlalchemy.orm import Session, sessionmaker
+from models.file_model import User, Upload, Epic, QA, ConfluenceOutbox
+from services import confluence_outbox as outbox
+from services.confluence_publisher import ConfluencePublisher, epic_page_spec
+from tests.fake_confluence import FakeConfluence
+
+
+@pytest.fixture
+def fake():
+    with FakeConfluence() as server:
+        yield server
+
+
+@pytest.fixture
+def db(sqlite_session):
+    """Upload 1 with two epics, each with one test plan"""
+    sqlite_session.add(User(id=1, email="a@example.com"))
+    sqlite_session.add(Upload(id=1, user_id=1, filename="req.pdf", content={}))
+    sqlite_session.add_all([Epic(id=e, upload_id=1, name=f"Epic {e}", content={"description": "d"}) for e in (1, 2)])
+    sqlite_session.add_all([QA(id=10 + e, epic_id=e, type="test_plan", content={"title": f"Plan {e}"}) for e in (1, 2)])
+    sqlite_session.commit()
+    return sqlite_session
+
+
+@pytest.fixture
+def worker(db, fake):
+    """Route the outbox's sessions and publisher to the test database and fake server"""
+    factory = sessionmaker(bind=db.get_bind(), expire_on_commit=False)
+    state = {"open_sessions": 0, "open_while_publishing": []}
+
+    @contextmanager
+    def db_context():
+        session = factory()
+        state["open_sessions"] += 1
+        try:
+            yield session
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+            state["open_sessions"] -= 1
+
+    publisher = ConfluencePublisher(url=fake.url, space_key="REQ", max_retries=0, backoff_seconds=0)
+    publish = publisher.publish
+
+    def checked_publish(*args, **kwargs):
+        state["open_while_publishing"].append(state["open_sessions"])
+        return publish(*args, **kwargs)
+
+    publisher.publish = checked_publish
+    with patch.object(outbox, "get_db_context", db_context), \
+            patch.object(outbox, "get_confluence_publisher", return_value=publisher), \
+            patch.object(outbox, "CONFLUENCE_ROOT_FOLDER_ID", "42"):
+        yield state
+
+
+def entry(db, entry_id):
+    db.expire_all()
+    return db.get(ConfluenceOutbox, entry_id)
+
+
+class TestEnqueue:
+    """Test outbox entries join the caller's transaction"""
+
+    def test_entry_pending_in_transaction(self, db):
+        """Test the entry gets an ID but disappears if the transaction rolls back"""
+        created = outbox.enqueue_publication(db, 1, user_id=1)
+
+        assert created.id is not None
+        assert created.status == outbox.OUTBOX_PENDING
+        db.rollback()
+        assert db.query(ConfluenceOutbox).count() == 0
+
+
+class TestBuildPageTree:
+    """Test the page tree read from the database"""
+
+    def test_upload_epics_and_test_plans(self, db):
+        """Test folder > epics > test plans, each tied to its row"""
+        root = outbox.build_page_tree(db, 1)
+
+        assert (root.model, root.row_id) == (Upload, 1)
+        assert root.title.startswith("req.pdf_")
+        assert [(e.model, e.row_id) for e in root.children] == [(Epic, 1), (Epic, 2)]
+        assert [(p.model, p.row_id) for p in root.children[0].children] == [(QA, 11)]
+        assert "Test Plan: Plan 1" in root.children[0].children[0].body
+
+    def test_existing_pages_and_epic_filter(self, db):
+        """Test recorded page IDs are carried over and epic_id limits the epics"""
+        db.get(Upload, 1).confluence_page_id = "500"
+        db.commit()
+
+        root = outbox.build_page_tree(db, 1, epic_id=2)
+
+        assert root.page_id == "500"
+        assert [e.row_id for e in root.children] == [2]
+
+    def test_missing_upload(self, db):
+        """Test a deleted upload has nothing to publish"""
+        assert outbox.build_page_tree(db, 99) is None
+
+
+class TestProcessOutbox:
+    """Test the worker publishes entries and records the outcome"""
+
+    def test_publishes_and_saves_page_ids(self, db, fake, worker):
+        """Test every page is created and its ID written back, with no session open during publishing"""
+        created = outbox.enqueue_publication(db, 1, user_id=1)
+        db.commit()
+
+        assert outbox.process_outbox() == {outbox.OUTBOX_DONE: 1}
+
+        db.expire_all()
+        assert len(fake.pages) == 5
+        assert fake.pages[db.get(Upload, 1).confluence_page_id]["parent_id"] == "42"
+        assert fake.pages[db.get(QA, 12).confluence_page_id]["parent_id"] == db.get(Epic, 2).confluence_page_id
+        assert entry(db, created.id).attempts == 1
+        assert worker["open_while_publishing"] == [0]
+
+    def test_failure_backs_off(self, db, fake, worker):
+        """Test a failed page puts the entry back to pending with a later available_at"""
+        created = outbox.enqueue_publication(db, 1, user_id=1)
+        db.commit()
+        fake.fail("Epic 2", 503)
+
+        with patch.object(outbox, "epic_page_spec", side_effect=_fixed_title_spec):
+            assert outbox.process_outbox() == {outbox.OUTBOX_PENDING: 1}
+
+        retried = entry(db, created.id)
+        assert "503" in retried.last_error
+        assert retried.available_at > datetime.utcnow() + timedelta(seconds=20)
+        assert db.get(Epic, 1).confluence_page_id is not None
+        assert db.get(Epic, 2).confluence_page_id is None
+        assert outbox.claim_pending() == []
+
+    def test_retry_does_not_duplicate_pages(self, db, fake, worker):
+        """Test a retry only creates the pages that are still missing"""
+        created = outbox.enqueue_publication(db, 1, user_id=1)
+        db.commit()
+        fake.fail("Epic 2", 503)
+
+        with patch.object(outbox, "epic_page_spec", side_effect=_fixed_title_spec):
+            outbox.process_outbox()
+            entry(db, created.id).available_at = datetime.utcnow()
+            db.commit()
+            assert outbox.process_outbox() == {outbox.OUTBOX_DONE: 1}
+
+        assert len(fake.pages) == 5
+        assert (fake.attempts["Epic 1"], fake.attempts["Epic 2"]) == (1, 2)
+        assert sum(1 for page in fake.pages.values() if page["title"].startswith("req.pdf_")) == 1
+        assert entry(db, created.id).attempts == 2
+
+    def test_failed_after_max_attempts_then_replay(self, db, fake, worker):
+        """Test an entry out of attempts is failed until replayed"""
+        created = outbox.enqueue_publication(db, 1, user_id=1)
+        created.attempts = outbox.CONFLUENCE_OUTBOX_MAX_ATTEMPTS - 1
+        db.commit()
+        fake.fail("Epic 1", 503)
+
+        with patch.object(outbox, "epic_page_spec", side_effect=_fixed_title_spec):
+            assert outbox.process_outbox() == {outbox.OUTBOX_FAILED: 1}
+            assert outbox.claim_pending() == []
+
+            assert outbox.replay_failed(db, user_id=2) == 0
+            assert outbox.replay_failed(db, user_id=1) == 1
+            assert outbox.process_outbox() == {outbox.OUTBOX_DONE: 1}
+
+        replayed = entry(db, created.id)
+        assert (replayed.status, replayed.attempts) == (outbox.OUTBOX_DONE, 1)
+        assert len(fake.pages) == 5
+
+    def test_crash_releases_entry(self, db, worker):
+        """Test an unexpected error returns the entry to pending instead of leaving it in progress"""
+        created = outbox.enqueue_publication(db, 1, user_id=1)
+        db.commit()
+
+        with patch.object(outbox, "build_page_tree", side_effect=RuntimeError("boom")):
+            assert outbox.process_outbox() == {outbox.OUTBOX_PENDING: 1}
+
+        assert entry(db, created.id).last_error == "boom"
+
+
+class TestClaim:
+    """Test entries are claimed one upload at a time"""
+
+    def test_skips_upload_in_progress(self, db, worker):
+        """Test an upload with an entry in progress is not claimed again"""
+        first = outbox.enqueue_publication(db, 1, user_id=1)
+        first.status = outbox.OUTBOX_IN_PROGRESS
+        second = outbox.enqueue_publication(db, 1, epic_id=2, user_id=1)
+        db.commit()
+
+        assert outbox.claim_pending() == []
+        entry(db, first.id).status = outbox.OUTBOX_DONE
+        db.commit()
+        assert outbox.claim_pending() == [second.id]
+
+    def test_rechecks_under_upload_lock(self, db, worker):
+        """Test an upload claimed by another worker after the first query is not claimed again"""
+        ours = outbox.enqueue_publication(db, 1, user_id=1)
+        theirs = outbox.enqueue_publication(db, 1, epic_id=2, user_id=1)
+        db.commit()
+        raced = []
+
+        def other_worker_claims(state):
+            # Runs as the uploads are locked: the other worker committed its claim just before
+            if not raced and state.is_select and "uploads" in str(state.statement):
+                raced.append(True)
+                state.session.execute(
+                    update(ConfluenceOutbox).where(ConfluenceOutbox.id == theirs.id)
+                    .values(status=outbox.OUTBOX_IN_PROGRESS)
+                )
+
+        event.listen(Session, "do_orm_execute", other_worker_claims)
+        try:
+            assert outbox.claim_pending() == []
+        finally:
+            event.remove(Session, "do_orm_execute", other_worker_claims)
+        assert raced and entry(db, ours.id).status == outbox.OUTBOX_PENDING
+
+    def test_interrupted_entries_requeued(self, db, worker):
+        """Test entries whose claim outlived the lease go back to pending"""
+        created = outbox.enqueue_publication(db, 1, user_id=1)
+        created.status = outbox.OUTBOX_IN_PROGRESS
+        created.claimed_at = datetime.utcnow() - timedelta(seconds=outbox.CONFLUENCE_OUTBOX_LEASE_SECONDS + 1)
+        db.commit()
+
+        assert outbox._requeue_expired() == 1
+        requeued = entry(db, created.id)
+        assert (requeued.status, requeued.claimed_at) == (outbox.OUTBOX_PENDING, None)
+
+    def test_live_claims_not_requeued(self, db, worker):
+        """Test an entry another worker claimed recently is left in progress"""
+        created = outbox.enqueue_publication(db, 1, user_id=1)
+        db.commit()
+        assert outbox.claim_pending() == [created.id]
+
+        assert outbox._requeue_expired() == 0
+        assert outbox.process_outbox() == {}
+        claimed = entry(db, created.id)
+        assert claimed.status == outbox.OUTBOX_IN_PROGRESS and claimed.claimed_at is not None
+
+
+def _fixed_title_spec(epic_id, epic_data):
+    """Epic page without the timestamp suffix, so failures can target it by title"""
+    spec = epic_page_spec(epic_id, epic_data)
+    spec.title = epic_data["name"]
+    return spec
@@ -0,0 +1,159 @@
+"""Unit tests for the concurrent Confluence publisher, against a local fake server"""
+
+import pytest
+from sqlalchemy import event
+from unittest.mock import call, patch
+from models.file_model import User, Upload, Epic, QA
+from services.confluence_publisher import (
+    ConfluencePublishError,
+    ConfluencePublisher,
+    PageSpec,
+    iter_pages,
+    save_page_ids,
+)
+from tests.fake_confluence import FakeConfluence
+
+
+@pytest.fixture
+def fake():
+    with FakeConfluence() as server:
+        yield server
+
+
+def make_publisher(server, **kwargs):
+    kwargs.setdefault("backoff_seconds", 0)
+    return ConfluencePublisher(url=server.url, username="bot", password="secret", space_key="REQ", **kwargs)
+
+
+def tree(epics=3, plans=2):
+    """Upload folder > epics > test plans"""
+    return PageSpec("Upload", "<h2>Upload</h2>", model=Upload, row_id=1, children=[
+        PageSpec(f"Epic {e}", "<p>epic</p>", model=Epic, row_id=e, children=[
+            PageSpec(f"Plan {e}.{p}", "<p>plan</p>", model=QA, row_id=e * 10 + p) for p in range(plans)
+        ])
+        for e in range(1, epics + 1)
+    ])
+
+
+class TestPublishTree:
+    """Test page trees are created under the right parents"""
+
+    def test_tree_structure(self, fake):
+        """Test every page is created once, under its parent's new page"""
+        root = make_publisher(fake).publish(tree(), parent_id="42")
+
+        assert len(fake.pages) == 1 + 3 + 6
+        assert fake.parent_of("Upload") == "42"
+        for epic in root.children:
+            assert fake.parent_of(epic.title) == root.page_id
+            for plan in epic.children:
+                assert fake.parent_of(plan.title) == epic.page_id
+        assert all(page.error is None for page in iter_pages(root))
+
+    def test_siblings_created_concurrently(self):
+        """Test sibling pages overlap, up to max_workers at once"""
+        with FakeConfluence(delay=0.05) as server:
+            make_publisher(server, max_workers=4).publish(tree(epics=8, plans=0))
+
+        assert 1 < server.peak_in_flight <= 4
+
+    def test_single_worker_is_serial(self):
+        """Test max_workers=1 never has two requests in flight"""
+        with FakeConfluence(delay=0.01) as server:
+            make_publisher(server, max_workers=1).publish(tree(epics=3, plans=1))
+
+        assert server.peak_in_flight == 1
+
+    def test_publish_many_siblings(self, fake):
+        """Test several roots are published under one existing page"""
+        pages = [PageSpec(f"Plan {n}", "<p/>") for n in range(3)]
+
+        make_publisher(fake).publish_many(pages, parent_id="7")
+
+        assert [fake.parent_of(p.title) for p in pages] == ["7"] * 3
+
+
+class TestRetries:
+    """Test retry with backoff on throttling and server errors"""
+
+    def test_retries_429_and_5xx(self, fake):
+        """Test a page that gets 429 then 503 is created on the third attempt"""
+        fake.fail("Epic 1", 429, 503)
+
+        root = make_publisher(fake).publish(tree(epics=1, plans=0))
+
+        assert fake.attempts["Epic 1"] == 3
+        assert root.children[0].page_id is not None
+
+    def test_retry_after_honoured(self):
+        """Test the Retry-After header sets the wait instead of the backoff"""
+        with FakeConfluence(retry_after="2") as server:
+            server.fail("Upload", 429)
+            with patch("services.confluence_publisher.time.sleep") as sleep:
+                make_publisher(server, backoff_seconds=5).create_page("Upload", "<p/>")
+
+        assert call(2.0) in sleep.call_args_list
+        assert call(5) not in sleep.call_args_list
+
+    def test_client_errors_not_retried(self, fake):
+        """Test a 400 fails at once and skips the page's descendants"""
+        fake.fail("Epic 2", 400)
+
+        root = make_publisher(fake).publish(tree())
+
+        failed = root.children[1]
+        assert fake.attempts["Epic 2"] == 1
+        assert "400" in failed.error
+        assert all("was not created" in plan.error for plan in failed.children)
+        assert root.children[0].page_id and root.children[2].page_id
+
+    def test_retries_exhausted(self, fake):
+        """Test create_page raises once max_retries is used up"""
+        fake.fail("Upload", 503, 503, 503)
+
+        with pytest.raises(ConfluencePublishError) as exc:
+            make_publisher(fake, max_retries=2).create_page("Upload", "<p/>")
+
+        assert exc.value.status_code == 503
+        assert fake.attempts["Upload"] == 3
+
+    def test_unreachable_server(self):
+        """Test connection errors are retried and then reported"""
+        with FakeConfluence() as server:
+            url = server.url
+
+        publisher = ConfluencePublisher(url=url, space_key="REQ", max_retries=1, backoff_seconds=0, timeout=1)
+        with pytest.raises(ConfluencePublishError, match="unreachable"):
+            publisher.create_page("Upload", "<p/>")
+
+
+class TestSavePageIds:
+    """Test page IDs are written back in batches"""
+
+    def test_one_update_per_table(self, fake, sqlite_session):
+        """Test uploads, epics and QA are each updated with a single executemany"""
+        db = sqlite_session
+        db.add(User(id=1, email="a@example.com"))
+        db.add(Upload(id=1, user_id=1, filename="a.pdf", content={}))
+        db.add_all([Epic(id=e, upload_id=1, name=f"Epic {e}", content={}) for e in range(1, 4)])
+        db.add_all([QA(id=e * 10 + p, epic_id=e, type="test_plan", content={}) for e in range(1, 4) for p in range(2)])
+        db.commit()
+        root = make_publisher(fake).publish(tree())
+
+        updates = []
+        event.listen(db.get_bind(), "before_cursor_execute",
+                     lambda conn, cursor, statement, *args: updates.append(statement)
+                     if statement.startswith("UPDATE") else None)
+        saved = save_page_ids(db, root)
+
+        assert saved == 10
+        assert len(updates) == 3
+        assert db.get(Upload, 1).confluence_page_id == root.page_id
+        assert db.get(QA, 31).confluence_page_id == root.children[2].children[1].page_id
+
+    def test_failed_pages_skipped(self, fake, sqlite_session):
+        """Test nodes without a page ID are not written"""
+        root = PageSpec("Epic", "<p/>", model=Epic, row_id=1, error="boom")
+
+        assert save_page_ids(sqlite_session, root) == 0
+
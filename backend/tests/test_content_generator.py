@@ -1,6 +1,6 @@
 """Unit tests for content generator service"""
 import pytest
-from unittest.mock import Mock, MagicMock, patch
+from unittest.mock import AsyncMock, Mock, MagicMock, patch
 from sqlalchemy.orm import Session
 from services.content_generator import ContentGenerationService
 from models.file_model import Upload
@@ -16,7 +16,7 @@ def mock_db():
 @pytest.fixture
 def content_service(mock_db):
     """Create ContentGenerationService instance with mocked DB"""
-    with patch('services.content_generator.VectorStore'):
+    with patch('services.content_generator.get_default_store'):
         service = ContentGenerationService(mock_db)
     return service
 
@@ -26,10 +26,20 @@ class TestContentGenerationService:
     
     def test_service_initialization(self, mock_db):
         """Test service initialization"""
-        with patch('services.content_generator.VectorStore'):
+        with patch('services.content_generator.get_default_store'):
             service = ContentGenerationService(mock_db)
             assert service.db == mock_db
             assert service.vectorstore is not None
+
+    def test_services_share_vectorstore(self, mock_db):
+        """Test each service reuses the process-wide store rather than opening its own"""
+        with patch('rag.vectorstore.get_vectorstore') as get_vectorstore, \
+                patch('rag.vectorstore._default_store', None):
+            first = ContentGenerationService(mock_db)
+            second = ContentGenerationService(mock_db)
+
+        assert first.vectorstore is second.vectorstore
+        get_vectorstore.assert_called_once()
     
     def test_generate_epics_success(self, content_service, mock_db):
         """Test successful epic generation"""
@@ -83,6 +93,60 @@ class TestContentGenerationService:
                 result = content_service.generate_stories(1, "template")
                 assert len(result) == 1
     
+    @pytest.mark.asyncio
+    async def test_agenerate_stories_success(self, content_service, mock_db):
+        """Test story generation through the async Gemini client"""
+        mock_epic = Mock()
+        mock_epic.content = {"name": "Epic"}
+        mock_db.query.return_value.filter.return_value.first.return_value = mock_epic
+        
+        with patch('services.content_generator.agenerate_json', new_callable=AsyncMock) as mock_gemini:
+            mock_gemini.return_value = [{"name": "Story 1"}]
+            
+            result = await content_service.agenerate_stories(1, "Epic: {epic_content}")
+            
+            assert result == [{"name": "Story 1"}]
+            mock_gemini.assert_awaited_once_with("Epic: {'name': 'Epic'}", use_cache=True)
+    
+    @pytest.mark.asyncio
+    async def test_agenerate_stories_failure_wrapped(self, content_service, mock_db):
+        """Test Gemini errors surface as ProcessingError"""
+        mock_db.query.return_value.filter.return_value.first.return_value = Mock(content="epic")
+        
+        with patch('services.content_generator.agenerate_json', new_callable=AsyncMock) as mock_gemini:
+            mock_gemini.side_effect = TimeoutError("timed out")
+            
+            with pytest.raises(ProcessingError):
+                await content_service.agenerate_stories(1, "{epic_content}")
+    
+    @pytest.mark.asyncio
+    async def test_astream_stories_saves_each_item(self, content_service, mock_db):
+        """Test streamed stories are saved one by one and yielded with their IDs"""
+        mock_db.query.return_value.filter.return_value.first.return_value = Mock(content="epic")
+        
+        async def items(prompt, use_cache=True):
+            yield {"name": "Story 1"}
+            yield "not a story"
+            yield {"name": "Story 2"}
+        
+        saved = []
+        content_service.save_stories = lambda epic_id, data: saved.append(data) or [(len(saved), data[0])]
+        
+        with patch('services.content_generator.astream_json_items', side_effect=items):
+            result = [item async for item in content_service.astream_stories(1, "{epic_content}")]
+        
+        assert result == [(1, {"name": "Story 1"}), (2, {"name": "Story 2"})]
+        assert saved == [[{"name": "Story 1"}], [{"name": "Story 2"}]]
+    
+    @pytest.mark.asyncio
+    async def test_astream_epics_upload_not_found(self, content_service, mock_db):
+        """Test streaming epics for a missing upload raises"""
+        mock_db.query.return_value.filter.return_value.first.return_value = None
+        
+        with pytest.raises(ResourceNotFoundError):
+            async for _ in content_service.astream_epics(999, "{requirement_text}"):
+                pass
+    
     def test_generate_qa_success(self, content_service, mock_db):
         """Test successful QA generation"""
         mock_upload = Mock()
@@ -164,6 +228,31 @@ class TestContentStorageAndRetrieval:
         except AttributeError:
             pytest.skip("get_epics_by_upload method not implemented")
 
+    def test_save_epics_commits_before_embedding_and_indexing(self, content_service, mock_db):
+        """Rows are committed before they are encoded or indexed, then the embeddings are committed"""
+        calls = []
+        mock_db.commit.side_effect = lambda: calls.append("commit")
+        content_service.vectorstore.store_documents.side_effect = lambda items: calls.append("index")
+        
+        with patch('services.content_generator.epic_document', return_value={"id": "epic-1"}):
+            with patch('services.content_generator.embed_new_rows', side_effect=lambda rows, kind: calls.append("embed")):
+                saved = content_service.save_epics(1, [{"name": "Epic"}])
+        
+        assert len(saved) == 1
+        assert calls == ["commit", "index", "embed", "commit"]
+    
+    def test_save_qa_failed_commit_indexes_nothing(self, content_service, mock_db):
+        """A failed commit leaves no documents in the vector store for rows that do not exist"""
+        mock_db.commit.side_effect = RuntimeError("database is locked")
+        
+        with patch('services.content_generator.qa_document', return_value={"id": "qa-1"}):
+            with patch('services.content_generator.embed_new_rows') as mock_embed:
+                with pytest.raises(RuntimeError):
+                    content_service.save_qa(1, [{"title": "Plan"}], qa_type="test_plan")
+        
+        mock_embed.assert_not_called()
+        content_service.vectorstore.store_documents.assert_not_called()
+
 
 class TestErrorHandling:
     """Tests for error handling in content generation"""
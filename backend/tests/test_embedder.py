@@ -3,13 +3,27 @@
 import pytest
 from unittest.mock import Mock, MagicMock, patch
 import numpy as np
-from rag.embedder import EmbeddingManager, embed_text
+from rag.embedder import (
+    EmbeddingManager,
+    clear_embedding_models,
+    embed_text,
+    get_embedding_model,
+    get_embedding_model_stats,
+)
+
+
+@pytest.fixture(autouse=True)
+def reset_model_registry():
+    """Start every test with an empty model registry"""
+    clear_embedding_models()
+    yield
+    clear_embedding_models()
 
 
 class TestEmbeddingManager:
     """Test EmbeddingManager class"""
     
-    @patch('rag.embedder.SentenceTransformer')
+    @patch('sentence_transformers.SentenceTransformer')
     def test_initialization_default_model(self, mock_st):
         """Test EmbeddingManager initialization with default model"""
         mock_model = Mock()
@@ -21,7 +35,7 @@ class TestEmbeddingManager:
         assert manager.model_name == "all-MiniLM-L6-v2"
         mock_st.assert_called_once_with("all-MiniLM-L6-v2")
     
-    @patch('rag.embedder.SentenceTransformer')
+    @patch('sentence_transformers.SentenceTransformer')
     def test_initialization_custom_model(self, mock_st):
         """Test EmbeddingManager initialization with custom model"""
         mock_model = Mock()
@@ -33,7 +47,7 @@ class TestEmbeddingManager:
         assert manager.model_name == "custom-model"
         mock_st.assert_called_once_with("custom-model")
     
-    @patch('rag.embedder.SentenceTransformer')
+    @patch('sentence_transformers.SentenceTransformer')
     def test_initialization_failure(self, mock_st):
         """Test EmbeddingManager initialization failure"""
         mock_st.side_effect = Exception("Model not found")
@@ -41,7 +55,7 @@ class TestEmbeddingManager:
         with pytest.raises(Exception):
             EmbeddingManager()
     
-    @patch('rag.embedder.SentenceTransformer')
+    @patch('sentence_transformers.SentenceTransformer')
     def test_embed_text_single(self, mock_st):
         """Test embedding a single text"""
         mock_model = Mock()
@@ -55,7 +69,7 @@ class TestEmbeddingManager:
         assert np.array_equal(result, embedding)
         mock_model.encode.assert_called_once_with(["Sample text"])
     
-    @patch('rag.embedder.SentenceTransformer')
+    @patch('sentence_transformers.SentenceTransformer')
     def test_embed_text_empty_string(self, mock_st):
         """Test embedding an empty string"""
         mock_model = Mock()
@@ -68,7 +82,7 @@ class TestEmbeddingManager:
         
         mock_model.encode.assert_called_once_with([""])
     
-    @patch('rag.embedder.SentenceTransformer')
+    @patch('sentence_transformers.SentenceTransformer')
     def test_embed_text_special_characters(self, mock_st):
         """Test embedding text with special characters"""
         mock_model = Mock()
@@ -82,7 +96,7 @@ class TestEmbeddingManager:
         
         mock_model.encode.assert_called_once_with([text_with_chars])
     
-    @patch('rag.embedder.SentenceTransformer')
+    @patch('sentence_transformers.SentenceTransformer')
     def test_embed_text_unicode(self, mock_st):
         """Test embedding unicode text"""
         mock_model = Mock()
@@ -96,7 +110,7 @@ class TestEmbeddingManager:
         
         mock_model.encode.assert_called_once()
     
-    @patch('rag.embedder.SentenceTransformer')
+    @patch('sentence_transformers.SentenceTransformer')
     def test_embed_text_long_text(self, mock_st):
         """Test embedding very long text"""
         mock_model = Mock()
@@ -110,7 +124,7 @@ class TestEmbeddingManager:
         
         mock_model.encode.assert_called_once()
     
-    @patch('rag.embedder.SentenceTransformer')
+    @patch('sentence_transformers.SentenceTransformer')
     def test_embed_text_failure(self, mock_st):
         """Test embedding failure"""
         mock_model = Mock()
@@ -121,7 +135,7 @@ class TestEmbeddingManager:
         with pytest.raises(Exception):
             manager.embed_text("text")
     
-    @patch('rag.embedder.SentenceTransformer')
+    @patch('sentence_transformers.SentenceTransformer')
     def test_embed_batch_empty(self, mock_st):
         """Test embedding empty batch"""
         mock_model = Mock()
@@ -133,7 +147,7 @@ class TestEmbeddingManager:
         
         mock_model.encode.assert_called_once_with([])
     
-    @patch('rag.embedder.SentenceTransformer')
+    @patch('sentence_transformers.SentenceTransformer')
     def test_embed_batch_single_item(self, mock_st):
         """Test embedding batch with single item"""
         mock_model = Mock()
@@ -147,7 +161,7 @@ class TestEmbeddingManager:
         assert np.array_equal(result, embedding)
         mock_model.encode.assert_called_once_with(["Single text"])
     
-    @patch('rag.embedder.SentenceTransformer')
+    @patch('sentence_transformers.SentenceTransformer')
     def test_embed_batch_multiple_items(self, mock_st):
         """Test embedding batch with multiple items"""
         mock_model = Mock()
@@ -167,7 +181,7 @@ class TestEmbeddingManager:
         assert result.shape == (3, 2)
         mock_model.encode.assert_called_once_with(texts)
     
-    @patch('rag.embedder.SentenceTransformer')
+    @patch('sentence_transformers.SentenceTransformer')
     def test_embed_batch_large_batch(self, mock_st):
         """Test embedding large batch"""
         mock_model = Mock()
@@ -182,7 +196,7 @@ class TestEmbeddingManager:
         
         assert result.shape[0] == batch_size
     
-    @patch('rag.embedder.SentenceTransformer')
+    @patch('sentence_transformers.SentenceTransformer')
     def test_embed_batch_failure(self, mock_st):
         """Test batch embedding failure"""
         mock_model = Mock()
@@ -193,7 +207,7 @@ class TestEmbeddingManager:
         with pytest.raises(Exception):
             manager.embed_batch(["text1", "text2"])
     
-    @patch('rag.embedder.SentenceTransformer')
+    @patch('sentence_transformers.SentenceTransformer')
     def test_embed_batch_with_special_texts(self, mock_st):
         """Test batch embedding with special texts"""
         mock_model = Mock()
@@ -244,7 +258,7 @@ class TestEmbedTextLegacyFunction:
 class TestEmbeddingDimensions:
     """Test embedding output dimensions"""
     
-    @patch('rag.embedder.SentenceTransformer')
+    @patch('sentence_transformers.SentenceTransformer')
     def test_embedding_dimension_consistency(self, mock_st):
         """Test embedding dimensions are consistent"""
         mock_model = Mock()
@@ -258,7 +272,7 @@ class TestEmbeddingDimensions:
         
         assert len(result) == 384
     
-    @patch('rag.embedder.SentenceTransformer')
+    @patch('sentence_transformers.SentenceTransformer')
     def test_batch_embeddings_same_dimension(self, mock_st):
         """Test all batch embeddings have same dimension"""
         mock_model = Mock()
@@ -276,7 +290,7 @@ class TestEmbeddingDimensions:
 class TestEmbeddingNormalization:
     """Test embedding normalization and properties"""
     
-    @patch('rag.embedder.SentenceTransformer')
+    @patch('sentence_transformers.SentenceTransformer')
     def test_embedding_returns_array(self, mock_st):
         """Test embedding returns numpy array"""
         mock_model = Mock()
@@ -289,7 +303,7 @@ class TestEmbeddingNormalization:
         
         assert isinstance(result, np.ndarray)
     
-    @patch('rag.embedder.SentenceTransformer')
+    @patch('sentence_transformers.SentenceTransformer')
     def test_batch_embeddings_returns_2d_array(self, mock_st):
         """Test batch returns 2D array"""
         mock_model = Mock()
@@ -302,3 +316,80 @@ class TestEmbeddingNormalization:
         
         assert isinstance(result, np.ndarray)
         assert len(result.shape) == 2
+
+
+class TestEmbeddingModelRegistry:
+    """Test the shared embedding model registry"""
+    
+    @patch('sentence_transformers.SentenceTransformer')
+    def test_model_loaded_once(self, mock_st):
+        """Test repeated lookups reuse the same model instance"""
+        mock_model = Mock()
+        mock_st.return_value = mock_model
+        
+        first = get_embedding_model()
+        second = get_embedding_model()
+        
+        assert first is second is mock_model
+        mock_st.assert_called_once_with("all-MiniLM-L6-v2")
+    
+    @patch('sentence_transformers.SentenceTransformer')
+    def test_managers_share_model(self, mock_st):
+        """Test EmbeddingManager instances share the registry model"""
+        mock_st.return_value = Mock()
+        
+        assert EmbeddingManager().model is EmbeddingManager().model
+        mock_st.assert_called_once()
+    
+    @patch('sentence_transformers.SentenceTransformer')
+    def test_models_keyed_by_name(self, mock_st):
+        """Test different model names get separate instances"""
+        mock_st.side_effect = lambda name: Mock(name=name)
+        
+        assert get_embedding_model("model-a") is not get_embedding_model("model-b")
+        assert mock_st.call_count == 2
+    
+    @patch('sentence_transformers.SentenceTransformer')
+    def test_failed_load_not_cached(self, mock_st):
+        """Test a failed load is retried on the next lookup"""
+        mock_st.side_effect = [Exception("Model not found"), Mock()]
+        
+        with pytest.raises(Exception):
+            get_embedding_model()
+        assert get_embedding_model() is not None
+    
+    @patch('sentence_transformers.SentenceTransformer')
+    def test_stats_record_load(self, mock_st):
+        """Test load time and memory stats are recorded"""
+        mock_st.return_value = Mock()
+        
+        get_embedding_model()
+        stats = get_embedding_model_stats()
+        
+        assert stats["loaded_models"] == ["all-MiniLM-L6-v2"]
+        model_stats = stats["models"]["all-MiniLM-L6-v2"]
+        assert model_stats["load_time_seconds"] >= 0
+        assert "rss_after_mb" in model_stats
+    
+    @patch('sentence_transformers.SentenceTransformer')
+    def test_legacy_embedder_is_lazy(self, mock_st):
+        """Test the legacy module-level embedder loads on first use"""
+        mock_model = Mock()
+        mock_model.encode.return_value = np.array([[0.1, 0.2]])
+        mock_st.return_value = mock_model
+        
+        mock_st.assert_not_called()
+        result = embed_text("text")
+        
+        assert np.array_equal(result, np.array([0.1, 0.2]))
+        mock_st.assert_called_once()
+    
+    def test_import_does_not_load_sentence_transformers(self):
+        """Test importing the embedder leaves sentence_transformers (and torch) unimported"""
+        import subprocess
+        import sys
+        
+        code = "import sys, rag.embedder; sys.exit('sentence_transformers' in sys.modules)"
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True)
+        
+        assert result.returncode == 0, result.stderr.decode()
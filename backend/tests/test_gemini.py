@@ -0,0 +1,224 @@
+"""Unit tests for the Gemini client helpers"""
+
+import asyncio
+import pytest
+from unittest.mock import Mock, patch
+import config.gemini as gemini
+from utils.llm_cache import LLMResponseCache
+
+
+@pytest.fixture(autouse=True)
+def no_cache():
+    """Keep the response cache out of tests unless one asks for it"""
+    with patch.object(gemini, "get_llm_cache", return_value=None):
+        yield
+
+
+@pytest.fixture
+def cache(tmp_path):
+    """Response cache backed by a temp file, used by the Gemini helpers"""
+    cache = LLMResponseCache(str(tmp_path / "llm_cache.db"))
+    with patch.object(gemini, "get_llm_cache", return_value=cache):
+        yield cache
+    cache.close()
+
+
+@pytest.fixture
+def fake_model():
+    """Patch the shared model with one whose calls can be controlled"""
+    model = Mock()
+    model.generate_content.return_value = Mock(text='[{"name": "Epic"}]')
+
+    async def generate_content_async(prompt, **kwargs):
+        return Mock(text='{"answer": 42}')
+
+    model.generate_content_async = Mock(side_effect=generate_content_async)
+    with patch.object(gemini, "get_model", return_value=model):
+        yield model
+
+
+class TestModelReuse:
+    """Test model objects are shared between calls"""
+
+    def test_same_model_returned(self):
+        """Test get_model creates each model once"""
+        with patch.object(gemini.genai, "GenerativeModel") as model_class, \
+                patch.dict(gemini._models, clear=True):
+            first = gemini.get_model("models/test")
+            second = gemini.get_model("models/test")
+
+        assert first is second
+        model_class.assert_called_once_with("models/test")
+
+    def test_sync_calls_reuse_model(self, fake_model):
+        """Test generate_json goes through the shared model"""
+        assert gemini.generate_json("prompt") == [{"name": "Epic"}]
+        assert gemini.generate_text("prompt") == '[{"name": "Epic"}]'
+        assert fake_model.generate_content.call_count == 2
+
+
+class TestAsyncGeneration:
+    """Test the async Gemini variants"""
+
+    @pytest.mark.asyncio
+    async def test_agenerate_json(self, fake_model):
+        """Test the async path parses JSON from the response"""
+        assert await gemini.agenerate_json("prompt") == {"answer": 42}
+        fake_model.generate_content.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_timeout(self, fake_model):
+        """Test a slow call raises TimeoutError"""
+        async def slow(prompt, **kwargs):
+            await asyncio.sleep(1)
+
+        fake_model.generate_content_async.side_effect = slow
+
+        with pytest.raises(TimeoutError):
+            await gemini.agenerate_text("prompt", timeout=0.01)
+
+    @pytest.mark.asyncio
+    async def test_concurrency_limited(self, fake_model):
+        """Test no more than GEMINI_MAX_CONCURRENCY calls are in flight"""
+        in_flight = 0
+        peak = 0
+
+        async def tracked(prompt, **kwargs):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return Mock(text="ok")
+
+        fake_model.generate_content_async.side_effect = tracked
+
+        with patch.object(gemini, "GEMINI_MAX_CONCURRENCY", 2), \
+                patch.object(gemini, "_semaphores", gemini.weakref.WeakKeyDictionary()):
+            results = await asyncio.gather(*(gemini.agenerate_text(str(i)) for i in range(6)))
+
+        assert results == ["ok"] * 6
+        assert peak == 2
+
+
+class TestResponseCache:
+    """Test generate_json answers repeated prompts from the cache"""
+
+    def test_repeat_prompt_served_from_cache(self, fake_model, cache):
+        """Test the second identical call does not reach Gemini"""
+        first = gemini.generate_json("prompt")
+        second = gemini.generate_json("prompt")
+
+        assert first == second == [{"name": "Epic"}]
+        assert fake_model.generate_content.call_count == 1
+        assert cache.stats()["hits"] == 1
+
+    def test_bypass_refreshes_entry(self, fake_model, cache):
+        """Test use_cache=False calls Gemini and stores the new response"""
+        gemini.generate_json("prompt")
+        fake_model.generate_content.return_value = Mock(text='[{"name": "Fresh"}]')
+
+        assert gemini.generate_json("prompt", use_cache=False) == [{"name": "Fresh"}]
+        assert gemini.generate_json("prompt") == [{"name": "Fresh"}]
+        assert fake_model.generate_content.call_count == 2
+
+    def test_params_part_of_key(self, fake_model, cache):
+        """Test different generation parameters are cached separately"""
+        gemini.generate_json("prompt")
+        gemini.generate_json("prompt", generation_config={"temperature": 0.2})
+
+        assert fake_model.generate_content.call_count == 2
+
+    def test_unparseable_response_not_cached(self, fake_model, cache):
+        """Test responses that fail JSON extraction are not stored"""
+        fake_model.generate_content.return_value = Mock(text="not json at all")
+
+        with pytest.raises(Exception):
+            gemini.generate_json("prompt")
+
+        assert cache.stats()["entries"] == 0
+
+    @pytest.mark.asyncio
+    async def test_async_shares_cache(self, fake_model, cache):
+        """Test agenerate_json reads what generate_json stored"""
+        gemini.generate_json("prompt")
+
+        assert await gemini.agenerate_json("prompt") == [{"name": "Epic"}]
+        fake_model.generate_content_async.assert_not_called()
+
+
+def stream_of(*texts):
+    """Async response yielding chunks with the given text"""
+    async def chunks():
+        for text in texts:
+            yield Mock(text=text)
+
+    async def generate_content_async(prompt, **kwargs):
+        return chunks()
+
+    return generate_content_async
+
+
+class TestStreamedGeneration:
+    """Test astream_json_items yields array elements as they arrive"""
+
+    @pytest.mark.asyncio
+    async def test_items_streamed(self, fake_model):
+        """Test each element is yielded once its chunk arrives"""
+        fake_model.generate_content_async.side_effect = stream_of('```json\n[{"name": "A"},', ' {"name": "B"}]\n```')
+
+        items = [item async for item in gemini.astream_json_items("prompt")]
+
+        assert items == [{"name": "A"}, {"name": "B"}]
+        assert fake_model.generate_content_async.call_args.kwargs["stream"] is True
+
+    @pytest.mark.asyncio
+    async def test_single_object_response(self, fake_model):
+        """Test a non-array response is still returned as one item"""
+        fake_model.generate_content_async.side_effect = stream_of('{"name": ', '"Only"}')
+
+        assert [item async for item in gemini.astream_json_items("prompt")] == [{"name": "Only"}]
+
+    @pytest.mark.asyncio
+    async def test_stalled_stream(self, fake_model):
+        """Test a stream that stops sending chunks raises TimeoutError"""
+        async def stalled():
+            yield Mock(text='[{"name": "A"},')
+            await asyncio.sleep(1)
+
+        async def generate_content_async(prompt, **kwargs):
+            return stalled()
+
+        fake_model.generate_content_async.side_effect = generate_content_async
+
+        items = []
+        with pytest.raises(TimeoutError):
+            async for item in gemini.astream_json_items("prompt", timeout=0.05):
+                items.append(item)
+        assert items == [{"name": "A"}]
+
+    @pytest.mark.asyncio
+    async def test_slot_free_while_consumer_handles_item(self, fake_model):
+        """Test the concurrency slot is not held while the consumer works on a yielded item"""
+        fake_model.generate_content_async.side_effect = stream_of('[{"name": "A"},', ' {"name": "B"}]')
+
+        with patch.object(gemini, "GEMINI_MAX_CONCURRENCY", 1), \
+                patch.object(gemini, "_semaphores", gemini.weakref.WeakKeyDictionary()):
+            items = []
+            async for item in gemini.astream_json_items("prompt", use_cache=False):
+                items.append(item)
+                assert not gemini._get_semaphore().locked()
+
+        assert items == [{"name": "A"}, {"name": "B"}]
+
+    @pytest.mark.asyncio
+    async def test_stream_cached_and_replayed(self, fake_model, cache):
+        """Test a completed stream is cached and replayed without calling Gemini"""
+        fake_model.generate_content_async.side_effect = stream_of('[{"name": "A"}, ', '{"name": "B"}]')
+
+        first = [item async for item in gemini.astream_json_items("prompt")]
+        second = [item async for item in gemini.astream_json_items("prompt")]
+
+        assert first == second == [{"name": "A"}, {"name": "B"}]
+        assert fake_model.generate_content_async.call_count == 1
+        assert gemini.generate_json("prompt") == first
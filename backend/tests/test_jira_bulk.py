@@ -0,0 +1,205 @@
+"""Unit tests for bulk Jira story creation"""
+
+import pytest
+from fastapi import HTTPException
+from unittest.mock import MagicMock, patch
+from jira import JIRAError
+from config.auth import TokenData
+from models.file_model import User, Upload, Epic, Story
+from routes.jira import BulkCreateStoriesRequest, create_stories_bulk
+from services.jira_client import JiraAuthError, create_issues_in_chunks
+
+USER = TokenData(user_id=1, email="a@example.com")
+
+
+def issue(key, issue_id):
+    created = MagicMock()
+    created.key, created.id = key, issue_id
+    return created
+
+
+def bulk_response(fields, fail=()):
+    """What JIRA.create_issues returns, failing the issues whose summary is in fail"""
+    return [
+        {"status": "Error", "error": {"summary": "rejected"}, "issue": None, "input_fields": f}
+        if f["summary"] in fail else
+        {"status": "Success", "error": None, "issue": issue(f"REQ-{n}", 100 + n), "input_fields": f}
+        for n, f in enumerate(fields, start=1)
+    ]
+
+
+@pytest.fixture
+def db(sqlite_session):
+    """User 1 owns epic 1 (in Jira as REQ-0) with stories 1-3; epic 2 belongs to user 2"""
+    session = sqlite_session
+    session.add_all([User(id=1, email="a@example.com"), User(id=2, email="b@example.com")])
+    session.add_all([Upload(id=1, user_id=1, filename="a.pdf", content={}),
+                     Upload(id=2, user_id=2, filename="b.pdf", content={})])
+    session.add_all([Epic(id=1, upload_id=1, name="Login", content={}, jira_key="REQ-0", jira_issue_id="100"),
+                     Epic(id=2, upload_id=2, name="Theirs", content={}, jira_issue_id="200")])
+    session.add_all([Story(id=s, epic_id=1, name=f"Story {s}", content={"description": f"d{s}"}) for s in (1, 2, 3)])
+    session.add(Story(id=4, epic_id=2, name="Other", content={}))
+    session.commit()
+    return session
+
+
+@pytest.fixture
+def jira():
+    client = MagicMock()
+    client.create_issues.side_effect = lambda fields, prefetch: bulk_response(fields)
+    with patch("routes.jira.get_jira_client", return_value=client):
+        yield client
+
+
+def request(**kwargs):
+    values = dict(jira_url="https://jira.example.com", jira_username="a@example.com",
+                  jira_api_token="token", jira_project_key="REQ", epic_id=1, story_ids=[1, 2, 3])
+    values.update(kwargs)
+    return BulkCreateStoriesRequest(**values)
+
+
+class TestCreateStoriesBulk:
+    """Test the bulk endpoint creates stories and records each outcome"""
+
+    def test_creates_all_in_one_call(self, db, jira):
+        """Test every story goes in one bulk request as a child of the epic"""
+        result = create_stories_bulk(request(), db=db, current_user=USER)
+
+        assert jira.create_issues.call_count == 1
+        fields = jira.create_issues.call_args[0][0]
+        assert [f["summary"] for f in fields] == ["Story 1", "Story 2", "Story 3"]
+        assert fields[0] == {"summary": "Story 1", "description": "d1", "parent": {"id": "100"},
+                             "project": {"key": "REQ"}, "issuetype": {"name": "Story"}}
+        assert (result["created"], result["failed"]) == (3, 0)
+        story = db.get(Story, 2)
+        assert (story.jira_key, story.jira_issue_id, story.epic_jira_key) == ("REQ-2", "102", "REQ-0")
+        assert story.jira_url == "https://jira.example.com/browse/REQ-2"
+        assert story.jira_creation_success is True
+        assert story.content == {"description": "d2", "jira_key": "REQ-2", "jira_issue_id": "102"}
+
+    def test_per_item_failures(self, db, jira):
+        """Test a rejected story and an unknown story fail without failing the rest"""
+        jira.create_issues.side_effect = lambda fields, prefetch: bulk_response(fields, fail={"Story 2"})
+
+        result = create_stories_bulk(request(story_ids=[1, 2, 4]), db=db, current_user=USER)
+
+        assert [(r["story_id"], r["success"]) for r in result["results"]] == [(1, True), (2, False), (4, False)]
+        assert result["results"][1]["error"] == "summary: rejected"
+        assert result["results"][2]["error"] == "Story not found in this epic"
+        assert db.get(Story, 2).jira_creation_success is False
+        assert db.get(Story, 4).jira_creation_success is None
+
+    def test_epic_must_be_in_jira(self, db, jira):
+        """Test stories are not sent before their epic exists in Jira"""
+        db.get(Epic, 1).jira_issue_id = None
+        db.commit()
+
+        with pytest.raises(HTTPException) as exc:
+            create_stories_bulk(request(), db=db, current_user=USER)
+
+        assert exc.value.status_code == 400
+        jira.create_issues.assert_not_called()
+
+    def test_other_users_epic(self, db, jira):
+        """Test another user's epic is refused"""
+        with pytest.raises(HTTPException) as exc:
+            create_stories_bulk(request(epic_id=2, story_ids=[4]), db=db, current_user=USER)
+
+        assert exc.value.status_code == 403
+
+    def test_invalid_credentials(self, db, jira):
+        """Test rejected credentials are a 400 and leave the stories untouched"""
+        jira.create_issues.side_effect = JiraAuthError("Jira rejected the credentials", 401)
+
+        with pytest.raises(HTTPException) as exc:
+            create_stories_bulk(request(), db=db, current_user=USER)
+
+        assert exc.value.status_code == 400
+        assert db.get(Story, 1).jira_creation_success is None
+
+    def test_auth_error_after_first_chunk(self, db, jira):
+        """Test stories created before the credentials were rejected are recorded and reported"""
+        calls = []
+
+        def create_issues(fields, prefetch):
+            calls.append(fields)
+            if len(calls) > 1:
+                raise JIRAError(status_code=401, text="Unauthorized")
+            return bulk_response(fields)
+
+        jira.create_issues.side_effect = create_issues
+
+        with patch("routes.jira.create_issues_in_chunks",
+                   lambda client, fields: create_issues_in_chunks(client, fields, chunk_size=2)):
+            result = create_stories_bulk(request(), db=db, current_user=USER)
+
+        assert [(r["story_id"], r["success"]) for r in result["results"]] == [(1, True), (2, True), (3, False)]
+        assert (result["created"], result["failed"]) == (2, 1)
+        assert result["error"].startswith("Invalid Jira credentials")
+        assert (db.get(Story, 1).jira_key, db.get(Story, 2).jira_key) == ("REQ-1", "REQ-2")
+        assert db.get(Story, 3).jira_creation_success is None
+
+    def test_stories_in_jira_not_sent_again(self, db, jira):
+        """Test a story that already has a Jira key is reported without a second issue"""
+        story = db.get(Story, 1)
+        story.jira_key, story.jira_url = "REQ-9", "https://jira.example.com/browse/REQ-9"
+        db.commit()
+
+        result = create_stories_bulk(request(), db=db, current_user=USER)
+
+        assert [f["summary"] for f in jira.create_issues.call_args[0][0]] == ["Story 2", "Story 3"]
+        assert result["results"][0] == {"story_id": 1, "success": True, "key": "REQ-9",
+                                        "url": "https://jira.example.com/browse/REQ-9", "error": None}
+        assert (result["created"], result["already_created"], result["failed"]) == (2, 1, 0)
+        assert db.get(Story, 1).jira_key == "REQ-9"
+
+
+class TestCreateIssuesInChunks:
+    """Test issues are sent in chunks with their outcomes in input order"""
+
+    def test_chunks(self):
+        """Test 5 issues with a chunk size of 2 take 3 requests"""
+        client = MagicMock()
+        client.create_issues.side_effect = lambda fields, prefetch: bulk_response(fields)
+        fields = [{"summary": f"S{n}"} for n in range(5)]
+
+        results = create_issues_in_chunks(client, fields, chunk_size=2)
+
+        assert [len(c[0][0]) for c in client.create_issues.call_args_list] == [2, 2, 1]
+        assert all(c[1]["prefetch"] is False for c in client.create_issues.call_args_list)
+        assert len(results) == 5 and all(r["key"] for r in results)
+
+    def test_failed_chunk_does_not_stop_others(self):
+        """Test a chunk rejected as a whole fails only its own issues"""
+        client = MagicMock()
+        client.create_issues.side_effect = [
+            JIRAError(status_code=500, text="boom"),
+            bulk_response([{"summary": "S2"}]),
+        ]
+
+        results = create_issues_in_chunks(client, [{"summary": f"S{n}"} for n in range(3)], chunk_size=2)
+
+        assert [r["error"] for r in results] == ["boom", "boom", None]
+
+    def test_auth_error_raises(self):
+        """Test 401 is reported as a credentials problem"""
+        client = MagicMock()
+        client.create_issues.side_effect = JIRAError(status_code=401, text="Unauthorized")
+
+        with pytest.raises(JiraAuthError) as exc:
+            create_issues_in_chunks(client, [{"summary": "S"}])
+        assert exc.value.results == []
+
+    def test_auth_error_carries_earlier_results(self):
+        """Test issues created before the credentials were rejected are reported with the error"""
+        client = MagicMock()
+        client.create_issues.side_effect = [
+            bulk_response([{"summary": "S0"}, {"summary": "S1"}]),
+            JIRAError(status_code=401, text="Unauthorized"),
+        ]
+
+        with pytest.raises(JiraAuthError) as exc:
+            create_issues_in_chunks(client, [{"summary": f"S{n}"} for n in range(3)], chunk_size=2)
+
+        assert [r["key"] for r in exc.value.results] == ["REQ-1", "REQ-2"]
+
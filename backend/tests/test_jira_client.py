@@ -0,0 +1,118 @@
+"""Unit tests for the cached, pooled Jira clients"""
+
+import asyncio
+import pytest
+from unittest.mock import MagicMock, patch
+from config.auth import TokenData
+from models.file_model import User
+from routes.jira import JiraCredentials, delete_jira_credentials, save_jira_credentials
+from services import jira_client
+from services.jira_client import clear_jira_clients, get_jira_client, invalidate_jira_clients
+
+URL = "https://jira.example.com"
+
+
+@pytest.fixture
+def factory():
+    """Empty cache; every new client is a distinct mock"""
+    with patch.dict(jira_client._clients, clear=True), \
+            patch.object(jira_client, "JIRA", side_effect=lambda **kwargs: MagicMock()) as jira:
+        yield jira
+
+
+class TestGetJiraClient:
+    """Test clients are reused across requests"""
+
+    def test_reused_for_same_credentials(self, factory):
+        """Test the same credentials reuse one client, trailing slash or not"""
+        first = get_jira_client(URL + "/", "a@example.com", "t1")
+
+        assert get_jira_client(URL, "a@example.com", "t1") is first
+        assert factory.call_count == 1
+        assert factory.call_args.kwargs["options"] == {"check_update": False}
+
+    def test_keyed_by_token_hash(self, factory):
+        """Test another token gets its own client and the raw token is not kept in the key"""
+        first = get_jira_client(URL, "a@example.com", "t1")
+        second = get_jira_client(URL, "a@example.com", "t2")
+
+        assert first is not second
+        assert all("t1" not in key and "t2" not in key for key in jira_client._clients)
+
+    def test_pooled_session(self, factory):
+        """Test the client's session gets a keep-alive pool of JIRA_POOL_MAXSIZE"""
+        client = get_jira_client(URL, "a@example.com", "t1")
+
+        adapter = client._session.mount.call_args.args[1]
+        assert adapter._pool_maxsize == jira_client.JIRA_POOL_MAXSIZE
+
+    def test_expires_after_ttl(self, factory):
+        """Test an expired client is rebuilt"""
+        with patch.object(jira_client.time, "monotonic", return_value=1000.0):
+            first = get_jira_client(URL, "a@example.com", "t1")
+        with patch.object(jira_client.time, "monotonic", return_value=1000.0 + jira_client.JIRA_CLIENT_TTL_SECONDS):
+            second = get_jira_client(URL, "a@example.com", "t1")
+
+        assert first is not second
+        assert len(jira_client._clients) == 1
+
+    def test_least_recently_used_evicted(self, factory):
+        """Test the cache keeps at most JIRA_CLIENT_CACHE_SIZE clients, dropping the least recently used"""
+        with patch.object(jira_client, "JIRA_CLIENT_CACHE_SIZE", 2):
+            first = get_jira_client(URL, "a@example.com", "t")
+            get_jira_client(URL, "b@example.com", "t")
+            get_jira_client(URL, "a@example.com", "t")
+            get_jira_client(URL, "c@example.com", "t")
+
+        assert sorted(key[1] for key in jira_client._clients) == ["a@example.com", "c@example.com"]
+        assert get_jira_client(URL, "a@example.com", "t") is first
+
+    def test_invalidate(self, factory):
+        """Test every token of a (URL, username) is dropped and other users are kept"""
+        get_jira_client(URL, "a@example.com", "t1")
+        get_jira_client(URL, "a@example.com", "t2")
+        other = get_jira_client(URL, "b@example.com", "t1")
+
+        assert invalidate_jira_clients(URL + "/", "a@example.com") == 2
+        assert invalidate_jira_clients(None, None) == 0
+        assert get_jira_client(URL, "b@example.com", "t1") is other
+
+    def test_clear_closes_clients(self, factory):
+        """Test clearing the cache closes the clients' sessions"""
+        client = get_jira_client(URL, "a@example.com", "t1")
+
+        clear_jira_clients()
+
+        client.close.assert_called_once()
+        assert not jira_client._clients
+
+
+class TestCredentialRoutes:
+    """Test saving and deleting credentials drops the cached clients"""
+
+    @pytest.fixture
+    def db(self, sqlite_session):
+        sqlite_session.add(User(id=1, email="a@example.com", jira_url=URL, jira_username="old@example.com",
+                                jira_api_token="old", jira_project_key="REQ"))
+        sqlite_session.commit()
+        return sqlite_session
+
+    def test_save_replaces_old_clients(self, db, factory):
+        """Test the previous credentials' clients go and the validated client stays cached"""
+        get_jira_client(URL, "old@example.com", "old")
+        credentials = JiraCredentials(jira_url=URL, jira_username="new@example.com",
+                                      jira_api_token="new", jira_project_key="REQ")
+
+        asyncio.run(save_jira_credentials(credentials, db=db, current_user=TokenData(user_id=1, email="a@example.com")))
+
+        assert [key[1] for key in jira_client._clients] == ["new@example.com"]
+        assert db.get(User, 1).jira_username == "new@example.com"
+
+    def test_delete_drops_clients(self, db, factory):
+        """Test deleting credentials drops their clients"""
+        get_jira_client(URL, "old@example.com", "old")
+
+        asyncio.run(delete_jira_credentials(db=db, current_user=TokenData(user_id=1, email="a@example.com")))
+
+        assert not jira_client._clients
+        assert db.get(User, 1).jira_url is None
@@ -0,0 +1,245 @@
+"""Unit tests for the background job queue"""
+
+import threading
+import time
+import pytest
+from services.job_queue import (
+    JOB_FAILED,
+    JOB_QUEUED,
+    JOB_RUNNING,
+    JOB_SUCCEEDED,
+    JobQueue,
+    JobStore,
+    QueueFullError,
+    job_response,
+)
+
+
+def wait_for(queue, job_id, timeout=5.0):
+    """Poll a job until it finishes"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = queue.get(job_id)
+        if job["status"] in (JOB_SUCCEEDED, JOB_FAILED):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"Job {job_id} did not finish")
+
+
+@pytest.fixture
+def store(tmp_path):
+    """Job store backed by a temp SQLite file"""
+    store = JobStore(str(tmp_path / "jobs.db"))
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def queue(store):
+    """Job queue with two workers"""
+    queue = JobQueue(store=store, workers=2, max_pending=10)
+    yield queue
+    queue.stop()
+
+
+class TestJobExecution:
+    """Test running jobs through the queue"""
+
+    def test_submit_returns_immediately(self, queue):
+        """Test submit returns a queued job before the handler finishes"""
+        release = threading.Event()
+        queue.register("slow", lambda ctx: release.wait(5))
+
+        job = queue.submit("slow", {}, user_id=1)
+
+        assert job["status"] == JOB_QUEUED
+        assert job["user_id"] == 1
+        release.set()
+        assert wait_for(queue, job["id"])["status"] == JOB_SUCCEEDED
+
+    def test_result_and_timings_recorded(self, queue):
+        """Test the handler result and step timings are stored"""
+        def handler(ctx, value):
+            with ctx.step("llm"):
+                time.sleep(0.01)
+            with ctx.step("llm"):
+                pass
+            ctx.progress("done")
+            return {"doubled": value * 2}
+
+        queue.register("double", handler)
+        job = wait_for(queue, queue.submit("double", {"value": 21})["id"])
+
+        assert job["result"] == {"doubled": 42}
+        assert job["progress"] == "done"
+        assert job["timings"]["steps"]["llm"] >= 0.01
+        assert job["timings"]["run_seconds"] >= job["timings"]["steps"]["llm"]
+        assert job["timings"]["queue_wait_seconds"] >= 0
+
+    def test_failure_recorded(self, queue):
+        """Test an exception marks the job failed with its message"""
+        def handler(ctx):
+            raise RuntimeError("model unavailable")
+
+        queue.register("broken", handler)
+        job = wait_for(queue, queue.submit("broken", {})["id"])
+
+        assert job["status"] == JOB_FAILED
+        assert job["error"] == "model unavailable"
+
+    def test_unknown_kind_rejected(self, queue):
+        """Test submitting an unregistered kind raises"""
+        with pytest.raises(ValueError):
+            queue.submit("missing", {})
+
+    def test_queue_full(self, store):
+        """Test submissions beyond max_pending are rejected"""
+        release = threading.Event()
+        queue = JobQueue(store=store, workers=1, max_pending=2)
+        queue.register("slow", lambda ctx: release.wait(5))
+        try:
+            first = queue.submit("slow", {})
+            queue.submit("slow", {})
+            with pytest.raises(QueueFullError) as error:
+                queue.submit("slow", {})
+            assert error.value.status_code == 503
+
+            release.set()
+            wait_for(queue, first["id"])
+        finally:
+            release.set()
+            queue.stop()
+
+
+class TestJobRecovery:
+    """Test job state across restarts"""
+
+    def test_queued_jobs_resumed(self, store):
+        """Test jobs left queued are run when the queue starts"""
+        job = store.create("echo", {"value": "hi"}, user_id=3)
+
+        queue = JobQueue(store=store, workers=1)
+        queue.register("echo", lambda ctx, value: value)
+        try:
+            queue.start()
+            assert wait_for(queue, job["id"])["result"] == "hi"
+        finally:
+            queue.stop()
+
+    def test_running_jobs_marked_interrupted(self, store):
+        """Test running jobs with no live worker lease are failed on start"""
+        job = store.create("echo", {"value": "hi"})
+        store.update(job["id"], status=JOB_RUNNING)
+
+        queue = JobQueue(store=store, workers=1)
+        try:
+            queue.start()
+            job = store.get(job["id"])
+        finally:
+            queue.stop()
+
+        assert job["status"] == JOB_FAILED
+        assert "restart" in job["error"]
+
+    def test_live_lease_not_interrupted(self, store):
+        """Test a job another live worker is running is left alone on start"""
+        job = store.create("echo", {"value": "hi"})
+        assert store.claim(job["id"], "other-worker", lease_seconds=60)
+
+        queue = JobQueue(store=store, workers=1)
+        try:
+            queue.start()
+            job = store.get(job["id"])
+        finally:
+            queue.stop()
+
+        assert job["status"] == JOB_RUNNING
+        assert job["owner"] == "other-worker"
+
+    def test_expired_lease_interrupted(self, store):
+        """Test a job whose worker stopped renewing its lease is failed"""
+        job = store.create("echo", {"value": "hi"})
+        store.claim(job["id"], "dead-worker", lease_seconds=60)
+        store.update(job["id"], lease_expires_at=time.time() - 1)
+
+        assert store.fail_expired("Interrupted by server restart") == 1
+        assert store.get(job["id"])["status"] == JOB_FAILED
+
+    def test_claim_is_exclusive(self, store):
+        """Test only one worker can claim a queued job"""
+        job = store.create("echo", {})
+
+        assert store.claim(job["id"], "first", lease_seconds=60) is True
+        assert store.claim(job["id"], "second", lease_seconds=60) is False
+        assert store.get(job["id"])["owner"] == "first"
+
+    def test_two_queues_run_job_once(self, store):
+        """Test a queued job dispatched by two queues on the same file runs once"""
+        job = store.create("count", {})
+        runs = []
+        queues = [JobQueue(store=store, workers=2) for _ in range(2)]
+        for queue in queues:
+            queue.register("count", lambda ctx: runs.append(1))
+        try:
+            for queue in queues:
+                queue.start()
+            wait_for(queues[0], job["id"])
+        finally:
+            for queue in queues:
+                queue.stop()
+
+        assert len(runs) == 1
+
+    def test_heartbeat_renews_lease(self, store):
+        """Test a long job keeps its lease while its worker is alive"""
+        release = threading.Event()
+        queue = JobQueue(store=store, workers=1, lease_seconds=0.3)
+        queue.register("slow", lambda ctx: release.wait(5))
+        try:
+            job = queue.submit("slow", {})
+            time.sleep(0.6)
+            running = store.get(job["id"])
+            release.set()
+            finished = wait_for(queue, job["id"])
+        finally:
+            release.set()
+            queue.stop()
+
+        assert running["status"] == JOB_RUNNING
+        assert running["lease_expires_at"] > time.time() - 0.3
+        assert finished["status"] == JOB_SUCCEEDED
+
+    def test_columns_added_to_old_files(self, tmp_path):
+        """Test a job file from before leases gains the owner and lease columns"""
+        import sqlite3
+        path = str(tmp_path / "old.db")
+        conn = sqlite3.connect(path)
+        conn.execute("CREATE TABLE jobs (id TEXT PRIMARY KEY, kind TEXT NOT NULL, status TEXT NOT NULL, "
+                     "user_id INTEGER, params TEXT NOT NULL, result TEXT, error TEXT, progress TEXT, "
+                     "timings TEXT, created_at REAL NOT NULL, started_at REAL, finished_at REAL)")
+        conn.close()
+
+        store = JobStore(path)
+        try:
+            job = store.create("echo", {})
+            assert store.claim(job["id"], "worker", lease_seconds=60)
+        finally:
+            store.close()
+
+    def test_list_by_user(self, store):
+        """Test listing returns only the user's jobs, newest first"""
+        first = store.create("echo", {}, user_id=1)
+        store.create("echo", {}, user_id=2)
+        second = store.create("echo", {}, user_id=1)
+
+        assert [job["id"] for job in store.list(user_id=1)] == [second["id"], first["id"]]
+
+    def test_job_response(self, store):
+        """Test the public view exposes the status URL"""
+        job = store.create("echo", {})
+
+        response = job_response(job)
+
+        assert response["job_id"] == job["id"]
+        assert response["status_url"] == f"/api/jobs/{job['id']}"
+        assert "user_id" not in response
@@ -1,7 +1,14 @@
 """Unit tests for JSON parser utility"""
 import json
 import pytest
-from utils.json_parser import extract_valid_json, parse_model_json, ensure_dict_list
+from utils.json_parser import (
+    extract_valid_json,
+    parse_model_json,
+    ensure_dict_list,
+    JSONArrayStream,
+    iter_json_array_items,
+)
+from utils.json_parser_bench import strategy_chain_extract, synthetic_output
 
 
 class TestExtractValidJson:
@@ -61,6 +68,46 @@ class TestExtractValidJson:
         with pytest.raises(ValueError):
             extract_valid_json("This is not JSON at all")
     
+    def test_smart_quotes(self):
+        """Test curly quotes used as string delimiters are repaired"""
+        text = '{\u201cname\u201d: \u201cDon\u2019t stop\u201d, \u2018role\u2019: "admin"}'
+        assert extract_valid_json(text) == {"name": "Don\u2019t stop", "role": "admin"}
+    
+    def test_single_quotes_with_apostrophe_and_double_quotes(self):
+        """Test single-quoted strings keep escaped apostrophes and inner double quotes"""
+        text = "[{'title': 'It\\'s \"done\"'}]"
+        assert extract_valid_json(text) == [{"title": 'It\'s "done"'}]
+    
+    def test_apostrophe_inside_double_quotes_untouched(self):
+        """Test apostrophes in normal strings are not treated as quotes"""
+        text = '```json\n[{"name": "User\'s profile",}]\n```'
+        assert extract_valid_json(text) == [{"name": "User's profile"}]
+    
+    def test_raw_newline_inside_string(self):
+        """Test unescaped newlines inside strings are accepted"""
+        assert extract_valid_json('Result: {"text": "line 1\nline 2"}') == {"text": "line 1\nline 2"}
+    
+    def test_unparseable_elements_raise(self):
+        """Test an array whose elements all fail to parse raises ValueError"""
+        with pytest.raises(ValueError):
+            extract_valid_json("[{name: Epic}]")
+    
+    def test_bracketed_aside_before_json(self):
+        """Test a bracketed note that is not JSON is skipped for the next value"""
+        assert extract_valid_json('Some text [note] then [{"a":1}]') == [{"a": 1}]
+        assert extract_valid_json('Use {braces} like {"a": 1}') == {"a": 1}
+    
+    def test_truncated_array_raises(self):
+        """Test an array cut off inside an element raises rather than dropping it"""
+        with pytest.raises(ValueError):
+            extract_valid_json('[{"a": 1}, {"b": tru')
+    
+    def test_matches_strategy_chain_on_large_output(self):
+        """Test the single-pass parser agrees with the old strategy chain"""
+        for malformed in (False, True):
+            text = synthetic_output(300, malformed)
+            assert extract_valid_json(text) == strategy_chain_extract(text)
+    
     def test_empty_string_raises_error(self):
         """Test that empty string raises ValueError"""
         with pytest.raises(ValueError):
@@ -135,3 +182,74 @@ class TestEnsureDictList:
         result = ensure_dict_list(data)
         assert len(result) == 2
         assert result[0]["items"][0]["sub_id"] == 1
+
+
+class TestJSONArrayStream:
+    """Tests for incremental array parsing"""
+    
+    def test_elements_emitted_as_they_close(self):
+        """Test each element is returned by the chunk that completes it"""
+        stream = JSONArrayStream()
+        
+        assert stream.feed('[{"name": "A"}, {"na') == [{"name": "A"}]
+        assert stream.feed('me": "B"}') == [{"name": "B"}]
+        assert stream.feed(']') == []
+        assert stream.finished
+    
+    def test_fences_and_prose_skipped(self):
+        """Test text around the array is ignored"""
+        chunks = ['Here you go:\n```json\n[', '{"a": 1},', ' {"a": 2}]\n```']
+        assert list(iter_json_array_items(chunks)) == [{"a": 1}, {"a": 2}]
+    
+    def test_brackets_inside_strings(self):
+        """Test brackets, commas and escaped quotes in strings do not split elements"""
+        chunks = ['[{"t": "a, [b] {c}"}, {"t": "say \\"hi\\""', '}]']
+        assert list(iter_json_array_items(chunks)) == [{"t": "a, [b] {c}"}, {"t": 'say "hi"'}]
+    
+    def test_character_by_character(self):
+        """Test one character per chunk gives the same result as one chunk"""
+        text = '[{"id": 1, "tags": ["x", "y"]}, 2, "three"]'
+        assert list(iter_json_array_items(text)) == json.loads(text)
+    
+    def test_trailing_comma_inside_element(self):
+        """Test an element with a trailing comma is repaired"""
+        assert list(iter_json_array_items(['[{"a": [1, 2,],}]'])) == [{"a": [1, 2]}]
+    
+    def test_truncated_stream(self):
+        """Test close returns a final element left without its closing bracket"""
+        stream = JSONArrayStream()
+        
+        assert stream.feed('[{"a": 1}, 42') == [{"a": 1}]
+        assert stream.close() == [42]
+        assert stream.finished
+        assert not stream.truncated
+    
+    def test_truncated_element_counted(self):
+        """Test close counts a final element that does not parse"""
+        stream = JSONArrayStream()
+        
+        assert stream.feed('[{"a": 1}, {"b": tru') == [{"a": 1}]
+        assert stream.close() == []
+        assert stream.skipped == 1
+        assert stream.truncated
+    
+    def test_object_root(self):
+        """Test a top-level object is returned whole once it closes"""
+        stream = JSONArrayStream()
+        
+        assert stream.feed('Sure: {"epics": [{"a": 1},') == []
+        assert stream.feed(' {"a": 2},]}') == [{"epics": [{"a": 1}, {"a": 2}]}]
+        assert stream.root == "{"
+        assert stream.finished
+    
+    def test_repairs_across_chunk_boundaries(self):
+        """Test quotes and trailing commas split between chunks are still repaired"""
+        chunks = ["[{'na", "me': \u201cA", "\u201d,", "\n}", ", ", '"tail"]']
+        assert list(iter_json_array_items(chunks)) == [{"name": "A"}, "tail"]
+    
+    def test_skipped_elements_counted(self):
+        """Test elements that cannot be repaired are skipped and counted"""
+        stream = JSONArrayStream()
+        
+        assert stream.feed('[{"a": 1}, {b: 2}, {"c": 3}]') == [{"a": 1}, {"c": 3}]
+        assert stream.skipped == 1
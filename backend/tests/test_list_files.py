@@ -0,0 +1,106 @@
+"""Unit tests for the /list-files upload hierarchy"""
+
+import pytest
+from sqlalchemy import event
+from models.file_model import User, Upload, Epic, Story, QA, AggregatedUpload
+from routes.listFiles import load_upload_tree
+
+
+@pytest.fixture
+def db(sqlite_session):
+    """SQLite session holding two users' upload trees, with a SELECT counter"""
+    session = sqlite_session
+    session.add_all([User(id=1, email="a@example.com"), User(id=2, email="b@example.com")])
+    for upload_id in range(1, 6):
+        session.add(Upload(id=upload_id, user_id=1, filename=f"req{upload_id}.pdf", content={}))
+        for e in range(3):
+            epic_id = upload_id * 10 + e
+            session.add(Epic(id=epic_id, upload_id=upload_id, name=f"Epic {epic_id}", content={}))
+            for s in range(2):
+                story_id = epic_id * 10 + s
+                session.add(Story(id=story_id, epic_id=epic_id, name=f"Story {story_id}", content={"n": story_id}))
+                session.add(QA(story_id=story_id, type="api_test", content={"story": story_id}))
+    session.add(AggregatedUpload(upload_id=1, content={"summary": True}))
+    session.add(Upload(id=99, user_id=2, filename="other.pdf", content={}))
+    session.commit()
+    session.expire_all()
+
+    session.selects = 0
+
+    def count_selects(conn, cursor, statement, *args):
+        if statement.lstrip().upper().startswith("SELECT"):
+            session.selects += 1
+
+    event.listen(session.get_bind(), "before_cursor_execute", count_selects)
+    return session
+
+
+class TestLoadUploadTree:
+    """Test the eager-loaded upload hierarchy"""
+
+    def test_full_tree(self, db):
+        """Test uploads carry their epics, stories and QA"""
+        result = load_upload_tree(db, user_id=1, page_size=100, content=True)
+
+        assert result["total_uploads"] == 5
+        upload = next(u for u in result["uploads"] if u["upload_id"] == 1)
+        assert upload["name"] == "req1.pdf"
+        assert upload["aggregated"] == {"summary": True}
+        assert [e["epic_id"] for e in upload["epics"]] == [10, 11, 12]
+        story = upload["epics"][0]["stories"][0]
+        assert story["story_id"] == 100
+        assert story["qa"] == [{"qa_id": story["qa"][0]["qa_id"], "type": "api_test", "content": {"story": 100}}]
+
+    def test_constant_query_count(self, db):
+        """Test the number of queries does not depend on the number of rows"""
+        load_upload_tree(db, user_id=1, page_size=100, content=True)
+
+        # count, uploads, aggregated, epics, stories, QA
+        assert db.selects == 6
+
+    def test_content_omitted_by_default(self, db):
+        """Test the tree leaves out content, and the aggregated query, unless asked for"""
+        statements = []
+        event.listen(db.get_bind(), "before_cursor_execute",
+                     lambda conn, cursor, statement, *args: statements.append(statement))
+
+        result = load_upload_tree(db, user_id=1, page_size=100)
+
+        story = result["uploads"][-1]["epics"][0]["stories"][0]
+        assert "content" not in story
+        assert story["qa"] == [{"qa_id": story["qa"][0]["qa_id"], "type": "api_test"}]
+        assert "aggregated" not in result["uploads"][-1]
+        assert db.selects == 5
+        rows = [statement for statement in statements if not statement.startswith("SELECT count")]
+        assert not any("content" in statement for statement in rows)
+
+    def test_depth_limits_levels(self, db):
+        """Test lower depths skip the deeper levels and their queries"""
+        result = load_upload_tree(db, user_id=1, depth=1, content=True)
+
+        assert db.selects == 4
+        epic = result["uploads"][0]["epics"][0]
+        assert "stories" not in epic
+
+        db.selects = 0
+        result = load_upload_tree(db, user_id=1, depth=0, content=True)
+        assert db.selects == 3
+        assert "epics" not in result["uploads"][0]
+
+    def test_pagination(self, db):
+        """Test pages split the user's uploads without overlap"""
+        first = load_upload_tree(db, user_id=1, page=1, page_size=2, depth=0)
+        third = load_upload_tree(db, user_id=1, page=3, page_size=2, depth=0)
+
+        assert first["total_pages"] == 3
+        assert len(first["uploads"]) == 2
+        assert len(third["uploads"]) == 1
+        ids = [u["upload_id"] for u in first["uploads"] + third["uploads"]]
+        assert len(set(ids)) == 3
+
+    def test_other_users_excluded(self, db):
+        """Test only the requesting user's uploads are returned"""
+        result = load_upload_tree(db, user_id=2)
+
+        assert [u["upload_id"] for u in result["uploads"]] == [99]
+        assert result["uploads"][0]["epics"] == []
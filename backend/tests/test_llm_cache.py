@@ -0,0 +1,104 @@
+"""Unit tests for the LLM response cache"""
+
+import pytest
+from unittest.mock import patch
+from utils.llm_cache import LLMResponseCache, cache_key
+
+
+@pytest.fixture
+def cache(tmp_path):
+    """Response cache backed by a temp file"""
+    cache = LLMResponseCache(str(tmp_path / "llm_cache.db"), ttl_seconds=60, max_entries=3)
+    yield cache
+    cache.close()
+
+
+class TestCacheKey:
+    """Test content-addressed keys"""
+
+    def test_same_inputs_same_key(self):
+        """Test the key only depends on model, prompt and params"""
+        assert cache_key("m", "p", {"a": 1, "b": 2}) == cache_key("m", "p", {"b": 2, "a": 1})
+
+    def test_inputs_change_key(self):
+        """Test each input is part of the key"""
+        base = cache_key("m", "p")
+        assert cache_key("other", "p") != base
+        assert cache_key("m", "other") != base
+        assert cache_key("m", "p", {"temperature": 0}) != base
+
+
+class TestLLMResponseCache:
+    """Test storage, expiry and eviction"""
+
+    def test_miss_then_hit(self, cache):
+        """Test a stored response is returned and counted"""
+        assert cache.get("k") is None
+        cache.put("k", "model", "response")
+
+        assert cache.get("k") == "response"
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+        assert cache.stats()["hit_rate"] == 0.5
+
+    def test_persists_across_instances(self, tmp_path):
+        """Test entries survive reopening the cache file"""
+        path = str(tmp_path / "llm_cache.db")
+        LLMResponseCache(path).put("k", "model", "response")
+
+        assert LLMResponseCache(path).get("k") == "response"
+
+    def test_expired_entry_is_miss(self, cache):
+        """Test entries older than the TTL are dropped"""
+        with patch("utils.llm_cache.time.time", return_value=1000.0):
+            cache.put("k", "model", "response")
+        with patch("utils.llm_cache.time.time", return_value=1061.0):
+            assert cache.get("k") is None
+
+        assert cache.stats()["expired"] == 1
+        assert cache.stats()["entries"] == 0
+
+    def test_least_recently_used_evicted(self, cache):
+        """Test the entry used longest ago goes first when full"""
+        for i, key in enumerate(["a", "b", "c"]):
+            with patch("utils.llm_cache.time.time", return_value=1000.0 + i):
+                cache.put(key, "model", key)
+        with patch("utils.llm_cache.time.time", return_value=1010.0):
+            cache.get("a")
+        with patch("utils.llm_cache.time.time", return_value=1011.0):
+            cache.put("d", "model", "d")
+
+        with patch("utils.llm_cache.time.time", return_value=1012.0):
+            assert cache.get("b") is None
+            assert cache.get("a") == "a"
+        assert cache.stats()["evictions"] == 1
+        assert cache.stats()["entries"] == 3
+
+    def test_clear(self, cache):
+        """Test clear removes every entry"""
+        cache.put("k", "model", "response")
+
+        assert cache.clear() == 1
+        assert cache.get("k") is None
+
+
+class TestCacheMetricsEndpoint:
+    """Test the /metrics/llm-cache endpoint"""
+
+    def test_requires_user(self):
+        """Test anonymous requests are rejected and signed-in users get the stats"""
+        from fastapi.testclient import TestClient
+        import app as app_module
+        from config.auth import TokenData, get_current_user
+
+        client = TestClient(app_module.app, base_url="http://localhost")
+        with patch.object(app_module, "get_llm_cache_stats", return_value={"hits": 3}):
+            anonymous = client.get("/metrics/llm-cache")
+            app_module.app.dependency_overrides[get_current_user] = lambda: TokenData(user_id=1, email="a@example.com")
+            try:
+                signed_in = client.get("/metrics/llm-cache")
+            finally:
+                app_module.app.dependency_overrides.pop(get_current_user)
+
+        assert anonymous.status_code == 401
+        assert signed_in.json() == {"hits": 3}
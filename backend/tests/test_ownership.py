@@ -0,0 +1,244 @@
+"""Unit tests for the denormalized owner columns and single-query access checks"""
+
+from contextlib import contextmanager
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import event
+from unittest.mock import MagicMock, patch
+from config.auth import TokenData
+from models.file_model import User, Upload, Epic, Story, QA
+from utils.ownership import FORBIDDEN, MISSING, OWNED, check_owner, owner_status
+
+
+@pytest.fixture
+def db(sqlite_session):
+    """Two users; user 1 owns upload 1 > epic 1 > story 1 > two QA tests, with a SELECT counter"""
+    session = sqlite_session
+    session.add_all([User(id=1, email="a@example.com"), User(id=2, email="b@example.com")])
+    session.add_all([
+        Upload(id=1, user_id=1, filename="a.pdf", content={}),
+        Upload(id=2, user_id=2, filename="b.pdf", content={}),
+    ])
+    session.add_all([Epic(id=1, upload_id=1, name="Mine", content={}), Epic(id=2, upload_id=2, name="Theirs", content={})])
+    session.add_all([Story(id=1, epic_id=1, name="Login", content={}), Story(id=2, epic_id=2, name="Other", content={})])
+    session.add_all([
+        QA(id=1, story_id=1, type="qa", content={"case": 1}),
+        QA(id=2, story_id=1, type="qa", content={"case": 2}),
+        QA(id=3, epic_id=1, type="test_plan", content={"title": "Plan"}),
+    ])
+    session.commit()
+    session.expire_all()
+
+    session.selects = 0
+
+    def count_selects(conn, cursor, statement, *args):
+        if statement.lstrip().upper().startswith("SELECT"):
+            session.selects += 1
+
+    event.listen(session.get_bind(), "before_cursor_execute", count_selects)
+    return session
+
+
+@contextmanager
+def use_session(session):
+    yield session
+
+
+USER = TokenData(user_id=1, email="a@example.com")
+OTHER = TokenData(user_id=2, email="b@example.com")
+
+
+class TestOwnerOnInsert:
+    """Test user_id and upload_id are copied from the parent row"""
+
+    def test_hierarchy_inherits_owner(self, db):
+        """Test epics, stories, QA and test plans get the upload's owner"""
+        assert db.get(Epic, 1).user_id == 1
+        story = db.get(Story, 1)
+        assert (story.user_id, story.upload_id) == (1, 1)
+        assert [(q.user_id, q.upload_id) for q in db.query(QA).order_by(QA.id)] == [(1, 1)] * 3
+
+    def test_explicit_owner_kept(self, db):
+        """Test values set by the caller are not overwritten"""
+        db.add(Story(id=3, epic_id=1, upload_id=1, user_id=1, name="Set", content={}))
+        db.commit()
+        db.selects = 0
+
+        db.add(QA(story_id=3, upload_id=1, user_id=1, type="qa", content={}))
+        db.commit()
+
+        assert db.selects == 0
+
+    def test_save_qa_stores_test_plans_under_epic(self, db):
+        """Test save_qa links test plans to the epic and QA tests to the story"""
+        from services.content_generator import ContentGenerationService
+
+        service = ContentGenerationService(db)
+        service.vectorstore = MagicMock()
+        with patch("services.content_generator.embed_new_rows"):
+            [(plan_id, _)] = service.save_qa(2, [{"title": "Plan"}], qa_type="test_plan")
+            [(qa_id, _)] = service.save_qa(2, [{"title": "Case"}], qa_type="qa")
+
+        plan, qa = db.get(QA, plan_id), db.get(QA, qa_id)
+        assert (plan.epic_id, plan.story_id, plan.user_id) == (2, None, 2)
+        assert (qa.story_id, qa.epic_id, qa.user_id) == (2, None, 2)
+
+
+class TestOwnerStatus:
+    """Test the fallback lookup that tells missing rows from other users' rows"""
+
+    def test_statuses(self, db):
+        """Test owned, forbidden and missing rows"""
+        assert owner_status(db, Story, 1, 1) == OWNED
+        assert owner_status(db, Story, 2, 1) == FORBIDDEN
+        assert owner_status(db, Story, 99, 1) == MISSING
+
+    def test_check_owner_errors(self, db):
+        """Test 404 for a missing row and 403 for another user's row"""
+        with pytest.raises(HTTPException) as missing:
+            check_owner(db, Epic, 99, 1, "epic")
+        with pytest.raises(HTTPException) as forbidden:
+            check_owner(db, Epic, 2, 1, "epic")
+
+        assert (missing.value.status_code, missing.value.detail) == (404, "Epic not found")
+        assert forbidden.value.status_code == 403
+
+
+class TestQARoutes:
+    """Test /qa/{story_id} checks access in the query that loads the tests"""
+
+    def test_owned_story_is_one_query(self, db):
+        """Test listing an owned story's QA issues a single SELECT"""
+        from routes import getQA
+
+        with patch.object(getQA, "get_db_context", lambda: use_session(db)):
+            result = getQA.get_qa(1, include=None, current_user=USER)
+
+        assert result["total_qa_tests"] == 2
+        assert db.selects == 1
+
+    def test_other_users_story_forbidden(self, db):
+        """Test another user's story is a 403, not an empty list"""
+        from routes import getQA
+
+        with patch.object(getQA, "get_db_context", lambda: use_session(db)):
+            with pytest.raises(HTTPException) as exc:
+                getQA.get_qa(1, include=None, current_user=OTHER)
+
+        assert exc.value.status_code == 403
+
+    def test_missing_story_not_found(self, db):
+        """Test an unknown story is a 404"""
+        from routes import getQA
+
+        with patch.object(getQA, "get_db_context", lambda: use_session(db)):
+            with pytest.raises(HTTPException) as exc:
+                getQA.get_qa_details(99, 1, current_user=USER)
+
+        assert (exc.value.status_code, exc.value.detail) == (404, "Story not found")
+
+    def test_details_one_query(self, db):
+        """Test fetching one owned QA test issues a single SELECT"""
+        from routes import getQA
+
+        with patch.object(getQA, "get_db_context", lambda: use_session(db)):
+            result = getQA.get_qa_details(1, 2, current_user=USER)
+
+        assert result["qa"]["content"] == {"case": 2}
+        assert db.selects == 1
+
+
+class TestCoordinatorAccess:
+    """Test AgentCoordinator reads use the owner column"""
+
+    def test_get_qa(self, db):
+        """Test owned, forbidden and unchecked reads"""
+        from agents import agent_coordinator
+
+        coordinator = agent_coordinator.AgentCoordinator()
+        with patch.object(agent_coordinator, "get_db_context", lambda: use_session(db)):
+            owned = coordinator.get_qa(1, user_id=1)
+            selects = db.selects
+            forbidden = coordinator.get_qa(1, user_id=2)
+            unchecked = coordinator.get_qa(1)
+
+        assert owned.data["total"] == 2
+        assert selects == 1
+        assert forbidden.success is False
+        assert "Unauthorized" in forbidden.error
+        assert unchecked.data["total"] == 2
+
+    def test_get_testplan_missing_epic(self, db):
+        """Test an unknown epic is reported as not found"""
+        from agents import agent_coordinator
+
+        coordinator = agent_coordinator.AgentCoordinator()
+        with patch.object(agent_coordinator, "get_db_context", lambda: use_session(db)):
+            response = coordinator.get_testplan(99, user_id=1)
+
+        assert response.error == "Epic not found"
+
+
+class TestStreamRoutes:
+    """Test the SSE generation routes check ownership and hold no session while streaming"""
+
+    @pytest.fixture
+    def client(self, db):
+        from fastapi import FastAPI
+        from fastapi.testclient import TestClient
+        from sqlalchemy.orm import sessionmaker
+        from config.auth import get_current_user
+        from routes import generateEpics, generateStories
+        from services import content_generator
+
+        factory = sessionmaker(bind=db.get_bind(), expire_on_commit=False)
+        state = {"open": 0, "open_while_streaming": []}
+
+        @contextmanager
+        def db_context():
+            session = factory()
+            state["open"] += 1
+            try:
+                yield session
+                session.commit()
+            finally:
+                session.close()
+                state["open"] -= 1
+
+        async def items(prompt, use_cache=True):
+            for name in ("First", "Second"):
+                state["open_while_streaming"].append(state["open"])
+                yield {"name": name}
+
+        app = FastAPI()
+        app.include_router(generateEpics.router, prefix="/api")
+        app.include_router(generateStories.router, prefix="/api")
+        app.dependency_overrides[get_current_user] = lambda: USER
+        with patch.object(generateEpics, "get_db_context", db_context), \
+                patch.object(generateStories, "get_db_context", db_context), \
+                patch.object(content_generator, "get_db_context", db_context), \
+                patch.object(content_generator, "astream_json_items", items), \
+                patch.object(content_generator, "embed_new_rows"), \
+                patch.object(content_generator, "get_default_store"):
+            client = TestClient(app)
+            client.state = state
+            yield client
+
+    def test_other_users_upload_forbidden(self, client):
+        """Test epics cannot be streamed into another user's upload, nor stories into their epic"""
+        assert client.post("/api/generate-epics/2/stream").status_code == 403
+        assert client.post("/api/generate-stories/2/stream").status_code == 403
+        assert client.post("/api/generate-epics/99/stream").status_code == 404
+
+    def test_no_session_held_while_streaming(self, client, db):
+        """Test each epic is saved in its own short session and the outbox entry in a final one"""
+        response = client.post("/api/generate-epics/1/stream")
+
+        assert response.status_code == 200
+        assert response.text.count("event: epic") == 2
+        assert '"confluence_outbox_id": 1' in response.text
+        assert client.state["open_while_streaming"] == [0, 0]
+        db.expire_all()
+        assert [epic.name for epic in db.query(Epic).filter(Epic.upload_id == 1).order_by(Epic.id)] == [
+            "Mine", "First", "Second"
+        ]
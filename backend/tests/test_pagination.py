@@ -0,0 +1,141 @@
+"""Unit tests for keyset pagination of the listing endpoints"""
+
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import pytest
+from fastapi import HTTPException
+from unittest.mock import patch
+from config.auth import TokenData
+from models.file_model import User, Upload, Epic, Story, QA
+from utils.pagination import count_rows, decode_cursor, encode_cursor, page_info, paginate, sort_columns
+
+
+@pytest.fixture
+def db(sqlite_session):
+    """Two users; user 1 has 12 epics, several sharing a created_at"""
+    session = sqlite_session
+    base = datetime(2026, 1, 1)
+    session.add_all([User(id=1, email="a@example.com"), User(id=2, email="b@example.com")])
+    session.add_all([
+        Upload(id=1, user_id=1, filename="a.pdf", content={}, created_at=base),
+        Upload(id=2, user_id=1, filename="b.pdf", content={}, created_at=base + timedelta(hours=1)),
+        Upload(id=3, user_id=2, filename="other.pdf", content={}, created_at=base),
+    ])
+    for epic_id in range(1, 13):
+        # Pairs of epics share a timestamp so the id tie-breaker matters
+        session.add(Epic(id=epic_id, upload_id=1 + epic_id % 2, name=f"Epic {epic_id}", content={},
+                         created_at=base + timedelta(minutes=epic_id // 2)))
+    session.add(Epic(id=50, upload_id=3, name="Not mine", content={}, created_at=base))
+    session.add(Story(id=1, epic_id=1, name="Login story", jira_key="PROJ-1", content={}, created_at=base))
+    session.add(QA(id=1, story_id=1, type="qa", content={"case": 1}, created_at=base))
+    session.add(QA(id=2, story_id=1, type="qa", content={"case": 2}, created_at=base))
+    session.commit()
+    return session
+
+
+@contextmanager
+def use_session(session):
+    yield session
+
+
+def user_epics(db, user_id=1):
+    return db.query(Epic).join(Upload, Epic.upload_id == Upload.id).filter(Upload.user_id == user_id)
+
+
+class TestPaginate:
+    """Test keyset pages against offset ordering"""
+
+    @pytest.mark.parametrize("sort_by,descending", [("created_at", True), ("created_at", False), ("id", True)])
+    def test_cursor_walk_matches_offset_order(self, db, sort_by, descending):
+        """Test following next_cursor visits every row once, in sort order"""
+        columns = sort_columns(Epic, sort_by)
+        expected = [epic.id for epic in paginate(user_epics(db), columns, 100, descending)[0]]
+
+        seen, cursor = [], None
+        while True:
+            rows, cursor = paginate(user_epics(db), columns, 5, descending, cursor)
+            seen.extend(epic.id for epic in rows)
+            if cursor is None:
+                break
+
+        assert seen == expected
+        assert sorted(seen) == list(range(1, 13))
+
+    def test_last_page_has_no_cursor(self, db):
+        """Test next_cursor is None once the rows run out"""
+        rows, cursor = paginate(user_epics(db), sort_columns(Epic, "id"), 12)
+
+        assert len(rows) == 12
+        assert cursor is None
+
+    def test_page_number_still_supported(self, db):
+        """Test offset paging without a cursor returns the same rows as the cursor walk"""
+        columns = sort_columns(Epic, "created_at")
+        _, cursor = paginate(user_epics(db), columns, 5)
+
+        by_cursor, _ = paginate(user_epics(db), columns, 5, cursor=cursor)
+        by_page, _ = paginate(user_epics(db), columns, 5, page=2)
+
+        assert [e.id for e in by_cursor] == [e.id for e in by_page]
+
+    def test_invalid_cursor_rejected(self, db):
+        """Test malformed cursors and cursors for another sort give 400"""
+        with pytest.raises(HTTPException) as error:
+            paginate(user_epics(db), sort_columns(Epic, "created_at"), 5, cursor="not-a-cursor")
+        assert error.value.status_code == 400
+
+        with pytest.raises(HTTPException):
+            decode_cursor(encode_cursor([7]), sort_columns(Epic, "created_at"))
+
+
+class TestCounts:
+    """Test total counting modes"""
+
+    def test_modes(self, db):
+        """Test exact counts, skipped counts and the non-PostgreSQL estimate fallback"""
+        assert count_rows(user_epics(db), "exact") == (12, False)
+        assert count_rows(user_epics(db), "none") == (None, False)
+        assert count_rows(user_epics(db), "approximate") == (12, False)
+
+    def test_page_info(self):
+        """Test total_pages is omitted when there is no total"""
+        assert page_info(None, 1, 10, "abc")["total_pages"] is None
+        assert page_info(21, 1, 10, None, True) == {
+            "current_page": 1, "page_size": 10, "total_pages": 3, "total_is_estimate": True, "next_cursor": None
+        }
+
+
+class TestListingRoutes:
+    """Test the listing routes scope rows to the current user"""
+
+    def test_epics_scoped_to_user(self, db):
+        """Test GET /epics returns only the user's epics and a working cursor"""
+        from routes import getEpics
+
+        user = TokenData(user_id=1, email="a@example.com")
+        with patch.object(getEpics, "get_db_context", lambda: use_session(db)):
+            first = getEpics.get_all_epics(page=1, page_size=10, sort_by="id", sort_order="desc",
+                                           cursor=None, total="exact", include=None, current_user=user)
+            second = getEpics.get_all_epics(page=1, page_size=10, sort_by="id", sort_order="desc",
+                                            cursor=first["next_cursor"], total="none", include=None,
+                                            current_user=user)
+
+        assert first["total_epics"] == 12
+        assert first["total_pages"] == 2
+        assert [e["id"] for e in first["epics"] + second["epics"]] == list(range(12, 0, -1))
+        assert second["total_epics"] is None
+        assert second["next_cursor"] is None
+
+    def test_qa_includes_story_without_extra_queries(self, db):
+        """Test GET /qa joins the story name and Jira key"""
+        from routes import getQA
+
+        user = TokenData(user_id=1, email="a@example.com")
+        with patch.object(getQA, "get_db_context", lambda: use_session(db)):
+            result = getQA.get_all_qa(page=1, page_size=1, sort_by="created_at", sort_order="desc",
+                                      cursor=None, total="exact", include=None, current_user=user)
+
+        assert result["total_qa_tests"] == 2
+        assert result["qa_tests"][0]["story_name"] == "Login story"
+        assert result["qa_tests"][0]["story_jira_key"] == "PROJ-1"
+        assert result["next_cursor"] is not None
@@ -0,0 +1,119 @@
+"""Unit tests for deferred content and projected listing queries"""
+
+from contextlib import contextmanager
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from unittest.mock import patch
+from models.file_model import User, Upload, Epic, QA
+from utils.projection import include_content, parse_include
+
+
+@pytest.fixture
+def db(sqlite_session):
+    """User 1 with an upload, an epic and a test plan, all with content; records row SELECTs"""
+    session = sqlite_session
+    session.add(User(id=1, email="a@example.com"))
+    session.add(Upload(id=1, user_id=1, filename="spec.pdf", content={"requirement": "x" * 1000}))
+    session.add(Epic(id=1, upload_id=1, name="Login", content={"description": "Sign in"}, embedding=b"\x00" * 8))
+    session.add(QA(id=1, epic_id=1, type="test_plan", content={"name": "Login plan"}))
+    session.commit()
+    session.expunge_all()
+
+    session.statements = []
+
+    def record(conn, cursor, statement, *args):
+        if not statement.startswith("SELECT count"):
+            session.statements.append(statement)
+
+    event.listen(session.get_bind(), "before_cursor_execute", record)
+    return session
+
+
+@pytest.fixture
+def client(db):
+    from config.auth import TokenData, get_current_user
+    from routes import getEpics, getTestPlan, upload
+
+    @contextmanager
+    def use_session():
+        yield db
+
+    app = FastAPI()
+    for module in (getEpics, getTestPlan, upload):
+        app.include_router(module.router, prefix="/api")
+    app.dependency_overrides[get_current_user] = lambda: TokenData(user_id=1, email="a@example.com")
+    with patch.object(getEpics, "get_db_context", use_session), \
+            patch.object(getTestPlan, "get_db_context", use_session), \
+            patch.object(upload, "get_db_context", use_session):
+        yield TestClient(app)
+
+
+class TestParseInclude:
+    """Test the include query parameter"""
+
+    def test_fields(self):
+        """Test empty, repeated and mixed-case fields"""
+        assert parse_include(None) == set()
+        assert parse_include(" Content, content ,") == {"content"}
+        assert include_content("content") and not include_content("")
+
+    def test_unknown_field(self):
+        """Test an unknown field is a 400"""
+        with pytest.raises(HTTPException) as exc:
+            parse_include("content,embedding")
+
+        assert exc.value.status_code == 400
+        assert "embedding" in exc.value.detail
+
+
+class TestDeferredContent:
+    """Test content is only read when asked for"""
+
+    def test_model_defers_content(self, db):
+        """Test loading a row leaves content unloaded until it is accessed"""
+        epic = db.query(Epic).one()
+
+        assert "content" not in epic.__dict__
+        assert "epics.content" not in db.statements[-1]
+        assert epic.content == {"description": "Sign in"}
+
+    def test_listing_projects_columns(self, client, db):
+        """Test GET /epics selects neither content nor embeddings by default"""
+        response = client.get("/api/epics")
+
+        epic = response.json()["epics"][0]
+        assert epic["name"] == "Login" and "content" not in epic
+        assert len(db.statements) == 1
+        assert "epics.content" not in db.statements[0]
+        assert "epics.embedding" not in db.statements[0]
+
+    def test_include_content(self, client, db):
+        """Test include=content returns the content from the same single query"""
+        response = client.get("/api/epics/1", params={"include": "content"})
+
+        assert response.json()["epics"][0]["content"] == {"description": "Sign in"}
+        # upload ownership, then epics with their content
+        assert len(db.statements) == 2
+        assert "epics.content" in db.statements[1]
+
+    def test_testplan_title_without_content(self, client, db):
+        """Test test plan titles are extracted by the database rather than from loaded content"""
+        response = client.get("/api/testplans")
+
+        plan = response.json()["test_plans"][0]
+        assert plan["title"] == "Login plan" and "content" not in plan
+        assert "qa.content AS qa_content" not in db.statements[0]
+
+    def test_uploads(self, client, db):
+        """Test GET /uploads leaves out the upload text unless included"""
+        plain = client.get("/api/uploads").json()["uploads"][0]
+        full = client.get("/api/uploads", params={"include": "content"}).json()["uploads"][0]
+
+        assert plain["filename"] == "spec.pdf" and "content" not in plain
+        assert full["content"] == {"requirement": "x" * 1000}
+
+    def test_unknown_include(self, client):
+        """Test listings reject fields they cannot include"""
+        assert client.get("/api/epics", params={"include": "embedding"}).status_code == 400
@@ -0,0 +1,268 @@
+"""Unit tests for incremental reindexing of database resources"""
+
+import os
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from types import SimpleNamespace
+from unittest.mock import Mock, patch
+import numpy as np
+from models.file_model import Epic, Story
+from rag.resource_index import (
+    ReindexProgress,
+    epic_document,
+    qa_document,
+    reindex_resources,
+    resource_doc_id,
+    story_document,
+)
+from rag.vectorstore import VectorStore
+
+
+class FakeQuery:
+    """Query stand-in supporting count() and options().order_by().yield_per()"""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def count(self):
+        return len(self.rows)
+
+    def options(self, *args):
+        return self
+
+    def order_by(self, *args):
+        return self
+
+    def yield_per(self, size):
+        return iter(sorted(self.rows, key=lambda row: row.id))
+
+
+class FakeSession:
+    """Session stand-in returning fixed rows per model"""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def query(self, model):
+        return FakeQuery(self.rows.get(model, []))
+
+
+def make_epic(epic_id, name="Login", description="Users sign in"):
+    return SimpleNamespace(id=epic_id, name=name, upload_id=1,
+                           content={"description": description, "acceptanceCriteria": ["works"]})
+
+
+def make_story(story_id, epic_id=1):
+    return SimpleNamespace(id=story_id, name=f"Story {story_id}", epic_id=epic_id,
+                           content={"description": "As a user", "acceptanceCriteria": []})
+
+
+@pytest.fixture
+def store(tmp_path):
+    """Vector store with a fake model that counts encoded texts"""
+    model = Mock()
+    model.encoded = []
+
+    def encode(texts, **kwargs):
+        batch = [texts] if isinstance(texts, str) else list(texts)
+        model.encoded.extend(batch)
+        vectors = np.array([[len(text), 1.0, 0.5] for text in batch], dtype=np.float32)
+        return vectors[0] if isinstance(texts, str) else vectors
+
+    model.encode.side_effect = encode
+    VectorStore._embedding_cache.clear()
+    VectorStore._cache_timestamp.clear()
+    with patch("rag.vectorstore.get_embedding_model", return_value=model):
+        store = VectorStore(store_path=str(tmp_path / "vectorstore.json"))
+        store.model_calls = model.encoded
+        yield store
+    VectorStore._embedding_cache.clear()
+    VectorStore._cache_timestamp.clear()
+
+
+class TestResourceDocuments:
+    """Test deterministic documents for database rows"""
+
+    def test_doc_id_is_deterministic(self):
+        """Test the same row always maps to the same document"""
+        assert epic_document(make_epic(3))["doc_id"] == resource_doc_id("epic", 3) == "epic_3"
+        assert epic_document(make_epic(3)) == epic_document(make_epic(3))
+
+    def test_hash_changes_with_content(self):
+        """Test edited content produces a different hash"""
+        before = epic_document(make_epic(3))
+        after = epic_document(make_epic(3, description="Users sign in with SSO"))
+
+        assert before["content_hash"] != after["content_hash"]
+
+    def test_qa_metadata_type(self):
+        """Test test plans and QA tests keep their searchable types"""
+        plan = SimpleNamespace(id=5, type="test_plan", story_id=None, epic_id=2,
+                               content={"title": "Plan", "objective": "Cover login"})
+        test = SimpleNamespace(id=6, type="qa", story_id=4, epic_id=None,
+                               content={"title": "Login API", "method": "POST"})
+
+        assert qa_document(plan)["metadata"]["type"] == "test_plan"
+        assert qa_document(test)["metadata"]["type"] == "qa"
+        assert qa_document(test)["doc_id"] == "qa_6"
+
+    def test_story_document_without_content(self):
+        """Test rows with non-dict content still build a document"""
+        story = SimpleNamespace(id=1, name="Empty", epic_id=1, content=None)
+
+        assert story_document(story)["text"].startswith("Story: Empty")
+
+
+class TestReindexResources:
+    """Test incremental and full reindex runs"""
+
+    def test_first_run_embeds_everything(self, store):
+        """Test an empty store gets every row"""
+        db = FakeSession({Epic: [make_epic(1), make_epic(2)], Story: [make_story(1)]})
+
+        result = reindex_resources(db, store)
+
+        assert result["state"] == "completed"
+        assert result["embedded"] == 3
+        assert set(store.data) == {"epic_1", "epic_2", "story_1"}
+
+    def test_unchanged_rows_skipped(self, store):
+        """Test a second run only embeds new or changed rows"""
+        reindex_resources(FakeSession({Epic: [make_epic(1), make_epic(2)]}), store)
+        store.model_calls.clear()
+
+        db = FakeSession({Epic: [make_epic(1), make_epic(2, description="Changed"), make_epic(3)]})
+        result = reindex_resources(db, store)
+
+        assert result["embedded"] == 2
+        assert result["unchanged"] == 1
+        assert len(store.model_calls) == 2
+        assert "Changed" in store.data["epic_2"]["text"]
+
+    def test_full_run_reembeds(self, store):
+        """Test full=True ignores stored hashes"""
+        db = FakeSession({Epic: [make_epic(1), make_epic(2)]})
+        reindex_resources(db, store)
+
+        result = reindex_resources(db, store, full=True)
+
+        assert result["embedded"] == 2
+        assert result["unchanged"] == 0
+
+    def test_orphans_deleted(self, store):
+        """Test documents of deleted rows are removed, other documents kept"""
+        reindex_resources(FakeSession({Epic: [make_epic(1), make_epic(2)]}), store)
+        store.store_document("note", "manual_note", {"type": "note"})
+
+        result = reindex_resources(FakeSession({Epic: [make_epic(1)]}), store)
+
+        assert result["deleted"] == 1
+        assert set(store.data) == {"epic_1", "manual_note"}
+
+    def test_batches_written_separately(self, store):
+        """Test rows are stored one batch at a time"""
+        db = FakeSession({Epic: [make_epic(i) for i in range(1, 6)]})
+
+        with patch.object(store, "store_documents", wraps=store.store_documents) as store_documents:
+            reindex_resources(db, store, batch_size=2)
+
+        assert [len(call.args[0]) for call in store_documents.call_args_list] == [2, 2, 1]
+
+    def test_failure_recorded(self, store):
+        """Test an exception marks the run failed and propagates"""
+        db = Mock()
+        db.query.side_effect = RuntimeError("database down")
+        progress = ReindexProgress()
+
+        with pytest.raises(RuntimeError):
+            reindex_resources(db, store, progress=progress)
+
+        assert progress.snapshot()["state"] == "failed"
+        assert progress.snapshot()["error"] == "database down"
+
+
+class TestReindexProgress:
+    """Test progress tracking"""
+
+    def test_single_run_at_a_time(self):
+        """Test a second start is refused while running"""
+        progress = ReindexProgress()
+
+        assert progress.start(full=False) is True
+        assert progress.start(full=False) is False
+        progress.finish()
+        assert progress.start(full=True) is True
+
+    def test_percent(self):
+        """Test the snapshot reports percent done"""
+        progress = ReindexProgress()
+        progress.start(full=False)
+        progress.update(total=4)
+        progress.add(processed=1)
+
+        assert progress.snapshot()["percent"] == 25.0
+
+
+class TestIndexingRoutes:
+    """Test the reindex and vectorstore endpoints"""
+
+    @pytest.fixture
+    def indexing(self, store):
+        from routes import indexing
+
+        with patch.object(indexing, "vectorstore", store):
+            yield indexing
+
+    def test_requires_user(self, indexing):
+        """Test the endpoints reject anonymous requests"""
+        app = FastAPI()
+        app.include_router(indexing.router, prefix="/api")
+
+        response = TestClient(app).get("/api/reindex/status")
+
+        assert response.status_code == 401
+
+    def test_requires_admin(self, indexing):
+        """Test signed-in users outside ADMIN_EMAILS cannot clear or reindex the shared store"""
+        from config.auth import TokenData, get_current_user
+
+        app = FastAPI()
+        app.include_router(indexing.router, prefix="/api")
+        app.dependency_overrides[get_current_user] = lambda: TokenData(user_id=2, email="b@example.com")
+        client = TestClient(app)
+
+        with patch("config.auth.ADMIN_EMAILS", {"admin@example.com"}):
+            responses = [
+                client.post("/api/vectorstore/clear"),
+                client.post("/api/reindex", params={"full": True}),
+                client.post("/api/vectorstore/index/rebuild"),
+                client.get("/api/vectorstore/stats"),
+            ]
+
+        assert [response.status_code for response in responses] == [403] * 4
+
+    def test_status_under_api(self, indexing, store):
+        """Test /api/reindex/status reports the shared store to an administrator"""
+        from config.auth import TokenData, get_current_user
+
+        app = FastAPI()
+        app.include_router(indexing.router, prefix="/api")
+        app.dependency_overrides[get_current_user] = lambda: TokenData(user_id=1, email="Admin@example.com")
+        store.store_document("Users sign in", "epic_1")
+
+        with patch("config.auth.ADMIN_EMAILS", {"admin@example.com"}):
+            response = TestClient(app).get("/api/reindex/status")
+
+        assert response.status_code == 200
+        assert response.json()["total_documents_in_store"] == 1
+
+    def test_store_in_storage_dir(self):
+        """Test the indexing routes use the default store in VECTORSTORE_DIR, not a working-directory path"""
+        from config.config import VECTORSTORE_DIR
+        from rag.vectorstore import get_default_store
+        from routes import indexing
+
+        assert indexing.vectorstore is get_default_store()
+        assert indexing.vectorstore.store_path == os.path.join(VECTORSTORE_DIR, "vectorstore.json")
+        assert os.path.isabs(VECTORSTORE_DIR)
@@ -0,0 +1,147 @@
+"""Unit tests for precomputed row embeddings"""
+
+import pytest
+from unittest.mock import Mock
+import numpy as np
+from rag.row_embeddings import (
+    EMBEDDING_MODEL_NAME,
+    content_hash,
+    cosine_similarities,
+    embed_new_rows,
+    epic_text,
+    pack_embedding,
+    refresh_row_embeddings,
+    score_rows,
+    testplan_text,
+    unpack_embedding,
+)
+
+
+def make_row(content, name=None):
+    """Create a row-like object with empty embedding columns"""
+    row = Mock()
+    row.name = name
+    row.content = content
+    row.embedding = None
+    row.embedding_hash = None
+    row.embedding_model = None
+    return row
+
+
+def make_model(vectors_by_text):
+    """Create a fake SentenceTransformer returning fixed vectors per text"""
+    model = Mock()
+    model.encode.side_effect = lambda texts, show_progress_bar=False: np.array(
+        [vectors_by_text[text] for text in texts]
+    )
+    return model
+
+
+class TestRowText:
+    """Test searchable text builders"""
+
+    def test_epic_text_combines_name_and_description(self):
+        """Test epic text is name plus description"""
+        epic = make_row({"description": "Users can sign in"}, name="Auth")
+        assert epic_text(epic) == "Auth Users can sign in"
+
+    def test_testplan_text_combines_title_and_objective(self):
+        """Test test plan text is title plus objective"""
+        plan = make_row({"title": "Auth plan", "objective": "Cover login"})
+        assert testplan_text(plan) == "Auth plan Cover login"
+
+
+class TestEmbeddingSerialization:
+    """Test packing embeddings into bytes"""
+
+    def test_pack_roundtrip(self):
+        """Test vectors survive a pack/unpack roundtrip as float32"""
+        vector = np.array([0.1, 0.2, 0.3])
+        result = unpack_embedding(pack_embedding(vector))
+        assert result.dtype == np.float32
+        assert np.allclose(result, vector)
+
+    def test_content_hash_is_stable(self):
+        """Test same text produces same hash"""
+        assert content_hash("text") == content_hash("text")
+        assert content_hash("text") != content_hash("other")
+
+
+class TestRefreshRowEmbeddings:
+    """Test reuse and refresh of stored embeddings"""
+
+    def test_missing_embeddings_are_encoded_in_one_batch(self):
+        """Test rows without embeddings are encoded together and stored"""
+        rows = [make_row({"title": "a"}), make_row({"title": "b"})]
+        model = make_model({"a": [1.0, 0.0], "b": [0.0, 1.0]})
+
+        pairs = refresh_row_embeddings(rows, "test_plan", model)
+
+        assert len(pairs) == 2
+        model.encode.assert_called_once()
+        assert rows[0].embedding_hash == content_hash("a")
+        assert rows[0].embedding_model == EMBEDDING_MODEL_NAME
+        assert np.allclose(unpack_embedding(rows[1].embedding), [0.0, 1.0])
+
+    def test_current_embeddings_are_reused(self):
+        """Test rows with matching hash and model are not re-encoded"""
+        row = make_row({"title": "a"})
+        row.embedding = pack_embedding([1.0, 0.0])
+        row.embedding_hash = content_hash("a")
+        row.embedding_model = EMBEDDING_MODEL_NAME
+        model = make_model({})
+
+        pairs = refresh_row_embeddings([row], "test_plan", model)
+
+        model.encode.assert_not_called()
+        assert np.allclose(pairs[0][1], [1.0, 0.0])
+
+    def test_changed_content_is_re_encoded(self):
+        """Test rows whose text changed get a fresh embedding"""
+        row = make_row({"title": "new"})
+        row.embedding = pack_embedding([1.0, 0.0])
+        row.embedding_hash = content_hash("old")
+        row.embedding_model = EMBEDDING_MODEL_NAME
+        model = make_model({"new": [0.0, 1.0]})
+
+        refresh_row_embeddings([row], "test_plan", model)
+
+        assert row.embedding_hash == content_hash("new")
+        assert np.allclose(unpack_embedding(row.embedding), [0.0, 1.0])
+
+    def test_rows_without_text_are_skipped(self):
+        """Test rows without searchable text are left out"""
+        model = make_model({})
+        assert refresh_row_embeddings([make_row(None)], "test_plan", model) == []
+        model.encode.assert_not_called()
+
+    def test_embed_new_rows_swallows_errors(self):
+        """Test write-time embedding failures don't propagate"""
+        model = Mock()
+        model.encode.side_effect = Exception("Encoding error")
+        assert embed_new_rows([make_row({"title": "a"})], "test_plan", model) is False
+
+
+class TestScoreRows:
+    """Test scoring rows against a query"""
+
+    def test_cosine_similarities(self):
+        """Test cosine similarity against every matrix row"""
+        matrix = np.array([[1.0, 0.0], [0.0, 2.0], [0.0, 0.0]], dtype=np.float32)
+        scores = cosine_similarities([1.0, 0.0], matrix)
+        assert np.allclose(scores, [1.0, 0.0, 0.0])
+
+    def test_score_rows_ranks_by_similarity(self):
+        """Test rows are scored using their embeddings"""
+        rows = [make_row({"title": "a"}), make_row({"title": "b"})]
+        model = make_model({"a": [1.0, 0.0], "b": [0.6, 0.8]})
+
+        scored = score_rows(np.array([1.0, 0.0]), rows, "test_plan", model)
+
+        assert [row for row, _ in scored] == rows
+        assert scored[0][1] == pytest.approx(1.0)
+        assert scored[1][1] == pytest.approx(0.6)
+
+    def test_score_rows_empty(self):
+        """Test scoring no rows returns an empty list"""
+        assert score_rows(np.array([1.0, 0.0]), [], "epic", make_model({})) == []
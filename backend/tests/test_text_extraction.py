@@ -0,0 +1,225 @@
+"""Unit tests for spooled uploads and off-loop text extraction"""
+
+import asyncio
+import hashlib
+import io
+import logging
+import os
+import pytest
+from docx import Document
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from fpdf import FPDF
+from unittest.mock import patch
+from services.text_extraction import (
+    UploadTooLargeError,
+    extract_pdf,
+    extract_text,
+    extract_text_async,
+    iter_document_text,
+    shutdown_extraction_pool,
+    spool_upload,
+)
+from services.text_extraction_bench import benchmark
+from utils.upload_limit import FORM_OVERHEAD_BYTES, UploadSizeLimitMiddleware
+
+
+def make_pdf(path, pages):
+    pdf = FPDF()
+    pdf.set_font("Helvetica", size=12)
+    for number in range(1, pages + 1):
+        pdf.add_page()
+        pdf.cell(0, 10, f"Requirement page {number}")
+    pdf.output(str(path))
+    return str(path)
+
+
+class CountingReader(io.BytesIO):
+    """Byte stream that records how much was read per call"""
+
+    def __init__(self, data):
+        super().__init__(data)
+        self.reads = []
+
+    def read(self, size=-1):
+        chunk = super().read(size)
+        self.reads.append(len(chunk))
+        return chunk
+
+
+class TestSpoolUpload:
+    """Test uploads are copied to disk in chunks under a size cap"""
+
+    def test_copies_in_chunks(self):
+        """Test the stream is read chunk_size bytes at a time"""
+        source = CountingReader(b"x" * 2500)
+
+        path = spool_upload(source, max_bytes=10_000, chunk_size=1000)
+        try:
+            with open(path, "rb") as spooled:
+                assert spooled.read() == b"x" * 2500
+        finally:
+            os.unlink(path)
+        assert max(source.reads) == 1000
+
+    def test_rejects_early(self):
+        """Test reading stops at the first chunk past the cap and the temp file is removed"""
+        source = CountingReader(b"x" * 10_000)
+
+        with patch("services.text_extraction.os.unlink", wraps=os.unlink) as unlink:
+            with pytest.raises(UploadTooLargeError) as exc:
+                spool_upload(source, max_bytes=2500, chunk_size=1000)
+
+        assert exc.value.status_code == 413
+        assert sum(source.reads) == 3000
+        assert not os.path.exists(unlink.call_args.args[0])
+
+
+class TestExtractText:
+    """Test page-by-page extraction per document type"""
+
+    def test_pdf_page_by_page(self, tmp_path):
+        """Test a PDF yields one piece per page, in order"""
+        path = make_pdf(tmp_path / "spec.pdf", pages=3)
+
+        pieces = list(iter_document_text(path, "spec.pdf"))
+
+        assert len(pieces) == 3
+        assert "page 1" in pieces[0] and "page 3" in pieces[2]
+
+    def test_docx(self, tmp_path):
+        """Test DOCX paragraphs are joined with newlines"""
+        document = Document()
+        document.add_paragraph("First")
+        document.add_paragraph("Second")
+        document.save(tmp_path / "spec.docx")
+
+        assert extract_text(str(tmp_path / "spec.docx"), "Spec.DOCX") == "First\nSecond"
+
+    def test_plain_text_utf8_across_chunks(self, tmp_path):
+        """Test multi-byte characters split across chunk boundaries decode correctly"""
+        (tmp_path / "spec.txt").write_bytes(("é" * 5000).encode("utf-8"))
+
+        with patch("services.text_extraction.UPLOAD_SPOOL_CHUNK_BYTES", 999):
+            assert extract_text(str(tmp_path / "spec.txt"), "spec.txt") == "é" * 5000
+
+    def test_plain_text_latin1_fallback(self, tmp_path):
+        """Test invalid UTF-8 is decoded as Latin-1"""
+        (tmp_path / "spec.txt").write_bytes("café".encode("latin1"))
+
+        assert extract_text(str(tmp_path / "spec.txt"), "spec.txt") == "café"
+
+    def test_async_runs_off_loop(self, tmp_path):
+        """Test extract_text_async returns the text from a worker thread"""
+        path = make_pdf(tmp_path / "spec.pdf", pages=2)
+
+        text = asyncio.run(extract_text_async(path, "spec.pdf"))
+
+        assert "page 2" in text
+
+
+class TestExtractPdf:
+    """Test PDFs are extracted across worker processes and reassembled in order"""
+
+    @pytest.fixture(autouse=True)
+    def pool(self):
+        yield
+        shutdown_extraction_pool()
+
+    def test_parallel_matches_serial(self, tmp_path):
+        """Test page ranges split across processes give the serial text with each page's offset"""
+        path = make_pdf(tmp_path / "spec.pdf", pages=12)
+
+        serial = extract_pdf(path, processes=1)
+        parallel = extract_pdf(path, processes=2, pages_per_task=5)
+
+        assert parallel == serial
+        assert len(parallel.page_offsets) == 12
+        for number, offset in enumerate(parallel.page_offsets, start=1):
+            assert parallel.text[offset:].startswith(f"Requirement page {number}\n")
+
+    def test_logs_throughput(self, tmp_path, caplog):
+        """Test the pages per second are logged"""
+        path = make_pdf(tmp_path / "spec.pdf", pages=3)
+
+        with caplog.at_level(logging.INFO, logger="services.text_extraction"):
+            extract_pdf(path, processes=1)
+
+        assert "Extracted 3 PDF pages" in caplog.text and "pages/s" in caplog.text
+
+    def test_benchmark(self):
+        """Test the benchmark reports every process count with text identical to the serial run"""
+        results = benchmark(pages=10, processes=(1, 2), repeat=1, pages_per_task=4)
+
+        assert [row["processes"] for row in results] == [1, 2]
+        assert all(row["identical"] and row["pages_per_s"] > 0 for row in results)
+
+
+class TestUploadSizeLimitMiddleware:
+    """Test oversized uploads are refused from their Content-Length"""
+
+    @pytest.fixture
+    def client(self):
+        app = FastAPI()
+        app.add_middleware(UploadSizeLimitMiddleware, max_bytes=1000, paths=["/api/upload"])
+
+        @app.post("/api/upload")
+        async def upload():
+            return {"ok": True}
+
+        @app.post("/api/other")
+        async def other():
+            return {"ok": True}
+
+        return TestClient(app)
+
+    def test_rejects_over_limit(self, client):
+        """Test a body past the limit and the form allowance is refused with 413"""
+        response = client.post("/api/upload", content=b"x" * (1001 + FORM_OVERHEAD_BYTES))
+
+        assert response.status_code == 413
+        assert "upload limit" in response.json()["detail"]
+
+    def test_allows_within_limit_and_other_paths(self, client):
+        """Test small uploads and other routes are untouched"""
+        assert client.post("/api/upload", content=b"x" * 500).status_code == 200
+        assert client.post("/api/other", content=b"x" * (2000 + FORM_OVERHEAD_BYTES)).status_code == 200
+
+
+class TestUploadRoute:
+    """Test the upload route spools, extracts and stores off the event loop"""
+
+    @pytest.fixture
+    def client(self):
+        from config.auth import TokenData, get_current_user
+        from routes import upload
+
+        app = FastAPI()
+        app.include_router(upload.router, prefix="/api")
+        app.dependency_overrides[get_current_user] = lambda: TokenData(user_id=1, email="a@example.com")
+        return TestClient(app)
+
+    def test_stores_extracted_text(self, client, tmp_path):
+        """Test the PDF text and page offsets reach the database write and the spool file is removed"""
+        path = make_pdf(tmp_path / "spec.pdf", pages=2)
+        with patch("routes.upload._store_upload", return_value=(7, None)) as store, \
+                patch("routes.upload._resolve_duplicate", return_value=None), \
+                patch("routes.upload.os.unlink", wraps=os.unlink) as unlink, open(path, "rb") as pdf:
+            response = client.post("/api/upload", files={"file": ("spec.pdf", pdf, "application/pdf")})
+
+        assert response.json() == {"message": "File uploaded successfully", "upload_id": 7, "duplicate_of": None}
+        filename, extracted, user_id, file_hash = store.call_args.args
+        assert (filename, user_id) == ("spec.pdf", 1)
+        assert file_hash == hashlib.sha256(open(path, "rb").read()).hexdigest()
+        assert "page 1" in extracted.text and "page 2" in extracted.text
+        assert len(extracted.page_offsets) == 2
+        assert not os.path.exists(unlink.call_args.args[0])
+
+    def test_too_large(self, client):
+        """Test a file past the cap is refused with 413 and nothing is stored"""
+        with patch.object(spool_upload, "__defaults__", (10, 4, None)), \
+                patch("routes.upload._store_upload") as store:
+            response = client.post("/api/upload", files={"file": ("spec.txt", b"x" * 100, "text/plain")})
+
+        assert response.status_code == 413
+        store.assert_not_called()
@@ -0,0 +1,166 @@
+"""Unit tests for duplicate upload detection and reuse"""
+
+import hashlib
+import io
+import pytest
+from contextlib import contextmanager, nullcontext
+from docx import Document
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from unittest.mock import MagicMock, patch
+from models.file_model import User, Upload, UploadChunk, Epic
+from rag.row_embeddings import content_hash
+from services.upload_dedup import copy_upload, find_duplicate_upload, resolve_duplicate
+
+DOCUMENT = b"Users sign in with email and password."
+FILE_HASH = hashlib.sha256(DOCUMENT).hexdigest()
+TEXT_HASH = content_hash(DOCUMENT.decode())
+
+
+@pytest.fixture
+def db(sqlite_session):
+    """User 1 uploaded DOCUMENT as upload 1, with one chunk and one epic already in Jira"""
+    session = sqlite_session
+    session.add_all([User(id=1, email="a@example.com"), User(id=2, email="b@example.com")])
+    upload = Upload(id=1, user_id=1, filename="spec.txt", content={"requirement": DOCUMENT.decode()},
+                    file_hash=FILE_HASH, text_hash=TEXT_HASH, page_offsets=None)
+    upload.chunks = [UploadChunk(chunk_index=0, start_offset=0, end_offset=len(DOCUMENT), text=DOCUMENT.decode(),
+                                 embedding=b"\x00" * 8, embedding_model="model", embedding_hash="h")]
+    upload.epics = [Epic(name="Login", content={"description": "Sign in", "jira_key": "REQ-1"},
+                         jira_key="REQ-1", confluence_page_id="55", embedding=b"\x01" * 8)]
+    session.add(upload)
+    session.commit()
+    return session
+
+
+class TestFindDuplicateUpload:
+    """Test duplicates are matched per user on bytes or text"""
+
+    def test_matches_bytes_or_text(self, db):
+        """Test either hash finds the earlier upload"""
+        assert find_duplicate_upload(db, 1, file_hash=FILE_HASH).id == 1
+        assert find_duplicate_upload(db, 1, file_hash="other", text_hash=TEXT_HASH).id == 1
+        assert find_duplicate_upload(db, 1, file_hash="other", text_hash="other") is None
+
+    def test_other_users_not_matched(self, db):
+        """Test another user's identical upload is not a duplicate"""
+        assert find_duplicate_upload(db, 2, file_hash=FILE_HASH, text_hash=TEXT_HASH) is None
+
+
+class TestResolveDuplicate:
+    """Test the reuse, copy and new policies"""
+
+    def test_reuse_returns_earlier_upload(self, db):
+        """Test reuse answers with the earlier upload and stores nothing"""
+        response = resolve_duplicate(db, "reuse", "spec-v2.txt", 1, file_hash=FILE_HASH)
+
+        assert response["upload_id"] == response["duplicate_of"] == 1
+        assert response["epic_count"] == 1
+        assert db.query(Upload).count() == 1
+
+    def test_copy_seeds_new_upload(self, db):
+        """Test copy stores a new upload with the text, chunks and epics, without external links"""
+        response = resolve_duplicate(db, "copy", "spec-v2.txt", 1, text_hash=TEXT_HASH)
+        db.commit()
+
+        copy = db.get(Upload, response["upload_id"])
+        assert response["duplicate_of"] == 1 and copy.id != 1
+        assert (copy.filename, copy.content, copy.text_hash) == ("spec-v2.txt", db.get(Upload, 1).content, TEXT_HASH)
+        assert [chunk.embedding for chunk in copy.chunks] == [b"\x00" * 8]
+        epic = copy.epics[0]
+        assert (epic.name, epic.content, epic.embedding) == ("Login", {"description": "Sign in"}, b"\x01" * 8)
+        assert (epic.jira_key, epic.confluence_page_id, epic.user_id) == (None, None, 1)
+
+    def test_new_ignores_duplicates(self, db):
+        """Test new always processes the file"""
+        assert resolve_duplicate(db, "new", "spec.txt", 1, file_hash=FILE_HASH) is None
+
+    def test_copy_keeps_new_file_hash(self, db):
+        """Test a text-only match records the new file's own byte hash"""
+        copy = copy_upload(db, db.get(Upload, 1), "spec.docx", 1, "docx-hash")
+
+        assert copy.file_hash == "docx-hash"
+
+
+class TestUploadRouteDuplicates:
+    """Test the upload route skips work for duplicates"""
+
+    @pytest.fixture
+    def client(self, db):
+        from config.auth import TokenData, get_current_user
+        from routes import upload
+
+        app = FastAPI()
+        app.include_router(upload.router, prefix="/api")
+        app.dependency_overrides[get_current_user] = lambda: TokenData(user_id=1, email="a@example.com")
+        with patch("routes.upload._resolve_duplicate",
+                   side_effect=lambda policy, filename, user_id, **hashes:
+                   resolve_duplicate(db, policy, filename, user_id, **hashes)):
+            yield TestClient(app)
+
+    def test_same_bytes_skip_extraction(self, client):
+        """Test re-uploading the same bytes reuses the earlier upload without extracting"""
+        with patch("routes.upload.extract_document_async") as extract, \
+                patch("routes.upload._store_upload") as store:
+            response = client.post("/api/upload", files={"file": ("spec.txt", DOCUMENT, "text/plain")},
+                                   params={"on_duplicate": "reuse"})
+
+        assert response.json()["duplicate_of"] == 1
+        extract.assert_not_called()
+        store.assert_not_called()
+
+    def test_same_text_skips_embedding(self, client):
+        """Test a different file with the same text is matched after extraction and not stored again"""
+        document = Document()
+        document.add_paragraph(DOCUMENT.decode())
+        docx = io.BytesIO()
+        document.save(docx)
+
+        with patch("routes.upload._store_upload") as store:
+            response = client.post("/api/upload", files={"file": ("spec.docx", docx.getvalue(), "application/zip")},
+                                   params={"on_duplicate": "reuse"})
+
+        assert response.json()["duplicate_of"] == 1
+        store.assert_not_called()
+
+    def test_new_by_default(self, client, db):
+        """Test a duplicate is extracted and stored again unless reuse is asked for, with the match reported"""
+        with patch("routes.upload.get_db_context", return_value=nullcontext(db)), \
+                patch("routes.upload.embed_upload_chunks"):
+            response = client.post("/api/upload", files={"file": ("spec.txt", DOCUMENT, "text/plain")})
+
+        upload_id = response.json()["upload_id"]
+        assert response.json() == {"message": "File uploaded successfully", "upload_id": upload_id, "duplicate_of": 1}
+        assert upload_id != 1 and db.get(Upload, upload_id).file_hash == FILE_HASH
+
+    def test_copy_indexes_epics(self, db):
+        """Test the epics of a copy are added to the vector store after it is committed"""
+        from routes import upload
+
+        calls = []
+
+        @contextmanager
+        def db_context():
+            yield db
+            db.commit()
+            calls.append("commit")
+
+        store = MagicMock()
+        store.store_documents.side_effect = lambda documents: calls.append([d["doc_id"] for d in documents])
+        with patch("routes.upload.get_db_context", db_context), \
+                patch("routes.upload.get_default_store", return_value=store):
+            response = upload._resolve_duplicate("copy", "spec-v2.txt", 1, file_hash=FILE_HASH)
+
+        copied_epic = db.get(Upload, response["upload_id"]).epics[0]
+        assert calls == ["commit", [f"epic_{copied_epic.id}"]]
+
+    def test_reuse_indexes_nothing(self, db):
+        """Test reusing an upload does not index its epics again"""
+        from routes import upload
+
+        store = MagicMock()
+        with patch("routes.upload.get_db_context", return_value=nullcontext(db)), \
+                patch("routes.upload.get_default_store", return_value=store):
+            upload._resolve_duplicate("reuse", "spec.txt", 1, file_hash=FILE_HASH)
+
+        store.store_documents.assert_not_called()
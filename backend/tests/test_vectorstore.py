@@ -0,0 +1,408 @@
+"""Unit tests for the matrix-backed vector store"""
+
+import json
+import pytest
+from unittest.mock import Mock, patch
+import numpy as np
+from rag.vectorstore import (
+    VectorStore,
+    flush_all_stores,
+    get_vectorstore,
+    migrate_json_stores,
+    start_write_behind_flusher,
+    stop_write_behind_flusher,
+)
+
+
+VECTORS = {
+    "login": [1.0, 0.0, 0.0],
+    "signup": [0.9, 0.1, 0.0],
+    "payments": [0.0, 1.0, 0.0],
+    "reports": [0.0, 0.0, 1.0],
+    "zero": [0.0, 0.0, 0.0],
+}
+
+
+@pytest.fixture
+def fake_model():
+    """Patch the shared embedding model with fixed vectors per text"""
+    model = Mock()
+
+    def encode(texts, **kwargs):
+        if isinstance(texts, str):
+            return np.array(VECTORS[texts], dtype=np.float32)
+        return np.array([VECTORS[text] for text in texts], dtype=np.float32)
+
+    model.encode.side_effect = encode
+    VectorStore._embedding_cache.clear()
+    VectorStore._cache_timestamp.clear()
+    with patch("rag.vectorstore.get_embedding_model", return_value=model):
+        yield model
+    VectorStore._embedding_cache.clear()
+    VectorStore._cache_timestamp.clear()
+
+
+@pytest.fixture
+def store(tmp_path, fake_model):
+    """Provide an empty vector store backed by a temp file"""
+    return VectorStore(store_path=str(tmp_path / "vectorstore.json"))
+
+
+class TestVectorStoreSearch:
+    """Test vectorized search over the embedding matrix"""
+
+    def test_search_empty_store(self, store):
+        """Test searching an empty store returns nothing"""
+        assert store.search("login") == []
+
+    def test_search_orders_by_similarity(self, store):
+        """Test results come back best match first"""
+        for text in ("payments", "signup", "login"):
+            store.store_document(text, text)
+
+        results = store.search("login", top_k=3)
+
+        assert [r["doc_id"] for r in results] == ["login", "signup", "payments"]
+        assert results[0]["similarity"] == pytest.approx(1.0)
+
+    def test_search_limits_top_k(self, store):
+        """Test only top_k results are returned"""
+        for text in ("payments", "signup", "login", "reports"):
+            store.store_document(text, text)
+
+        results = store.search("login", top_k=2)
+
+        assert [r["doc_id"] for r in results] == ["login", "signup"]
+
+    def test_search_applies_threshold(self, store):
+        """Test documents below the similarity threshold are dropped"""
+        for text in ("payments", "login"):
+            store.store_document(text, text)
+
+        results = store.search("login", top_k=5, similarity_threshold=0.5)
+
+        assert [r["doc_id"] for r in results] == ["login"]
+
+    def test_search_applies_metadata_filters(self, store):
+        """Test metadata filters restrict the candidates"""
+        store.store_document("login", "epic_1", metadata={"type": "epic", "upload_id": 1})
+        store.store_document("signup", "story_1", metadata={"type": "story", "upload_id": 1})
+        store.store_document("login", "epic_2", metadata={"type": "epic", "upload_id": 2})
+
+        results = store.search("login", filters={"type": "epic", "upload_id": 1})
+
+        assert [r["doc_id"] for r in results] == ["epic_1"]
+
+    def test_zero_vector_scores_zero(self, store):
+        """Test a zero embedding does not produce NaN scores"""
+        store.store_document("zero", "zero")
+
+        results = store.search("login")
+
+        assert results[0]["similarity"] == 0.0
+
+
+class TestVectorStoreIndex:
+    """Test the index stays in sync with stored documents"""
+
+    def test_index_loaded_from_disk(self, tmp_path, fake_model):
+        """Test a reopened store rebuilds its matrix"""
+        path = str(tmp_path / "vectorstore.json")
+        first = VectorStore(store_path=path)
+        first.store_document("login", "login")
+        first.store_document("payments", "payments")
+
+        reopened = VectorStore(store_path=path)
+
+        assert reopened.get_stats()["indexed_documents"] == 2
+        assert reopened.search("payments", top_k=1)[0]["doc_id"] == "payments"
+
+    def test_replacing_document_keeps_one_row(self, store):
+        """Test storing the same doc_id twice overwrites its row"""
+        store.store_document("login", "doc")
+        store.store_document("payments", "doc")
+
+        results = store.search("payments")
+
+        assert len(results) == 1
+        assert results[0]["similarity"] == pytest.approx(1.0)
+
+    def test_index_grows_past_capacity(self, store):
+        """Test appends beyond the preallocated capacity are kept"""
+        store.INITIAL_INDEX_CAPACITY = 2
+        store._reset_index(None, None)
+        for i in range(5):
+            store.store_document("login", f"doc_{i}")
+
+        assert len(store.search("login", top_k=10)) == 5
+
+    def test_delete_document_removes_row(self, store):
+        """Test deleted documents no longer match"""
+        for text in ("login", "signup", "payments"):
+            store.store_document(text, text)
+
+        store.delete_document("login")
+
+        results = store.search("login", top_k=5)
+        assert [r["doc_id"] for r in results] == ["signup", "payments"]
+
+    def test_delete_by_metadata_updates_filters(self, store):
+        """Test metadata filters reflect deletions"""
+        store.store_document("login", "a", metadata={"upload_id": 1})
+        store.store_document("signup", "b", metadata={"upload_id": 2})
+
+        store.delete_by_metadata("upload_id", 1)
+
+        assert store.search("login", filters={"upload_id": 1}) == []
+        assert [r["doc_id"] for r in store.search("login", filters={"upload_id": 2})] == ["b"]
+
+    def test_clear_empties_index(self, store):
+        """Test clear drops every row"""
+        store.store_document("login", "login")
+
+        store.clear()
+
+        assert store.search("login") == []
+        assert store.get_stats()["indexed_documents"] == 0
+
+
+class TestVectorStorePersistence:
+    """Test the binary on-disk layout"""
+
+    def test_store_writes_binary_files(self, tmp_path, store):
+        """Test documents land in a metadata log and a float32 vectors file"""
+        store.store_document("login", "login", metadata={"type": "epic"})
+
+        vectors_files = list(tmp_path.glob("vectorstore.*.f32"))
+        assert len(vectors_files) == 1
+        assert vectors_files[0].stat().st_size == 3 * 4
+        assert not (tmp_path / "vectorstore.json").exists()
+
+        lines = (tmp_path / "vectorstore.meta.jsonl").read_text().splitlines()
+        assert json.loads(lines[0])["dimension"] == 3
+        assert json.loads(lines[1])["doc_id"] == "login"
+
+    def test_reopened_store_is_memory_mapped(self, tmp_path, fake_model):
+        """Test reopening maps the vectors file instead of parsing it"""
+        path = str(tmp_path / "vectorstore.json")
+        VectorStore(store_path=path).store_document("login", "login")
+
+        reopened = VectorStore(store_path=path)
+
+        assert isinstance(reopened._matrix, np.memmap)
+        assert reopened.data["login"]["text"] == "login"
+
+    def test_appends_do_not_rewrite_existing_rows(self, tmp_path, store):
+        """Test each store grows the vectors file by one row"""
+        store.store_document("login", "a")
+        store.store_document("payments", "b")
+
+        vectors_file = next(tmp_path.glob("vectorstore.*.f32"))
+        assert vectors_file.stat().st_size == 2 * 3 * 4
+
+    def test_deletes_persist(self, tmp_path, store):
+        """Test deletions survive reopening the store"""
+        store.store_document("login", "a")
+        store.store_document("payments", "b")
+        store.delete_document("a")
+
+        reopened = VectorStore(store_path=store.store_path)
+
+        assert list(reopened.data) == ["b"]
+        assert [r["doc_id"] for r in reopened.search("login")] == ["b"]
+
+    def test_overwrite_persists_latest_version(self, store):
+        """Test the last write of a doc_id wins after reopening"""
+        store.store_document("login", "doc")
+        store.store_document("payments", "doc")
+
+        reopened = VectorStore(store_path=store.store_path)
+
+        assert reopened.data["doc"]["text"] == "payments"
+        assert reopened.get_stats()["dead_rows"] == 1
+
+    def test_compact_drops_dead_rows(self, tmp_path, store):
+        """Test compaction rewrites only live rows into a new generation"""
+        store.store_document("login", "a")
+        store.store_document("payments", "b")
+        store.delete_document("a")
+        old_file = store.get_stats()["vectors_file"]
+
+        store.compact()
+
+        assert store.get_stats()["vectors_file"] != old_file
+        assert not (tmp_path / old_file).exists()
+        assert store.get_stats()["dead_rows"] == 0
+        reopened = VectorStore(store_path=store.store_path)
+        assert [r["doc_id"] for r in reopened.search("payments")] == ["b"]
+
+    def test_partial_trailing_row_ignored(self, tmp_path, store):
+        """Test a torn write at the end of the vectors file is dropped"""
+        store.store_document("login", "a")
+        vectors_file = next(tmp_path.glob("vectorstore.*.f32"))
+        with open(vectors_file, "ab") as f:
+            f.write(b"\x00\x01")
+
+        reopened = VectorStore(store_path=store.store_path)
+
+        assert reopened.get_stats()["indexed_documents"] == 1
+        assert vectors_file.stat().st_size == 3 * 4
+
+
+class TestSharedStores:
+    """Test several instances writing the same store"""
+
+    def test_two_instances_keep_both_documents(self, tmp_path, fake_model):
+        """Test rows come from the vectors file, not from each instance's own count"""
+        path = str(tmp_path / "vectorstore.json")
+        first = VectorStore(store_path=path)
+        second = VectorStore(store_path=path)
+
+        first.store_document("login", "a")
+        second.store_document("payments", "b")
+
+        for store in (first, second, VectorStore(store_path=path)):
+            assert store.get_stats()["indexed_documents"] == 2
+            top = store.search("login", top_k=1)[0]
+            assert top["doc_id"] == "a" and top["similarity"] == pytest.approx(1.0)
+
+    def test_compaction_elsewhere_is_picked_up(self, tmp_path, fake_model):
+        """Test an instance reloads after another rewrote the store into a new generation"""
+        path = str(tmp_path / "vectorstore.json")
+        first = VectorStore(store_path=path)
+        second = VectorStore(store_path=path)
+        first.store_documents([{"doc_id": "a", "text": "login"}, {"doc_id": "b", "text": "payments"}])
+        first.delete_documents(["a"])
+        first.compact()
+
+        second.store_document("reports", "c")
+
+        assert [r["doc_id"] for r in first.search("reports", top_k=1)] == ["c"]
+        assert sorted(VectorStore(store_path=path).data) == ["b", "c"]
+
+    def test_registry_returns_one_store_per_path(self, tmp_path, fake_model):
+        """Test get_vectorstore shares an instance per resolved path"""
+        path = str(tmp_path / "vectorstore.json")
+
+        store = get_vectorstore(path)
+
+        assert get_vectorstore(str(tmp_path / "." / "vectorstore.json")) is store
+        assert get_vectorstore(path, upload_id="7") is not store
+        assert get_vectorstore(path, upload_id="7").store_path.endswith("vectorstore_upload_7.json")
+
+
+class TestLegacyMigration:
+    """Test conversion of JSON vector stores"""
+
+    def write_legacy(self, path, documents):
+        with open(path, "w") as f:
+            json.dump(documents, f)
+
+    def test_json_store_migrated_on_open(self, tmp_path, fake_model):
+        """Test opening a legacy JSON store converts it"""
+        path = tmp_path / "vectorstore.json"
+        self.write_legacy(path, {
+            "a": {"text": "login", "embedding": [2.0, 0.0, 0.0], "metadata": {"type": "epic"}},
+        })
+
+        store = VectorStore(store_path=str(path))
+
+        assert not path.exists()
+        assert (tmp_path / "vectorstore.json.migrated").exists()
+        assert store.search("login")[0]["metadata"] == {"type": "epic"}
+
+    def test_missing_embeddings_encoded(self, tmp_path, fake_model):
+        """Test legacy documents without embeddings are encoded during migration"""
+        path = tmp_path / "vectorstore.json"
+        self.write_legacy(path, {"a": {"text": "payments"}})
+
+        store = VectorStore(store_path=str(path))
+
+        assert store.get_stats()["indexed_documents"] == 1
+
+    def test_migrate_folder(self, tmp_path, fake_model):
+        """Test every vectorstore*.json file in a folder is migrated"""
+        self.write_legacy(tmp_path / "vectorstore.json", {"a": {"text": "x", "embedding": [1.0, 0.0, 0.0]}})
+        self.write_legacy(tmp_path / "vectorstore_upload_7.json", {})
+        self.write_legacy(tmp_path / "other.json", {})
+
+        migrated = migrate_json_stores(str(tmp_path))
+
+        assert migrated == {"vectorstore.json": 1, "vectorstore_upload_7.json": 0}
+        assert (tmp_path / "vectorstore_upload_7.meta.jsonl").exists()
+        assert (tmp_path / "other.json").exists()
+
+
+class TestBatchedWrites:
+    """Test bulk storage and write-behind buffering"""
+
+    def test_store_documents_encodes_once(self, tmp_path, store, fake_model):
+        """Test a batch is encoded in one call and appended in one write"""
+        stored = store.store_documents([
+            {"text": "login", "doc_id": "a", "metadata": {"type": "epic"}},
+            {"text": "payments", "doc_id": "b"},
+            {"text": "reports", "doc_id": "c"},
+        ], batch_size=2)
+
+        assert stored == 3
+        fake_model.encode.assert_called_once_with(
+            ["login", "payments", "reports"], batch_size=2, show_progress_bar=False
+        )
+        lines = (tmp_path / "vectorstore.meta.jsonl").read_text().splitlines()
+        assert len(lines) == 4
+        assert store.search("payments", top_k=1)[0]["doc_id"] == "b"
+
+    def test_store_documents_empty(self, store, fake_model):
+        """Test an empty batch does nothing"""
+        assert store.store_documents([]) == 0
+        fake_model.encode.assert_not_called()
+
+    def test_write_behind_buffers_until_flush(self, tmp_path, fake_model):
+        """Test write-behind stores keep documents in memory until flushed"""
+        path = str(tmp_path / "vectorstore.json")
+        store = VectorStore(store_path=path, write_behind=True)
+        store.store_documents([{"text": "login", "doc_id": "a"}])
+
+        assert "a" in store.data
+        assert store.get_stats()["pending_documents"] == 1
+        assert not (tmp_path / "vectorstore.meta.jsonl").exists()
+
+        assert store.flush() == 1
+        assert list(VectorStore(store_path=path).data) == ["a"]
+
+    def test_write_behind_search_sees_buffered_documents(self, fake_model, tmp_path):
+        """Test searching flushes buffered documents first"""
+        store = VectorStore(store_path=str(tmp_path / "vectorstore.json"), write_behind=True)
+        store.store_document("login", "a")
+
+        assert [r["doc_id"] for r in store.search("login")] == ["a"]
+        assert store.get_stats()["pending_documents"] == 0
+
+    def test_write_behind_delete_of_buffered_document(self, fake_model, tmp_path):
+        """Test deleting a buffered document removes it after the flush"""
+        store = VectorStore(store_path=str(tmp_path / "vectorstore.json"), write_behind=True)
+        store.store_document("login", "a")
+
+        assert store.delete_document("a") is True
+        assert VectorStore(store_path=store.store_path).data == {}
+
+    def test_flush_all_stores(self, fake_model, tmp_path):
+        """Test the shutdown flush writes every dirty store"""
+        first = VectorStore(store_path=str(tmp_path / "vectorstore_a.json"), write_behind=True)
+        second = VectorStore(store_path=str(tmp_path / "vectorstore_b.json"), write_behind=True)
+        first.store_document("login", "a")
+        second.store_documents([{"text": "payments", "doc_id": "b"}, {"text": "reports", "doc_id": "c"}])
+
+        assert flush_all_stores() == 3
+        assert flush_all_stores() == 0
+
+    def test_stop_flusher_flushes_pending(self, fake_model, tmp_path):
+        """Test stopping the background flusher writes what is still buffered"""
+        store = VectorStore(store_path=str(tmp_path / "vectorstore.json"), write_behind=True)
+        start_write_behind_flusher(interval=60)
+        store.store_document("login", "a")
+
+        stop_write_behind_flusher()
+
+        assert store.get_stats()["pending_documents"] == 0
+        assert list(VectorStore(store_path=store.store_path).data) == ["a"]
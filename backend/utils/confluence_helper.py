@@ -1,5 +1,6 @@
 """Confluence utilities for consistent page creation and management"""
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from typing import Tuple, Dict, Any, Optional
 from datetime import datetime
 
@@ -108,7 +109,8 @@ def build_confluence_page(confluence_client, space_key: str, title: str, content
         raise
 
 
-def batch_create_pages(confluence_client, space_key: str, pages_config: list, parent_id: Optional[str] = None) -> list:
+def batch_create_pages(confluence_client, space_key: str, pages_config: list, parent_id: Optional[str] = None,
+                       max_workers: int = 1) -> list:
     """
     Create multiple Confluence pages with error recovery.
     
@@ -117,15 +119,14 @@ def batch_create_pages(confluence_client, space_key: str, pages_config: list, pa
         space_key: Confluence space key
         pages_config: List of dicts with 'title', 'content', and optional 'type'
         parent_id: Optional parent page ID for all pages
+        max_workers: Pages created at once; sibling pages have no ordering dependency
         
     Returns:
-        List of created pages
+        List of created pages, in pages_config order (None for failed pages)
     """
-    created_pages = []
-    
-    for page_config in pages_config:
+    def create(page_config):
         try:
-            page = build_confluence_page(
+            return build_confluence_page(
                 confluence_client,
                 space_key,
                 page_config.get('title', 'Untitled'),
@@ -133,9 +134,11 @@ def batch_create_pages(confluence_client, space_key: str, pages_config: list, pa
                 parent_id,
                 page_config.get('type', 'page')
             )
-            created_pages.append(page)
         except Exception as e:
             logger.warning(f"Skipped Confluence page due to error: {str(e)}")
-            created_pages.append(None)
+            return None
     
-    return created_pages
+    if max_workers <= 1 or len(pages_config) <= 1:
+        return [create(page_config) for page_config in pages_config]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(pages_config))) as pool:
+        return list(pool.map(create, pages_config))
@@ -1,16 +1,23 @@
 """Unified JSON parsing utilities to eliminate code duplication"""
 import json
-import re
 import logging
-from typing import Any, Union, List, Dict
+import re
+from typing import Any, Dict, Iterable, Iterator, List, Tuple, Union
 
 logger = logging.getLogger(__name__)
 
+# Characters per slice when extract_valid_json runs the incremental parser
+_EXTRACT_CHUNK_SIZE = 16384
+
 
 def extract_valid_json(text: str) -> Union[dict, list]:
     """
-    Extract valid JSON from text with multiple fallback strategies.
-    Handles code fences, single quotes, trailing commas, and malformed JSON.
+    Extract valid JSON from text.
+    Handles code fences, surrounding prose, single and smart quotes, and trailing commas.
+    
+    Well-formed JSON is parsed directly; anything else goes through a single
+    repairing pass of JSONArrayStream instead of re-scanning the text once per
+    fallback strategy.
     
     Args:
         text: Raw text potentially containing JSON
@@ -25,59 +32,263 @@ def extract_valid_json(text: str) -> Union[dict, list]:
         raise ValueError(f"Invalid input type: {type(text)}")
     
     text = text.strip()
-    
-    # Strategy 1: Remove code fences (```json, ```python, etc.)
-    text = re.sub(r"^```(?:json|python|javascript)?\s*", "", text)
-    text = re.sub(r"\s*```$", "", text)
-    text = text.strip()
-    
-    # Strategy 2: Try direct parse first
     try:
         return json.loads(text)
     except json.JSONDecodeError:
         pass
     
-    # Strategy 3: Replace single quotes with double quotes (common in AI outputs)
-    normalized = text.replace("'", '"')
-    try:
-        return json.loads(normalized)
-    except json.JSONDecodeError:
-        pass
+    # A bracketed aside before the JSON ("see [1]") fails to parse; try again after it
+    start = 0
+    while True:
+        stream, items = _extract_from(text, start)
+        if stream.root is None:
+            break
+        if stream.truncated:
+            logger.error(f"Model output ends inside the JSON: {text[-200:]}")
+            raise ValueError("Model output was truncated before the JSON closed.")
+        if stream.root == "{" and items:
+            return items[0]
+        if stream.root == "[" and (items or not stream.skipped):
+            return items
+        start += stream.consumed
     
-    # Strategy 4: Remove trailing commas before closing brackets
-    cleaned = re.sub(r",(\s*[}\]])", r"\1", text)
-    try:
-        return json.loads(cleaned)
-    except json.JSONDecodeError:
-        pass
+    logger.error(f"Failed to extract JSON from text: {text[:200]}...")
+    raise ValueError("Could not extract valid JSON from model output.")
+
+
+def _extract_from(text: str, start: int) -> Tuple["JSONArrayStream", List[Any]]:
+    """Run one JSONArrayStream over text[start:], fed in slices so it never scans past the current slice"""
+    stream = JSONArrayStream()
+    items = []
+    for offset in range(start, len(text), _EXTRACT_CHUNK_SIZE):
+        items.extend(stream.feed(text[offset:offset + _EXTRACT_CHUNK_SIZE]))
+        if stream.finished:
+            break
+    items.extend(stream.close())
+    return stream, items
+
+
+# Closing characters for each kind of string opener
+_DOUBLE_QUOTES = {'"': '"', "\u201c": "\u201c\u201d\"", "\u201d": "\u201c\u201d\""}
+_SINGLE_QUOTES = {"'": "'", "\u2018": "\u2019", "\u2019": "\u2019"}
+_DECODER = json.JSONDecoder(strict=False)
+_ROOT_START = re.compile(r"[\[{]")
+# A complete double-quoted string, or a single structural character
+_STRUCTURAL = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"|' + "[][{},\"'\u201c\u201d\u2018\u2019]", re.DOTALL)
+# Characters that need handling inside a string, per set of closing quotes
+_STRING_SPECIAL = {
+    closers: re.compile("[\\\\\"" + re.escape(closers) + "]")
+    for closers in {*_DOUBLE_QUOTES.values(), *_SINGLE_QUOTES.values()}
+}
+
+
+class JSONArrayStream:
+    """
+    Incrementally extract JSON from streamed text in a single pass.
+    
+    Feed chunks of model output as they arrive. When the first bracket is
+    "[", each call returns the array elements completed by that chunk; when
+    it is "{", the object is returned once it closes. Text outside the JSON
+    (code fences, prose) is skipped.
+    
+    Common model slips are repaired while scanning: trailing commas are
+    dropped, and single-quoted or smart-quoted strings are rewritten with
+    double quotes.
+    """
+    
+    def __init__(self):
+        self._buffer = []  # Repaired characters of the element being read
+        self._root = None
+        self._finished = False
+        self._depth = 0  # Nesting depth inside the current element
+        self._closers = None  # Characters that end the current string, None outside strings
+        self._escaped = False
+        self._pending_comma = False  # Dropped if the next token closes a bracket
+        self._skipped = 0
+        self._truncated = False
+        self._consumed = 0  # Characters consumed by previous feeds
     
-    # Strategy 5: Extract first {...} or [...]
-    for pattern in [r"(\[.*\])", r"(\{.*\})"]:
-        match = re.search(pattern, text, re.DOTALL)
-        if match:
-            extracted = match.group(1)
-            # Try with cleaned version
-            cleaned = re.sub(r",(\s*[}\]])", r"\1", extracted)
-            cleaned = cleaned.replace("'", '"')
-            try:
-                return json.loads(cleaned)
-            except json.JSONDecodeError:
+    def feed(self, chunk: str) -> List[Any]:
+        """
+        Consume a chunk of text.
+        
+        Args:
+            chunk: Next piece of model output
+            
+        Returns:
+            Values completed within this chunk, in order
+        """
+        items = []
+        buffer = self._buffer
+        i, n = 0, len(chunk)
+        while i < n and not self._finished:
+            if self._root is None:
+                match = _ROOT_START.search(chunk, i)
+                if match is None:
+                    break
+                self._root = match.group()
+                i = match.end() if self._root == "[" else match.start()
+                continue
+            
+            if self._closers is not None:
+                if self._escaped:
+                    self._escaped = False
+                    # JSON has no \' escape
+                    buffer.append("'" if chunk[i] == "'" else "\\" + chunk[i])
+                    i += 1
+                    continue
+                # Copy the string body up to the next quote or backslash in one step
+                match = _STRING_SPECIAL[self._closers].search(chunk, i)
+                end = match.start() if match else n
+                buffer.append(chunk[i:end])
+                if match is None:
+                    break
+                char = match.group()
+                i = match.end()
+                if char == "\\":
+                    self._escaped = True
+                elif char in self._closers:
+                    buffer.append('"')
+                    self._closers = None
+                else:
+                    buffer.append('\\"')
+                continue
+            
+            match = _STRUCTURAL.search(chunk, i)
+            end = match.start() if match else n
+            if end > i:
+                text = chunk[i:end]
+                if self._pending_comma and not text.isspace():
+                    self._pending_comma = False
+                    buffer.append(",")
+                buffer.append(text)
+            if match is None:
+                break
+            char = match.group()
+            i = match.end()
+            
+            if char == ",":
+                if self._depth == 0:
+                    self._emit(items)
+                else:
+                    self._pending_comma = True
+                continue
+            if self._pending_comma:
+                self._pending_comma = False
+                if char not in "]}":
+                    buffer.append(",")
+            
+            if len(char) > 1:
+                # Complete double-quoted string, copied as is
+                if self._pending_comma:
+                    self._pending_comma = False
+                    buffer.append(",")
+                buffer.append(char)
                 continue
+            if self._depth == 0 and char in '[{"':
+                # Fast path: an element that is already well-formed is decoded in one C call
+                try:
+                    value, i = _DECODER.raw_decode(chunk, match.start())
+                except json.JSONDecodeError:
+                    pass
+                else:
+                    buffer.clear()
+                    items.append(value)
+                    self._finished = self._root == "{"
+                    continue
+            
+            if char in "[{":
+                self._depth += 1
+                buffer.append(char)
+            elif char in "]}":
+                if self._depth == 0:
+                    # End of the top-level array
+                    self._emit(items)
+                    self._finished = True
+                    continue
+                self._depth -= 1
+                buffer.append(char)
+                if self._depth == 0:
+                    self._emit(items)
+                    if self._root == "{":
+                        self._finished = True
+            else:
+                self._closers = _SINGLE_QUOTES.get(char) or _DOUBLE_QUOTES[char]
+                buffer.append('"')
+        self._consumed += i if self._finished else n
+        return items
     
-    # Strategy 6: Try to convert dict response to array format
-    try:
-        obj = json.loads(text)
-        if isinstance(obj, dict):
-            # If it's a dict with numeric keys, convert to list
-            if all(key.isdigit() or key.startswith('item') for key in obj.keys()):
-                return list(obj.values())
-            return obj
-        return obj
-    except json.JSONDecodeError:
-        pass
+    def close(self) -> List[Any]:
+        """
+        Signal the end of the stream.
+        
+        Returns:
+            A last element left unterminated by a truncated array, if it parses;
+            one that does not is counted in skipped and sets truncated
+        """
+        items = []
+        if not self._finished:
+            skipped = self._skipped
+            self._emit(items)
+            self._truncated = self._skipped > skipped
+            self._finished = True
+        return items
     
-    logger.error(f"Failed to extract JSON from text: {text[:200]}...")
-    raise ValueError("Could not extract valid JSON from model output after all strategies.")
+    @property
+    def finished(self) -> bool:
+        """Whether the end of the top-level value has been seen"""
+        return self._finished
+    
+    @property
+    def root(self) -> Union[str, None]:
+        """Opening bracket of the top-level value, None until one is seen"""
+        return self._root
+    
+    @property
+    def truncated(self) -> bool:
+        """Whether the stream ended inside an element that was dropped as a result"""
+        return self._truncated
+    
+    @property
+    def consumed(self) -> int:
+        """Characters read so far; once finished, the offset just past the top-level value"""
+        return self._consumed
+    
+    @property
+    def skipped(self) -> int:
+        """Number of elements that could not be parsed even after repair"""
+        return self._skipped
+    
+    def _emit(self, items: List[Any]) -> None:
+        text = "".join(self._buffer).strip()
+        self._buffer.clear()
+        self._pending_comma = False
+        if not text:
+            return
+        try:
+            # strict=False accepts raw newlines inside strings
+            items.append(json.loads(text, strict=False))
+        except json.JSONDecodeError:
+            self._skipped += 1
+            logger.warning(f"Skipping unparseable JSON element: {text[:100]}...")
+
+
+def iter_json_array_items(chunks: Iterable[str]) -> Iterator[Any]:
+    """
+    Yield elements of a streamed top-level JSON array as soon as each closes.
+    
+    Args:
+        chunks: Pieces of model output, in order
+        
+    Yields:
+        Parsed array elements
+    """
+    stream = JSONArrayStream()
+    for chunk in chunks:
+        yield from stream.feed(chunk)
+        if stream.finished:
+            return
+    yield from stream.close()
 
 
 def parse_model_json(raw_output: Any) -> Union[dict, list]:
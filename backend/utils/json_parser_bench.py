@@ -0,0 +1,150 @@
+"""Benchmark the single-pass JSON extractor against the old strategy chain.
+
+Usage (from the backend directory):
+
+    python -m utils.json_parser_bench --elements 2000 --repeat 5
+"""
+import argparse
+import json
+import re
+import time
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from utils.json_parser import extract_valid_json, iter_json_array_items
+
+
+def strategy_chain_extract(text: str) -> Union[dict, list]:
+    """
+    The previous multi-strategy extractor, kept as the benchmark baseline.
+
+    Each strategy re-scans the whole text, and only a complete response
+    can be parsed.
+    """
+    text = text.strip()
+    text = re.sub(r"^```(?:json|python|javascript)?\s*", "", text)
+    text = re.sub(r"\s*```$", "", text)
+    text = text.strip()
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+    try:
+        return json.loads(text.replace("'", '"'))
+    except json.JSONDecodeError:
+        pass
+    try:
+        return json.loads(re.sub(r",(\s*[}\]])", r"\1", text))
+    except json.JSONDecodeError:
+        pass
+    for pattern in [r"(\[.*\])", r"(\{.*\})"]:
+        match = re.search(pattern, text, re.DOTALL)
+        if match:
+            cleaned = re.sub(r",(\s*[}\]])", r"\1", match.group(1)).replace("'", '"')
+            try:
+                return json.loads(cleaned)
+            except json.JSONDecodeError:
+                continue
+    raise ValueError("Could not extract valid JSON from model output after all strategies.")
+
+
+def synthetic_output(elements: int, malformed: bool = True) -> str:
+    """
+    Model-like output: a fenced array of epic objects.
+
+    With malformed=True the array has trailing commas, the slip that pushes
+    the old chain through most of its strategies.
+    """
+    items = []
+    for index in range(elements):
+        item = json.dumps({
+            "name": f"Epic {index}",
+            "description": "As a user I want to manage my account settings, " * 4,
+            "acceptanceCriteria": [f"Criterion {n}" for n in range(5)]
+        })
+        items.append(item[:-1] + ", }" if malformed else item)
+    body = ",\n".join(items) + (",\n" if malformed else "\n")
+    return f"Here are the epics:\n```json\n[\n{body}]\n```"
+
+
+def _time(func: Callable[[], Any], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def _time_to_first(chunks: List[str], repeat: int) -> float:
+    """Best time until the streaming parser returns its first element"""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        next(iter_json_array_items(chunks))
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def benchmark(elements: int = 2000, repeat: int = 5, chunk_size: int = 256) -> List[Dict[str, Any]]:
+    """
+    Time both extractors on well-formed and malformed outputs.
+
+    The strategy chain can only start once the whole response has arrived,
+    so its time to first element is its full parse time.
+
+    Args:
+        elements: Array elements in the synthetic output
+        repeat: Runs per measurement; the best run is reported
+        chunk_size: Characters per chunk for the streaming measurement
+
+    Returns:
+        One row per (output, parser) with best total and first-element times in milliseconds
+    """
+    results = []
+    for label, malformed in (("valid", False), ("malformed", True)):
+        text = synthetic_output(elements, malformed)
+        chunks = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+        expected = len(extract_valid_json(text))
+
+        runs = {
+            "strategy_chain": lambda: strategy_chain_extract(text),
+            "single_pass": lambda: extract_valid_json(text),
+            "single_pass_streamed": lambda: list(iter_json_array_items(chunks)),
+        }
+        for parser, func in runs.items():
+            try:
+                count = len(func())
+            except ValueError:
+                count = 0
+            best_ms = round(_time(func, repeat) * 1000, 3)
+            first_ms = round(_time_to_first(chunks, repeat) * 1000, 3) if parser.endswith("streamed") else best_ms
+            results.append({
+                "output": label,
+                "parser": parser,
+                "bytes": len(text),
+                "elements": count,
+                "complete": count == expected,
+                "best_ms": best_ms,
+                "first_element_ms": first_ms
+            })
+    return results
+
+
+def _print_benchmark(results: List[Dict[str, Any]]) -> None:
+    print(f"{'output':<11}{'parser':<22}{'bytes':>10}{'elements':>10}{'best ms':>10}{'first ms':>10}")
+    for row in results:
+        print(f"{row['output']:<11}{row['parser']:<22}{row['bytes']:>10}{row['elements']:>10}"
+              f"{row['best_ms']:>10.3f}{row['first_element_ms']:>10.3f}")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark JSON extraction from model output")
+    parser.add_argument("--elements", type=int, default=2000, help="Array elements in the synthetic output")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement")
+    parser.add_argument("--chunk-size", type=int, default=256, help="Characters per streamed chunk")
+    args = parser.parse_args(argv)
+    _print_benchmark(benchmark(args.elements, args.repeat, args.chunk_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""Persistent cache of LLM responses keyed by model, prompt and parameters.
+
+Identical generation requests (same model, prompt text and generation
+parameters) are answered from a local SQLite file instead of calling the
+model again. Entries expire after a TTL and the least recently used entries
+are evicted once the cache holds more than its maximum number of entries.
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from config.config import LLM_CACHE_ENABLED, LLM_CACHE_MAX_ENTRIES, LLM_CACHE_PATH, LLM_CACHE_TTL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_cache (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    response TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_used_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_llm_cache_last_used ON llm_cache (last_used_at);
+"""
+
+
+def cache_key(model: str, prompt: str, params: Optional[Dict[str, Any]] = None) -> str:
+    """SHA-256 over the model name, prompt text and generation parameters"""
+    payload = json.dumps({"model": model, "prompt": prompt, "params": params or {}}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """SQLite-backed response cache with TTL expiry and LRU eviction"""
+
+    def __init__(self, path: str = LLM_CACHE_PATH, ttl_seconds: float = LLM_CACHE_TTL_SECONDS,
+                 max_entries: int = LLM_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._counters = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0, "writes": 0}
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response for a key, or None on a miss or expired entry"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT response, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._counters["misses"] += 1
+                return None
+            response, created_at = row
+            if self.ttl_seconds and now - created_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._counters["expired"] += 1
+                self._counters["misses"] += 1
+                return None
+            self._conn.execute("UPDATE llm_cache SET last_used_at = ? WHERE key = ?", (now, key))
+            self._counters["hits"] += 1
+        return response
+
+    def put(self, key: str, model: str, response: str) -> None:
+        """Store a response, evicting least recently used entries beyond max_entries"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, model, response, created_at, last_used_at) VALUES (?, ?, ?, ?, ?)",
+                (key, model, response, now, now)
+            )
+            self._counters["writes"] += 1
+            evicted = self._conn.execute(
+                "DELETE FROM llm_cache WHERE key IN ("
+                "SELECT key FROM llm_cache ORDER BY last_used_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            ).rowcount
+            self._counters["evictions"] += max(evicted, 0)
+
+    def clear(self) -> int:
+        """Remove every entry; returns the number removed"""
+        with self._lock:
+            return self._conn.execute("DELETE FROM llm_cache").rowcount
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+            counters = dict(self._counters)
+        lookups = counters["hits"] + counters["misses"]
+        return {
+            "enabled": True,
+            "path": self.path,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            **counters,
+            "hit_rate": round(counters["hits"] / lookups, 4) if lookups else 0.0
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_llm_cache: Optional[LLMResponseCache] = None
+_llm_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> Optional[LLMResponseCache]:
+    """Return the process-wide response cache, or None when LLM_CACHE_ENABLED is off"""
+    global _llm_cache
+    if not LLM_CACHE_ENABLED:
+        return None
+    if _llm_cache is None:
+        with _llm_cache_lock:
+            if _llm_cache is None:
+                _llm_cache = LLMResponseCache()
+    return _llm_cache
+
+
+def get_llm_cache_stats() -> Dict[str, Any]:
+    """Hit/miss counters and size of the process-wide response cache"""
+    cache = get_llm_cache()
+    return cache.stats() if cache is not None else {"enabled": False}
@@ -0,0 +1,35 @@
+"""Ownership checks on the denormalized ``user_id`` of uploads, epics, stories and QA.
+
+Reads fold ``Model.user_id == current_user`` into their main query, so an
+owned resource costs one indexed query. Only when that query comes back
+empty is the parent row looked up, to tell a missing row (404) from one
+that belongs to someone else (403).
+"""
+from fastapi import HTTPException, status
+from sqlalchemy.orm import Session
+
+OWNED = "owned"
+MISSING = "missing"
+FORBIDDEN = "forbidden"
+
+
+def owner_status(db: Session, model, row_id: int, user_id: int) -> str:
+    """OWNED, MISSING or FORBIDDEN for a row and a user, from one primary key lookup"""
+    row = db.query(model.user_id).filter(model.id == row_id).first()
+    if row is None:
+        return MISSING
+    return OWNED if row.user_id == user_id else FORBIDDEN
+
+
+def check_owner(db: Session, model, row_id: int, user_id: int, label: str) -> None:
+    """
+    Raise unless the user owns the row.
+
+    Raises:
+        HTTPException: 404 "<Label> not found" or 403 "You don't have access to this <label>"
+    """
+    result = owner_status(db, model, row_id, user_id)
+    if result == MISSING:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"{label.capitalize()} not found")
+    if result == FORBIDDEN:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=f"You don't have access to this {label}")
@@ -0,0 +1,150 @@
+"""Keyset (cursor) pagination and row counts for the listing endpoints.
+
+Listing endpoints sort on ``(created_at, id)`` or ``id``. Instead of
+``OFFSET``, which makes the database walk and discard every earlier row, a
+page is requested with the opaque ``next_cursor`` of the previous page and
+fetched with a row comparison against the last row seen:
+
+    WHERE (created_at, id) < (:last_created_at, :last_id)
+    ORDER BY created_at DESC, id DESC
+    LIMIT :page_size
+
+Page-number requests are still supported for the first pages and for
+clients that have not switched to cursors.
+"""
+import base64
+import json
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import text, tuple_
+from sqlalchemy.orm import Query
+
+logger = logging.getLogger(__name__)
+
+TOTAL_MODES = ("exact", "approximate", "none")
+
+
+def encode_cursor(values: List[Any]) -> str:
+    """Opaque cursor for the sort key of the last row on a page"""
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, columns: List[Any]) -> List[Any]:
+    """
+    Decode a cursor produced by encode_cursor for the given sort columns.
+
+    Raises:
+        HTTPException: 400 if the cursor is malformed or was issued for a different sort
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError("cursor does not match the sort order")
+        return [
+            datetime.fromisoformat(value) if column.key == "created_at" else int(value)
+            for column, value in zip(columns, values)
+        ]
+    except (ValueError, TypeError) as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid pagination cursor: {str(e)}")
+
+
+def sort_columns(model, sort_by: Optional[str]) -> List[Any]:
+    """Sort key columns: ``id`` alone, or ``created_at`` with ``id`` as the tie-breaker"""
+    if (sort_by or "created_at").lower() == "id":
+        return [model.id]
+    return [model.created_at, model.id]
+
+
+def paginate(query: Query, columns: List[Any], page_size: int, descending: bool = True,
+             cursor: Optional[str] = None, page: int = 1) -> Tuple[List[Any], Optional[str]]:
+    """
+    Fetch one page of a query ordered by the sort key.
+
+    With a cursor the page starts after the row the cursor points at;
+    otherwise ``page`` selects the page by offset.
+
+    Args:
+        query: Filtered query (rows or tuples whose first entity is the model)
+        columns: Sort key columns from sort_columns
+        page_size: Rows per page
+        descending: Newest (highest key) first
+        cursor: next_cursor returned with the previous page
+        page: Page number, used when no cursor is given
+
+    Returns:
+        (rows, next_cursor); next_cursor is None on the last page
+    """
+    if cursor:
+        key = tuple_(*columns) if len(columns) > 1 else columns[0]
+        last = decode_cursor(cursor, columns)
+        last = tuple_(*last) if len(columns) > 1 else last[0]
+        query = query.filter(key < last if descending else key > last)
+
+    order = [column.desc() if descending else column.asc() for column in columns]
+    query = query.order_by(*order)
+    if not cursor:
+        query = query.offset((page - 1) * page_size)
+
+    # One extra row tells whether another page follows
+    rows = query.limit(page_size + 1).all()
+    if len(rows) <= page_size:
+        return rows, None
+    rows = rows[:page_size]
+    last_row = rows[-1]
+    entity = last_row[0] if hasattr(last_row, "_fields") else last_row
+    return rows, encode_cursor([getattr(entity, column.key) for column in columns])
+
+
+def count_rows(query: Query, mode: str = "exact") -> Tuple[Optional[int], bool]:
+    """
+    Total rows matched by a query.
+
+    Args:
+        query: Filtered query, before ordering and limits
+        mode: "exact" runs COUNT(*); "approximate" uses the PostgreSQL
+              planner's row estimate; "none" skips counting
+
+    Returns:
+        (total, is_estimate); total is None when mode is "none"
+    """
+    if mode == "none":
+        return None, False
+    if mode == "approximate":
+        estimate = _planner_estimate(query)
+        if estimate is not None:
+            return estimate, True
+    return query.order_by(None).count(), False
+
+
+def _planner_estimate(query: Query) -> Optional[int]:
+    session = query.session
+    if session.bind is None or session.bind.dialect.name != "postgresql":
+        return None
+    try:
+        statement = query.order_by(None).statement.compile(
+            dialect=session.bind.dialect, compile_kwargs={"literal_binds": True}
+        )
+        plan = session.execute(text(f"EXPLAIN (FORMAT JSON) {statement}")).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+    except Exception as e:
+        logger.warning(f"Row estimate failed, falling back to COUNT: {str(e)}")
+        return None
+
+
+def page_info(total: Optional[int], page: int, page_size: int, next_cursor: Optional[str],
+              is_estimate: bool = False) -> Dict[str, Any]:
+    """Pagination fields shared by the listing responses"""
+    return {
+        "current_page": page,
+        "page_size": page_size,
+        "total_pages": (total + page_size - 1) // page_size if total is not None else None,
+        "total_is_estimate": is_estimate,
+        "next_cursor": next_cursor
+    }
@@ -0,0 +1,56 @@
+"""Column projections for the listing endpoints.
+
+The ``content`` JSONB of uploads, epics, stories, QA tests and aggregated
+uploads can run to megabytes and is ``deferred`` on the models, so a query
+for the rows does not read it. Listings go further and load only the
+columns they return (``load_only``), which also leaves out embeddings:
+
+    SELECT epics.id, epics.name, epics.jira_key, ... FROM epics WHERE ...
+
+Clients that need the content in a listing ask for it with
+``?include=content``; detail endpoints and bulk readers that use the
+content ``undefer`` it in their own query rather than loading it row by row.
+"""
+from typing import Optional, Set
+
+from fastapi import HTTPException, status
+from sqlalchemy import func
+from sqlalchemy.orm import load_only
+
+INCLUDE_FIELDS = ("content",)
+INCLUDE_DESCRIPTION = "Comma-separated extra fields to return; `content` adds the full JSON content"
+
+
+def parse_include(include: Optional[str]) -> Set[str]:
+    """
+    Fields requested with ``?include=``.
+
+    Raises:
+        HTTPException: 400 for a field that cannot be included
+    """
+    fields = {field.strip().lower() for field in (include or "").split(",") if field.strip()}
+    unknown = fields.difference(INCLUDE_FIELDS)
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Cannot include {', '.join(sorted(unknown))}; supported: {', '.join(INCLUDE_FIELDS)}"
+        )
+    return fields
+
+
+def include_content(include: Optional[str]) -> bool:
+    """Whether ``?include=`` asks for the content column"""
+    return "content" in parse_include(include)
+
+
+def list_columns(model, *names: str, content: bool = False):
+    """load_only option for the columns a listing returns, with content when requested"""
+    columns = [getattr(model, name) for name in names]
+    if content:
+        columns.append(model.content)
+    return load_only(*columns)
+
+
+def content_title(model):
+    """``content.title``, else ``content.name``, extracted by the database: ``content ->> 'title'``"""
+    return func.coalesce(model.content["title"].astext, model.content["name"].astext).label("title")
@@ -0,0 +1,33 @@
+"""Early rejection of oversized uploads, before the request body is read."""
+from typing import Iterable
+
+from starlette.responses import JSONResponse
+
+# Multipart boundaries and part headers on top of the file itself
+FORM_OVERHEAD_BYTES = 64 * 1024
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Answer 413 to POSTs on the given paths whose Content-Length exceeds max_bytes.
+
+    Requests without a Content-Length (chunked) are let through; the upload
+    route still stops spooling them at the limit.
+    """
+
+    def __init__(self, app, max_bytes: int, paths: Iterable[str]):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.paths = set(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["method"] == "POST" and scope["path"] in self.paths:
+            length = dict(scope["headers"]).get(b"content-length")
+            if length and length.isdigit() and int(length) > self.max_bytes + FORM_OVERHEAD_BYTES:
+                response = JSONResponse(
+                    status_code=413,
+                    content={"detail": f"File exceeds the {self.max_bytes // (1024 * 1024)} MB upload limit"}
+                )
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
@@ -67,6 +67,36 @@ export const uploadFile = (file) => {
 export const fetchUploads = (page = 1, page_size = 100) =>
   api.get(`${API_BASE}/api/uploads`, { params: { page, page_size } });
 
+// ============================================
+// BACKGROUND JOBS
+// Long-running generation endpoints return a job; poll it for the result
+// ============================================
+
+export const fetchJob = (jobId) =>
+  api.get(`${API_BASE}/api/jobs/${jobId}`);
+
+export const fetchJobs = (limit = 20) =>
+  api.get(`${API_BASE}/api/jobs`, { params: { limit } });
+
+// Resolves like an axios response whose data is the job result
+export const waitForJob = async (jobId, intervalMs = 1000) => {
+  for (;;) {
+    const { data: job } = await fetchJob(jobId);
+    if (job.status === "succeeded") {
+      return { data: job.result, job };
+    }
+    if (job.status === "failed") {
+      throw new Error(job.error || "Job failed");
+    }
+    await new Promise((resolve) => setTimeout(resolve, intervalMs));
+  }
+};
+
+const runJob = async (request) => {
+  const { data } = await request;
+  return waitForJob(data.job_id);
+};
+
 // ============================================
 // AGENTIC GENERATION ENDPOINTS (POST)
 // All require Bearer token in Authorization header
@@ -85,24 +115,25 @@ export const generateTestPlanAgent = (epicId) =>
   api.post(`${API_BASE}/api/agents/testplan/generate`, { epic_id: epicId });
 
 export const executeWorkflow = (uploadId) =>
-  api.post(`${API_BASE}/api/agents/workflow/execute`, { upload_id: uploadId });
+  runJob(api.post(`${API_BASE}/api/agents/workflow/execute`, { upload_id: uploadId }));
 
 // ============================================
 // AGENTIC RETRIEVAL ENDPOINTS (GET)
 // All require Bearer token in Authorization header
+// Listings leave out each item's content unless include: "content" is passed
 // ============================================
 
 export const getEpicsAgent = (uploadId) =>
-  api.get(`${API_BASE}/api/agents/epic/list`, { params: { upload_id: uploadId } });
+  api.get(`${API_BASE}/api/agents/epic/list`, { params: { upload_id: uploadId, include: "content" } });
 
 export const getStoriesAgent = (epicId) =>
-  api.get(`${API_BASE}/api/agents/story/list`, { params: { epic_id: epicId } });
+  api.get(`${API_BASE}/api/agents/story/list`, { params: { epic_id: epicId, include: "content" } });
 
 export const getQAAgent = (storyId) =>
-  api.get(`${API_BASE}/api/agents/qa/list`, { params: { story_id: storyId } });
+  api.get(`${API_BASE}/api/agents/qa/list`, { params: { story_id: storyId, include: "content" } });
 
 export const getTestPlanAgent = (epicId) =>
-  api.get(`${API_BASE}/api/agents/testplan/list`, { params: { epic_id: epicId } });
+  api.get(`${API_BASE}/api/agents/testplan/list`, { params: { epic_id: epicId, include: "content" } });
 
 export const ragSearch = (query, uploadId, topK = 5) =>
   api.post(`${API_BASE}/api/agents/rag/search`, { 
@@ -125,16 +156,49 @@ export const ragVectorStoreSearch = (query, topK = 5) =>
 // ============================================
 
 export const generateEpics = (uploadId) =>
-  api.post(`${API_BASE}/api/generate-epics/${uploadId}`);
+  runJob(api.post(`${API_BASE}/api/generate-epics/${uploadId}`));
 
 export const generateStories = (epicId) =>
   api.post(`${API_BASE}/api/generate-stories/${epicId}`);
 
 export const generateQA = (storyId) =>
-  api.post(`${API_BASE}/api/generate-qa/${storyId}`);
+  runJob(api.post(`${API_BASE}/api/generate-qa/${storyId}`));
 
 export const generateTestPlan = (storyId) =>
-  api.post(`${API_BASE}/api/generate-testplan/${storyId}`);
+  runJob(api.post(`${API_BASE}/api/generate-testplan/${storyId}`));
+
+// Streaming variants: onEvent(event, data) is called for each server-sent event
+// ("epic" / "story", "done", "error") as items are generated
+const streamGeneration = async (path, onEvent) => {
+  const response = await fetch(`${API_BASE}${path}`, {
+    method: "POST",
+    headers: { Authorization: `Bearer ${localStorage.getItem("token")}` },
+  });
+  if (!response.ok) {
+    throw new Error(`Stream failed with status ${response.status}`);
+  }
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    const messages = buffer.split("\n\n");
+    buffer = messages.pop();
+    for (const message of messages) {
+      const event = message.match(/^event: (.*)$/m)?.[1];
+      const data = message.match(/^data: (.*)$/m)?.[1];
+      if (event && data) onEvent(event, JSON.parse(data));
+    }
+  }
+};
+
+export const streamEpics = (uploadId, onEvent) =>
+  streamGeneration(`/api/generate-epics/${uploadId}/stream`, onEvent);
+
+export const streamStories = (epicId, onEvent) =>
+  streamGeneration(`/api/generate-stories/${epicId}/stream`, onEvent);
 
 // ============================================
 // LEGACY DATA ENDPOINTS (GET)
@@ -162,7 +226,7 @@ export const fetchQAByStory = (storyId) =>
   api.get(`${API_BASE}/api/qa/${storyId}`);
 
 export const fetchAllQA = (page = 1, page_size = 10, sort_by = "created_at", sort_order = "desc") =>
-  api.get(`${API_BASE}/api/qa`, { params: { page, page_size, sort_by, sort_order } });
+  api.get(`${API_BASE}/api/qa`, { params: { page, page_size, sort_by, sort_order, include: "content" } });
 
 export const fetchQADetails = (storyId, qaId) => 
   api.get(`${API_BASE}/api/qa/${storyId}/${qaId}`);
@@ -572,56 +572,62 @@ export default function AgenticAIPage() {
     }
   };
 
-  // Create all stories in Jira as subtasks under epic
+  // Create all stories in Jira as subtasks under epic, in one bulk request
   const createStoriesInJira = async (stories, epicId, epic) => {
     const token = localStorage.getItem("token");
     let successCount = 0;
     let failureCount = 0;
 
-    for (const story of stories) {
-      try {
-        setLoadingJiraItems(prev => new Set([...prev, `story_${story.id}`]));
-        
-        const response = await fetch(`${API_BASE_URL}/api/jira/create-story-jira`, {
-          method: "POST",
-          headers: {
-            Authorization: `Bearer ${token}`,
-            "Content-Type": "application/json",
-          },
-          body: JSON.stringify({
-            jira_url: jiraCredentials.jira_url,
-            jira_username: jiraCredentials.jira_username,
-            jira_api_token: jiraCredentials.jira_api_token,
-            jira_project_key: jiraCredentials.jira_project_key,
-            epic_jira_issue_id: epic.jira_issue_id,
-            epic_jira_key: epic.jira_key,
-            final_story_name: story.name || "Untitled Story",
-            story_description: story.description || story.content?.description || "",
-            story_id: story.id,
-          }),
-        });
+    setLoadingJiraItems(prev => new Set([...prev, ...stories.map(story => `story_${story.id}`)]));
+    try {
+      const response = await fetch(`${API_BASE_URL}/api/jira/create-stories-bulk`, {
+        method: "POST",
+        headers: {
+          Authorization: `Bearer ${token}`,
+          "Content-Type": "application/json",
+        },
+        body: JSON.stringify({
+          jira_url: jiraCredentials.jira_url,
+          jira_username: jiraCredentials.jira_username,
+          jira_api_token: jiraCredentials.jira_api_token,
+          jira_project_key: jiraCredentials.jira_project_key,
+          epic_id: epic.id,
+          story_ids: stories.map(story => story.id),
+        }),
+      });
 
-        const data = await response.json();
+      const data = await response.json();
 
-        if (response.ok) {
-          successCount++;
-          setJiraResults(prev => ({
-            ...prev,
-            [`story_${story.id}`]: { key: data.key, url: data.url }
-          }));
-        } else {
-          failureCount++;
+      if (response.ok) {
+        successCount = data.created + data.already_created;
+        failureCount = data.failed;
+        if (data.error) {
+          console.error("Jira stopped part way through:", data.error);
         }
-      } catch (err) {
-        failureCount++;
-        console.error(`Failed to create story ${story.name}:`, err);
-      } finally {
-        setLoadingJiraItems(prev => {
-          const newSet = new Set(prev);
-          newSet.delete(`story_${story.id}`);
-          return newSet;
+        setJiraResults(prev => {
+          const next = { ...prev };
+          for (const result of data.results) {
+            if (result.success) {
+              next[`story_${result.story_id}`] = { key: result.key, url: result.url };
+            }
+          }
+          return next;
         });
+      } else {
+        failureCount = stories.length;
+        console.error("Failed to create stories in Jira:", data);
       }
+    } catch (err) {
+      failureCount = stories.length;
+      console.error("Failed to create stories in Jira:", err);
+    } finally {
+      setLoadingJiraItems(prev => {
+        const newSet = new Set(prev);
+        for (const story of stories) {
+          newSet.delete(`story_${story.id}`);
+        }
+        return newSet;
+      });
     }
 
     // Show summary message
@@ -75,6 +75,7 @@ export default function History() {
   };
 
   const getTestPlanTitle = (tp) => {
+    if (tp.title) return tp.title;
     if (typeof tp.content === 'string') {
       try {
         const parsed = JSON.parse(tp.content);
@@ -69,10 +69,13 @@ export default function UploadPage() {
         headers: { "Content-Type": "multipart/form-data" },
       });
       setUploadProgress(75);
+      const { upload_id: uploadId, duplicate_of: duplicateOf } = response.data;
       toast.current.show({
         severity: "success",
         summary: "Success",
-        detail: `✅ Upload successful! File ID: ${response.data.upload_id}`,
+        detail: duplicateOf
+          ? `✅ Upload successful! File ID: ${uploadId} (same document as File ID ${duplicateOf})`
+          : `✅ Upload successful! File ID: ${uploadId}`,
         life: 2000,
       });
       setFile(null);
@@ -0,0 +1,63 @@
+"""
+Migration script to add precomputed embedding columns for RAG search
+
+Fields added to epics and qa:
+- embedding: float32 embedding vector stored as bytes
+- embedding_model: Name of the model that produced the embedding
+- embedding_hash: SHA-256 of the text that was embedded
+
+Existing rows are embedded lazily by the first search that sees them.
+
+Run this script to update the database schema
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+from sqlalchemy import text
+from config.db import engine
+
+EMBEDDING_COLUMNS = [
+    ("embedding", "BYTEA"),
+    ("embedding_model", "VARCHAR(255)"),
+    ("embedding_hash", "VARCHAR(64)"),
+]
+
+# Uploads are embedded per passage in upload_chunks; see create_upload_chunks.py
+TABLES = ["epics", "qa"]
+
+
+def migrate():
+    """Add embedding columns to epics and qa tables"""
+
+    with engine.connect() as connection:
+        for table in TABLES:
+            for column, column_type in EMBEDDING_COLUMNS:
+                print(f"Checking if {column} column exists in {table} table...")
+                try:
+                    connection.execute(text(f"SELECT {column} FROM {table} LIMIT 1"))
+                    print(f"✓ {column} column already exists in {table} table")
+                except Exception:
+                    try:
+                        connection.rollback()
+                        print(f"Adding {column} column to {table} table...")
+                        connection.execute(text(f"""
+                            ALTER TABLE {table}
+                            ADD COLUMN {column} {column_type}
+                        """))
+                        connection.commit()
+                        print(f"✓ {column} column added to {table} table")
+                    except Exception as add_error:
+                        connection.rollback()
+                        print(f"⚠️ Could not add {column} to {table}: {add_error}")
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Running migration: add_embedding_columns")
+    print("=" * 60)
+    migrate()
+    print("=" * 60)
+    print("Migration complete!")
+    print("=" * 60)
@@ -0,0 +1,56 @@
+"""
+Migration script to add composite indexes for the paginated listing endpoints
+
+Indexes added:
+- uploads(user_id, created_at, id): a user's uploads, newest first
+- epics(upload_id, created_at, id): epics of an upload, by creation time
+- stories(epic_id, created_at, id): stories of an epic, by creation time
+- qa(story_id, type): QA test cases of a story
+- qa(epic_id, type): test plans of an epic
+
+Indexes are built with CREATE INDEX CONCURRENTLY so the tables stay
+writable while the migration runs.
+
+Run this script to update the database schema
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+from sqlalchemy import text
+from config.db import engine
+
+INDEXES = [
+    ("ix_uploads_user_created", "uploads", "user_id, created_at, id"),
+    ("ix_epics_upload_created", "epics", "upload_id, created_at, id"),
+    ("ix_stories_epic_created", "stories", "epic_id, created_at, id"),
+    ("ix_qa_story_type", "qa", "story_id, type"),
+    ("ix_qa_epic_type", "qa", "epic_id, type"),
+]
+
+
+def migrate():
+    """Create the listing indexes if they do not exist"""
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        for name, table, columns in INDEXES:
+            print(f"Creating index {name} on {table} ({columns})...")
+            try:
+                connection.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({columns})"))
+                print(f"✓ Index {name} ready")
+            except Exception as e:
+                print(f"⚠️ Could not create {name}: {e}")
+        connection.execute(text("ANALYZE uploads, epics, stories, qa"))
+        print("✓ Table statistics refreshed")
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Running migration: add_listing_indexes")
+    print("=" * 60)
+    migrate()
+    print("=" * 60)
+    print("Migration complete!")
+    print("=" * 60)
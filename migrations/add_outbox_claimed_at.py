@@ -0,0 +1,52 @@
+"""
+Migration script to add the claim time to confluence_outbox
+
+Fields added to confluence_outbox:
+- claimed_at: when a worker took the entry in_progress; entries claimed
+  longer ago than CONFLUENCE_OUTBOX_LEASE_SECONDS are requeued
+
+Entries in progress before this migration have no claim time and are
+requeued by the next worker pass.
+
+Run this script to update the database schema
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+from sqlalchemy import text
+from config.db import engine
+
+
+def migrate():
+    """Add claimed_at column to confluence_outbox table"""
+
+    with engine.connect() as connection:
+        print("Checking if claimed_at column exists in confluence_outbox table...")
+        try:
+            connection.execute(text("SELECT claimed_at FROM confluence_outbox LIMIT 1"))
+            print("✓ claimed_at column already exists in confluence_outbox table")
+        except Exception:
+            try:
+                connection.rollback()
+                print("Adding claimed_at column to confluence_outbox table...")
+                connection.execute(text("""
+                    ALTER TABLE confluence_outbox
+                    ADD COLUMN claimed_at TIMESTAMP
+                """))
+                connection.commit()
+                print("✓ claimed_at column added to confluence_outbox table")
+            except Exception as add_error:
+                connection.rollback()
+                print(f"⚠️ Could not add claimed_at to confluence_outbox: {add_error}")
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Running migration: add_outbox_claimed_at")
+    print("=" * 60)
+    migrate()
+    print("=" * 60)
+    print("Migration complete!")
+    print("=" * 60)
@@ -0,0 +1,103 @@
+"""
+Migration script to denormalize the owner onto epics, stories and qa
+
+Columns added:
+- epics.user_id
+- stories.upload_id, stories.user_id
+- qa.upload_id, qa.user_id
+
+Existing rows are backfilled from their parents (uploads -> epics ->
+stories -> qa; test plans from their epic). New rows get the values on
+insert, so access checks filter on user_id without joining up to uploads.
+
+Indexes added:
+- epics(user_id, created_at, id)
+- stories(user_id, created_at, id)
+- qa(user_id, type, created_at, id)
+
+Run this script to update the database schema
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+from sqlalchemy import text
+from config.db import engine
+
+COLUMNS = [
+    ("epics", "user_id", "users(id)"),
+    ("stories", "upload_id", "uploads(id)"),
+    ("stories", "user_id", "users(id)"),
+    ("qa", "upload_id", "uploads(id)"),
+    ("qa", "user_id", "users(id)"),
+]
+
+# Parents before children, so each step reads already-backfilled values
+BACKFILL = [
+    ("epics", """
+        UPDATE epics SET user_id = uploads.user_id
+        FROM uploads
+        WHERE epics.upload_id = uploads.id AND epics.user_id IS NULL
+    """),
+    ("stories", """
+        UPDATE stories SET upload_id = epics.upload_id, user_id = epics.user_id
+        FROM epics
+        WHERE stories.epic_id = epics.id AND stories.user_id IS NULL
+    """),
+    ("qa tests", """
+        UPDATE qa SET upload_id = stories.upload_id, user_id = stories.user_id
+        FROM stories
+        WHERE qa.story_id = stories.id AND qa.user_id IS NULL
+    """),
+    ("test plans", """
+        UPDATE qa SET upload_id = epics.upload_id, user_id = epics.user_id
+        FROM epics
+        WHERE qa.story_id IS NULL AND qa.epic_id = epics.id AND qa.user_id IS NULL
+    """),
+]
+
+INDEXES = [
+    ("ix_epics_user_created", "epics", "user_id, created_at, id"),
+    ("ix_stories_user_created", "stories", "user_id, created_at, id"),
+    ("ix_qa_user_type_created", "qa", "user_id, type, created_at, id"),
+]
+
+
+def migrate():
+    """Add, backfill and index the owner columns"""
+
+    with engine.begin() as connection:
+        for table, column, target in COLUMNS:
+            print(f"Adding {table}.{column}...")
+            connection.execute(text(
+                f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column} INTEGER "
+                f"REFERENCES {target} ON DELETE CASCADE"
+            ))
+            print(f"✓ {table}.{column} ready")
+
+        for label, statement in BACKFILL:
+            updated = connection.execute(text(statement)).rowcount
+            print(f"✓ Backfilled {updated} {label}")
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        for name, table, columns in INDEXES:
+            print(f"Creating index {name} on {table} ({columns})...")
+            try:
+                connection.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({columns})"))
+                print(f"✓ Index {name} ready")
+            except Exception as e:
+                print(f"⚠️ Could not create {name}: {e}")
+        connection.execute(text("ANALYZE epics, stories, qa"))
+        print("✓ Table statistics refreshed")
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Running migration: add_owner_columns")
+    print("=" * 60)
+    migrate()
+    print("=" * 60)
+    print("Migration complete!")
+    print("=" * 60)
@@ -0,0 +1,84 @@
+"""
+Migration script to add content hashes to uploads for duplicate detection
+
+Fields added to uploads:
+- file_hash: SHA-256 of the uploaded bytes
+- text_hash: SHA-256 of the extracted requirement text
+
+Indexes added:
+- uploads(user_id, file_hash) and uploads(user_id, text_hash), for the
+  duplicate lookup on every upload
+
+Existing uploads get their text_hash from the stored requirement text; their
+bytes were not kept, so file_hash stays NULL.
+
+Run this script to update the database schema
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+from sqlalchemy import text
+from config.db import engine
+
+HASH_COLUMNS = ["file_hash", "text_hash"]
+
+INDEXES = [
+    ("ix_uploads_user_file_hash", "user_id, file_hash"),
+    ("ix_uploads_user_text_hash", "user_id, text_hash"),
+]
+
+
+def migrate():
+    """Add hash columns to uploads, backfill text_hash and index both"""
+
+    with engine.connect() as connection:
+        for column in HASH_COLUMNS:
+            print(f"Checking if {column} column exists in uploads table...")
+            try:
+                connection.execute(text(f"SELECT {column} FROM uploads LIMIT 1"))
+                print(f"✓ {column} column already exists in uploads table")
+            except Exception:
+                try:
+                    connection.rollback()
+                    print(f"Adding {column} column to uploads table...")
+                    connection.execute(text(f"ALTER TABLE uploads ADD COLUMN {column} VARCHAR(64)"))
+                    connection.commit()
+                    print(f"✓ {column} column added to uploads table")
+                except Exception as add_error:
+                    connection.rollback()
+                    print(f"⚠️ Could not add {column} to uploads: {add_error}")
+
+        print("Backfilling text_hash from the stored requirement text...")
+        try:
+            result = connection.execute(text("""
+                UPDATE uploads
+                SET text_hash = encode(sha256(convert_to(content->>'requirement', 'UTF8')), 'hex')
+                WHERE text_hash IS NULL AND content->>'requirement' IS NOT NULL
+            """))
+            connection.commit()
+            print(f"✓ text_hash set on {result.rowcount} uploads")
+        except Exception as backfill_error:
+            connection.rollback()
+            print(f"⚠️ Could not backfill text_hash: {backfill_error}")
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        for name, columns in INDEXES:
+            print(f"Creating index {name} on uploads ({columns})...")
+            try:
+                connection.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON uploads ({columns})"))
+                print(f"✓ Index {name} ready")
+            except Exception as e:
+                print(f"⚠️ Could not create {name}: {e}")
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Running migration: add_upload_hashes")
+    print("=" * 60)
+    migrate()
+    print("=" * 60)
+    print("Migration complete!")
+    print("=" * 60)
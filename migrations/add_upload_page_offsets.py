@@ -0,0 +1,50 @@
+"""
+Migration script to add the page offsets column to uploads
+
+Fields added to uploads:
+- page_offsets: JSON list of where each PDF page starts in the extracted text
+
+Uploads stored before this migration keep NULL offsets.
+
+Run this script to update the database schema
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+from sqlalchemy import text
+from config.db import engine
+
+
+def migrate():
+    """Add page_offsets column to uploads table"""
+
+    with engine.connect() as connection:
+        print("Checking if page_offsets column exists in uploads table...")
+        try:
+            connection.execute(text("SELECT page_offsets FROM uploads LIMIT 1"))
+            print("✓ page_offsets column already exists in uploads table")
+        except Exception:
+            try:
+                connection.rollback()
+                print("Adding page_offsets column to uploads table...")
+                connection.execute(text("""
+                    ALTER TABLE uploads
+                    ADD COLUMN page_offsets JSONB
+                """))
+                connection.commit()
+                print("✓ page_offsets column added to uploads table")
+            except Exception as add_error:
+                connection.rollback()
+                print(f"⚠️ Could not add page_offsets to uploads: {add_error}")
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Running migration: add_upload_page_offsets")
+    print("=" * 60)
+    migrate()
+    print("=" * 60)
+    print("Migration complete!")
+    print("=" * 60)
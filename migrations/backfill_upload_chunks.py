@@ -0,0 +1,67 @@
+"""
+Migration script to mark chunked uploads and chunk the rest
+
+Search only reads upload_chunks, so uploads stored before chunking (or
+whose chunking failed at write time) are chunked here, and chunks embedded
+by another model are re-embedded. Run it again after changing
+EMBEDDING_MODEL_NAME.
+
+Field added to uploads:
+- chunked: True once the upload's passages are in upload_chunks
+
+Run this script after create_upload_chunks.py
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+from sqlalchemy import text
+from config.db import engine, get_db_context
+from rag.upload_chunks import backfill_upload_chunks
+
+
+def migrate():
+    """Add the chunked column to uploads and chunk every upload without chunks"""
+
+    with engine.connect() as connection:
+        print("Checking if chunked column exists in uploads table...")
+        try:
+            connection.execute(text("SELECT chunked FROM uploads LIMIT 1"))
+            print("✓ chunked column already exists in uploads table")
+        except Exception:
+            try:
+                connection.rollback()
+                print("Adding chunked column to uploads table...")
+                connection.execute(text("""
+                    ALTER TABLE uploads
+                    ADD COLUMN chunked BOOLEAN NOT NULL DEFAULT false
+                """))
+                connection.execute(text("""
+                    UPDATE uploads SET chunked = true
+                    WHERE EXISTS (SELECT 1 FROM upload_chunks WHERE upload_chunks.upload_id = uploads.id)
+                """))
+                connection.commit()
+                print("✓ chunked column added to uploads table")
+            except Exception as add_error:
+                connection.rollback()
+                print(f"⚠️ Could not add chunked to uploads: {add_error}")
+                return
+
+    print("Chunking uploads without chunks...")
+    try:
+        with get_db_context() as db:
+            embedded = backfill_upload_chunks(db)
+        print(f"✓ {embedded} upload chunks embedded")
+    except Exception as backfill_error:
+        print(f"⚠️ Could not chunk uploads: {backfill_error}")
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Running migration: backfill_upload_chunks")
+    print("=" * 60)
+    migrate()
+    print("=" * 60)
+    print("Migration complete!")
+    print("=" * 60)
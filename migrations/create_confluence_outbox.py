@@ -0,0 +1,59 @@
+"""
+Migration script to create the confluence_outbox table
+
+Generated epics and test plans are committed together with an outbox row;
+a background worker publishes the Confluence pages afterwards, so no
+database connection is held while Confluence is called, and failed
+publications can be replayed.
+
+Index added:
+- confluence_outbox(status, available_at), for the worker's claim query
+
+Run this script to update the database schema
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+from sqlalchemy import text
+from config.db import engine
+
+
+def migrate():
+    """Create the outbox table and its index"""
+
+    with engine.begin() as connection:
+        print("Creating confluence_outbox...")
+        connection.execute(text("""
+            CREATE TABLE IF NOT EXISTS confluence_outbox (
+                id SERIAL PRIMARY KEY,
+                user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+                upload_id INTEGER NOT NULL REFERENCES uploads(id) ON DELETE CASCADE,
+                epic_id INTEGER REFERENCES epics(id) ON DELETE CASCADE,
+                status VARCHAR(20) NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error VARCHAR(1000),
+                available_at TIMESTAMP NOT NULL DEFAULT (now() AT TIME ZONE 'utc'),
+                created_at TIMESTAMP DEFAULT now(),
+                updated_at TIMESTAMP
+            )
+        """))
+        print("✓ confluence_outbox ready")
+
+        print("Creating index ix_confluence_outbox_status_available...")
+        connection.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_confluence_outbox_status_available "
+            "ON confluence_outbox (status, available_at)"
+        ))
+        print("✓ Index ix_confluence_outbox_status_available ready")
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Running migration: create_confluence_outbox")
+    print("=" * 60)
+    migrate()
+    print("=" * 60)
+    print("Migration complete!")
+    print("=" * 60)
@@ -0,0 +1,59 @@
+"""
+Migration script to create the upload_chunks table
+
+Uploads are split into overlapping passages that are embedded one by one,
+so RAG search sees the whole document rather than the first ~256 tokens
+the embedding model reads. Existing uploads are chunked by
+backfill_upload_chunks.py.
+
+Index added:
+- upload_chunks(upload_id, chunk_index), for loading an upload's passages in order
+
+Run this script to update the database schema
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+from sqlalchemy import text
+from config.db import engine
+
+
+def migrate():
+    """Create the upload chunks table and its index"""
+
+    with engine.begin() as connection:
+        print("Creating upload_chunks...")
+        connection.execute(text("""
+            CREATE TABLE IF NOT EXISTS upload_chunks (
+                id SERIAL PRIMARY KEY,
+                upload_id INTEGER NOT NULL REFERENCES uploads(id) ON DELETE CASCADE,
+                chunk_index INTEGER NOT NULL,
+                start_offset INTEGER NOT NULL,
+                end_offset INTEGER NOT NULL,
+                heading VARCHAR(255),
+                text TEXT NOT NULL,
+                embedding BYTEA,
+                embedding_model VARCHAR(255),
+                embedding_hash VARCHAR(64)
+            )
+        """))
+        print("✓ upload_chunks ready")
+
+        print("Creating index ix_upload_chunks_upload_index...")
+        connection.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_upload_chunks_upload_index "
+            "ON upload_chunks (upload_id, chunk_index)"
+        ))
+        print("✓ Index ix_upload_chunks_upload_index ready")
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Running migration: create_upload_chunks")
+    print("=" * 60)
+    migrate()
+    print("=" * 60)
+    print("Migration complete!")
+    print("=" * 60)
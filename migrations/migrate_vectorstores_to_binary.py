@@ -0,0 +1,44 @@
+"""
+Migration script to convert JSON vector stores to the binary layout
+
+Every storage/vectorstore*.json file is rewritten as:
+- <name>.meta.jsonl: header plus one record per document (text, metadata)
+- <name>.<generation>.f32: float32 matrix of normalized embeddings
+
+The original JSON file is kept as <name>.json.migrated.
+
+Run this script once per deployment (stores are also migrated lazily when opened)
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+from rag.vectorstore import migrate_json_stores
+
+STORAGE_FOLDERS = [
+    Path(__file__).parent.parent / "storage",
+    Path(__file__).parent.parent / "backend" / "storage",
+]
+
+
+def migrate():
+    """Convert legacy JSON vector stores in the storage folders"""
+
+    for folder in STORAGE_FOLDERS:
+        print(f"Checking {folder} for JSON vector stores...")
+        migrated = migrate_json_stores(str(folder))
+        if not migrated:
+            print(f"✓ No JSON vector stores in {folder}")
+        for filename, document_count in migrated.items():
+            print(f"✓ Migrated {filename} ({document_count} documents)")
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Running migration: migrate_vectorstores_to_binary")
+    print("=" * 60)
+    migrate()
+    print("=" * 60)
+    print("Migration complete!")
+    print("=" * 60)